@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+FLV 错误检测
+基于文件头和标签索引检查常见的结构与时间戳问题
+"""
+
+from typing import Any, Dict, List
+
+from core.parser.flv_header import FLVHeader, FLVHeaderError, FLV_HEADER_SIZE
+from core.parser.tag_parser import TAG_TYPE_AUDIO, TAG_TYPE_VIDEO
+
+# 问题级别
+LEVEL_ERROR = '错误'
+LEVEL_WARNING = '警告'
+
+
+def _issue(level: str, check: str, message: str) -> Dict[str, Any]:
+    return {'级别': level, '检查项': check, '描述': message}
+
+
+def check_header(file_path) -> List[Dict[str, Any]]:
+    """检查FLV文件头"""
+    try:
+        with open(file_path, 'rb') as f:
+            FLVHeader.parse(f.read(FLV_HEADER_SIZE))
+    except FLVHeaderError as e:
+        return [_issue(LEVEL_ERROR, '文件头检查', str(e))]
+    return []
+
+
+def check_timestamps(table) -> List[Dict[str, Any]]:
+    """检查音视频时间戳是否单调递增"""
+    issues = []
+    for tag_type, name in ((TAG_TYPE_VIDEO, '视频'), (TAG_TYPE_AUDIO, '音频')):
+        last = -1
+        backwards = 0
+        first_row = -1
+        for row, (t, ts) in enumerate(zip(table.tag_type, table.timestamp)):
+            if t != tag_type:
+                continue
+            if ts < last:
+                backwards += 1
+                if first_row < 0:
+                    first_row = row
+            last = ts
+        if backwards:
+            issues.append(_issue(LEVEL_WARNING, '时间戳验证',
+                                 f"{name}时间戳回退 {backwards} 次，首次出现在第 {first_row} 个标签"))
+    return issues
+
+
+def detect_errors(handler) -> List[Dict[str, Any]]:
+    """
+    检测已加载FLV文件中的问题
+
+    Args:
+        handler: 已调用load_file的FLVFileHandler
+
+    Returns:
+        list: 问题列表，每项包含级别、检查项和描述
+    """
+    issues = check_header(handler.file_path)
+    if issues:
+        return issues
+
+    info = handler.file_info
+    table = handler.tags_data
+
+    if info.get('文件截断'):
+        issues.append(_issue(LEVEL_ERROR, '标签结构检查', '文件末尾的标签被截断'))
+    if info.get('PreviousTagSize错误数'):
+        issues.append(_issue(LEVEL_WARNING, '标签结构检查',
+                             f"PreviousTagSize不匹配 {info['PreviousTagSize错误数']} 处"))
+    if not len(table):
+        issues.append(_issue(LEVEL_ERROR, '标签结构检查', '未找到任何标签'))
+        return issues
+
+    if info.get('包含视频') and not table.count(TAG_TYPE_VIDEO):
+        issues.append(_issue(LEVEL_WARNING, '标签结构检查', '文件头声明包含视频，但没有视频标签'))
+    if info.get('包含音频') and not table.count(TAG_TYPE_AUDIO):
+        issues.append(_issue(LEVEL_WARNING, '标签结构检查', '文件头声明包含音频，但没有音频标签'))
+    if table.count(TAG_TYPE_VIDEO) and not len(handler.keyframes):
+        issues.append(_issue(LEVEL_ERROR, '标签结构检查', '视频流中没有关键帧'))
+    if not handler.metadata:
+        issues.append(_issue(LEVEL_WARNING, '元数据检查', '缺少onMetaData'))
+
+    issues.extend(check_timestamps(table))
+    return issues
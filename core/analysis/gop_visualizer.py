@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+GOP 结构分析
+从标签索引中向量化地提取GOP边界、逐帧类型(I/P/B)、帧大小和时长，
+结果以数组形式保存，供GOP结构图和命令行报告共用
+"""
+
+from typing import Any, Dict, Optional
+
+from core.parser.tag_parser import (TAG_TYPE_VIDEO, FRAME_TYPE_KEY, FRAME_TYPE_INTER,
+                                    FRAME_TYPE_DISPOSABLE)
+from core.parser.tag_table import TagTable
+from core.parser.es_processor import SliceIndex, SLICE_TYPE_CHARS
+
+# 可选依赖 - NumPy，GOP提取完全基于数组运算
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+# 帧类型编码
+FRAME_I = 0
+FRAME_P = 1
+FRAME_B = 2
+FRAME_UNKNOWN = 3
+FRAME_TYPE_CHARS = 'IPB?'
+
+# FLV帧类型4（服务器生成的关键帧）也作为GOP起点
+FRAME_TYPE_GENERATED_KEY = 4
+
+LENGTH_DISTRIBUTION_TOP = 10    # 摘要中列出的最常见GOP长度数
+
+
+def gop_type_counts(frame_types, gop_starts):
+    """
+    向量化计算每个GOP中各类帧的数量
+
+    每种帧类型做一次掩码和 np.add.reduceat，不生成逐帧的中间大数组。
+
+    Returns:
+        numpy.ndarray: 形状 (GOP数, 4)，列顺序为 I/P/B/未知
+    """
+    frame_types = np.minimum(np.asarray(frame_types, dtype=np.uint8), FRAME_UNKNOWN)
+    counts = np.zeros((len(gop_starts), len(FRAME_TYPE_CHARS)), dtype=np.int64)
+    if len(gop_starts):
+        for code in range(len(FRAME_TYPE_CHARS)):
+            mask = (frame_types == code).view(np.uint8)
+            counts[:, code] = np.add.reduceat(mask, gop_starts, dtype=np.int64)
+    return counts
+
+
+class GOPStructure:
+    """
+    按解码顺序排列的视频帧及其GOP划分
+
+    逐帧数组（长度为帧数）：
+        frame_rows: 帧在标签索引中的行号
+        frame_types: 帧类型编码（FRAME_I/P/B/UNKNOWN）
+        frame_sizes: 标签数据大小（字节）
+        frame_durations: 到下一帧的解码时间间隔（毫秒）
+        pts: 显示时间戳（毫秒，时间戳 + CTS）
+
+    逐GOP数组（长度为GOP数）：
+        gop_starts: 每个GOP第一帧的帧下标
+        gop_lengths: 帧数
+        gop_sizes: 字节数
+        gop_durations: 时长（毫秒）
+        gop_leading: 显示时间早于本GOP关键帧的前置帧数，大于0即开放GOP
+
+    首个关键帧之前的帧单独成为第一个GOP，此时 leading_partial 为True。
+    """
+
+    __slots__ = ('frame_rows', 'frame_types', 'frame_sizes', 'frame_durations', 'pts',
+                 'gop_starts', 'gop_lengths', 'gop_sizes', 'gop_durations', 'gop_leading',
+                 'leading_partial')
+
+    def __init__(self, frame_rows, frame_types, frame_sizes, frame_durations, pts,
+                 gop_starts, gop_lengths, gop_sizes, gop_durations, gop_leading,
+                 leading_partial: bool = False):
+        self.frame_rows = frame_rows
+        self.frame_types = frame_types
+        self.frame_sizes = frame_sizes
+        self.frame_durations = frame_durations
+        self.pts = pts
+        self.gop_starts = gop_starts
+        self.gop_lengths = gop_lengths
+        self.gop_sizes = gop_sizes
+        self.gop_durations = gop_durations
+        self.gop_leading = gop_leading
+        self.leading_partial = leading_partial
+
+    @classmethod
+    def empty(cls) -> 'GOPStructure':
+        int64 = np.zeros(0, dtype=np.int64)
+        return cls(np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint8), int64, int64, int64,
+                   int64, int64, int64, int64, int64)
+
+    def __len__(self) -> int:
+        return len(self.gop_starts)
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.frame_types)
+
+    @property
+    def open_gops(self):
+        """开放GOP的布尔掩码"""
+        return self.gop_leading > 0
+
+    def type_counts(self):
+        """每个GOP中各类帧的数量，形状 (GOP数, 4)"""
+        return gop_type_counts(self.frame_types, self.gop_starts)
+
+    def length_distribution(self):
+        """
+        GOP长度分布
+
+        Returns:
+            tuple: (长度数组, 出现次数数组)，按长度递增
+        """
+        return np.unique(self.gop_lengths, return_counts=True)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        GOP统计摘要（值均为Python内置类型，可直接输出为JSON）
+
+        Returns:
+            dict: GOP数、帧类型计数、长度/时长/大小统计、长度分布和开放GOP数；
+                没有视频帧时只有'GOP数'
+        """
+        count = len(self)
+        if not count:
+            return {'GOP数': 0}
+        totals = np.bincount(self.frame_types, minlength=len(FRAME_TYPE_CHARS))
+        # 首个不完整的GOP不参与长度/时长统计，避免拉低平均值
+        complete = slice(1, None) if self.leading_partial and count > 1 else slice(None)
+        lengths = self.gop_lengths[complete]
+        durations = self.gop_durations[complete]
+        sizes = self.gop_sizes[complete].astype(np.float64)
+        values, occurrences = np.unique(lengths, return_counts=True)
+        top = np.argsort(-occurrences, kind='stable')[:LENGTH_DISTRIBUTION_TOP]
+        mean_size = float(sizes.mean())
+        open_count = int(np.count_nonzero(self.open_gops))
+        return {
+            'GOP数': count,
+            'I帧数': int(totals[FRAME_I]),
+            'P帧数': int(totals[FRAME_P]),
+            'B帧数': int(totals[FRAME_B]),
+            '平均GOP长度_帧': round(float(lengths.mean()), 2),
+            '最小GOP长度_帧': int(lengths.min()),
+            '最大GOP长度_帧': int(lengths.max()),
+            'GOP长度分布': {int(values[i]): int(occurrences[i]) for i in top},
+            '平均GOP时长_毫秒': round(float(durations.mean()), 1),
+            'GOP时长标准差_毫秒': round(float(durations.std()), 1),
+            '平均GOP大小_字节': int(mean_size),
+            'GOP大小标准差_字节': int(sizes.std()),
+            'GOP大小变异系数': round(float(sizes.std() / mean_size), 3) if mean_size else 0.0,
+            '开放GOP数': open_count,
+            '封闭GOP数': count - open_count - int(self.leading_partial),
+            '首个关键帧前帧数': int(self.gop_lengths[0]) if self.leading_partial else 0,
+        }
+
+
+def classify_frames(frame_type, pts, gop_starts):
+    """
+    推断逐帧的I/P/B类型
+
+    FLV标签只区分关键帧、帧间帧和可丢弃帧。关键帧为I帧；可丢弃帧，以及
+    显示时间早于同一GOP内先解码的某一帧的帧（需要后向参考）为B帧；其余为P帧。
+    先前帧的最大显示时间按GOP分段计算，时间戳在GOP之间回退不会影响判断。
+
+    Args:
+        frame_type: FLV帧类型数组
+        pts: 显示时间戳数组（int64）
+        gop_starts: 每个GOP第一帧的下标
+
+    Returns:
+        tuple: (帧类型编码数组, 相对所在GOP第一帧的显示时间数组)
+    """
+    count = len(pts)
+    lengths = np.diff(np.append(gop_starts, count))
+    relative = pts - np.repeat(pts[gop_starts], lengths)
+    # 给每个GOP加上递增的偏移，使累计最大值在GOP边界处重新开始
+    span = int(relative.max() - relative.min()) + 1
+    shifted = relative + np.repeat(np.arange(len(gop_starts), dtype=np.int64) * span, lengths)
+    previous_max = np.empty(count, dtype=np.int64)
+    previous_max[0] = np.iinfo(np.int64).min
+    np.maximum.accumulate(shifted[:-1], out=previous_max[1:])
+
+    codes = np.full(count, FRAME_UNKNOWN, dtype=np.uint8)
+    inter = (frame_type == FRAME_TYPE_INTER) | (frame_type == FRAME_TYPE_DISPOSABLE)
+    codes[inter] = FRAME_P
+    codes[inter & ((frame_type == FRAME_TYPE_DISPOSABLE) | (shifted < previous_max))] = FRAME_B
+    codes[(frame_type == FRAME_TYPE_KEY) | (frame_type == FRAME_TYPE_GENERATED_KEY)] = FRAME_I
+    return codes, relative
+
+
+def apply_slice_types(codes, frame_rows, slices: SliceIndex):
+    """
+    用片头中的slice_type覆盖推断的帧类型（原地修改）
+
+    FLV只把IDR标记为关键帧，片头可以识别出非IDR的I帧，以及被标记为
+    帧间帧但实际只含I片的帧。片类型未知的帧保留推断结果。
+    """
+    if not len(slices) or not len(frame_rows):
+        return
+    slice_rows = slices.column('row')
+    slice_types = slices.column('slice_type')
+    positions = np.searchsorted(frame_rows, slice_rows)
+    known = (slice_types < len(SLICE_TYPE_CHARS)) & (positions < len(frame_rows))
+    known[known] &= frame_rows[positions[known]] == slice_rows[known]
+    slice_to_frame = np.array([FRAME_TYPE_CHARS.index(char) for char in SLICE_TYPE_CHARS], dtype=np.uint8)
+    codes[positions[known]] = slice_to_frame[slice_types[known]]
+
+
+def extract_gops(table: TagTable, slices: Optional[SliceIndex] = None) -> GOPStructure:
+    """
+    从标签索引提取GOP结构
+
+    Args:
+        table: 标签索引
+        slices: 可选的H.264片头索引，提供时帧类型以片头为准
+
+    Returns:
+        GOPStructure
+    """
+    if not HAS_NUMPY:
+        raise RuntimeError("GOP分析需要NumPy")
+    if not len(table):
+        return GOPStructure.empty()
+
+    frame_type = table.column('frame_type')
+    video = (table.frame_mask(TAG_TYPE_VIDEO)
+             & (frame_type >= FRAME_TYPE_KEY) & (frame_type <= FRAME_TYPE_GENERATED_KEY))
+    rows = np.flatnonzero(video).astype(np.uint32)
+    count = len(rows)
+    if not count:
+        return GOPStructure.empty()
+
+    frame_type = frame_type[rows]
+    sizes = table.column('data_size')[rows].astype(np.int64)
+    dts = table.column('timestamp')[rows].astype(np.int64)
+    pts = dts + table.column('cts')[rows]
+
+    # GOP边界：关键帧所在位置；首个关键帧前的帧自成一个GOP
+    key_mask = (frame_type == FRAME_TYPE_KEY) | (frame_type == FRAME_TYPE_GENERATED_KEY)
+    starts = np.flatnonzero(key_mask)
+    leading_partial = not len(starts) or starts[0] != 0
+    if leading_partial:
+        starts = np.concatenate(([0], starts))
+    lengths = np.diff(np.append(starts, count))
+
+    codes, relative = classify_frames(frame_type, pts, starts)
+    if slices is not None:
+        apply_slice_types(codes, rows, slices)
+
+    # 帧时长为到下一帧的解码时间间隔，最后一帧沿用前一帧的间隔；时间戳回退记为0
+    durations = np.empty(count, dtype=np.int64)
+    if count > 1:
+        np.subtract(dts[1:], dts[:-1], out=durations[:-1])
+        durations[-1] = durations[-2]
+    else:
+        durations[-1] = 0
+    np.maximum(durations, 0, out=durations)
+
+    leading = np.add.reduceat((relative < 0).view(np.uint8), starts, dtype=np.int64)
+    if leading_partial:
+        # 没有关键帧的GOP无法判断开放与否
+        leading[0] = 0
+
+    return GOPStructure(
+        frame_rows=rows,
+        frame_types=codes,
+        frame_sizes=sizes,
+        frame_durations=durations,
+        pts=pts,
+        gop_starts=starts,
+        gop_lengths=lengths,
+        gop_sizes=np.add.reduceat(sizes, starts),
+        gop_durations=np.add.reduceat(durations, starts),
+        gop_leading=leading,
+        leading_partial=bool(leading_partial),
+    )
+
+
+def analyze_gops(table: TagTable, slices: Optional[SliceIndex] = None) -> Optional[Dict[str, Any]]:
+    """GOP统计摘要；未安装NumPy时返回None"""
+    if not HAS_NUMPY:
+        return None
+    return extract_gops(table, slices).summary()
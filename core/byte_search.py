@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+字节模式搜索
+在内存映射的大文件中分块查找十六进制/ASCII模式，块之间保留重叠，
+按偏移顺序逐步返回结果
+"""
+
+from typing import Callable, Iterator, List, Optional
+
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+def parse_hex_pattern(text: str) -> bytes:
+    """
+    解析十六进制模式，支持 "46 4C 56"、"464c56"、"0x464C56" 等写法
+
+    Raises:
+        ValueError: 不是有效的十六进制字节序列
+    """
+    text = text.strip()
+    if text[:2].lower() == '0x':
+        text = text[2:]
+    digits = ''.join(text.replace(',', ' ').split())
+    if not digits:
+        raise ValueError("搜索内容为空")
+    if len(digits) % 2:
+        raise ValueError(f"十六进制位数必须为偶数: {text}")
+    return bytes.fromhex(digits)
+
+
+def parse_search_pattern(text: str, hex_mode: bool) -> bytes:
+    """
+    把搜索框中的文本转换为字节模式
+
+    Args:
+        text: 搜索文本
+        hex_mode: True按十六进制解析，False按UTF-8编码的文本解析
+    """
+    if hex_mode:
+        return parse_hex_pattern(text)
+    if not text:
+        raise ValueError("搜索内容为空")
+    return text.encode('utf-8')
+
+
+def _search_chunk(buffer, pattern: bytes, lo: int, hi: int, limit: Optional[int]) -> List[int]:
+    """在 [lo, hi) 中查找模式，hi 已包含与下一块的重叠部分"""
+    hits = []
+    pos = buffer.find(pattern, lo, hi)
+    while pos != -1:
+        hits.append(pos)
+        if limit is not None and len(hits) >= limit:
+            break
+        pos = buffer.find(pattern, pos + 1, hi)
+    return hits
+
+
+def iter_pattern_hits(buffer, pattern: bytes, start: int = 0, end: Optional[int] = None,
+                      max_hits: Optional[int] = None,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      cancelled: Optional[Callable[[], bool]] = None) -> Iterator[int]:
+    """
+    按偏移递增顺序逐个返回模式出现的位置
+
+    [start, end) 被切成 chunk_size 大小的块依次搜索，每块向后多搜索
+    len(pattern)-1 字节，跨越块边界的匹配只归属于它起始所在的块。mmap.find
+    执行期间不释放GIL，多线程并不能加速，分块只是为了在块之间检查取消请求，
+    调用方停止迭代后不会继续搜索剩余部分。
+
+    Args:
+        buffer: 支持 find(sub, start, end) 的对象（mmap、bytes）
+        pattern: 要查找的字节序列
+        start: 起始偏移
+        end: 结束偏移，None表示数据末尾
+        max_hits: 最多返回的结果数
+        chunk_size: 每块大小
+        cancelled: 返回True时停止搜索
+
+    Yields:
+        int: 匹配的起始偏移
+    """
+    if not pattern:
+        raise ValueError("搜索模式为空")
+    end = len(buffer) if end is None else min(end, len(buffer))
+    if start >= end or max_hits == 0:
+        return
+
+    overlap = len(pattern) - 1
+    found = 0
+    for lo in range(start, end, chunk_size):
+        if cancelled is not None and cancelled():
+            return
+        hi = min(lo + chunk_size + overlap, end)
+        limit = None if max_hits is None else max_hits - found
+        for pos in _search_chunk(buffer, pattern, lo, hi, limit):
+            yield pos
+            found += 1
+            if max_hits is not None and found >= max_hits:
+                return
+
+
+def find_next(buffer, pattern: bytes, start: int = 0, wrap: bool = True, **kwargs) -> int:
+    """
+    查找 start 之后（含）第一个匹配
+
+    Args:
+        wrap: 到末尾仍未找到时从文件开头继续查找
+        **kwargs: 传给 iter_pattern_hits 的分块参数
+
+    Returns:
+        int: 匹配的起始偏移，未找到返回-1
+    """
+    for pos in iter_pattern_hits(buffer, pattern, start, max_hits=1, **kwargs):
+        return pos
+    if wrap and start > 0:
+        for pos in iter_pattern_hits(buffer, pattern, 0, start + len(pattern) - 1,
+                                     max_hits=1, **kwargs):
+            return pos
+    return -1
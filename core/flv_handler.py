@@ -4,11 +4,10 @@ FLV 文件处理器
 用于加载、解析和处理FLV视频文件
 """
 
-import os
-import logging
 from pathlib import Path
-from typing import Optional, Dict, Any, List
-import struct
+from typing import Optional, Dict, Any, Callable
+from array import array
+from itertools import islice
 
 try:
     import flvlib
@@ -22,23 +21,197 @@ except ImportError:
     VideoFileClip = None
 
 from core import get_logger, format_file_size, format_duration
+from core.parser.flv_header import FLVHeaderError, PREV_TAG_SIZE_LENGTH
+from core.parser.tag_parser import (FLVTagScanner, TAG_TYPE_AUDIO, TAG_TYPE_VIDEO,
+                                    TAG_TYPE_SCRIPT, TAG_HEADER_SIZE, PACKET_TYPE_NONE,
+                                    SOUND_FORMAT_AAC, VIDEO_CODEC_NAMES, SOUND_FORMAT_NAMES,
+                                    audio_sample_rate, audio_channels, audio_sample_bits,
+                                    parse_script_data, video_header_size)
+from core.parser.tag_table import TagTable, TagDictView
+from core.parser.keyframe_index import KeyframeIndex
+from core.index_cache import IndexCache
+from core.frame_seeker import FrameSeeker, HAS_PYAV
+from core.parser.es_processor import (SliceIndex, scan_slices, iter_flv_video_frames,
+                                      parse_video_config, AudioSpecificConfig, ESParseError)
 
 logger = get_logger(__name__)
 
+# 扫描标签索引时每批的标签数（进度回调和取消检查的粒度）
+PROGRESS_BATCH_TAGS = 65536
+
+# 读取文件头阶段查找音视频序列头时最多检查的标签数
+HEADER_SCAN_TAGS = 64
+
+# 音频标签首字节(1) + AAC包类型(1)
+AAC_AUDIO_HEADER_SIZE = 2
+
 
 class FLVFileHandler:
-    """FLV文件处理器"""
+    """
+    FLV文件处理器
+
+    文件按阶段加载：load_file 只读取文件头和onMetaData；
+    首次访问 tags_data/keyframes 时才扫描标签索引，
+    首次访问 video_clip 时才启动解码器。
+
+    取帧优先使用关键帧索引+PyAV直接解码标签负载，
+    不可用时回退到moviepy。
+    """
     
-    def __init__(self):
+    def __init__(self, use_flvlib: bool = False, index_cache: Optional[IndexCache] = None,
+                 use_cache: bool = True):
+        """
+        Args:
+            use_flvlib: 使用flvlib解析标签（默认使用内置mmap扫描器）
+            index_cache: 标签索引缓存，为None时使用默认缓存目录
+            use_cache: 是否读写标签索引缓存
+        """
+        self.use_flvlib = use_flvlib
+        self.index_cache = (index_cache or IndexCache()) if use_cache else None
         self.file_path = None
         self.file_info = {}
         self.metadata = {}
-        self.tags_data = []
-        self.video_clip = None
+        self._tags_data = None
+        self._keyframes = array('I')
+        self._video_clip = None
+        self._video_clip_loaded = False
+        self._keyframe_index = None
+        self._scanner = None
+        self._seeker = None
+        self._seeker_loaded = False
+        self._slice_index = None
+        self._stream_info = {}
+        self._audio_samples_per_frame = 0
+
+    @property
+    def tags_data(self) -> TagTable:
+        """标签索引，首次访问时扫描"""
+        self._ensure_tag_index()
+        return self._tags_data if self._tags_data is not None else TagTable()
+
+    @property
+    def keyframes(self) -> array:
+        """关键帧所在的标签行号，首次访问时扫描"""
+        self._ensure_tag_index()
+        return self._keyframes
+
+    @property
+    def video_clip(self):
+        """用于播放的视频对象，首次访问时启动解码器"""
+        if not self._video_clip_loaded and self.file_path is not None:
+            self._video_clip_loaded = True
+            if VideoFileClip:
+                self._load_video_clip()
+            else:
+                logger.warning("moviepy未安装，无法播放视频")
+        return self._video_clip
+
+    @property
+    def keyframe_index(self) -> KeyframeIndex:
+        """
+        关键帧索引
+
+        标签索引未加载时优先使用onMetaData中的keyframes表，
+        避免为了跳转而扫描整个文件。
+        """
+        if self._keyframe_index is None and self.file_path is not None:
+            index = None
+            if not self.is_index_loaded:
+                index = KeyframeIndex.from_metadata(self.metadata)
+                if index is not None and not self._is_video_tag_at(index.offsets[0]):
+                    logger.warning("onMetaData中的关键帧位置无效，改用标签扫描")
+                    index = None
+            if index is None:
+                index = KeyframeIndex.from_table(self.tags_data, self.keyframes)
+            self._keyframe_index = index
+        return self._keyframe_index if self._keyframe_index is not None else KeyframeIndex()
+
+    def get_slice_index(self) -> SliceIndex:
+        """
+        H.264/H.265片头索引（逐帧片类型、IDR标志、frame_num和POC）
+
+        首次调用时按标签索引批量读取片头，不启动解码器；其他编码返回空索引。
+        """
+        if self._slice_index is None and self.file_path is not None:
+            self._slice_index = scan_slices(self._get_scanner(), self.tags_data)
+        return self._slice_index if self._slice_index is not None else SliceIndex()
+
+    def iter_video_frames(self, start_row: int = 0, stop_row: Optional[int] = None, threads: int = 0):
+        """
+        用一个多线程解码器连续解码视频帧（缩略图、质量分析等批量处理）
+
+        Args:
+            start_row: 起始标签行号，应为关键帧（见 keyframes）
+            stop_row: 结束标签行号（不含）
+            threads: 解码线程数，0表示自动
+
+        Yields:
+            av.VideoFrame
+        """
+        if not HAS_PYAV or self.file_path is None:
+            return iter(())
+        return iter_flv_video_frames(self._get_scanner(), self.tags_data, start_row, stop_row, threads)
+
+    def _get_scanner(self) -> FLVTagScanner:
+        """按需打开用于随机访问的扫描器"""
+        if self._scanner is None:
+            self._scanner = FLVTagScanner(self.file_path).open()
+        return self._scanner
+
+    def _is_video_tag_at(self, offset: int) -> bool:
+        record = self._get_scanner().read_tag(offset)
+        return record is not None and record[1] == TAG_TYPE_VIDEO
+
+    def _get_seeker(self) -> Optional[FrameSeeker]:
+        """按需创建基于关键帧索引的帧定位器"""
+        if not self._seeker_loaded and self.file_path is not None:
+            self._seeker_loaded = True
+            if HAS_PYAV:
+                try:
+                    seeker = FrameSeeker(self._get_scanner(), self.keyframe_index)
+                    if seeker.available:
+                        self._seeker = seeker
+                    else:
+                        logger.info("不支持直接解码该视频编码，使用moviepy取帧")
+                except Exception as e:
+                    logger.error(f"创建帧定位器失败: {e}")
+        return self._seeker
+
+    def _ensure_tag_index(self):
+        """标签索引尚未加载时扫描文件"""
+        if self._tags_data is None and self.file_path is not None:
+            self._parse_flv_structure()
+
+    def load_tag_index(self, progress: Optional[Callable[[int, TagTable], None]] = None,
+                       cancelled: Optional[Callable[[], bool]] = None,
+                       cached_only: bool = False) -> bool:
+        """
+        扫描标签索引，支持进度回调和取消（供后台线程调用）
+
+        Args:
+            progress: 每扫描一批标签调用一次，参数为已扫描字节数和
+                已扫描部分的索引表（只应在回调内读取）
+            cancelled: 返回True时中止扫描
+            cached_only: 只从索引缓存读取，缓存未命中时不扫描文件
+
+        Returns:
+            bool: 索引已加载返回True，被取消、缓存未命中或未打开文件返回False
+        """
+        if self._tags_data is None and self.file_path is not None:
+            if cached_only:
+                self._load_cached_index()
+            else:
+                self._parse_flv_structure(progress, cancelled)
+        return self._tags_data is not None
+
+    @property
+    def is_index_loaded(self) -> bool:
+        """标签索引是否已加载"""
+        return self._tags_data is not None
         
     def load_file(self, file_path: str) -> bool:
         """
-        加载FLV文件
+        加载FLV文件（仅读取文件头和onMetaData）
         
         Args:
             file_path: FLV文件路径
@@ -55,22 +228,14 @@ class FLVFileHandler:
             if not file_path.suffix.lower() == '.flv':
                 logger.warning(f"文件可能不是FLV格式: {file_path}")
                 
+            self.close()
             self.file_path = file_path
             
             # 获取基本文件信息
             self._get_basic_info()
             
-            # 解析FLV结构
-            if flvlib:
-                self._parse_flv_structure()
-            else:
-                logger.warning("flvlib未安装，跳过FLV结构解析")
-                
-            # 加载视频文件用于播放
-            if VideoFileClip:
-                self._load_video_clip()
-            else:
-                logger.warning("moviepy未安装，无法播放视频")
+            # 读取文件头和onMetaData，标签索引和解码器按需加载
+            self._parse_flv_header()
                 
             logger.info(f"成功加载FLV文件: {file_path.name}")
             return True
@@ -92,8 +257,211 @@ class FLVFileHandler:
             '文件格式': 'FLV'
         }
         
-    def _parse_flv_structure(self):
+    def _parse_flv_header(self):
+        """读取文件头、开头的onMetaData和音视频序列头，只访问文件最前面的几KB"""
+        with FLVTagScanner(self.file_path) as scanner:
+            header = scanner.header
+            self.file_info.update({
+                'FLV版本': header.version,
+                '包含视频': header.has_video,
+                '包含音频': header.has_audio,
+            })
+
+            # 开头的onMetaData和第一个音频、视频标签（通常是序列头）
+            video_seen = not header.has_video
+            audio_seen = not header.has_audio
+            for count, record in enumerate(scanner.iter_tags()):
+                offset, tag_type, _, data_size, codec_id, frame_type, packet_type, _ = record
+                if tag_type == TAG_TYPE_SCRIPT and not self.metadata:
+                    try:
+                        name, value = parse_script_data(
+                            scanner.buffer, offset + TAG_HEADER_SIZE, data_size)
+                    except Exception as e:
+                        logger.warning(f"解析脚本标签失败: {e}")
+                        continue
+                    if name == 'onMetaData' and isinstance(value, dict):
+                        self.metadata = value
+                elif tag_type == TAG_TYPE_VIDEO and not video_seen:
+                    video_seen = True
+                    self._parse_video_config(scanner, offset, data_size, codec_id, packet_type)
+                elif tag_type == TAG_TYPE_AUDIO and not audio_seen:
+                    audio_seen = True
+                    self._parse_audio_config(scanner, offset, data_size, codec_id, frame_type, packet_type)
+                if (video_seen and audio_seen) or count + 1 >= HEADER_SCAN_TAGS:
+                    break
+
+        if self.metadata:
+            self._parse_metadata()
+        self._apply_stream_info()
+
+    def _parse_video_config(self, scanner, offset, data_size, codec_id, packet_type):
+        """
+        从第一个视频标签读取编码信息
+
+        AVC/HEVC序列头中的SPS、Enhanced FLV的av1C/vpcC配置记录提供档次、
+        级别、颜色和像素格式。
+        """
+        name = VIDEO_CODEC_NAMES.get(codec_id, f'未知({codec_id})')
+        self._stream_info['视频编码'] = name
+        if packet_type != 0:
+            return
+        start = offset + TAG_HEADER_SIZE + video_header_size(codec_id, packet_type)
+        try:
+            config = parse_video_config(codec_id, scanner.buffer[start:offset + TAG_HEADER_SIZE + data_size])
+        except ESParseError as e:
+            logger.warning(f"解析{name}序列头失败: {e}")
+            return
+        if config is None:
+            return
+        self._stream_info.update({
+            '视频编码': f"{name} {config.profile_name}@L{config.level}",
+            '颜色空间': (config.color_space or '未指定') + (' (全范围)' if config.full_range else ''),
+            '像素格式': config.pixel_format,
+            '视频位深度': f"{config.bit_depth_luma} bit",
+        })
+        if config.width:
+            self._stream_info['分辨率'] = f"{config.width}x{config.height}"
+        if config.frame_rate:
+            self._stream_info['帧率'] = f"{config.frame_rate:.2f} fps"
+
+    def _parse_audio_config(self, scanner, offset, data_size, codec_id, audio_flags, packet_type):
+        """从第一个音频标签读取编码信息，AAC序列头提供编码格式、采样率和声道"""
+        name = SOUND_FORMAT_NAMES.get(codec_id, f'未知({codec_id})')
+        self._stream_info.update({
+            '音频编码': name,
+            '编码格式': name,
+            '音频采样率': f"{audio_sample_rate(audio_flags)} Hz",
+            '声道数': audio_channels(audio_flags),
+            '位深度': f"{audio_sample_bits(audio_flags)} bit",
+        })
+        if codec_id != SOUND_FORMAT_AAC or packet_type != 0:
+            return
+        start = offset + TAG_HEADER_SIZE + AAC_AUDIO_HEADER_SIZE
+        try:
+            config = AudioSpecificConfig.parse(scanner.buffer[start:offset + TAG_HEADER_SIZE + data_size])
+        except ESParseError as e:
+            logger.warning(f"解析AudioSpecificConfig失败: {e}")
+            return
+        self._audio_samples_per_frame = config.samples_per_frame
+        self._stream_info.update({
+            '编码格式': config.object_name,
+            '音频采样率': f"{config.output_sample_rate} Hz",
+        })
+        if config.channels:
+            self._stream_info['声道数'] = config.channels
+
+    def _apply_stream_info(self):
+        """
+        合并序列头中的编码信息
+
+        编码、颜色和像素格式以码流为准；分辨率、帧率、采样率优先使用onMetaData
+        （FLV标签头中的采样率对AAC固定为44100，没有元数据时才使用码流中的值）。
+        """
+        for key, value in self._stream_info.items():
+            if key in ('分辨率', '帧率', '音频采样率'):
+                self.file_info.setdefault(key, value)
+            else:
+                self.file_info[key] = value
+
+    def _parse_flv_structure(self, progress=None, cancelled=None):
         """解析FLV文件结构"""
+        # 先置为空索引，解析失败时不会在每次访问时重试
+        self._tags_data = TagTable()
+        if not self.use_flvlib:
+            self._parse_flv_structure_native(progress, cancelled)
+        elif flvlib:
+            self._parse_flv_structure_flvlib()
+        else:
+            logger.warning("flvlib未安装，跳过FLV结构解析")
+
+    def _parse_flv_structure_native(self, progress=None, cancelled=None):
+        """使用内置扫描器解析FLV文件结构"""
+        if self._load_cached_index():
+            if progress:
+                progress(self.file_info.get('文件大小_字节', 0), self._tags_data)
+            return
+
+        try:
+            structure_info = {}
+            with FLVTagScanner(self.file_path) as scanner:
+                header = scanner.header
+                structure_info.update({
+                    'FLV版本': header.version,
+                    '包含视频': header.has_video,
+                    '包含音频': header.has_audio,
+                })
+
+                # 解析标签到列式索引，分批上报进度
+                table = self._tags_data
+                records = scanner.iter_tags()
+                while True:
+                    batch = list(islice(records, PROGRESS_BATCH_TAGS))
+                    if not batch:
+                        break
+                    table.extend(batch)
+                    if progress:
+                        last_offset, _, _, last_size, *_ = batch[-1]
+                        progress(last_offset + TAG_HEADER_SIZE + last_size + PREV_TAG_SIZE_LENGTH, table)
+                    if cancelled and cancelled():
+                        logger.info(f"已取消扫描: {self.file_path.name}")
+                        self._tags_data = None
+                        return
+
+                # onMetaData不在文件开头时，逐个解码脚本标签查找
+                for row in ([] if self.metadata else self._tags_data.indices(TAG_TYPE_SCRIPT)):
+                    offset, data_size = self._tags_data.offset[row], self._tags_data.data_size[row]
+                    try:
+                        name, value = parse_script_data(
+                            scanner.buffer, offset + TAG_HEADER_SIZE, data_size)
+                    except Exception as e:
+                        logger.warning(f"解析脚本标签失败: {e}")
+                        continue
+                    if name == 'onMetaData' and isinstance(value, dict):
+                        self.metadata = value
+                        break
+
+                if scanner.truncated:
+                    structure_info['文件截断'] = True
+                if scanner.prev_tag_size_errors:
+                    structure_info['PreviousTagSize错误数'] = scanner.prev_tag_size_errors
+
+            self._keyframes = self._tags_data.keyframe_rows()
+            self.file_info.update(structure_info)
+            self._update_tag_statistics()
+
+            if self.metadata:
+                self._parse_metadata()
+
+            if self.index_cache is not None:
+                self.index_cache.store(self.file_path, self._tags_data, self._keyframes,
+                                       self.metadata, structure_info)
+
+        except FLVHeaderError as e:
+            logger.error(f"FLV文件头无效: {e}")
+        except Exception as e:
+            logger.error(f"解析FLV结构失败: {e}")
+
+    def _load_cached_index(self) -> bool:
+        """从索引缓存恢复标签索引，成功返回True"""
+        if self.index_cache is None:
+            return False
+
+        entry = self.index_cache.load(self.file_path)
+        if entry is None:
+            return False
+
+        self._tags_data = entry.table
+        self._keyframes = entry.keyframes
+        self.metadata = entry.metadata
+        self.file_info.update(entry.info)
+        self._update_tag_statistics()
+        if self.metadata:
+            self._parse_metadata()
+        logger.info(f"使用索引缓存: {self.file_path.name}")
+        return True
+
+    def _parse_flv_structure_flvlib(self):
+        """使用flvlib解析FLV文件结构"""
         try:
             with open(self.file_path, 'rb') as f:
                 flv_file = flvlib.FLV(f)
@@ -107,34 +475,24 @@ class FLVFileHandler:
                 })
                 
                 # 解析标签
-                self.tags_data = []
-                video_count = 0
-                audio_count = 0
-                script_count = 0
-                total_duration = 0
+                self._tags_data = TagTable()
                 
                 for tag in flv_file.iter_tags():
-                    tag_info = {
-                        '类型': tag.__class__.__name__,
-                        '时间戳': tag.timestamp,
-                        '数据大小': tag.size,
-                    }
-                    
+                    codec_id = 0
+                    frame_type = 0
                     if isinstance(tag, tags.VideoTag):
-                        video_count += 1
-                        tag_info.update({
-                            '编解码器': tag.codec,
-                            '帧类型': tag.frame_type,
-                        })
+                        tag_type = TAG_TYPE_VIDEO
+                        codec_id = getattr(tag, 'codec_id', 0)
+                        frame_type = getattr(tag, 'frame_type', 0)
                     elif isinstance(tag, tags.AudioTag):
-                        audio_count += 1
-                        tag_info.update({
-                            '编解码器': tag.codec,
-                            '采样率': tag.sample_rate,
-                            '声道': tag.channels,
-                        })
-                    elif isinstance(tag, tags.ScriptTag):
-                        script_count += 1
+                        tag_type = TAG_TYPE_AUDIO
+                        codec_id = getattr(tag, 'sound_format', 0)
+                        # 与内置扫描器一致：存放音频首字节低4位
+                        frame_type = ((getattr(tag, 'sound_rate', 0) << 2)
+                                      | (getattr(tag, 'sound_size', 0) << 1)
+                                      | getattr(tag, 'sound_type', 0))
+                    else:
+                        tag_type = TAG_TYPE_SCRIPT
                         # 尝试解析元数据
                         if hasattr(tag, 'name') and tag.name == 'onMetaData':
                             try:
@@ -142,25 +500,35 @@ class FLVFileHandler:
                             except:
                                 pass
                     
-                    self.tags_data.append(tag_info)
-                    total_duration = max(total_duration, tag.timestamp)
+                    self._tags_data.append((getattr(tag, 'offset', 0), tag_type, tag.timestamp,
+                                           tag.size, codec_id, frame_type, PACKET_TYPE_NONE, 0))
                 
-                # 更新统计信息
-                self.file_info.update({
-                    '视频标签数': video_count,
-                    '音频标签数': audio_count,
-                    '脚本标签数': script_count,
-                    '总标签数': len(self.tags_data),
-                    '持续时间': format_duration(total_duration / 1000),
-                    '持续时间_秒': total_duration / 1000,
-                })
+            self._keyframes = self._tags_data.keyframe_rows()
+            self._update_tag_statistics()
                 
-                # 从元数据获取更多信息
-                if self.metadata:
-                    self._parse_metadata()
+            # 从元数据获取更多信息
+            if self.metadata:
+                self._parse_metadata()
                     
         except Exception as e:
             logger.error(f"解析FLV结构失败: {e}")
+
+    def _update_tag_statistics(self):
+        """根据标签索引更新统计信息"""
+        table = self._tags_data
+        total_duration = table.max_timestamp()
+        self.file_info.update({
+            '视频标签数': table.count(TAG_TYPE_VIDEO),
+            '音频标签数': table.count(TAG_TYPE_AUDIO),
+            '脚本标签数': table.count(TAG_TYPE_SCRIPT),
+            '总标签数': len(table),
+            '持续时间': format_duration(total_duration / 1000),
+            '持续时间_秒': total_duration / 1000,
+            '总帧数': table.frame_count(TAG_TYPE_VIDEO),
+            '关键帧数': len(self._keyframes),
+        })
+        if self._audio_samples_per_frame:
+            self.file_info['总样本数'] = table.frame_count(TAG_TYPE_AUDIO) * self._audio_samples_per_frame
             
     def _parse_metadata(self):
         """解析元数据"""
@@ -200,22 +568,23 @@ class FLVFileHandler:
     def _load_video_clip(self):
         """加载视频文件用于播放"""
         try:
-            self.video_clip = VideoFileClip(str(self.file_path))
+            clip = VideoFileClip(str(self.file_path))
+            self._video_clip = clip
             
             # 更新视频信息
-            if self.video_clip.duration:
-                self.file_info['视频时长'] = format_duration(self.video_clip.duration)
+            if clip.duration:
+                self.file_info['视频时长'] = format_duration(clip.duration)
                 
-            if hasattr(self.video_clip, 'fps') and self.video_clip.fps:
-                self.file_info['视频帧率'] = f"{self.video_clip.fps:.2f} fps"
+            if hasattr(clip, 'fps') and clip.fps:
+                self.file_info['视频帧率'] = f"{clip.fps:.2f} fps"
                 
-            if hasattr(self.video_clip, 'size') and self.video_clip.size:
-                w, h = self.video_clip.size
+            if hasattr(clip, 'size') and clip.size:
+                w, h = clip.size
                 self.file_info['视频分辨率'] = f"{w}x{h}"
                 
         except Exception as e:
             logger.error(f"加载视频文件失败: {e}")
-            self.video_clip = None
+            self._video_clip = None
             
     def get_frame_at_time(self, time_seconds: float):
         """
@@ -227,6 +596,16 @@ class FLVFileHandler:
         Returns:
             numpy.ndarray: 视频帧数据，如果失败返回None
         """
+        seeker = self._get_seeker()
+        if seeker is not None:
+            try:
+                time_ms = int(max(0.0, min(time_seconds, self.get_duration())) * 1000)
+                frame = seeker.get_frame(time_ms)
+                if frame is not None:
+                    return frame
+            except Exception as e:
+                logger.error(f"关键帧定位解码失败: {e}")
+
         if not self.video_clip:
             return None
             
@@ -243,32 +622,94 @@ class FLVFileHandler:
             logger.error(f"获取视频帧失败: {e}")
             return None
             
-    def get_file_info(self) -> Dict[str, Any]:
-        """获取文件信息"""
+    def is_video_available(self) -> bool:
+        """是否可以获取视频帧"""
+        return self._get_seeker() is not None or self.video_clip is not None
+
+    def get_duration(self) -> float:
+        """获取时长（秒），优先使用onMetaData中的duration"""
+        duration = self.file_info.get('持续时间_秒')
+        if not duration and self.file_path is not None:
+            self._ensure_tag_index()
+            duration = self.file_info.get('持续时间_秒')
+        if not duration and self._video_clip is not None:
+            duration = self._video_clip.duration
+        return float(duration or 0.0)
+
+    def get_file_info(self, with_tags: bool = True) -> Dict[str, Any]:
+        """
+        获取文件信息
+        
+        Args:
+            with_tags: 是否包含标签统计（需要扫描标签索引）
+        """
+        if with_tags:
+            self._ensure_tag_index()
         return self.file_info.copy()
         
     def get_metadata(self) -> Dict[str, Any]:
         """获取元数据"""
         return self.metadata.copy()
         
-    def get_tags_data(self) -> List[Dict[str, Any]]:
-        """获取标签数据"""
-        return self.tags_data.copy()
+    def get_tags_data(self) -> TagDictView:
+        """获取标签数据（按需生成dict的只读视图）"""
+        return self.tags_data.as_dicts()
+
+    def get_tag_table(self) -> TagTable:
+        """获取列式标签索引"""
+        return self.tags_data
         
     def close(self):
         """关闭文件并释放资源"""
-        if self.video_clip:
+        if self._video_clip:
             try:
-                self.video_clip.close()
+                self._video_clip.close()
             except:
                 pass
-            self.video_clip = None
+            self._video_clip = None
+        self._video_clip_loaded = False
+
+        if self._seeker is not None:
+            self._seeker.close()
+            self._seeker = None
+        self._seeker_loaded = False
+        self._keyframe_index = None
+        self._slice_index = None
+        if self._scanner is not None:
+            self._scanner.close()
+            self._scanner = None
             
         self.file_path = None
         self.file_info = {}
         self.metadata = {}
-        self.tags_data = []
+        self._stream_info = {}
+        self._audio_samples_per_frame = 0
+        self._tags_data = None
+        self._keyframes = array('I')
         
     def __del__(self):
         """析构函数"""
-        self.close()
\ No newline at end of file
+        self.close()
+
+
+def read_file_summary(file_path) -> Dict[str, Any]:
+    """
+    读取文件的概要信息（文件头、onMetaData，以及已缓存的标签统计）
+    
+    不扫描标签，适合在线程池中批量获取大量文件的信息。
+    
+    Args:
+        file_path: FLV文件路径
+        
+    Returns:
+        dict: 文件信息；无法解析时包含'错误'键
+    """
+    handler = FLVFileHandler()
+    try:
+        if not handler.load_file(file_path):
+            path = Path(file_path)
+            return {'文件路径': str(path), '文件名': path.name, '错误': '无法解析FLV文件头'}
+        handler.load_tag_index(cached_only=True)
+        return handler.get_file_info(with_tags=False)
+    finally:
+        handler.close()
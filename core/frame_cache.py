@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+解码帧缓存
+按内存预算淘汰的LRU缓存，可在解码线程和界面线程之间共享
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+DEFAULT_CACHE_MB = 256
+
+
+class FrameCache:
+    """
+    线程安全的LRU帧缓存
+
+    每个条目带有字节数，总字节数超过预算时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """获取缓存帧，命中时标记为最近使用"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, nbytes: int):
+        """写入缓存帧，超过预算时淘汰最久未使用的条目"""
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total -= old[1]
+            self._entries[key] = (value, nbytes)
+            self._total += nbytes
+            self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self._total -= nbytes
+
+    def set_max_bytes(self, max_bytes: int):
+        """调整内存预算"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        """当前占用的字节数"""
+        return self._total
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._total = 0
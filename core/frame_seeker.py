@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+基于关键帧索引的快速帧定位
+直接从FLV标签负载解码，跳转时从目标前最近的关键帧开始，
+只解码关键帧到目标时间之间的帧
+"""
+
+# 可选依赖 - PyAV
+try:
+    import av
+    HAS_PYAV = True
+except ImportError:
+    av = None
+    HAS_PYAV = False
+
+from core import get_logger
+from core.parser.tag_parser import FLVTagScanner, TAG_TYPE_VIDEO, video_header_size
+from core.parser.tag_table import PACKET_TYPE_SEQUENCE_HEADER
+from core.parser.keyframe_index import KeyframeIndex
+from core.parser.es_processor import DECODER_NAMES, CODED_FRAME_PACKET_TYPES
+
+logger = get_logger(__name__)
+
+
+class FrameSeeker:
+    """
+    帧定位解码器
+
+    保留上一次解码的位置：目标时间在同一GOP内且不早于上次位置时
+    继续向后解码，否则从最近的关键帧重新开始。
+    """
+
+    def __init__(self, scanner: FLVTagScanner, keyframe_index: KeyframeIndex):
+        self.scanner = scanner
+        self.index = keyframe_index
+        self.codec_name = None
+        self.extradata = None
+        self._context = None
+        self._keyframe = -1
+        self._tags = iter(())
+        self._eof = False
+        self._pending = []
+        self._last_frame = None
+        self._last_image = None
+        self._find_sequence_header()
+
+    @property
+    def available(self) -> bool:
+        """是否可以使用该解码器定位帧"""
+        return HAS_PYAV and self.extradata is not None and len(self.index) > 0
+
+    def _find_sequence_header(self):
+        """查找视频序列头（AVC/HEVC或Enhanced FLV的SequenceStart），遇到第一个编码帧即停止"""
+        scanner = self.scanner
+        for offset, tag_type, _, data_size, codec_id, _, packet_type, _ in scanner.iter_tags():
+            if tag_type != TAG_TYPE_VIDEO:
+                continue
+            if codec_id not in DECODER_NAMES:
+                return
+            if packet_type == PACKET_TYPE_SEQUENCE_HEADER:
+                self.codec_name = DECODER_NAMES[codec_id]
+                header_size = video_header_size(codec_id, packet_type)
+                self.extradata = bytes(scanner.payload(offset, data_size)[header_size:])
+                return
+            if packet_type in CODED_FRAME_PACKET_TYPES:
+                return
+
+    def _reset(self, keyframe: int):
+        """从指定关键帧开始新的解码过程"""
+        context = av.CodecContext.create(self.codec_name, 'r')
+        context.extradata = self.extradata
+        self._context = context
+        self._keyframe = keyframe
+        self._tags = self.scanner.iter_tags(self.index.offsets[keyframe])
+        self._eof = False
+        self._pending = []
+        self._last_frame = None
+        self._last_image = None
+
+    def _decode_next(self):
+        """解码下一个视频帧标签，输出的帧追加到待显示队列"""
+        scanner = self.scanner
+        for offset, tag_type, timestamp, data_size, codec_id, _, packet_type, cts in self._tags:
+            if tag_type != TAG_TYPE_VIDEO or packet_type not in CODED_FRAME_PACKET_TYPES:
+                continue
+            view = scanner.payload(offset, data_size)
+            try:
+                packet = av.Packet(bytes(view[video_header_size(codec_id, packet_type):]))
+            finally:
+                view.release()
+            packet.dts = timestamp
+            packet.pts = timestamp + cts
+            self._pending.extend(self._context.decode(packet))
+            return
+
+        # 文件结束，取出解码器中缓存的帧
+        self._eof = True
+        self._pending.extend(self._context.decode(None))
+
+    def get_frame(self, time_ms: int):
+        """
+        获取指定时间的帧
+
+        按显示时间(PTS)选择不晚于目标时间的最后一帧；存在B帧时
+        解码器输出有延迟，会多解码几帧直到出现晚于目标时间的帧。
+
+        Args:
+            time_ms: 目标时间（毫秒）
+
+        Returns:
+            numpy.ndarray: RGB帧数据，失败返回None
+        """
+        if not self.available:
+            return None
+
+        keyframe = self.index.lookup(time_ms)
+        last_pts = self._last_frame.pts if self._last_frame is not None else -1
+        if self._context is None or keyframe != self._keyframe or time_ms < last_pts:
+            self._reset(keyframe)
+
+        while True:
+            pending = self._pending
+            while True:
+                while pending and (pending[0].pts is None or pending[0].pts <= time_ms):
+                    self._last_frame = pending.pop(0)
+                    self._last_image = None
+                if pending or self._eof:
+                    break
+                self._decode_next()
+            # 关键帧之后没有不晚于目标的帧：索引时间早于关键帧的显示时间（onMetaData中的
+            # 解码时间，或帧重排），目标帧属于前一个GOP，从前一个关键帧重新解码
+            if self._last_frame is not None or self._keyframe == 0:
+                break
+            self._reset(self._keyframe - 1)
+
+        pending = self._pending
+        frame = self._last_frame
+        if frame is None and pending:
+            # 目标早于第一帧
+            frame = self._last_frame = pending.pop(0)
+        if frame is None:
+            return None
+        if self._last_image is None:
+            self._last_image = frame.to_ndarray(format='rgb24')
+        return self._last_image
+
+    def close(self):
+        """释放解码器"""
+        self._context = None
+        self._last_frame = None
+        self._last_image = None
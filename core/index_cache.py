@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+标签索引缓存
+把标签索引、关键帧列表和onMetaData写入共享缓存目录，
+文件未变化时重新打开只需读取索引，无需重新扫描
+"""
+
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core import get_logger
+from core.parser.tag_table import TagTable, COLUMNS, COLUMN_NAMES
+
+logger = get_logger(__name__)
+
+# 缓存文件: 魔数(4) + 版本(2) + JSON长度(4) + JSON + 各列原始数据 + 关键帧行号
+CACHE_MAGIC = b'LFIX'
+CACHE_VERSION = 3
+CACHE_SUFFIX = '.lfidx'
+_CACHE_HEADER_STRUCT = struct.Struct('>4sHI')
+
+# 参与校验的文件头长度（覆盖FLV头和通常位于开头的onMetaData）
+HEADER_HASH_SIZE = 64 * 1024
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+
+def default_cache_dir() -> Path:
+    """默认缓存目录，可通过环境变量 LOOKFLV_CACHE_DIR 覆盖"""
+    env_dir = os.environ.get('LOOKFLV_CACHE_DIR')
+    if env_dir:
+        return Path(env_dir)
+    return Path.home() / '.lookflv' / 'index_cache'
+
+
+def file_signature(file_path) -> Dict[str, Any]:
+    """
+    计算文件签名
+
+    Returns:
+        dict: 包含绝对路径、大小、修改时间和文件头哈希
+    """
+    path = Path(file_path).resolve()
+    stat = path.stat()
+    with open(path, 'rb') as f:
+        header_hash = hashlib.sha1(f.read(HEADER_HASH_SIZE)).hexdigest()
+    return {
+        'path': str(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'header_hash': header_hash,
+    }
+
+
+class IndexCacheEntry:
+    """从缓存读取的索引"""
+
+    __slots__ = ('table', 'keyframes', 'metadata', 'info')
+
+    def __init__(self, table: TagTable, keyframes: array, metadata: dict, info: dict):
+        self.table = table
+        self.keyframes = keyframes
+        self.metadata = metadata
+        self.info = info
+
+
+class IndexCache:
+    """
+    共享目录下的标签索引缓存
+
+    每个FLV文件对应一个缓存文件，以路径哈希命名，内容按
+    路径、大小、修改时间和文件头哈希校验。缓存总大小超过上限时
+    按最近使用时间(LRU)淘汰。
+    """
+
+    def __init__(self, cache_dir=None, max_size: int = DEFAULT_MAX_SIZE):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.max_size = max_size
+
+    def _entry_path(self, file_path) -> Path:
+        key = hashlib.sha1(str(Path(file_path).resolve()).encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{key}{CACHE_SUFFIX}"
+
+    def load(self, file_path) -> Optional[IndexCacheEntry]:
+        """
+        读取文件的缓存索引
+
+        Returns:
+            IndexCacheEntry: 缓存有效时返回，否则返回None
+        """
+        entry_path = self._entry_path(file_path)
+        if not entry_path.exists():
+            return None
+
+        try:
+            signature = file_signature(file_path)
+            with open(entry_path, 'rb') as f:
+                data = f.read()
+
+            magic, version, json_len = _CACHE_HEADER_STRUCT.unpack_from(data, 0)
+            if magic != CACHE_MAGIC or version != CACHE_VERSION:
+                return None
+            pos = _CACHE_HEADER_STRUCT.size
+            header = json.loads(data[pos:pos + json_len].decode('utf-8'))
+            pos += json_len
+
+            if header.get('signature') != signature:
+                logger.debug(f"索引缓存已失效: {file_path}")
+                return None
+
+            swap = header.get('byteorder') != sys.byteorder
+            rows = header['rows']
+            keyframe_count = header['keyframes']
+            # 写入中断或被截断的文件按未命中处理，不读出不完整的列
+            payload_size = sum(array(typecode).itemsize for _, typecode in COLUMNS) * rows \
+                + array('I').itemsize * keyframe_count
+            if len(data) - pos != payload_size:
+                logger.debug(f"索引缓存长度与行数不符: {file_path}")
+                return None
+
+            table = TagTable()
+            for name, typecode in COLUMNS:
+                column = array(typecode)
+                nbytes = column.itemsize * rows
+                column.frombytes(data[pos:pos + nbytes])
+                pos += nbytes
+                if swap:
+                    column.byteswap()
+                setattr(table, name, column)
+
+            keyframes = array('I')
+            keyframes.frombytes(data[pos:pos + keyframes.itemsize * keyframe_count])
+            if swap:
+                keyframes.byteswap()
+
+            # 更新修改时间，作为LRU依据
+            os.utime(entry_path)
+            return IndexCacheEntry(table, keyframes, header.get('metadata') or {}, header.get('info') or {})
+
+        except Exception as e:
+            logger.warning(f"读取索引缓存失败: {e}")
+            return None
+
+    def store(self, file_path, table: TagTable, keyframes, metadata: dict, info: dict) -> bool:
+        """
+        写入文件的缓存索引
+
+        Args:
+            file_path: FLV文件路径
+            table: 标签索引
+            keyframes: 关键帧行号序列
+            metadata: onMetaData
+            info: 文件头等附加信息
+
+        Returns:
+            bool: 写入是否成功
+        """
+        try:
+            keyframes = array('I', keyframes)
+            header = {
+                'signature': file_signature(file_path),
+                'byteorder': sys.byteorder,
+                'rows': len(table),
+                'keyframes': len(keyframes),
+                'metadata': metadata,
+                'info': info,
+            }
+            header_bytes = json.dumps(header, ensure_ascii=False, default=str).encode('utf-8')
+
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            entry_path = self._entry_path(file_path)
+            # 临时文件名在进程和线程之间都唯一，写完后原子替换
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', prefix=entry_path.stem + '.',
+                                            dir=self.cache_dir)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(_CACHE_HEADER_STRUCT.pack(CACHE_MAGIC, CACHE_VERSION, len(header_bytes)))
+                    f.write(header_bytes)
+                    for name in COLUMN_NAMES:
+                        getattr(table, name).tofile(f)
+                    keyframes.tofile(f)
+                os.replace(tmp_path, entry_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+            self.evict()
+            return True
+
+        except Exception as e:
+            logger.warning(f"写入索引缓存失败: {e}")
+            return False
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """
+        列出缓存条目，按最近使用时间从新到旧排序
+
+        Returns:
+            list: 每项包含缓存文件、源文件路径、大小和最近使用时间
+        """
+        if not self.cache_dir.exists():
+            return []
+
+        result = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(CACHE_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                # 可能已被其他进程淘汰
+                continue
+            source = None
+            try:
+                with open(entry.path, 'rb') as f:
+                    magic, _, json_len = _CACHE_HEADER_STRUCT.unpack(f.read(_CACHE_HEADER_STRUCT.size))
+                    if magic == CACHE_MAGIC:
+                        source = json.loads(f.read(json_len).decode('utf-8'))['signature']['path']
+            except Exception:
+                pass
+            result.append({
+                'cache_file': entry.path,
+                'source': source,
+                'size': stat.st_size,
+                'last_used': stat.st_mtime,
+            })
+        result.sort(key=lambda item: item['last_used'], reverse=True)
+        return result
+
+    def total_size(self) -> int:
+        """缓存总大小（字节）"""
+        return sum(item['size'] for item in self.entries())
+
+    def evict(self):
+        """按LRU淘汰缓存，直到总大小不超过上限"""
+        entries = self.entries()
+        total = sum(item['size'] for item in entries)
+        while entries and total > self.max_size:
+            oldest = entries.pop()
+            try:
+                os.remove(oldest['cache_file'])
+                total -= oldest['size']
+                logger.debug(f"淘汰索引缓存: {oldest['source']}")
+            except OSError as e:
+                logger.warning(f"删除索引缓存失败: {e}")
+                break
+
+    def purge(self, file_path=None) -> int:
+        """
+        清除缓存
+
+        Args:
+            file_path: 只清除该文件的缓存；为None时清空整个缓存目录
+
+        Returns:
+            int: 删除的条目数
+        """
+        if file_path is not None:
+            entry_path = self._entry_path(file_path)
+            if entry_path.exists():
+                entry_path.unlink()
+                return 1
+            return 0
+
+        removed = 0
+        for item in self.entries():
+            try:
+                os.remove(item['cache_file'])
+                removed += 1
+            except OSError as e:
+                logger.warning(f"删除索引缓存失败: {e}")
+        return removed
@@ -2,12 +2,24 @@
 # -*- coding: utf-8 -*-
 """
 Elementary Stream处理器
-支持多种编码格式的深度解析
+支持多种编码格式的深度解析；H.264/H.265直接解析NAL单元和片头，不经过解码器，
+AV1/VP9从配置记录读取序列信息，AVS3/VVC的解析器由插件注册
 """
 
-from io import BytesIO
+from array import array
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 import warnings
 
+from core import get_logger
+from core.utils.binary_utils import BitReader, BitReaderError, remove_emulation_prevention
+from .tag_parser import (TAG_TYPE_VIDEO, TAG_HEADER_SIZE, VIDEO_CODEC_AVC, VIDEO_CODEC_HEVC,
+                         VIDEO_CODEC_EX_AVC, VIDEO_CODEC_EX_HEVC, VIDEO_CODEC_EX_AV1,
+                         VIDEO_CODEC_EX_VP9, EX_PACKET_CODED_FRAMES_X, decode_av_header,
+                         video_header_size)
+from .tag_table import PACKET_TYPE_SEQUENCE_HEADER
+from plugins.plugin_manager import HOOK_POST_ES_EXTRACT, get_hook_manager
+
 # 可选依赖 - PyAV
 try:
     import av
@@ -25,62 +37,1849 @@ except ImportError:
     HAS_CONSTRUCT = False
     warnings.warn("construct未安装，二进制解析功能受限", UserWarning)
 
+# 可选依赖 - NumPy，用于片头索引的零拷贝列视图
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+logger = get_logger(__name__)
+
+# AVC包类型：编码帧
+PACKET_TYPE_NALU = 1
+
+# 携带编码帧的包类型：AVC/HEVC编码帧（与Enhanced FLV的CodedFrames相同）和CodedFramesX
+CODED_FRAME_PACKET_TYPES = (PACKET_TYPE_NALU, EX_PACKET_CODED_FRAMES_X)
+
+# FFmpeg内置的av1解码器依赖硬件加速，软件解码优先使用libdav1d
+AV1_DECODER = 'libdav1d' if HAS_PYAV and 'libdav1d' in av.codecs_available else 'av1'
+
+# FLV视频编码ID -> PyAV解码器名称
+DECODER_NAMES = {
+    VIDEO_CODEC_AVC: 'h264',
+    VIDEO_CODEC_HEVC: 'hevc',
+    VIDEO_CODEC_EX_AVC: 'h264',
+    VIDEO_CODEC_EX_HEVC: 'hevc',
+    VIDEO_CODEC_EX_AV1: AV1_DECODER,
+    VIDEO_CODEC_EX_VP9: 'vp9',
+}
+
+# H.264 NAL单元类型
+NAL_SLICE = 1
+NAL_IDR_SLICE = 5
+NAL_SEI = 6
+NAL_SPS = 7
+NAL_PPS = 8
+NAL_AUD = 9
+
+# slice_type % 5
+SLICE_P = 0
+SLICE_B = 1
+SLICE_I = 2
+SLICE_SP = 3
+SLICE_SI = 4
+SLICE_UNKNOWN = 0xFF
+SLICE_TYPE_CHARS = 'PBIPI'    # SP归为P，SI归为I
+
+# 含chroma_format_idc、位深等扩展字段的profile_idc
+HIGH_PROFILES = frozenset((100, 110, 122, 244, 44, 83, 86, 118, 128, 138, 139, 134, 135))
+
+# profile_idc -> 名称
+H264_PROFILE_NAMES = {
+    66: 'Baseline',
+    77: 'Main',
+    88: 'Extended',
+    100: 'High',
+    110: 'High 10',
+    122: 'High 4:2:2',
+    244: 'High 4:4:4 Predictive',
+    44: 'CAVLC 4:4:4 Intra',
+}
+
+# VUI matrix_coefficients -> 颜色空间
+COLOUR_MATRIX_NAMES = {
+    0: 'GBR',
+    1: 'BT.709',
+    4: 'FCC',
+    5: 'BT.601',
+    6: 'BT.601',
+    7: 'SMPTE 240M',
+    8: 'YCgCo',
+    9: 'BT.2020 NCL',
+    10: 'BT.2020 CL',
+}
+COLOUR_UNSPECIFIED = 2
+
+# chroma_format_idc -> 像素格式前缀（与FFmpeg的命名一致）
+CHROMA_FORMAT_NAMES = ('gray', 'yuv420p', 'yuv422p', 'yuv444p')
+
+EXTENDED_SAR = 255
+# aspect_ratio_idc 1~16 对应的样本宽高比
+SAR_TABLE = ((1, 1), (12, 11), (10, 11), (16, 11), (40, 33), (24, 11), (20, 11), (32, 11),
+             (80, 33), (18, 11), (15, 11), (64, 33), (160, 99), (4, 3), (3, 2), (2, 1))
+
+# AAC audioObjectType -> 名称
+AAC_OBJECT_NAMES = {
+    1: 'AAC Main',
+    2: 'AAC LC',
+    3: 'AAC SSR',
+    4: 'AAC LTP',
+    5: 'HE-AAC',
+    6: 'AAC Scalable',
+    23: 'AAC LD',
+    29: 'HE-AACv2',
+    39: 'AAC ELD',
+}
+AAC_OBJECT_SBR = 5
+AAC_OBJECT_PS = 29
+AAC_OBJECT_ESCAPE = 31
+# 带GASpecificConfig（frameLengthFlag）的object type
+AAC_GA_OBJECTS = frozenset((1, 2, 3, 4, 6, 7, 17, 19, 20, 21, 22, 23))
+AAC_SAMPLE_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050,
+                    16000, 12000, 11025, 8000, 7350)
+AAC_EXPLICIT_RATE = 15
+# channelConfiguration -> 声道数（7表示7.1）
+AAC_CHANNELS = (0, 1, 2, 3, 4, 5, 6, 8)
+
+# H.265 NAL单元类型
+HEVC_NAL_RADL_N = 6
+HEVC_NAL_RASL_R = 9
+HEVC_NAL_BLA_W_LP = 16
+HEVC_NAL_IDR_W_RADL = 19
+HEVC_NAL_IDR_N_LP = 20
+HEVC_NAL_CRA = 21
+HEVC_NAL_IRAP_END = 23
+HEVC_NAL_VPS = 32
+HEVC_NAL_SPS = 33
+HEVC_NAL_PPS = 34
+# 片NAL：TRAIL/TSA/STSA/RADL/RASL 和 BLA/IDR/CRA
+HEVC_SLICE_NALS = frozenset(tuple(range(0, 10)) + tuple(range(16, 22)))
+
+# H.265 slice_type（0=B，1=P，2=I） -> H.264片类型编码
+HEVC_SLICE_TYPES = (SLICE_B, SLICE_P, SLICE_I)
+
+# general_profile_idc -> 名称
+HEVC_PROFILE_NAMES = {
+    1: 'Main',
+    2: 'Main 10',
+    3: 'Main Still Picture',
+    4: 'Rext',
+    5: 'High Throughput 4:4:4',
+    9: 'SCC',
+}
+
+# AV1 OBU类型：序列头
+AV1_OBU_SEQUENCE_HEADER = 1
+# AV1 seq_profile -> 名称
+AV1_PROFILE_NAMES = ('Main', 'High', 'Professional')
+# av1C：marker(1) + version(7)、profile/level、tier/位深/色度、initial_presentation_delay
+AV1_CONFIG_HEADER_SIZE = 4
+# color_primaries=BT.709、transfer=sRGB、matrix=Identity 时为4:4:4 RGB
+AV1_CP_BT709 = 1
+AV1_TC_SRGB = 13
+AV1_MC_IDENTITY = 0
+
+# vpcC（version 1）：version(1) + flags(3) + profile、level、位深/色度/范围、颜色描述
+VP9_CONFIG_SIZE = 10
+# vpcC chromaSubsampling -> chroma_format_idc（0/1均为4:2:0，区别在于色度采样位置）
+VP9_CHROMA_FORMATS = (1, 1, 2, 3)
+
+# 解析片头时截取的NAL前缀长度，片头到POC字段为止不会超过该长度
+SLICE_HEADER_BYTES = 32
+
+ANNEXB_START_CODE = b'\x00\x00\x01'
+
+
+class ESParseError(ValueError):
+    """ES数据无效"""
+
+
+def iter_start_code_units(buffer, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+    """
+    按起始码(00 00 01)定位字节流中的单元，返回每个单元的 (起始, 结束) 偏移，不含起始码
+
+    只用缓冲区的 find 方法在C层搜索，不复制数据，bytes和mmap都适用。
+    防竞争机制保证单元内部不会出现起始码，搜索次数与单元数成正比。
+    """
+    end = len(buffer) if end is None else end
+    pos = buffer.find(ANNEXB_START_CODE, start, end)
+    while pos >= 0:
+        unit_start = pos + 3
+        pos = buffer.find(ANNEXB_START_CODE, unit_start, end)
+        unit_end = end if pos < 0 else pos
+        # 4字节起始码和尾随零属于前一个单元之后的填充
+        while unit_end > unit_start and buffer[unit_end - 1] == 0:
+            unit_end -= 1
+        if unit_end > unit_start:
+            yield unit_start, unit_end
+
+
+def iter_annexb_nals(data) -> Iterator[bytes]:
+    """按起始码(00 00 01 / 00 00 00 01)切分Annex-B字节流"""
+    data = bytes(data)
+    for start, end in iter_start_code_units(data):
+        yield data[start:end]
+
+
+def iter_avcc_nals(data, length_size: int = 4, start: int = 0, end: Optional[int] = None) -> Iterator[memoryview]:
+    """按长度前缀切分AVCC格式的NAL单元（FLV/MP4中的H.264负载）"""
+    view = memoryview(data)
+    end = len(view) if end is None else end
+    pos = start
+    while pos + length_size <= end:
+        size = int.from_bytes(view[pos:pos + length_size], 'big')
+        pos += length_size
+        if size == 0 or pos + size > end:
+            return
+        yield view[pos:pos + size]
+        pos += size
+
+
+def _skip_scaling_list(reader: BitReader, size: int):
+    last = next_scale = 8
+    for _ in range(size):
+        if next_scale:
+            next_scale = (last + reader.read_se() + 256) % 256
+        if next_scale:
+            last = next_scale
+
+
+class VideoFormat:
+    """
+    各编码参数集中共同的图像格式字段：分辨率、色度格式、位深、颜色描述和帧率
+
+    配置记录中没有分辨率时（如VP9）width/height 为None；颜色字段使用
+    ITU-T H.273 的取值，H.264、H.265、AV1、VP9 相同。
+    """
+
+    __slots__ = ('width', 'height', 'chroma_format_idc', 'bit_depth_luma', 'sar', 'full_range',
+                 'colour_primaries', 'transfer_characteristics', 'matrix_coefficients', 'frame_rate')
+
+    # FFmpeg解码器对全范围视频输出yuvj像素格式的chroma_format_idc（H.264为4:2:0/4:2:2/4:4:4）
+    JPEG_RANGE_CHROMA = (1, 2, 3)
+
+    def _reset_format(self):
+        self.width = self.height = None
+        self.chroma_format_idc = 1
+        self.bit_depth_luma = 8
+        self.sar = (1, 1)
+        self.full_range = False
+        self.colour_primaries = self.transfer_characteristics = COLOUR_UNSPECIFIED
+        self.matrix_coefficients = COLOUR_UNSPECIFIED
+        self.frame_rate = None
+
+    @property
+    def pixel_format(self) -> str:
+        """像素格式（FFmpeg命名，如 yuv420p、yuvj420p、yuv420p10le）"""
+        chroma = self.chroma_format_idc if self.chroma_format_idc < len(CHROMA_FORMAT_NAMES) else 1
+        name = CHROMA_FORMAT_NAMES[chroma]
+        if self.bit_depth_luma > 8:
+            return f"{name}{self.bit_depth_luma}le"
+        if self.full_range and chroma in self.JPEG_RANGE_CHROMA:
+            return name.replace('yuv', 'yuvj')
+        return name
+
+    @property
+    def color_space(self) -> Optional[str]:
+        """颜色空间（matrix_coefficients），码流中未指定时为None"""
+        return COLOUR_MATRIX_NAMES.get(self.matrix_coefficients)
+
+    def _parse_vui_format(self, reader: BitReader):
+        """H.264/H.265 VUI开头相同的部分：宽高比、过扫描、信号类型和色度位置"""
+        if reader.read_flag():    # aspect_ratio_info_present_flag
+            aspect_ratio_idc = reader.read_bits(8)
+            if aspect_ratio_idc == EXTENDED_SAR:
+                self.sar = (reader.read_bits(16), reader.read_bits(16))
+            elif 0 < aspect_ratio_idc <= len(SAR_TABLE):
+                self.sar = SAR_TABLE[aspect_ratio_idc - 1]
+        if reader.read_flag():    # overscan_info_present_flag
+            reader.skip_bits(1)
+        if reader.read_flag():    # video_signal_type_present_flag
+            reader.skip_bits(3)    # video_format
+            self.full_range = reader.read_flag()
+            if reader.read_flag():    # colour_description_present_flag
+                self.colour_primaries = reader.read_bits(8)
+                self.transfer_characteristics = reader.read_bits(8)
+                self.matrix_coefficients = reader.read_bits(8)
+        if reader.read_flag():    # chroma_loc_info_present_flag
+            reader.read_ue()
+            reader.read_ue()
+
+
+class H264SPS(VideoFormat):
+    """H.264序列参数集（含VUI中的宽高比、颜色信息和时间信息）"""
+
+    __slots__ = ('sps_id', 'profile_idc', 'constraint_flags', 'level_idc',
+                 'separate_colour_plane', 'bit_depth_chroma',
+                 'log2_max_frame_num', 'poc_type', 'log2_max_poc_lsb',
+                 'delta_pic_order_always_zero', 'max_num_ref_frames', 'frame_mbs_only')
+
+    @property
+    def profile_name(self) -> str:
+        name = H264_PROFILE_NAMES.get(self.profile_idc, f'Profile {self.profile_idc}')
+        if self.profile_idc == 66 and self.constraint_flags & 0x40:
+            name = 'Constrained Baseline'
+        return name
+
+    @property
+    def level(self) -> str:
+        """级别，如 '4.1'"""
+        if self.level_idc == 11 and self.constraint_flags & 0x10 and self.profile_idc in (66, 77, 88):
+            return '1b'
+        return f"{self.level_idc // 10}.{self.level_idc % 10}"
+
+    def _parse_vui(self, reader: BitReader):
+        """解析VUI到时间信息为止；数据不足时保留已读出的字段"""
+        self._parse_vui_format(reader)
+        if reader.read_flag():    # timing_info_present_flag
+            num_units_in_tick = reader.read_bits(32)
+            time_scale = reader.read_bits(32)
+            if num_units_in_tick:
+                self.frame_rate = time_scale / (2 * num_units_in_tick)
+
+    @classmethod
+    def parse(cls, nal) -> 'H264SPS':
+        """
+        解析SPS NAL单元（含1字节NAL头）
+
+        Raises:
+            ESParseError: 数据不足或字段超出范围
+        """
+        sps = cls()
+        sps._reset_format()
+        try:
+            reader = BitReader(remove_emulation_prevention(nal[1:]))
+            sps.profile_idc = reader.read_bits(8)
+            sps.constraint_flags = reader.read_bits(8)
+            sps.level_idc = reader.read_bits(8)
+            sps.sps_id = reader.read_ue()
+            sps.separate_colour_plane = False
+            sps.bit_depth_chroma = 8
+            if sps.profile_idc in HIGH_PROFILES:
+                sps.chroma_format_idc = reader.read_ue()
+                if sps.chroma_format_idc == 3:
+                    sps.separate_colour_plane = reader.read_flag()
+                sps.bit_depth_luma = reader.read_ue() + 8
+                sps.bit_depth_chroma = reader.read_ue() + 8
+                reader.skip_bits(1)    # qpprime_y_zero_transform_bypass_flag
+                if reader.read_flag():    # seq_scaling_matrix_present_flag
+                    for i in range(8 if sps.chroma_format_idc != 3 else 12):
+                        if reader.read_flag():
+                            _skip_scaling_list(reader, 16 if i < 6 else 64)
+            sps.log2_max_frame_num = reader.read_ue() + 4
+            sps.poc_type = reader.read_ue()
+            sps.log2_max_poc_lsb = 0
+            sps.delta_pic_order_always_zero = False
+            if sps.poc_type == 0:
+                sps.log2_max_poc_lsb = reader.read_ue() + 4
+            elif sps.poc_type == 1:
+                sps.delta_pic_order_always_zero = reader.read_flag()
+                reader.read_se()    # offset_for_non_ref_pic
+                reader.read_se()    # offset_for_top_to_bottom_field
+                for _ in range(reader.read_ue()):
+                    reader.read_se()
+            sps.max_num_ref_frames = reader.read_ue()
+            reader.skip_bits(1)    # gaps_in_frame_num_value_allowed_flag
+            width_mbs = reader.read_ue() + 1
+            height_units = reader.read_ue() + 1
+            sps.frame_mbs_only = reader.read_flag()
+            if not sps.frame_mbs_only:
+                reader.skip_bits(1)    # mb_adaptive_frame_field_flag
+            reader.skip_bits(1)    # direct_8x8_inference_flag
+            width = width_mbs * 16
+            height = height_units * 16 * (2 - sps.frame_mbs_only)
+            if reader.read_flag():    # frame_cropping_flag
+                left, right, top, bottom = (reader.read_ue() for _ in range(4))
+                chroma = 0 if sps.separate_colour_plane else sps.chroma_format_idc
+                crop_x = 2 if chroma in (1, 2) else 1
+                crop_y = (2 if chroma == 1 else 1) * (2 - sps.frame_mbs_only)
+                width -= (left + right) * crop_x
+                height -= (top + bottom) * crop_y
+            sps.width = width
+            sps.height = height
+        except BitReaderError as e:
+            raise ESParseError(f"SPS数据不完整: {e}") from e
+
+        try:
+            if reader.read_flag():    # vui_parameters_present_flag
+                sps._parse_vui(reader)
+        except BitReaderError:
+            logger.debug("SPS的VUI数据不完整")
+        if sps.log2_max_frame_num > 16 or sps.log2_max_poc_lsb > 16 or sps.poc_type > 2:
+            raise ESParseError("SPS字段超出范围")
+        return sps
+
+
+class H264PPS:
+    """H.264图像参数集（只保留片头解析需要的字段）"""
+
+    __slots__ = ('pps_id', 'sps_id', 'entropy_coding_mode', 'bottom_field_pic_order_present')
+
+    @classmethod
+    def parse(cls, nal) -> 'H264PPS':
+        pps = cls()
+        try:
+            reader = BitReader(remove_emulation_prevention(nal[1:SLICE_HEADER_BYTES]))
+            pps.pps_id = reader.read_ue()
+            pps.sps_id = reader.read_ue()
+            pps.entropy_coding_mode = reader.read_flag()
+            pps.bottom_field_pic_order_present = reader.read_flag()
+        except BitReaderError as e:
+            raise ESParseError(f"PPS数据不完整: {e}") from e
+        return pps
+
+
+def _parse_profile_tier_level(reader: BitReader, max_sub_layers_minus1: int) -> Tuple[int, int, int]:
+    """
+    解析H.265 profile_tier_level（profilePresentFlag=1）
+
+    Returns:
+        tuple: (general_profile_idc, general_tier_flag, general_level_idc)
+    """
+    reader.skip_bits(2)    # general_profile_space
+    tier = reader.read_bit()
+    profile_idc = reader.read_bits(5)
+    compatibility = reader.read_bits(32)
+    reader.skip_bits(48)    # progressive/interlaced/non_packed/frame_only 及保留位
+    level_idc = reader.read_bits(8)
+    sub_layers = [(reader.read_flag(), reader.read_flag()) for _ in range(max_sub_layers_minus1)]
+    if max_sub_layers_minus1:
+        reader.skip_bits(2 * (8 - max_sub_layers_minus1))
+    for profile_present, level_present in sub_layers:
+        if profile_present:
+            reader.skip_bits(88)
+        if level_present:
+            reader.skip_bits(8)
+    if not profile_idc and compatibility:
+        # 只设置了兼容标志时取第一个兼容的profile
+        profile_idc = next(i for i in range(32) if compatibility & (1 << (31 - i)))
+    return profile_idc, tier, level_idc
+
+
+def _skip_hevc_scaling_list_data(reader: BitReader):
+    for size_id in range(4):
+        for _ in range(0, 6, 3 if size_id == 3 else 1):
+            if not reader.read_flag():    # scaling_list_pred_mode_flag
+                reader.read_ue()    # scaling_list_pred_matrix_id_delta
+                continue
+            if size_id > 1:
+                reader.read_se()    # scaling_list_dc_coef_minus8
+            for _ in range(min(64, 1 << (4 + (size_id << 1)))):
+                reader.read_se()
+
+
+def _parse_st_ref_pic_set(reader: BitReader, index: int, num_delta_pocs: List[int]) -> int:
+    """解析SPS中的第 index 个短期参考图像集，返回其NumDeltaPocs"""
+    if index and reader.read_flag():    # inter_ref_pic_set_prediction_flag
+        reader.skip_bits(1)    # delta_rps_sign
+        reader.read_ue()    # abs_delta_rps_minus1
+        count = 0
+        for _ in range(num_delta_pocs[index - 1] + 1):
+            # used_by_curr_pic_flag 为0时才有 use_delta_flag
+            if reader.read_flag() or reader.read_flag():
+                count += 1
+        return count
+    num_negative = reader.read_ue()
+    num_positive = reader.read_ue()
+    if num_negative + num_positive > 32:
+        raise BitReaderError("短期参考图像集过大")
+    for _ in range(num_negative + num_positive):
+        reader.read_ue()    # delta_poc_minus1
+        reader.skip_bits(1)    # used_by_curr_pic_flag
+    return num_negative + num_positive
+
+
+class HEVCVPS:
+    """H.265视频参数集（只保留档次级别和时间信息）"""
+
+    __slots__ = ('vps_id', 'max_sub_layers', 'profile_idc', 'tier', 'level_idc', 'frame_rate')
+
+    @classmethod
+    def parse(cls, nal) -> 'HEVCVPS':
+        """
+        解析VPS NAL单元（含2字节NAL头）
+
+        Raises:
+            ESParseError: 数据不足
+        """
+        vps = cls()
+        vps.frame_rate = None
+        try:
+            reader = BitReader(remove_emulation_prevention(nal[2:]))
+            vps.vps_id = reader.read_bits(4)
+            reader.skip_bits(8)    # base_layer_internal/available、max_layers_minus1
+            max_sub_layers_minus1 = reader.read_bits(3)
+            vps.max_sub_layers = max_sub_layers_minus1 + 1
+            reader.skip_bits(17)    # temporal_id_nesting、reserved_0xffff_16bits
+            vps.profile_idc, vps.tier, vps.level_idc = _parse_profile_tier_level(reader, max_sub_layers_minus1)
+        except BitReaderError as e:
+            raise ESParseError(f"VPS数据不完整: {e}") from e
+
+        try:
+            ordering_info_present = reader.read_flag()
+            for _ in range(0 if ordering_info_present else max_sub_layers_minus1, vps.max_sub_layers):
+                reader.read_ue()
+                reader.read_ue()
+                reader.read_ue()
+            max_layer_id = reader.read_bits(6)
+            reader.skip_bits(reader.read_ue() * (max_layer_id + 1))    # layer_id_included_flag
+            if reader.read_flag():    # vps_timing_info_present_flag
+                num_units_in_tick = reader.read_bits(32)
+                time_scale = reader.read_bits(32)
+                if num_units_in_tick:
+                    vps.frame_rate = time_scale / num_units_in_tick
+        except BitReaderError:
+            logger.debug("VPS的时间信息不完整")
+        return vps
+
+
+class HEVCSPS(VideoFormat):
+    """H.265序列参数集（含VUI中的宽高比、颜色信息和时间信息）"""
+
+    __slots__ = ('sps_id', 'vps_id', 'max_sub_layers', 'profile_idc', 'tier', 'level_idc',
+                 'separate_colour_plane', 'bit_depth_chroma', 'log2_max_poc_lsb', 'pic_size_in_ctbs')
+
+    # hevc解码器只对4:2:0使用yuvj
+    JPEG_RANGE_CHROMA = (1,)
+
+    @property
+    def profile_name(self) -> str:
+        return HEVC_PROFILE_NAMES.get(self.profile_idc, f'Profile {self.profile_idc}')
+
+    @property
+    def level(self) -> str:
+        """级别，如 '4.1'（general_level_idc 为级别的30倍）"""
+        return f"{self.level_idc // 30}.{self.level_idc % 30 // 3}"
+
+    def _parse_vui(self, reader: BitReader):
+        """解析VUI到时间信息为止；数据不足时保留已读出的字段"""
+        self._parse_vui_format(reader)
+        reader.skip_bits(3)    # neutral_chroma、field_seq、frame_field_info_present
+        if reader.read_flag():    # default_display_window_flag
+            for _ in range(4):
+                reader.read_ue()
+        if reader.read_flag():    # vui_timing_info_present_flag
+            num_units_in_tick = reader.read_bits(32)
+            time_scale = reader.read_bits(32)
+            if num_units_in_tick:
+                self.frame_rate = time_scale / num_units_in_tick
+
+    @classmethod
+    def parse(cls, nal) -> 'HEVCSPS':
+        """
+        解析SPS NAL单元（含2字节NAL头）
+
+        分辨率、色度格式、位深和POC字段必须完整；之后到VUI之间的字段
+        （缩放列表、参考图像集等）只为定位VUI而跳过，出错时VUI字段保持默认值。
+
+        Raises:
+            ESParseError: 数据不足或字段超出范围
+        """
+        sps = cls()
+        sps._reset_format()
+        try:
+            reader = BitReader(remove_emulation_prevention(nal[2:]))
+            sps.vps_id = reader.read_bits(4)
+            max_sub_layers_minus1 = reader.read_bits(3)
+            sps.max_sub_layers = max_sub_layers_minus1 + 1
+            reader.skip_bits(1)    # temporal_id_nesting_flag
+            sps.profile_idc, sps.tier, sps.level_idc = _parse_profile_tier_level(reader, max_sub_layers_minus1)
+            sps.sps_id = reader.read_ue()
+            sps.chroma_format_idc = reader.read_ue()
+            sps.separate_colour_plane = False
+            if sps.chroma_format_idc == 3:
+                sps.separate_colour_plane = reader.read_flag()
+            width = reader.read_ue()
+            height = reader.read_ue()
+            sps.width, sps.height = width, height
+            if reader.read_flag():    # conformance_window_flag
+                left, right, top, bottom = (reader.read_ue() for _ in range(4))
+                chroma = 0 if sps.separate_colour_plane else sps.chroma_format_idc
+                sps.width -= (left + right) * (2 if chroma in (1, 2) else 1)
+                sps.height -= (top + bottom) * (2 if chroma == 1 else 1)
+            sps.bit_depth_luma = reader.read_ue() + 8
+            sps.bit_depth_chroma = reader.read_ue() + 8
+            sps.log2_max_poc_lsb = reader.read_ue() + 4
+            ordering_info_present = reader.read_flag()
+            for _ in range(0 if ordering_info_present else max_sub_layers_minus1, sps.max_sub_layers):
+                reader.read_ue()
+                reader.read_ue()
+                reader.read_ue()
+            log2_min_cb_size = reader.read_ue() + 3
+            log2_ctb_size = log2_min_cb_size + reader.read_ue()
+            for _ in range(4):
+                reader.read_ue()    # 变换块大小与层次深度
+        except BitReaderError as e:
+            raise ESParseError(f"SPS数据不完整: {e}") from e
+        if sps.log2_max_poc_lsb > 16 or log2_ctb_size > 6 or not width or not height:
+            raise ESParseError("SPS字段超出范围")
+        ctb_size = 1 << log2_ctb_size
+        sps.pic_size_in_ctbs = -(-width // ctb_size) * -(-height // ctb_size)
+
+        try:
+            if reader.read_flag() and reader.read_flag():    # scaling_list_enabled/data_present
+                _skip_hevc_scaling_list_data(reader)
+            reader.skip_bits(2)    # amp_enabled、sample_adaptive_offset_enabled
+            if reader.read_flag():    # pcm_enabled_flag
+                reader.skip_bits(8)
+                reader.read_ue()
+                reader.read_ue()
+                reader.skip_bits(1)
+            num_delta_pocs = []
+            num_sets = reader.read_ue()
+            if num_sets > 64:
+                raise BitReaderError("短期参考图像集数量超出范围")
+            for index in range(num_sets):
+                num_delta_pocs.append(_parse_st_ref_pic_set(reader, index, num_delta_pocs))
+            if reader.read_flag():    # long_term_ref_pics_present_flag
+                reader.skip_bits(reader.read_ue() * (sps.log2_max_poc_lsb + 1))
+            reader.skip_bits(2)    # temporal_mvp_enabled、strong_intra_smoothing_enabled
+            if reader.read_flag():    # vui_parameters_present_flag
+                sps._parse_vui(reader)
+        except BitReaderError:
+            logger.debug("SPS的VUI数据不完整")
+        return sps
+
+
+class HEVCPPS:
+    """H.265图像参数集（只保留片头解析需要的字段）"""
+
+    __slots__ = ('pps_id', 'sps_id', 'dependent_slice_segments_enabled', 'output_flag_present',
+                 'num_extra_slice_header_bits')
+
+    @classmethod
+    def parse(cls, nal) -> 'HEVCPPS':
+        pps = cls()
+        try:
+            reader = BitReader(remove_emulation_prevention(nal[2:SLICE_HEADER_BYTES]))
+            pps.pps_id = reader.read_ue()
+            pps.sps_id = reader.read_ue()
+            pps.dependent_slice_segments_enabled = reader.read_flag()
+            pps.output_flag_present = reader.read_flag()
+            pps.num_extra_slice_header_bits = reader.read_bits(3)
+        except BitReaderError as e:
+            raise ESParseError(f"PPS数据不完整: {e}") from e
+        return pps
+
+
+def read_leb128(data, pos: int) -> Tuple[int, int]:
+    """
+    读取AV1的leb128变长整数
+
+    Returns:
+        tuple: (值, 之后的偏移)
+    """
+    value = 0
+    for i in range(8):
+        if pos >= len(data):
+            raise ESParseError("leb128数据不完整")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << (i * 7)
+        if not byte & 0x80:
+            return value, pos
+    raise ESParseError("leb128过长")
+
+
+class AV1SequenceHeader(VideoFormat):
+    """AV1序列头（来自av1C配置记录中的序列头OBU）"""
+
+    __slots__ = ('seq_profile', 'level_idx', 'tier')
+
+    # libdav1d对全范围输出仍为yuv像素格式，范围记录在帧属性中
+    JPEG_RANGE_CHROMA = ()
+
+    @property
+    def profile_name(self) -> str:
+        if self.seq_profile < len(AV1_PROFILE_NAMES):
+            return AV1_PROFILE_NAMES[self.seq_profile]
+        return f'Profile {self.seq_profile}'
+
+    @property
+    def level(self) -> str:
+        """级别，如 '4.0'（seq_level_idx 高3位为主级别减2，低2位为子级别）"""
+        return f"{2 + (self.level_idx >> 2)}.{self.level_idx & 3}"
+
+    @classmethod
+    def from_config(cls, record) -> 'AV1SequenceHeader':
+        """
+        读取AV1CodecConfigurationRecord（Enhanced FLV av01的SequenceStart负载）
+
+        记录中带序列头OBU时以OBU为准，否则只有记录头中的档次、级别、
+        位深和色度格式，分辨率为None。
+
+        Raises:
+            ESParseError: 记录无效
+        """
+        record = bytes(record)
+        if len(record) < AV1_CONFIG_HEADER_SIZE or record[0] & 0x80 == 0:
+            raise ESParseError("无效的AV1CodecConfigurationRecord")
+        pos = AV1_CONFIG_HEADER_SIZE
+        while pos < len(record):
+            obu_header = record[pos]
+            obu_type = (obu_header >> 3) & 0x0F
+            pos += 2 if obu_header & 0x04 else 1    # obu_extension_flag
+            if obu_header & 0x02:    # obu_has_size_field
+                size, pos = read_leb128(record, pos)
+            else:
+                size = len(record) - pos
+            if obu_type == AV1_OBU_SEQUENCE_HEADER:
+                return cls.parse(record[pos:pos + size])
+            pos += size
+
+        header = cls()
+        header._reset_format()
+        header.seq_profile = record[1] >> 5
+        header.level_idx = record[1] & 0x1F
+        header.tier = record[2] >> 7
+        high_bitdepth, twelve_bit = (record[2] >> 6) & 1, (record[2] >> 5) & 1
+        header.bit_depth_luma = 12 if twelve_bit else (10 if high_bitdepth else 8)
+        header.chroma_format_idc = cls._chroma_format((record[2] >> 4) & 1, (record[2] >> 3) & 1,
+                                                      (record[2] >> 2) & 1)
+        return header
+
+    @staticmethod
+    def _chroma_format(mono_chrome: int, subsampling_x: int, subsampling_y: int) -> int:
+        if mono_chrome:
+            return 0
+        if subsampling_x:
+            return 1 if subsampling_y else 2
+        return 3
+
+    @classmethod
+    def parse(cls, payload) -> 'AV1SequenceHeader':
+        """
+        解析sequence_header_obu负载（不含OBU头）
+
+        Raises:
+            ESParseError: 数据不足
+        """
+        header = cls()
+        header._reset_format()
+        try:
+            reader = BitReader(payload)
+            header.seq_profile = reader.read_bits(3)
+            reader.skip_bits(1)    # still_picture
+            reduced_still_picture_header = reader.read_flag()
+            header.tier = 0
+            if reduced_still_picture_header:
+                header.level_idx = reader.read_bits(5)
+            else:
+                decoder_model_info_present = False
+                buffer_delay_length = 0
+                if reader.read_flag():    # timing_info_present_flag
+                    num_units_in_display_tick = reader.read_bits(32)
+                    time_scale = reader.read_bits(32)
+                    ticks_per_picture = 1
+                    if reader.read_flag():    # equal_picture_interval
+                        ticks_per_picture = reader.read_ue() + 1    # uvlc与ue(v)编码相同
+                    if num_units_in_display_tick:
+                        header.frame_rate = time_scale / (num_units_in_display_tick * ticks_per_picture)
+                    decoder_model_info_present = reader.read_flag()
+                    if decoder_model_info_present:
+                        buffer_delay_length = reader.read_bits(5) + 1
+                        reader.skip_bits(32 + 5 + 5)
+                initial_display_delay_present = reader.read_flag()
+                for point in range(reader.read_bits(5) + 1):
+                    reader.skip_bits(12)    # operating_point_idc
+                    level_idx = reader.read_bits(5)
+                    tier = reader.read_bit() if level_idx > 7 else 0
+                    if point == 0:
+                        header.level_idx, header.tier = level_idx, tier
+                    if decoder_model_info_present and reader.read_flag():
+                        reader.skip_bits(2 * buffer_delay_length + 1)
+                    if initial_display_delay_present and reader.read_flag():
+                        reader.skip_bits(4)
+            width_bits = reader.read_bits(4) + 1
+            height_bits = reader.read_bits(4) + 1
+            header.width = reader.read_bits(width_bits) + 1
+            header.height = reader.read_bits(height_bits) + 1
+            header._parse_tools(reader, reduced_still_picture_header)
+            header._parse_color_config(reader)
+        except BitReaderError as e:
+            raise ESParseError(f"AV1序列头数据不完整: {e}") from e
+        return header
+
+    def _parse_tools(self, reader: BitReader, reduced_still_picture_header: bool):
+        """跳过编码工具开关，定位到color_config"""
+        if not reduced_still_picture_header and reader.read_flag():    # frame_id_numbers_present
+            reader.skip_bits(7)
+        reader.skip_bits(3)    # use_128x128_superblock、filter_intra、intra_edge
+        if not reduced_still_picture_header:
+            reader.skip_bits(4)    # interintra、masked_compound、warped_motion、dual_filter
+            enable_order_hint = reader.read_flag()
+            if enable_order_hint:
+                reader.skip_bits(2)    # jnt_comp、ref_frame_mvs
+            # seq_choose_screen_content_tools 为1时 seq_force_screen_content_tools 取2(SELECT)
+            force_screen_content_tools = 2 if reader.read_flag() else reader.read_bit()
+            if force_screen_content_tools and not reader.read_flag():    # seq_choose_integer_mv
+                reader.skip_bits(1)
+            if enable_order_hint:
+                reader.skip_bits(3)
+        reader.skip_bits(3)    # superres、cdef、restoration
+
+    def _parse_color_config(self, reader: BitReader):
+        high_bitdepth = reader.read_flag()
+        if self.seq_profile == 2 and high_bitdepth:
+            self.bit_depth_luma = 12 if reader.read_flag() else 10
+        else:
+            self.bit_depth_luma = 10 if high_bitdepth else 8
+        mono_chrome = 0 if self.seq_profile == 1 else reader.read_bit()
+        if reader.read_flag():    # color_description_present_flag
+            self.colour_primaries = reader.read_bits(8)
+            self.transfer_characteristics = reader.read_bits(8)
+            self.matrix_coefficients = reader.read_bits(8)
+        if mono_chrome:
+            self.full_range = reader.read_flag()
+            self.chroma_format_idc = 0
+            return
+        if (self.colour_primaries == AV1_CP_BT709 and self.transfer_characteristics == AV1_TC_SRGB
+                and self.matrix_coefficients == AV1_MC_IDENTITY):
+            self.full_range = True
+            self.chroma_format_idc = 3
+            return
+        self.full_range = reader.read_flag()
+        if self.seq_profile == 0:
+            subsampling_x = subsampling_y = 1
+        elif self.seq_profile == 1:
+            subsampling_x = subsampling_y = 0
+        elif self.bit_depth_luma == 12:
+            subsampling_x = reader.read_bit()
+            subsampling_y = reader.read_bit() if subsampling_x else 0
+        else:
+            subsampling_x, subsampling_y = 1, 0
+        self.chroma_format_idc = self._chroma_format(0, subsampling_x, subsampling_y)
+
+
+class VP9CodecConfig(VideoFormat):
+    """VP9编码配置（vpcC，Enhanced FLV vp09的SequenceStart负载），不含分辨率"""
+
+    __slots__ = ('profile', 'level_value')
+
+    JPEG_RANGE_CHROMA = ()
+
+    @property
+    def profile_name(self) -> str:
+        return f'Profile {self.profile}'
+
+    @property
+    def level(self) -> str:
+        return f"{self.level_value // 10}.{self.level_value % 10}"
+
+    @classmethod
+    def parse(cls, record) -> 'VP9CodecConfig':
+        """
+        Raises:
+            ESParseError: 记录过短或版本不支持
+        """
+        record = bytes(record)
+        if len(record) < VP9_CONFIG_SIZE or record[0] != 1:
+            raise ESParseError("无效的VPCodecConfigurationRecord")
+        config = cls()
+        config._reset_format()
+        config.profile = record[4]
+        config.level_value = record[5]
+        config.bit_depth_luma = record[6] >> 4
+        chroma_subsampling = (record[6] >> 1) & 0x07
+        if chroma_subsampling < len(VP9_CHROMA_FORMATS):
+            config.chroma_format_idc = VP9_CHROMA_FORMATS[chroma_subsampling]
+        config.full_range = bool(record[6] & 0x01)
+        config.colour_primaries = record[7]
+        config.transfer_characteristics = record[8]
+        config.matrix_coefficients = record[9]
+        return config
+
+
+class AudioSpecificConfig:
+    """AAC AudioSpecificConfig（FLV的AAC序列头负载）"""
+
+    __slots__ = ('object_type', 'sample_rate', 'channel_config', 'sbr', 'ps',
+                 'extension_sample_rate', 'frame_length')
+
+    @classmethod
+    def parse(cls, data) -> 'AudioSpecificConfig':
+        """
+        Raises:
+            ESParseError: 数据不足或采样率索引无效
+        """
+        config = cls()
+        reader = BitReader(bytes(data[:16]))
+        try:
+            object_type = config._read_object_type(reader)
+            config.sample_rate = config._read_sample_rate(reader)
+            config.channel_config = reader.read_bits(4)
+            config.sbr = config.ps = False
+            config.extension_sample_rate = None
+            if object_type in (AAC_OBJECT_SBR, AAC_OBJECT_PS):
+                # 显式的HE-AAC信令：扩展采样率之后是核心编码的object type
+                config.sbr = True
+                config.ps = object_type == AAC_OBJECT_PS
+                config.extension_sample_rate = config._read_sample_rate(reader)
+                core_type = config._read_object_type(reader)
+            else:
+                core_type = object_type
+            config.object_type = object_type
+            config.frame_length = 1024
+            if core_type in AAC_GA_OBJECTS and reader.read_flag():    # frameLengthFlag
+                config.frame_length = 960
+        except BitReaderError as e:
+            raise ESParseError(f"AudioSpecificConfig数据不完整: {e}") from e
+        return config
+
+    @staticmethod
+    def _read_object_type(reader: BitReader) -> int:
+        object_type = reader.read_bits(5)
+        if object_type == AAC_OBJECT_ESCAPE:
+            object_type = 32 + reader.read_bits(6)
+        return object_type
+
+    @staticmethod
+    def _read_sample_rate(reader: BitReader) -> int:
+        index = reader.read_bits(4)
+        if index == AAC_EXPLICIT_RATE:
+            return reader.read_bits(24)
+        if index >= len(AAC_SAMPLE_RATES):
+            raise ESParseError(f"无效的采样率索引: {index}")
+        return AAC_SAMPLE_RATES[index]
+
+    @property
+    def object_name(self) -> str:
+        return AAC_OBJECT_NAMES.get(self.object_type, f'AAC (object type {self.object_type})')
+
+    @property
+    def output_sample_rate(self) -> int:
+        """解码输出的采样率（SBR使输出采样率翻倍）"""
+        return self.extension_sample_rate or self.sample_rate
+
+    @property
+    def channels(self) -> int:
+        """声道数，0表示由节目配置单元指定"""
+        return AAC_CHANNELS[self.channel_config] if self.channel_config < len(AAC_CHANNELS) else 0
+
+    @property
+    def samples_per_frame(self) -> int:
+        """每个AAC帧解码输出的样本数（每声道）"""
+        return self.frame_length * (2 if self.sbr else 1)
+
+
+class H264SliceHeader:
+    """
+    H.264片头
+
+    frame_num/poc 在缺少对应SPS/PPS时为 -1；poc 只对 pic_order_cnt_type
+    0 和 2 计算，需要按解码顺序连续解析才准确。
+    """
+
+    __slots__ = ('nal_type', 'nal_ref_idc', 'slice_type', 'frame_num', 'poc')
+
+    def __init__(self, nal_type: int, nal_ref_idc: int, slice_type: int,
+                 frame_num: int = -1, poc: int = -1):
+        self.nal_type = nal_type
+        self.nal_ref_idc = nal_ref_idc
+        self.slice_type = slice_type
+        self.frame_num = frame_num
+        self.poc = poc
+
+    @property
+    def idr(self) -> bool:
+        return self.nal_type == NAL_IDR_SLICE
+
+    @property
+    def frame_type(self) -> str:
+        """I/P/B"""
+        return SLICE_TYPE_CHARS[self.slice_type] if self.slice_type < len(SLICE_TYPE_CHARS) else '?'
+
+    def __repr__(self):
+        return (f"H264SliceHeader(type={self.frame_type}, idr={self.idr}, "
+                f"frame_num={self.frame_num}, poc={self.poc})")
+
+
+class NALStreamParser:
+    """
+    NAL码流解析器基类
+
+    length_size 为AVCC/HVCC格式的NAL长度前缀字节数，由配置记录设置。
+    """
+
+    length_size = 4
+
+    def iter_nals(self, data) -> Iterator:
+        """自动识别Annex-B或长度前缀格式并切分NAL单元"""
+        if self._is_annexb(data):
+            return iter_annexb_nals(data)
+        return iter_avcc_nals(data, self.length_size)
+
+    def _is_annexb(self, data) -> bool:
+        """
+        判断是否为Annex-B格式
+
+        256~511字节的NAL在AVCC中的长度前缀也以 00 00 01 开头，
+        所以以起始码开头时再检查长度前缀能否恰好走到数据末尾。
+        """
+        head = bytes(data[:4])
+        if head == b'\x00\x00\x00\x01':
+            return True
+        if head[:3] != ANNEXB_START_CODE:
+            return False
+        pos = 0
+        length_size = self.length_size
+        while pos + length_size <= len(data):
+            pos += length_size + int.from_bytes(data[pos:pos + length_size], 'big')
+        return pos != len(data)
+
+
+class H264Parser(NALStreamParser):
+    """
+    H.264 NAL/片头解析器
+
+    参数集来自AVCDecoderConfigurationRecord（configure）或码流中的SPS/PPS，
+    按id保存。POC的推导依赖前一个参考帧，所以同一个解析器应按解码顺序
+    依次处理同一条流的帧。
+    """
+
+    def __init__(self):
+        self.sps: Dict[int, H264SPS] = {}
+        self.pps: Dict[int, H264PPS] = {}
+        self.length_size = 4
+        self.reset()
+
+    def reset(self):
+        """清空POC推导状态（跳转后重新解析时调用）"""
+        self._prev_poc_msb = 0
+        self._prev_poc_lsb = 0
+        self._prev_frame_num = 0
+        self._frame_num_offset = 0
+
+    def configure(self, record):
+        """
+        读取AVCDecoderConfigurationRecord（FLV的AVC序列头负载）
+
+        Raises:
+            ESParseError: 记录无效
+        """
+        record = bytes(record)
+        if len(record) < 7 or record[0] != 1:
+            raise ESParseError("无效的AVCDecoderConfigurationRecord")
+        self.length_size = (record[4] & 0x03) + 1
+        pos = 5
+        for count_mask in (0x1F, 0xFF):
+            if pos >= len(record):
+                break
+            count = record[pos] & count_mask
+            pos += 1
+            for _ in range(count):
+                size = int.from_bytes(record[pos:pos + 2], 'big')
+                pos += 2
+                if pos + size > len(record):
+                    raise ESParseError("参数集长度超出记录范围")
+                self.parse_nal(record[pos:pos + size])
+                pos += size
+
+    def parse_nal(self, nal) -> Optional[H264SliceHeader]:
+        """
+        解析一个NAL单元（含NAL头）：参数集被保存，片返回片头，其余忽略
+        """
+        if not len(nal):
+            return None
+        nal_type = nal[0] & 0x1F
+        if nal_type in (NAL_SLICE, NAL_IDR_SLICE):
+            return self.parse_slice(nal)
+        try:
+            if nal_type == NAL_SPS:
+                sps = H264SPS.parse(nal)
+                self.sps[sps.sps_id] = sps
+            elif nal_type == NAL_PPS:
+                pps = H264PPS.parse(nal)
+                self.pps[pps.pps_id] = pps
+        except ESParseError:
+            pass
+        return None
+
+    def parse_slice(self, nal) -> Optional[H264SliceHeader]:
+        """解析片头；片头本身损坏时返回None"""
+        nal_type = nal[0] & 0x1F
+        nal_ref_idc = (nal[0] >> 5) & 0x03
+        reader = BitReader(remove_emulation_prevention(nal[1:SLICE_HEADER_BYTES]))
+        try:
+            reader.read_ue()    # first_mb_in_slice
+            slice_type = reader.read_ue() % 5
+            pps = self.pps.get(reader.read_ue())
+            sps = self.sps.get(pps.sps_id) if pps is not None else None
+            header = H264SliceHeader(nal_type, nal_ref_idc, slice_type)
+            if sps is None:
+                return header
+
+            if sps.separate_colour_plane:
+                reader.skip_bits(2)
+            header.frame_num = reader.read_bits(sps.log2_max_frame_num)
+            field_pic = False
+            if not sps.frame_mbs_only:
+                field_pic = reader.read_flag()
+                if field_pic:
+                    reader.skip_bits(1)    # bottom_field_flag
+            if nal_type == NAL_IDR_SLICE:
+                reader.read_ue()    # idr_pic_id
+            poc_lsb = 0
+            if sps.poc_type == 0:
+                poc_lsb = reader.read_bits(sps.log2_max_poc_lsb)
+        except BitReaderError:
+            return None
+        header.poc = self._derive_poc(sps, header, poc_lsb)
+        return header
+
+    def _derive_poc(self, sps: H264SPS, header: H264SliceHeader, poc_lsb: int) -> int:
+        """按 8.2.1 推导顶场POC（不处理MMCO 5）"""
+        idr = header.nal_type == NAL_IDR_SLICE
+        if sps.poc_type == 0:
+            if idr:
+                self._prev_poc_msb = self._prev_poc_lsb = 0
+            max_lsb = 1 << sps.log2_max_poc_lsb
+            prev_msb, prev_lsb = self._prev_poc_msb, self._prev_poc_lsb
+            if poc_lsb < prev_lsb and prev_lsb - poc_lsb >= max_lsb // 2:
+                msb = prev_msb + max_lsb
+            elif poc_lsb > prev_lsb and poc_lsb - prev_lsb > max_lsb // 2:
+                msb = prev_msb - max_lsb
+            else:
+                msb = prev_msb
+            if header.nal_ref_idc:
+                self._prev_poc_msb, self._prev_poc_lsb = msb, poc_lsb
+            return msb + poc_lsb
+        if sps.poc_type == 2:
+            if idr:
+                self._frame_num_offset = 0
+            elif self._prev_frame_num > header.frame_num:
+                self._frame_num_offset += 1 << sps.log2_max_frame_num
+            self._prev_frame_num = header.frame_num
+            if idr:
+                return 0
+            return 2 * (self._frame_num_offset + header.frame_num) - (0 if header.nal_ref_idc else 1)
+        return -1
+
+    def parse_access_unit(self, data, start: int = 0, end: Optional[int] = None) -> Optional[H264SliceHeader]:
+        """
+        解析一个AVCC格式的访问单元（一个FLV视频标签的负载），返回第一个片的片头
+
+        Args:
+            data: 缓冲区（bytes、mmap等）
+            start: NAL数据起始偏移（跳过FLV视频标签头之后）
+            end: 结束偏移
+        """
+        # 热路径：直接按偏移读取，片只截取片头前缀，不为整个NAL建立视图
+        length_size = self.length_size
+        end = len(data) if end is None else end
+        pos = start
+        while pos + length_size <= end:
+            size = int.from_bytes(data[pos:pos + length_size], 'big')
+            pos += length_size
+            if size == 0 or pos + size > end:
+                break
+            nal_type = data[pos] & 0x1F
+            if nal_type in (NAL_SLICE, NAL_IDR_SLICE):
+                return self.parse_slice(data[pos:pos + min(size, SLICE_HEADER_BYTES)])
+            if nal_type in (NAL_SPS, NAL_PPS):
+                self.parse_nal(data[pos:pos + size])
+            pos += size
+        return None
+
+    def deep_parse(self, data) -> Dict[str, Any]:
+        """
+        解析一段H.264 ES数据（Annex-B、AVCC或AVCDecoderConfigurationRecord）
+
+        Returns:
+            dict: NAL类型列表；包含片时还有帧类型、IDR标志、frame_num和POC
+        """
+        data = bytes(data)
+        if data[:1] == b'\x01':
+            # AVCC的长度前缀不会以0x01开头（NAL不超过16MB），以0x01开头的是配置记录
+            self.configure(data)
+            return {"codec": "h264", "nal_types": [NAL_SPS, NAL_PPS],
+                    "sps_count": len(self.sps), "pps_count": len(self.pps), "parsed": True}
+
+        nal_types = []
+        header = None
+        for nal in self.iter_nals(data):
+            nal_types.append(nal[0] & 0x1F)
+            result = self.parse_nal(nal)
+            if header is None:
+                header = result
+        result = {"codec": "h264", "nal_types": nal_types, "parsed": True}
+        if header is not None:
+            result.update({
+                "frame_type": header.frame_type,
+                "slice_type": header.slice_type,
+                "idr": header.idr,
+                "nal_ref_idc": header.nal_ref_idc,
+                "frame_num": header.frame_num,
+                "poc": header.poc,
+            })
+        return result
+
+
+class HEVCSliceHeader:
+    """
+    H.265片头
+
+    slice_type 已换算为H.264的片类型编码，可与H.264片头一起存入 SliceIndex；
+    H.265没有frame_num，固定为 -1。poc 需要按解码顺序连续解析才准确。
+    """
+
+    __slots__ = ('nal_type', 'temporal_id', 'slice_type', 'poc')
+
+    frame_num = -1
+
+    def __init__(self, nal_type: int, temporal_id: int, slice_type: int, poc: int = -1):
+        self.nal_type = nal_type
+        self.temporal_id = temporal_id
+        self.slice_type = slice_type
+        self.poc = poc
+
+    @property
+    def idr(self) -> bool:
+        return self.nal_type in (HEVC_NAL_IDR_W_RADL, HEVC_NAL_IDR_N_LP)
+
+    @property
+    def nal_ref_idc(self) -> int:
+        """子层非参考图像（类型号不超过14的偶数）为0，其余为1"""
+        return 0 if self.nal_type <= 14 and not self.nal_type & 1 else 1
+
+    @property
+    def frame_type(self) -> str:
+        """I/P/B"""
+        return SLICE_TYPE_CHARS[self.slice_type] if self.slice_type < len(SLICE_TYPE_CHARS) else '?'
+
+    def __repr__(self):
+        return f"HEVCSliceHeader(type={self.frame_type}, nal_type={self.nal_type}, poc={self.poc})"
+
+
+class HEVCParser(NALStreamParser):
+    """
+    H.265 NAL/片头解析器
+
+    参数集来自HEVCDecoderConfigurationRecord（configure）或码流中的VPS/SPS/PPS，
+    按id保存。与 H264Parser 接口相同，同一个解析器应按解码顺序处理同一条流。
+    """
+
+    def __init__(self):
+        self.vps: Dict[int, HEVCVPS] = {}
+        self.sps: Dict[int, HEVCSPS] = {}
+        self.pps: Dict[int, HEVCPPS] = {}
+        self.length_size = 4
+        self.reset()
+
+    def reset(self):
+        """清空POC推导状态（跳转后重新解析时调用）"""
+        self._prev_poc_msb = 0
+        self._prev_poc_lsb = 0
+        self._first_picture = True
+
+    def configure(self, record):
+        """
+        读取HEVCDecoderConfigurationRecord（HEVC序列头/Enhanced FLV hvc1的SequenceStart负载）
+
+        Raises:
+            ESParseError: 记录无效
+        """
+        record = bytes(record)
+        if len(record) < 23 or record[0] > 1:
+            raise ESParseError("无效的HEVCDecoderConfigurationRecord")
+        self.length_size = (record[21] & 0x03) + 1
+        pos = 23
+        for _ in range(record[22]):
+            if pos + 3 > len(record):
+                raise ESParseError("参数集数组超出记录范围")
+            count = int.from_bytes(record[pos + 1:pos + 3], 'big')
+            pos += 3
+            for _ in range(count):
+                size = int.from_bytes(record[pos:pos + 2], 'big')
+                pos += 2
+                if pos + size > len(record):
+                    raise ESParseError("参数集长度超出记录范围")
+                self.parse_nal(record[pos:pos + size])
+                pos += size
+
+    def parse_nal(self, nal) -> Optional[HEVCSliceHeader]:
+        """
+        解析一个NAL单元（含2字节NAL头）：参数集被保存，片返回片头，其余忽略
+        """
+        if len(nal) < 2:
+            return None
+        nal_type = (nal[0] >> 1) & 0x3F
+        if nal_type in HEVC_SLICE_NALS:
+            return self.parse_slice(nal)
+        try:
+            if nal_type == HEVC_NAL_VPS:
+                vps = HEVCVPS.parse(nal)
+                self.vps[vps.vps_id] = vps
+            elif nal_type == HEVC_NAL_SPS:
+                sps = HEVCSPS.parse(nal)
+                self.sps[sps.sps_id] = sps
+            elif nal_type == HEVC_NAL_PPS:
+                pps = HEVCPPS.parse(nal)
+                self.pps[pps.pps_id] = pps
+        except ESParseError:
+            pass
+        return None
+
+    def parse_slice(self, nal) -> Optional[HEVCSliceHeader]:
+        """解析片段头；缺少参数集、依赖片段或片头损坏时返回None"""
+        nal_type = (nal[0] >> 1) & 0x3F
+        temporal_id = (nal[1] & 0x07) - 1
+        reader = BitReader(remove_emulation_prevention(nal[2:SLICE_HEADER_BYTES]))
+        try:
+            first_slice_segment = reader.read_flag()
+            if HEVC_NAL_BLA_W_LP <= nal_type <= HEVC_NAL_IRAP_END:
+                reader.skip_bits(1)    # no_output_of_prior_pics_flag
+            pps = self.pps.get(reader.read_ue())
+            sps = self.sps.get(pps.sps_id) if pps is not None else None
+            if sps is None:
+                return None
+            if not first_slice_segment:
+                if pps.dependent_slice_segments_enabled and reader.read_flag():
+                    return None
+                reader.skip_bits((sps.pic_size_in_ctbs - 1).bit_length())    # slice_segment_address
+            reader.skip_bits(pps.num_extra_slice_header_bits)
+            slice_type = reader.read_ue()
+            if slice_type >= len(HEVC_SLICE_TYPES):
+                return None
+            header = HEVCSliceHeader(nal_type, temporal_id, HEVC_SLICE_TYPES[slice_type])
+            if pps.output_flag_present:
+                reader.skip_bits(1)
+            if sps.separate_colour_plane:
+                reader.skip_bits(2)
+            poc_lsb = 0 if header.idr else reader.read_bits(sps.log2_max_poc_lsb)
+        except BitReaderError:
+            return None
+        header.poc = self._derive_poc(sps, header, poc_lsb)
+        return header
+
+    def _derive_poc(self, sps: HEVCSPS, header: HEVCSliceHeader, poc_lsb: int) -> int:
+        """按 8.3.1 推导POC"""
+        nal_type = header.nal_type
+        # IDR、BLA和流中第一个CRA的NoRaslOutputFlag为1，POC的高位清零
+        if (HEVC_NAL_BLA_W_LP <= nal_type <= HEVC_NAL_IDR_N_LP
+                or (nal_type == HEVC_NAL_CRA and self._first_picture)):
+            msb = 0
+        else:
+            max_lsb = 1 << sps.log2_max_poc_lsb
+            prev_msb, prev_lsb = self._prev_poc_msb, self._prev_poc_lsb
+            if poc_lsb < prev_lsb and prev_lsb - poc_lsb >= max_lsb // 2:
+                msb = prev_msb + max_lsb
+            elif poc_lsb > prev_lsb and poc_lsb - prev_lsb > max_lsb // 2:
+                msb = prev_msb - max_lsb
+            else:
+                msb = prev_msb
+        self._first_picture = False
+        # prevTid0Pic：时间层0且不是RADL/RASL/子层非参考图像
+        if (header.temporal_id == 0 and header.nal_ref_idc
+                and not HEVC_NAL_RADL_N <= nal_type <= HEVC_NAL_RASL_R):
+            self._prev_poc_msb, self._prev_poc_lsb = msb, poc_lsb
+        return msb + poc_lsb
+
+    def parse_access_unit(self, data, start: int = 0, end: Optional[int] = None) -> Optional[HEVCSliceHeader]:
+        """
+        解析一个长度前缀格式的访问单元（一个FLV视频标签的负载），返回第一个片的片头
+
+        Args:
+            data: 缓冲区（bytes、mmap等）
+            start: NAL数据起始偏移（跳过FLV视频标签头之后）
+            end: 结束偏移
+        """
+        length_size = self.length_size
+        end = len(data) if end is None else end
+        pos = start
+        while pos + length_size <= end:
+            size = int.from_bytes(data[pos:pos + length_size], 'big')
+            pos += length_size
+            if size < 2 or pos + size > end:
+                break
+            nal_type = (data[pos] >> 1) & 0x3F
+            if nal_type in HEVC_SLICE_NALS:
+                return self.parse_slice(data[pos:pos + min(size, SLICE_HEADER_BYTES)])
+            if HEVC_NAL_VPS <= nal_type <= HEVC_NAL_PPS:
+                self.parse_nal(data[pos:pos + size])
+            pos += size
+        return None
+
+    def deep_parse(self, data) -> Dict[str, Any]:
+        """
+        解析一段H.265 ES数据（Annex-B、长度前缀格式或HEVCDecoderConfigurationRecord）
+
+        Returns:
+            dict: NAL类型列表；包含片时还有帧类型、IDR标志和POC
+        """
+        data = bytes(data)
+        if data[:1] == b'\x01':
+            self.configure(data)
+            return {"codec": "hevc", "nal_types": [HEVC_NAL_VPS, HEVC_NAL_SPS, HEVC_NAL_PPS],
+                    "vps_count": len(self.vps), "sps_count": len(self.sps),
+                    "pps_count": len(self.pps), "parsed": True}
+
+        nal_types = []
+        header = None
+        for nal in self.iter_nals(data):
+            if len(nal) < 2:
+                continue
+            nal_types.append((nal[0] >> 1) & 0x3F)
+            result = self.parse_nal(nal)
+            if header is None:
+                header = result
+        result = {"codec": "hevc", "nal_types": nal_types, "parsed": True}
+        if header is not None:
+            result.update({
+                "frame_type": header.frame_type,
+                "slice_type": header.slice_type,
+                "idr": header.idr,
+                "temporal_id": header.temporal_id,
+                "poc": header.poc,
+            })
+        return result
+
+
+def parse_video_config(codec_id: int, record) -> Optional[VideoFormat]:
+    """
+    解析视频序列头负载（AVC/HEVC/AV1/VP9配置记录）中的图像格式
+
+    Args:
+        codec_id: 标签索引中的视频编码ID（含Enhanced FLV映射的编码ID）
+        record: 序列头负载（跳过视频标签头之后）
+
+    Returns:
+        VideoFormat: H264SPS、HEVCSPS、AV1SequenceHeader或VP9CodecConfig；
+            不支持的编码或记录中没有SPS时返回None
+
+    Raises:
+        ESParseError: 记录无效
+    """
+    if codec_id in (VIDEO_CODEC_AVC, VIDEO_CODEC_EX_AVC):
+        parser = H264Parser()
+        parser.configure(record)
+        return next(iter(parser.sps.values()), None)
+    if codec_id in (VIDEO_CODEC_HEVC, VIDEO_CODEC_EX_HEVC):
+        parser = HEVCParser()
+        parser.configure(record)
+        sps = next(iter(parser.sps.values()), None)
+        if sps is not None and sps.frame_rate is None:
+            vps = parser.vps.get(sps.vps_id)
+            sps.frame_rate = vps.frame_rate if vps is not None else None
+        return sps
+    if codec_id == VIDEO_CODEC_EX_AV1:
+        return AV1SequenceHeader.from_config(record)
+    if codec_id == VIDEO_CODEC_EX_VP9:
+        return VP9CodecConfig.parse(record)
+    return None
+
+
+class SliceIndex:
+    """
+    逐帧片头索引
+
+    每个AVC/HEVC编码帧标签一行，列为标签行号、片类型、IDR标志、nal_ref_idc、
+    frame_num和POC（未知为 -1 / SLICE_UNKNOWN）。HEVC的片类型换算为H.264编码，
+    nal_ref_idc 只区分是否为参考图像。
+    """
+
+    COLUMNS = (
+        ('row', 'I'),
+        ('slice_type', 'B'),
+        ('idr', 'B'),
+        ('nal_ref_idc', 'B'),
+        ('frame_num', 'i'),
+        ('poc', 'i'),
+    )
+
+    __slots__ = tuple(name for name, _ in COLUMNS)
+
+    def __init__(self):
+        for name, typecode in self.COLUMNS:
+            setattr(self, name, array(typecode))
+
+    def append(self, row: int, header):
+        self.row.append(row)
+        if header is None:
+            self.slice_type.append(SLICE_UNKNOWN)
+            self.idr.append(0)
+            self.nal_ref_idc.append(0)
+            self.frame_num.append(-1)
+            self.poc.append(-1)
+        else:
+            self.slice_type.append(header.slice_type)
+            self.idr.append(header.idr)
+            self.nal_ref_idc.append(header.nal_ref_idc)
+            self.frame_num.append(header.frame_num)
+            self.poc.append(header.poc)
+
+    def __len__(self) -> int:
+        return len(self.row)
+
+    def column(self, name: str):
+        """列的零拷贝NumPy视图（未安装NumPy时为memoryview）"""
+        data = getattr(self, name)
+        if HAS_NUMPY:
+            return np.frombuffer(data, dtype=data.typecode) if len(data) else np.empty(0, dtype=data.typecode)
+        return memoryview(data)
+
+
+# 编码ID -> 片头解析器
+SLICE_PARSERS = {
+    VIDEO_CODEC_AVC: H264Parser,
+    VIDEO_CODEC_EX_AVC: H264Parser,
+    VIDEO_CODEC_HEVC: HEVCParser,
+    VIDEO_CODEC_EX_HEVC: HEVCParser,
+}
+
+
+def scan_slices(scanner, table) -> SliceIndex:
+    """
+    批量解析标签索引中所有AVC/HEVC编码帧的片头
+
+    每个标签只读取NAL长度和片头前缀的几十个字节，不解码。
+
+    Args:
+        scanner: 已打开的FLVTagScanner
+        table: 该文件的标签索引
+
+    Returns:
+        SliceIndex
+    """
+    index = SliceIndex()
+    buffer = scanner.buffer
+    append = index.append
+    parsers = {}
+    parser = None
+    parser_codec = None
+    rows = zip(table.offset, table.tag_type, table.data_size, table.codec_id, table.packet_type)
+    for row, (offset, tag_type, data_size, codec_id, packet_type) in enumerate(rows):
+        if tag_type != TAG_TYPE_VIDEO:
+            continue
+        if codec_id != parser_codec:
+            if codec_id not in SLICE_PARSERS:
+                continue
+            parser = parsers.get(codec_id)
+            if parser is None:
+                parser = parsers[codec_id] = SLICE_PARSERS[codec_id]()
+            parser_codec = codec_id
+        start = offset + TAG_HEADER_SIZE
+        end = start + data_size
+        start += video_header_size(codec_id, packet_type)
+        if packet_type in CODED_FRAME_PACKET_TYPES:
+            append(row, parser.parse_access_unit(buffer, start, end))
+        elif packet_type == PACKET_TYPE_SEQUENCE_HEADER and start < end:
+            try:
+                parser.configure(buffer[start:end])
+            except ESParseError:
+                pass
+    return index
+
+
+class VideoDecoder:
+    """
+    长期复用的视频解码器
+
+    整条流共用一个 CodecContext，只在序列头变化或冲刷之后重建。默认开启
+    帧级多线程，解码器内同时有若干个包在解码，输出相应地延迟几帧；
+    每送入一个包就取出已完成的帧，内存中不会积压解码后的图像。
+    """
+
+    def __init__(self, codec_name: str, extradata: Optional[bytes] = None, threads: int = 0):
+        """
+        Args:
+            codec_name: PyAV解码器名称（h264、hevc等）
+            extradata: 序列头（AVCDecoderConfigurationRecord等），Annex-B码流可为None
+            threads: 解码线程数，0表示按CPU核数自动选择，1表示单线程（无输出延迟）
+        """
+        if not HAS_PYAV:
+            raise RuntimeError("PyAV未安装，无法解码")
+        self.codec_name = codec_name
+        self.extradata = extradata
+        self.threads = threads
+        self.frames_decoded = 0
+        self.errors = 0
+        self._context = None
+
+    @property
+    def context(self):
+        """当前的 CodecContext，按需创建"""
+        if self._context is None:
+            context = av.CodecContext.create(self.codec_name, 'r')
+            if self.extradata:
+                context.extradata = self.extradata
+            if self.threads != 1:
+                context.thread_type = 'FRAME'
+            context.thread_count = self.threads
+            self._context = context
+        return self._context
+
+    def decode_packet(self, data, dts: Optional[int] = None, pts: Optional[int] = None) -> List:
+        """
+        送入一个编码帧，返回此时已完成解码的帧（可能为空）
+
+        损坏的数据包只计数，不中断后续解码。
+        """
+        packet = av.Packet(data)
+        packet.dts = dts
+        packet.pts = pts
+        try:
+            frames = self.context.decode(packet)
+        except av.error.FFmpegError as e:
+            self.errors += 1
+            logger.debug(f"解码数据包失败: {e}")
+            return []
+        self.frames_decoded += len(frames)
+        return frames
+
+    def decode(self, packets: Iterable[Tuple[bytes, int, int]]) -> Iterator:
+        """
+        惰性解码一串 (数据, DTS, PTS)，依次产出解码后的帧（不含冲刷）
+        """
+        decode_packet = self.decode_packet
+        for data, dts, pts in packets:
+            yield from decode_packet(data, dts, pts)
+
+    def decode_es(self, data) -> List:
+        """把一段原始ES字节流按帧切分后解码，返回已完成的帧"""
+        context = self.context
+        frames = []
+        for packet in context.parse(data):
+            try:
+                frames.extend(context.decode(packet))
+            except av.error.FFmpegError as e:
+                self.errors += 1
+                logger.debug(f"解码数据包失败: {e}")
+        self.frames_decoded += len(frames)
+        return frames
+
+    def flush(self) -> Iterator:
+        """取出解码器中缓存的帧；之后的解码会重新创建解码器"""
+        context = self._context
+        if context is None:
+            return
+        self._context = None
+        try:
+            frames = context.decode(None)
+        except av.error.FFmpegError as e:
+            logger.debug(f"冲刷解码器失败: {e}")
+            return
+        self.frames_decoded += len(frames)
+        yield from frames
+
+    def reconfigure(self, extradata: bytes) -> Iterator:
+        """序列头变化时冲刷旧解码器并换用新的序列头，产出冲刷出的帧"""
+        if extradata == self.extradata:
+            return
+        yield from self.flush()
+        self.extradata = extradata
+
+    def close(self):
+        self._context = None
+
+
+def _last_sequence_header(table, start_row: int) -> int:
+    """start_row 之前最后一个视频序列头的行号，没有返回-1"""
+    if HAS_NUMPY:
+        mask = ((table.column('tag_type')[:start_row] == TAG_TYPE_VIDEO)
+                & (table.column('packet_type')[:start_row] == PACKET_TYPE_SEQUENCE_HEADER))
+        rows = np.flatnonzero(mask)
+        return int(rows[-1]) if len(rows) else -1
+    for row in range(start_row - 1, -1, -1):
+        if table.tag_type[row] == TAG_TYPE_VIDEO and table.packet_type[row] == PACKET_TYPE_SEQUENCE_HEADER:
+            return row
+    return -1
+
+
+def iter_flv_video_frames(scanner, table, start_row: int = 0, stop_row: Optional[int] = None,
+                          threads: int = 0) -> Iterator:
+    """
+    批量解码FLV文件中的视频帧
+
+    用一个长期存在的解码器按解码顺序依次处理 [start_row, stop_row) 内的视频标签，
+    起点之前最近的序列头会先被读取；流中出现新的序列头时重新配置解码器。
+    start_row 应位于关键帧，否则开头的帧可能无法解码。
+
+    Args:
+        scanner: 已打开的FLVTagScanner
+        table: 该文件的标签索引
+        start_row: 起始标签行号
+        stop_row: 结束标签行号（不含），默认到文件末尾
+        threads: 解码线程数，0表示自动
+
+    Yields:
+        av.VideoFrame: 按显示顺序输出的帧
+    """
+    buffer = scanner.buffer
+    stop_row = len(table) if stop_row is None else min(stop_row, len(table))
+    decoder: Optional[VideoDecoder] = None
+    if start_row > 0:
+        header_row = _last_sequence_header(table, start_row)
+        codec_id = table.codec_id[header_row] if header_row >= 0 else None
+        if codec_id in DECODER_NAMES:
+            start = table.offset[header_row] + TAG_HEADER_SIZE
+            end = start + table.data_size[header_row]
+            start += video_header_size(codec_id, PACKET_TYPE_SEQUENCE_HEADER)
+            decoder = VideoDecoder(DECODER_NAMES[codec_id], buffer[start:end], threads)
+
+    columns = (table.offset, table.tag_type, table.timestamp, table.data_size,
+               table.codec_id, table.packet_type, table.cts)
+    rows = islice(zip(*columns), start_row, stop_row)
+    for offset, tag_type, timestamp, data_size, codec_id, packet_type, cts in rows:
+        if tag_type != TAG_TYPE_VIDEO or codec_id not in DECODER_NAMES:
+            continue
+        start = offset + TAG_HEADER_SIZE + video_header_size(codec_id, packet_type)
+        end = offset + TAG_HEADER_SIZE + data_size
+        if start >= end:
+            continue
+        if packet_type == PACKET_TYPE_SEQUENCE_HEADER:
+            if decoder is None:
+                decoder = VideoDecoder(DECODER_NAMES[codec_id], buffer[start:end], threads)
+            else:
+                yield from decoder.reconfigure(buffer[start:end])
+        elif packet_type in CODED_FRAME_PACKET_TYPES and decoder is not None:
+            yield from decoder.decode_packet(buffer[start:end], timestamp, timestamp + cts)
+
+    if decoder is not None:
+        yield from decoder.flush()
+        if decoder.errors:
+            logger.warning(f"解码过程中有 {decoder.errors} 个数据包失败")
+
 
 class DummyParser:
     """占位解析器，用于未实现的编码格式"""
-    def deep_parse(self, frame):
+    def deep_parse(self, data):
         return {"type": "unknown", "parsed": False}
 
 
 class ESProcessor:
     def __init__(self):
+        self.hooks = get_hook_manager()
         self.codec_parsers = {
-            'h264': DummyParser(),  # TODO: 实现H264Parser
-            'avs3': DummyParser(),  # TODO: 实现AVS3Parser
-            'vvc': DummyParser()    # TODO: 实现VVCParser
+            'h264': H264Parser(),
+            'hevc': HEVCParser(),
+            'avs3': DummyParser(),
+            'vvc': DummyParser()
         }
-    
+        # AVS3/VVC等编码的解析器由插件注册（plugins/avs3_parser.py、vvc_parser.py）
+        self.codec_parsers.update(self.hooks.create_codec_parsers())
+        self._decoders: Dict[str, VideoDecoder] = {}
+
     def parse_es(self, data: bytes, codec_type: str):
         """
         解析ES流数据
-        
+
+        有专用解析器的编码直接解析码流，其余编码用该编码长期复用的
+        PyAV解码器解码，返回本次输出的第一帧的信息。同一编码的连续调用
+        视为同一条流的连续片段，存在帧重排时输出的可能是之前送入的帧。
+
         Args:
             data: ES流字节数据
             codec_type: 编码类型 (h264, avs3, vvc等)
-            
+
         Returns:
             dict: 解析结果
         """
+        parser = self.codec_parsers.get(codec_type)
+        if parser is not None:
+            try:
+                result = parser.deep_parse(data)
+                self.hooks.call(HOOK_POST_ES_EXTRACT, codec_type, data, result)
+                return result
+            except ESParseError as e:
+                return {
+                    "error": f"ES解析失败: {str(e)}",
+                    "codec_type": codec_type,
+                    "data_size": len(data)
+                }
+
         if not HAS_PYAV:
             return {
                 "error": "PyAV未安装，无法进行ES解析",
                 "suggestion": "运行 pip install av 安装PyAV"
             }
-        
-        try:
-            # 使用PyAV进行基础帧解析
-            with av.open(BytesIO(data)) as container:
-                for frame in container.decode(video=0):
-                    # 调用专用编码解析器
-                    if codec_type in self.codec_parsers:
-                        return self.codec_parsers[codec_type].deep_parse(frame)
-                    else:
-                        return {
-                            "codec": codec_type,
-                            "frame_type": str(frame.pict_type),
-                            "size": (frame.width, frame.height),
-                            "pts": frame.pts,
-                            "parsed": True
-                        }
+
+        try:
+            # 复用该编码的解码器；数据中没有完整输出的帧时冲刷解码器
+            decoder = self._get_decoder(codec_type)
+            frames = decoder.decode_es(data) + decoder.decode_es(None)
+            if not frames:
+                frames = list(decoder.flush())
+            for frame in frames:
+                return {
+                    "codec": codec_type,
+                    "frame_type": str(frame.pict_type),
+                    "size": (frame.width, frame.height),
+                    "pts": frame.pts,
+                    "parsed": True
+                }
         except Exception as e:
             return {
                 "error": f"ES解析失败: {str(e)}",
                 "codec_type": codec_type,
                 "data_size": len(data)
             }
-        
+
         return {"error": "无有效帧数据"}
 
+    def parse_video_tag(self, payload) -> Dict[str, Any]:
+        """
+        解析一个FLV视频标签负载（传统AVC/HEVC标签或Enhanced FLV扩展标签）
+
+        序列头返回配置记录中的图像格式，编码帧交给 parse_es 按编码解析，
+        元数据等其他扩展包只返回包头信息。
+
+        Args:
+            payload: 视频标签负载（不含11字节标签头）
+
+        Returns:
+            dict: 解析结果
+        """
+        codec_id, frame_type, packet_type, cts = decode_av_header(payload, TAG_TYPE_VIDEO, 0, len(payload))
+        result = {"codec_id": codec_id, "tag_frame_type": frame_type, "packet_type": packet_type, "cts": cts}
+        codec_type = DECODER_NAMES.get(codec_id)
+        if codec_type is None:
+            result["error"] = f"不支持的视频编码: {codec_id}"
+            return result
+        body = bytes(payload[video_header_size(codec_id, packet_type):])
+
+        if packet_type == PACKET_TYPE_SEQUENCE_HEADER:
+            try:
+                config = parse_video_config(codec_id, body)
+            except ESParseError as e:
+                result["error"] = f"序列头解析失败: {str(e)}"
+                return result
+            parser = self.codec_parsers.get(codec_type)
+            if parser is not None:
+                # 保存参数集，供后续编码帧的片头解析使用
+                parser.configure(body)
+            if config is not None:
+                result.update({
+                    "codec": codec_type,
+                    "profile": config.profile_name,
+                    "level": config.level,
+                    "size": (config.width, config.height) if config.width else None,
+                    "pixel_format": config.pixel_format,
+                    "color_space": config.color_space,
+                    "frame_rate": config.frame_rate,
+                })
+            result["parsed"] = True
+        elif packet_type in CODED_FRAME_PACKET_TYPES:
+            result.update(self.parse_es(body, codec_type))
+        else:
+            result["parsed"] = True
+        return result
+
+    def _get_decoder(self, codec_type: str) -> VideoDecoder:
+        decoder = self._decoders.get(codec_type)
+        if decoder is None:
+            # 逐段检查时不需要多线程带来的输出延迟
+            decoder = self._decoders[codec_type] = VideoDecoder(codec_type, threads=1)
+        return decoder
+
+    def close(self):
+        """释放缓存的解码器"""
+        for decoder in self._decoders.values():
+            decoder.close()
+        self._decoders.clear()
+
 
 # Windows兼容性函数
 def check_dependencies():
@@ -90,4 +1889,4 @@ def check_dependencies():
         "construct": HAS_CONSTRUCT,
         "ready": HAS_PYAV and HAS_CONSTRUCT
     }
-    return status
\ No newline at end of file
+    return status
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+FLV 文件头解析
+解析9字节FLV文件头，不依赖第三方库
+"""
+
+import struct
+
+# FLV文件签名与固定长度
+FLV_SIGNATURE = b'FLV'
+FLV_HEADER_SIZE = 9
+PREV_TAG_SIZE_LENGTH = 4
+
+# 文件头标志位
+FLAG_AUDIO = 0x04
+FLAG_VIDEO = 0x01
+
+# 签名(3) + 版本(1) + 标志(1) + 数据偏移(4)
+_HEADER_STRUCT = struct.Struct('>3sBBI')
+
+
+class FLVHeaderError(ValueError):
+    """FLV文件头无效"""
+
+
+class FLVHeader:
+    """FLV文件头"""
+
+    __slots__ = ('version', 'flags', 'data_offset')
+
+    def __init__(self, version: int, flags: int, data_offset: int):
+        self.version = version
+        self.flags = flags
+        self.data_offset = data_offset
+
+    @property
+    def has_audio(self) -> bool:
+        """是否声明包含音频"""
+        return bool(self.flags & FLAG_AUDIO)
+
+    @property
+    def has_video(self) -> bool:
+        """是否声明包含视频"""
+        return bool(self.flags & FLAG_VIDEO)
+
+    @classmethod
+    def parse(cls, buffer, offset: int = 0) -> 'FLVHeader':
+        """
+        从缓冲区解析FLV文件头
+
+        Args:
+            buffer: 支持缓冲区协议的对象 (bytes、mmap、memoryview等)
+            offset: 文件头起始偏移
+
+        Returns:
+            FLVHeader: 解析结果
+
+        Raises:
+            FLVHeaderError: 数据不足或签名不匹配
+        """
+        if len(buffer) - offset < FLV_HEADER_SIZE:
+            raise FLVHeaderError("数据不足，无法读取FLV文件头")
+
+        signature, version, flags, data_offset = _HEADER_STRUCT.unpack_from(buffer, offset)
+        if signature != FLV_SIGNATURE:
+            raise FLVHeaderError(f"无效的FLV签名: {signature!r}")
+        if data_offset < FLV_HEADER_SIZE:
+            raise FLVHeaderError(f"无效的数据偏移: {data_offset}")
+
+        return cls(version, flags, data_offset)
+
+    def __repr__(self):
+        return (f"FLVHeader(version={self.version}, has_audio={self.has_audio}, "
+                f"has_video={self.has_video}, data_offset={self.data_offset})")
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+关键帧索引
+按时间查找不晚于目标时间的最近关键帧及其文件偏移
+"""
+
+from array import array
+from bisect import bisect_right
+from typing import Optional, Tuple
+
+from .tag_table import TagTable
+
+
+class KeyframeIndex:
+    """
+    关键帧索引
+
+    times 为升序的关键帧时间（毫秒），offsets 为对应标签头的文件偏移，
+    rows 为标签索引中的行号（仅来自onMetaData时为-1）。来自标签索引时
+    times 为显示时间(PTS = 时间戳 + CTS)，与帧定位按PTS选帧一致；
+    onMetaData的关键帧表只有解码时间，存在B帧时会比PTS早一个重排延迟。
+    """
+
+    __slots__ = ('times', 'offsets', 'rows')
+
+    def __init__(self):
+        self.times = array('I')
+        self.offsets = array('Q')
+        self.rows = array('i')
+
+    @classmethod
+    def from_table(cls, table: TagTable, keyframe_rows) -> 'KeyframeIndex':
+        """从标签索引的关键帧行号构建，时间为关键帧的显示时间"""
+        index = cls()
+        timestamp, cts, offset = table.timestamp, table.cts, table.offset
+        for row in keyframe_rows:
+            ts = max(timestamp[row] + cts[row], 0)
+            # 时间戳回退的关键帧无法二分查找，跳过
+            if index.times and ts < index.times[-1]:
+                continue
+            index.times.append(ts)
+            index.offsets.append(offset[row])
+            index.rows.append(row)
+        return index
+
+    @classmethod
+    def from_metadata(cls, metadata: dict) -> Optional['KeyframeIndex']:
+        """
+        从onMetaData的 keyframes.filepositions/times 构建
+
+        Returns:
+            KeyframeIndex: 元数据中没有关键帧表时返回None
+        """
+        keyframes = metadata.get('keyframes') if metadata else None
+        if not isinstance(keyframes, dict):
+            return None
+        positions = keyframes.get('filepositions')
+        times = keyframes.get('times')
+        if not isinstance(positions, list) or not isinstance(times, list) or not positions:
+            return None
+
+        index = cls()
+        for position, seconds in zip(positions, times):
+            if not isinstance(position, (int, float)) or not isinstance(seconds, (int, float)):
+                continue
+            ts = int(round(seconds * 1000))
+            if index.times and ts < index.times[-1]:
+                continue
+            index.times.append(ts)
+            index.offsets.append(int(position))
+            index.rows.append(-1)
+        return index if len(index) else None
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def lookup(self, time_ms: int) -> int:
+        """
+        查找不晚于指定时间的最近关键帧
+
+        Returns:
+            int: 关键帧在索引中的位置，早于第一个关键帧时返回0
+        """
+        return max(bisect_right(self.times, time_ms) - 1, 0)
+
+    def __getitem__(self, i: int) -> Tuple[int, int, int]:
+        """返回 (时间戳, 文件偏移, 行号)"""
+        return self.times[i], self.offsets[i], self.rows[i]
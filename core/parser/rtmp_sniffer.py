@@ -0,0 +1,1038 @@
+# -*- coding: utf-8 -*-
+"""
+RTMP 块流解复用
+从一个方向的RTMP字节流（客户端->服务器或服务器->客户端）中跳过握手、
+解析块头并按块流ID重组消息，把音视频和数据消息还原为与FLV文件解析
+相同的标签事件；另提供透明代理，在转发真实连接的同时进行解析，
+以及从pcap/pcapng抓包中重组TCP连接并还原RTMP会话
+"""
+
+import asyncio
+import heapq
+import socket
+import struct
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from core import get_logger
+from core.analysis.error_detector import LEVEL_ERROR, LEVEL_WARNING
+from .stream_parser import FLVStreamParser, FLVStreamError, StreamTag, AV_HEADER_BYTES
+from .tag_parser import (AMF0Decoder, AMF0Error, TAG_TYPE_AUDIO, TAG_TYPE_VIDEO,
+                         TAG_TYPE_SCRIPT, TAG_HEADER_SIZE, decode_av_header, _TAG_HEADER_STRUCT)
+
+logger = get_logger(__name__)
+
+RTMP_VERSION = 3
+HANDSHAKE_SIZE = 1536
+# C0/S0(1) + C1/S1(1536) + C2/S2(1536)
+HANDSHAKE_TOTAL = 1 + HANDSHAKE_SIZE * 2
+DEFAULT_CHUNK_SIZE = 128
+EXTENDED_TIMESTAMP = 0xFFFFFF
+
+# 消息类型
+MSG_SET_CHUNK_SIZE = 1
+MSG_ABORT = 2
+MSG_AUDIO = 8
+MSG_VIDEO = 9
+MSG_DATA_AMF3 = 15
+MSG_COMMAND_AMF3 = 17
+MSG_DATA_AMF0 = 18
+MSG_COMMAND_AMF0 = 20
+MSG_AGGREGATE = 22
+
+# 块消息头长度（按fmt）
+_MESSAGE_HEADER_SIZES = (11, 7, 3, 0)
+
+MAX_COMMANDS = 256   # 保留的命令消息数量
+
+_UINT24_STRUCT = struct.Struct('>I')   # 读4字节后取低24位
+_UINT32_STRUCT = struct.Struct('>I')
+_UINT32_LE_STRUCT = struct.Struct('<I')
+
+
+class RTMPError(ValueError):
+    """RTMP数据无法继续解析"""
+
+
+class _ChunkStream:
+    """单个块流ID的解析状态"""
+
+    __slots__ = ('timestamp', 'ts_field', 'extended', 'length', 'type_id', 'stream_id',
+                 'buffer', 'filled', 'start_offset')
+
+    def __init__(self):
+        self.timestamp = 0
+        self.ts_field = 0        # 最近一次读到的时间戳字段（绝对值或增量）
+        self.extended = False    # 最近一次块头是否带扩展时间戳
+        self.length = 0
+        self.type_id = 0
+        self.stream_id = 0
+        self.buffer = None       # 正在重组的消息，按消息长度预分配
+        self.filled = 0
+        self.start_offset = 0
+
+
+class RTMPChunkDemuxer:
+    """
+    RTMP块流解复用器（推送式）
+
+    feed() 返回本次完成的音视频/数据消息，格式与 FLVStreamParser 相同：
+    (标签记录, 负载)，记录中的偏移为消息第一个块在该方向字节流中的偏移。
+    协议控制消息（设置块大小、中止）在内部处理，命令消息的名称保存在
+    commands 中供诊断。
+    """
+
+    def __init__(self, keep_payload: bool = True, has_handshake: bool = True):
+        """
+        Args:
+            keep_payload: 是否保留完整消息负载；为False时只保留解析标签
+                首部所需的字节，不为大消息分配缓冲区
+            has_handshake: 数据是否以握手(C0+C1+C2 或 S0+S1+S2)开始
+        """
+        self.keep_payload = keep_payload
+        self.chunk_size = DEFAULT_CHUNK_SIZE
+        self.messages_parsed = 0
+        self.commands: List[Tuple[int, str]] = []   # (时间戳, 命令名)
+        self._streams: Dict[int, _ChunkStream] = {}
+        self._buffer = bytearray()
+        self._consumed = 0
+        self._handshake_left = HANDSHAKE_TOTAL if has_handshake else 0
+
+    @property
+    def bytes_consumed(self) -> int:
+        return self._consumed
+
+    def feed(self, data) -> List[StreamTag]:
+        """
+        输入一块数据
+
+        Raises:
+            RTMPError: 版本号不支持（如加密的RTMPE）或块头无效
+        """
+        buf = self._buffer
+        buf += data
+        size = len(buf)
+        pos = 0
+        events = []
+
+        try:
+            if self._handshake_left:
+                if self._handshake_left == HANDSHAKE_TOTAL and size and buf[0] != RTMP_VERSION:
+                    raise RTMPError(f"不支持的RTMP版本: {buf[0]}")
+                pos = min(self._handshake_left, size)
+                self._handshake_left -= pos
+                if self._handshake_left:
+                    return events
+
+            while pos < size:
+                consumed = self._read_chunk(buf, pos, size, events)
+                if not consumed:
+                    break
+                pos += consumed
+        finally:
+            del buf[:pos]
+            self._consumed += pos
+
+        return events
+
+    def _read_chunk(self, buf, pos: int, size: int, events: list) -> int:
+        """
+        解析一个完整的块
+
+        Returns:
+            int: 块的总字节数；数据不足时返回0，不修改任何状态
+        """
+        start = pos
+        first = buf[pos]
+        fmt = first >> 6
+        csid = first & 0x3F
+        pos += 1
+        if csid == 0:
+            if pos + 1 > size:
+                return 0
+            csid = 64 + buf[pos]
+            pos += 1
+        elif csid == 1:
+            if pos + 2 > size:
+                return 0
+            csid = 64 + buf[pos] + (buf[pos + 1] << 8)
+            pos += 2
+
+        header_size = _MESSAGE_HEADER_SIZES[fmt]
+        if pos + header_size > size:
+            return 0
+
+        stream = self._streams.get(csid)
+        if stream is None:
+            if fmt != 0:
+                raise RTMPError(f"块流 {csid} 的第一个块不是类型0 (fmt={fmt})")
+            stream = self._streams[csid] = _ChunkStream()
+
+        length = stream.length
+        type_id = stream.type_id
+        stream_id = stream.stream_id
+        if fmt < 3:
+            ts_field = _UINT24_STRUCT.unpack_from(buf, pos - 1)[0] & 0xFFFFFF
+            if fmt < 2:
+                length = _UINT24_STRUCT.unpack_from(buf, pos + 2)[0] & 0xFFFFFF
+                type_id = buf[pos + 6]
+                if fmt == 0:
+                    stream_id = _UINT32_LE_STRUCT.unpack_from(buf, pos + 7)[0]
+            extended = ts_field == EXTENDED_TIMESTAMP
+        else:
+            ts_field = stream.ts_field
+            extended = stream.extended
+        pos += header_size
+
+        if extended:
+            if pos + 4 > size:
+                return 0
+            ext_value = _UINT32_STRUCT.unpack_from(buf, pos)[0]
+            pos += 4
+            if fmt < 3:
+                ts_field = ext_value
+
+        new_message = stream.buffer is None
+        remaining = length - stream.filled if not new_message else length
+        chunk_len = min(self.chunk_size, remaining)
+        if pos + chunk_len > size:
+            return 0
+
+        # 数据完整，提交块头状态
+        if new_message:
+            if fmt == 0:
+                stream.timestamp = ts_field
+            else:
+                stream.timestamp = (stream.timestamp + ts_field) & 0xFFFFFFFF
+            stream.length = length
+            stream.type_id = type_id
+            stream.stream_id = stream_id
+            stream.start_offset = self._consumed + start
+            stream.filled = 0
+            # 不保留负载时音视频消息只需要首部字节，其他消息要完整解析
+            if self.keep_payload or type_id not in (MSG_AUDIO, MSG_VIDEO):
+                stream.buffer = bytearray(length)
+            else:
+                stream.buffer = bytearray(min(length, AV_HEADER_BYTES))
+        stream.ts_field = ts_field
+        stream.extended = extended
+
+        target = stream.buffer
+        filled = stream.filled
+        if filled < len(target):
+            copy = min(chunk_len, len(target) - filled)
+            target[filled:filled + copy] = buf[pos:pos + copy]
+        stream.filled = filled + chunk_len
+        pos += chunk_len
+
+        if stream.filled >= stream.length:
+            message = stream.buffer
+            stream.buffer = None
+            self._on_message(stream, message, events)
+        return pos - start
+
+    def _on_message(self, stream: _ChunkStream, message: bytearray, events: list):
+        """处理一条完整消息"""
+        self.messages_parsed += 1
+        type_id = stream.type_id
+
+        if type_id == MSG_SET_CHUNK_SIZE and len(message) >= 4:
+            chunk_size = _UINT32_STRUCT.unpack_from(message, 0)[0] & 0x7FFFFFFF
+            if chunk_size < 1:
+                raise RTMPError(f"无效的块大小: {chunk_size}")
+            self.chunk_size = chunk_size
+            return
+        if type_id == MSG_ABORT and len(message) >= 4:
+            aborted = self._streams.get(_UINT32_STRUCT.unpack_from(message, 0)[0])
+            if aborted is not None:
+                aborted.buffer = None
+            return
+        if type_id in (MSG_COMMAND_AMF0, MSG_COMMAND_AMF3):
+            self._on_command(stream.timestamp, message, type_id == MSG_COMMAND_AMF3)
+            return
+        if type_id == MSG_AGGREGATE:
+            self._on_aggregate(stream, message, events)
+            return
+
+        if type_id in (MSG_AUDIO, MSG_VIDEO):
+            tag_type = type_id
+        elif type_id in (MSG_DATA_AMF0, MSG_DATA_AMF3):
+            tag_type = TAG_TYPE_SCRIPT
+            message = strip_set_data_frame(message, type_id == MSG_DATA_AMF3)
+        else:
+            return
+
+        data_size = len(message) if self.keep_payload or tag_type == TAG_TYPE_SCRIPT else stream.length
+        codec_id, frame_type, packet_type, cts = decode_av_header(
+            message, tag_type, 0, min(data_size, len(message)))
+        record = (stream.start_offset, tag_type, stream.timestamp, data_size,
+                  codec_id, frame_type, packet_type, cts)
+        # 消息缓冲区是为这条消息单独分配的，直接交给调用方，不再拷贝
+        events.append((record, message if self.keep_payload else None))
+
+    def _on_aggregate(self, stream: _ChunkStream, message: bytearray, events: list):
+        """
+        拆分聚合消息：负载是一串FLV标签（标签头+数据+PreviousTagSize），
+        子标签时间戳按聚合消息的时间戳整体平移
+        """
+        parser = FLVStreamParser(self.keep_payload, has_header=False)
+        try:
+            tags = parser.feed(message)
+        except FLVStreamError as e:
+            logger.warning(f"无效的聚合消息: {e}")
+            return
+        if not tags:
+            return
+        shift = stream.timestamp - tags[0][0][2]
+        for (offset, tag_type, timestamp, *rest), payload in tags:
+            events.append(((stream.start_offset, tag_type, (timestamp + shift) & 0xFFFFFFFF, *rest),
+                           payload))
+
+    def _on_command(self, timestamp: int, message: bytearray, amf3: bool):
+        """记录命令消息名称（connect、publish、play等）"""
+        offset = 1 if amf3 else 0   # AMF3命令消息首字节为0
+        try:
+            name = AMF0Decoder(message, offset).read_value()
+        except AMF0Error:
+            return
+        if isinstance(name, str) and len(self.commands) < MAX_COMMANDS:
+            self.commands.append((timestamp, name))
+
+
+def strip_set_data_frame(message, amf3: bool = False):
+    """
+    去掉数据消息开头的 "@setDataFrame"，与FLV文件中的onMetaData脚本标签一致
+    """
+    offset = 1 if amf3 else 0
+    marker = b'\x02\x00\x0d@setDataFrame'
+    if message[offset:offset + len(marker)] == marker:
+        return message[offset + len(marker):]
+    return message
+
+
+# ---------------------------------------------------------------------------
+# 透明代理
+# ---------------------------------------------------------------------------
+
+# 事件回调: (连接ID, 方向, [StreamTag, ...])
+TagCallback = Callable[[int, str, List[StreamTag]], None]
+
+DIRECTION_UPSTREAM = 'client->server'
+DIRECTION_DOWNSTREAM = 'server->client'
+
+RELAY_READ_SIZE = 256 * 1024
+
+
+class RTMPSniffProxy:
+    """
+    RTMP透明代理
+
+    监听本地端口，把每个连接原样转发到上游服务器，同时用两个解复用器
+    分别解析推流方向和播放方向的数据。所有连接在同一个事件循环中处理，
+    解析失败只停止该方向的解析，不影响转发。
+    """
+
+    def __init__(self, upstream_host: str, upstream_port: int = 1935,
+                 host: str = '127.0.0.1', port: int = 1935,
+                 on_tags: Optional[TagCallback] = None, keep_payload: bool = False):
+        self.upstream_host = upstream_host
+        self.upstream_port = upstream_port
+        self.host = host
+        self.port = port
+        self.on_tags = on_tags
+        self.keep_payload = keep_payload
+        self.connections: Dict[int, Dict[str, object]] = {}   # 连接ID -> 统计信息
+        self._next_id = 1
+        self._server = None
+
+    async def start(self) -> int:
+        """开始监听，返回实际端口"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"RTMP代理已启动: {self.host}:{self.port} -> "
+                    f"{self.upstream_host}:{self.upstream_port}")
+        return self.port
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, client_reader, client_writer):
+        conn_id = self._next_id
+        self._next_id += 1
+        peer = client_writer.get_extra_info('peername')
+        try:
+            server_reader, server_writer = await asyncio.open_connection(
+                self.upstream_host, self.upstream_port)
+        except OSError as e:
+            logger.error(f"连接上游服务器失败: {e}")
+            client_writer.close()
+            return
+
+        stats = {'peer': peer, 'started': time.time(), 'commands': []}
+        self.connections[conn_id] = stats
+        logger.info(f"RTMP连接 #{conn_id} 来自 {peer}")
+        try:
+            await asyncio.gather(
+                self._relay(conn_id, DIRECTION_UPSTREAM, client_reader, server_writer, stats),
+                self._relay(conn_id, DIRECTION_DOWNSTREAM, server_reader, client_writer, stats))
+        finally:
+            client_writer.close()
+            server_writer.close()
+            stats['closed'] = time.time()
+            logger.info(f"RTMP连接 #{conn_id} 已关闭")
+
+    async def _relay(self, conn_id: int, direction: str, reader, writer, stats):
+        """转发一个方向的数据并解析"""
+        demuxer = RTMPChunkDemuxer(keep_payload=self.keep_payload)
+        key_bytes = f'{direction} 字节数'
+        key_tags = f'{direction} 标签数'
+        stats[key_bytes] = 0
+        stats[key_tags] = 0
+        try:
+            while True:
+                data = await reader.read(RELAY_READ_SIZE)
+                if not data:
+                    break
+                writer.write(data)
+                stats[key_bytes] += len(data)
+                if demuxer is not None:
+                    try:
+                        tags = demuxer.feed(data)
+                    except RTMPError as e:
+                        logger.warning(f"连接 #{conn_id} {direction} 停止解析: {e}")
+                        demuxer = None
+                        tags = None
+                    else:
+                        if demuxer.commands:
+                            stats['commands'].extend(demuxer.commands)
+                            demuxer.commands.clear()
+                    if tags:
+                        stats[key_tags] += len(tags)
+                        if self.on_tags is not None:
+                            self.on_tags(conn_id, direction, tags)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            # 一个方向结束时关闭对端写入，另一个方向随之结束
+            if writer.can_write_eof():
+                try:
+                    writer.write_eof()
+                except OSError:
+                    pass
+
+
+# ---------------------------------------------------------------------------
+# 抓包文件读取（pcap / pcapng）
+# ---------------------------------------------------------------------------
+
+class CaptureError(ValueError):
+    """抓包文件格式无效"""
+
+
+PCAP_MAGIC_US = 0xA1B2C3D4
+PCAP_MAGIC_NS = 0xA1B23C4D
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_IDB = 1
+PCAPNG_PB = 2
+PCAPNG_SPB = 3
+PCAPNG_EPB = 6
+PCAPNG_OPT_TSRESOL = 9
+
+# 链路类型
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+MAX_CAPTURE_BLOCK = 256 * 1024 * 1024   # 单个记录/块的长度上限，超过视为文件损坏
+
+# (时间戳秒, 链路类型, 帧数据)
+CapturePacket = Tuple[float, int, bytes]
+
+
+def iter_capture_packets(file_path) -> Iterator[CapturePacket]:
+    """
+    逐个读取 pcap / pcapng 抓包文件中的数据包
+
+    按记录顺序流式读取，内存中只保留当前数据包。支持两种字节序、
+    微秒/纳秒精度的pcap，以及pcapng的多个节和多个接口。
+
+    Raises:
+        CaptureError: 不是支持的抓包格式
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(4)
+        if len(head) < 4:
+            raise CaptureError("文件太短，不是抓包文件")
+        if struct.unpack('<I', head)[0] == PCAPNG_SHB:
+            yield from _iter_pcapng(f, head)
+        else:
+            yield from _iter_pcap(f, head)
+
+
+def _iter_pcap(f, magic_bytes: bytes) -> Iterator[CapturePacket]:
+    for endian in '<>':
+        magic = struct.unpack(endian + 'I', magic_bytes)[0]
+        if magic in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+            break
+    else:
+        raise CaptureError(f"未知的抓包文件标识: {magic_bytes.hex()}")
+    scale = 1e-9 if magic == PCAP_MAGIC_NS else 1e-6
+
+    header = f.read(20)
+    if len(header) < 20:
+        raise CaptureError("pcap文件头不完整")
+    linktype = struct.unpack(endian + 'I', header[16:20])[0] & 0x0FFFFFFF
+
+    record = struct.Struct(endian + 'IIII')
+    while True:
+        head = f.read(16)
+        if len(head) < 16:
+            return
+        ts_sec, ts_frac, incl_len, _ = record.unpack(head)
+        if incl_len > MAX_CAPTURE_BLOCK:
+            raise CaptureError(f"数据包长度无效: {incl_len}")
+        data = f.read(incl_len)
+        if len(data) < incl_len:
+            logger.warning("抓包文件末尾的数据包被截断")
+            return
+        yield ts_sec + ts_frac * scale, linktype, data
+
+
+def _iter_pcapng(f, first: bytes) -> Iterator[CapturePacket]:
+    endian = '<'
+    interfaces: List[Tuple[int, float]] = []   # (链路类型, 时间戳单位)
+    block_type = PCAPNG_SHB
+    head = first + f.read(4)
+    while True:
+        if len(head) < 8:
+            return
+        if block_type == PCAPNG_SHB:
+            # 节头决定后续所有块的字节序
+            magic = f.read(4)
+            if len(magic) < 4:
+                return
+            endian = '<' if struct.unpack('<I', magic)[0] == PCAPNG_BYTE_ORDER_MAGIC else '>'
+            if struct.unpack(endian + 'I', magic)[0] != PCAPNG_BYTE_ORDER_MAGIC:
+                raise CaptureError("pcapng节头的字节序标识无效")
+            total = struct.unpack(endian + 'I', head[4:8])[0]
+            if not 28 <= total <= MAX_CAPTURE_BLOCK:
+                raise CaptureError(f"块长度无效: {total}")
+            f.read(total - 12)
+            interfaces = []
+        else:
+            total = struct.unpack(endian + 'I', head[4:8])[0]
+            if not 12 <= total <= MAX_CAPTURE_BLOCK:
+                raise CaptureError(f"块长度无效: {total}")
+            body = f.read(total - 8)
+            if len(body) < total - 8:
+                logger.warning("抓包文件末尾的块被截断")
+                return
+            packet = _parse_pcapng_block(block_type, body, endian, interfaces)
+            if packet is not None:
+                yield packet
+
+        # 新的节可能使用不同的字节序，节头的块类型本身与字节序无关
+        head = f.read(8)
+        if len(head) < 8:
+            return
+        block_type = struct.unpack(endian + 'I', head[:4])[0]
+
+
+def _parse_pcapng_block(block_type: int, body: bytes, endian: str,
+                        interfaces: List[Tuple[int, float]]) -> Optional[CapturePacket]:
+    """解析pcapng中的接口描述块和数据包块，其他块忽略"""
+    if block_type == PCAPNG_IDB:
+        linktype = struct.unpack_from(endian + 'H', body, 0)[0]
+        interfaces.append((linktype, _pcapng_tsresol(body, 8, endian)))
+        return None
+
+    if block_type == PCAPNG_EPB:
+        iface, ts_high, ts_low, caplen = struct.unpack_from(endian + 'IIII', body, 0)
+        data_pos = 20
+    elif block_type == PCAPNG_PB:
+        iface, _, ts_high, ts_low, caplen = struct.unpack_from(endian + 'HHIII', body, 0)
+        data_pos = 20
+    elif block_type == PCAPNG_SPB:
+        iface, ts_high, ts_low = 0, 0, 0
+        caplen = min(struct.unpack_from(endian + 'I', body, 0)[0], len(body) - 8)
+        data_pos = 4
+    else:
+        return None
+
+    if iface >= len(interfaces):
+        raise CaptureError(f"数据包引用了未定义的接口: {iface}")
+    linktype, unit = interfaces[iface]
+    timestamp = ((ts_high << 32) | ts_low) * unit
+    return timestamp, linktype, body[data_pos:data_pos + caplen]
+
+
+def _pcapng_tsresol(body: bytes, pos: int, endian: str) -> float:
+    """读取接口描述块的 if_tsresol 选项，默认微秒"""
+    end = len(body) - 4   # 末尾是重复的块长度
+    while pos + 4 <= end:
+        code, length = struct.unpack_from(endian + 'HH', body, pos)
+        if code == 0:
+            break
+        if code == PCAPNG_OPT_TSRESOL and length >= 1:
+            value = body[pos + 4]
+            return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+        pos += 4 + (length + 3) // 4 * 4
+    return 1e-6
+
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_ACK = 0x10
+
+_ETHERTYPE_IPV4 = 0x0800
+_ETHERTYPE_IPV6 = 0x86DD
+_ETHERTYPE_VLAN = (0x8100, 0x88A8, 0x9100)
+_IPV6_EXTENSION_HEADERS = (0, 43, 60)   # 逐跳选项、路由、目的选项
+_IP_PROTO_TCP = 6
+_BSD_AF_INET6 = (10, 24, 28, 30)        # Linux / NetBSD / FreeBSD / macOS
+
+# (源地址, 源端口, 目的地址, 目的端口, 序号, 标志, 负载)
+TCPSegment = Tuple[str, int, str, int, int, int, bytes]
+
+
+def decode_tcp_segment(linktype: int, frame: bytes) -> Optional[TCPSegment]:
+    """
+    从链路层帧中取出TCP段
+
+    支持以太网（含VLAN标签）、Linux cooked (SLL/SLL2)、BSD loopback和
+    原始IP。非TCP数据包和IP分片返回None。
+    """
+    if linktype == LINKTYPE_ETHERNET:
+        pos = 12
+        ethertype = int.from_bytes(frame[pos:pos + 2], 'big')
+        while ethertype in _ETHERTYPE_VLAN:
+            pos += 4
+            ethertype = int.from_bytes(frame[pos:pos + 2], 'big')
+        pos += 2
+    elif linktype == LINKTYPE_LINUX_SLL:
+        ethertype = int.from_bytes(frame[14:16], 'big')
+        pos = 16
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        ethertype = int.from_bytes(frame[0:2], 'big')
+        pos = 20
+    elif linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        if len(frame) < 4:
+            return None
+        # NULL 的协议族是抓包主机的字节序，LOOP 是网络字节序
+        family = int.from_bytes(frame[:4], 'big')
+        if linktype == LINKTYPE_NULL and family > 0xFFFF:
+            family = int.from_bytes(frame[:4], 'little')
+        if family == socket.AF_INET:
+            ethertype = _ETHERTYPE_IPV4
+        elif family in _BSD_AF_INET6:
+            ethertype = _ETHERTYPE_IPV6
+        else:
+            return None
+        pos = 4
+    elif linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        if not frame:
+            return None
+        ethertype = _ETHERTYPE_IPV4 if frame[0] >> 4 == 4 else _ETHERTYPE_IPV6
+        pos = 0
+    else:
+        return None
+
+    if ethertype == _ETHERTYPE_IPV4:
+        if len(frame) < pos + 20 or frame[pos] >> 4 != 4 or frame[pos + 9] != _IP_PROTO_TCP:
+            return None
+        if int.from_bytes(frame[pos + 6:pos + 8], 'big') & 0x3FFF:
+            return None   # 分片（MF置位或偏移不为0）
+        ip_end = pos + int.from_bytes(frame[pos + 2:pos + 4], 'big')
+        src = socket.inet_ntop(socket.AF_INET, frame[pos + 12:pos + 16])
+        dst = socket.inet_ntop(socket.AF_INET, frame[pos + 16:pos + 20])
+        pos += (frame[pos] & 0x0F) * 4
+    elif ethertype == _ETHERTYPE_IPV6:
+        if len(frame) < pos + 40 or frame[pos] >> 4 != 6:
+            return None
+        ip_end = pos + 40 + int.from_bytes(frame[pos + 4:pos + 6], 'big')
+        next_header = frame[pos + 6]
+        src = socket.inet_ntop(socket.AF_INET6, frame[pos + 8:pos + 24])
+        dst = socket.inet_ntop(socket.AF_INET6, frame[pos + 24:pos + 40])
+        pos += 40
+        while next_header in _IPV6_EXTENSION_HEADERS and pos + 2 <= len(frame):
+            next_header = frame[pos]
+            pos += (frame[pos + 1] + 1) * 8
+        if next_header != _IP_PROTO_TCP:
+            return None
+    else:
+        return None
+
+    # 以太网最小帧会在末尾补零，按IP长度截取
+    ip_end = min(ip_end, len(frame))
+    if pos + 20 > ip_end:
+        return None
+    sport, dport, seq = struct.unpack_from('>HHI', frame, pos)
+    data_offset = (frame[pos + 12] >> 4) * 4
+    flags = frame[pos + 13]
+    return src, sport, dst, dport, seq, flags, frame[pos + data_offset:ip_end]
+
+
+# ---------------------------------------------------------------------------
+# TCP重组
+# ---------------------------------------------------------------------------
+
+DEFAULT_MAX_PENDING = 8 * 1024 * 1024   # 每个方向缓存的乱序数据上限
+_SEQ_MASK = 0xFFFFFFFF
+
+
+class TCPReassembler:
+    """
+    单方向TCP字节流重组
+
+    序号按与期望序号的有符号差值换算为流内绝对位置，超过4GB回绕的长
+    连接也能正确排序。重传和重叠部分被丢弃，提前到达的段按位置缓存在
+    堆中；缓存超过 max_pending 时认为中间的数据没有被抓到，跳过缺口继续。
+    """
+
+    def __init__(self, max_pending: int = DEFAULT_MAX_PENDING):
+        self.max_pending = max_pending
+        self.position = 0              # 已交付的字节数（流内绝对位置）
+        self.retransmitted_bytes = 0
+        self.out_of_order_segments = 0
+        self.gaps = 0
+        self.gap_bytes = 0
+        self._next_seq: Optional[int] = None
+        self._pending: List[Tuple[int, bytes]] = []   # (绝对位置, 数据) 最小堆
+        self._pending_bytes = 0
+
+    @property
+    def pending_bytes(self) -> int:
+        return self._pending_bytes
+
+    def syn(self, seq: int):
+        """收到SYN，数据从 seq+1 开始"""
+        if self._next_seq is None:
+            self._next_seq = (seq + 1) & _SEQ_MASK
+
+    def add(self, seq: int, payload) -> List[Optional[bytes]]:
+        """
+        输入一个TCP段的负载
+
+        Returns:
+            list: 按顺序可交付的数据块；None 表示此处有无法补齐的缺口
+        """
+        if not payload:
+            return []
+        if self._next_seq is None:
+            # 没有抓到握手，从第一个看到的段开始
+            self._next_seq = seq
+        delta = ((seq - self._next_seq + 0x80000000) & _SEQ_MASK) - 0x80000000
+        start = self.position + delta
+
+        out: List[Optional[bytes]] = []
+        if start > self.position:
+            self.out_of_order_segments += 1
+            heapq.heappush(self._pending, (start, bytes(payload)))
+            self._pending_bytes += len(payload)
+            if self._pending_bytes > self.max_pending:
+                self._skip_gap(out)
+            return out
+
+        self._deliver(start, payload, out)
+        self._drain(out)
+        return out
+
+    def flush(self) -> List[Optional[bytes]]:
+        """连接结束，跳过所有缺口交付剩余的缓存数据"""
+        out: List[Optional[bytes]] = []
+        while self._pending:
+            self._skip_gap(out)
+        return out
+
+    def _deliver(self, start: int, data, out: list):
+        end = start + len(data)
+        if end <= self.position:
+            self.retransmitted_bytes += len(data)
+            return
+        if start < self.position:
+            self.retransmitted_bytes += self.position - start
+            data = data[self.position - start:]
+        out.append(bytes(data))
+        self.position = end
+        self._next_seq = (self._next_seq + len(data)) & _SEQ_MASK
+
+    def _drain(self, out: list):
+        pending = self._pending
+        while pending and pending[0][0] <= self.position:
+            start, data = heapq.heappop(pending)
+            self._pending_bytes -= len(data)
+            self._deliver(start, data, out)
+
+    def _skip_gap(self, out: list):
+        start = self._pending[0][0]
+        if start > self.position:
+            missing = start - self.position
+            self.gaps += 1
+            self.gap_bytes += missing
+            self._next_seq = (self._next_seq + missing) & _SEQ_MASK
+            self.position = start
+            out.append(None)
+        self._drain(out)
+
+
+# ---------------------------------------------------------------------------
+# 抓包会话还原
+# ---------------------------------------------------------------------------
+
+class _FLVSpool:
+    """把一个方向还原出的标签边解析边写成FLV文件"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.flags = 0
+        self.tags = 0
+        self._file = open(path, 'wb')
+        self._file.write(b'FLV\x01\x00\x00\x00\x00\x09\x00\x00\x00\x00')
+
+    def write(self, tags: List[StreamTag]):
+        out = bytearray()
+        pack_header = _TAG_HEADER_STRUCT.pack
+        pack_size = _UINT32_STRUCT.pack
+        for (_, tag_type, timestamp, _, *_), payload in tags:
+            size = len(payload)
+            out += pack_header((tag_type << 24) | size,
+                               ((timestamp & 0xFFFFFF) << 8) | ((timestamp >> 24) & 0xFF))
+            out += b'\x00\x00\x00'
+            out += payload
+            out += pack_size(size + TAG_HEADER_SIZE)
+            if tag_type == TAG_TYPE_AUDIO:
+                self.flags |= 0x04
+            elif tag_type == TAG_TYPE_VIDEO:
+                self.flags |= 0x01
+        self._file.write(out)
+        self.tags += len(tags)
+
+    def close(self):
+        # 写完后按实际出现的标签类型补上文件头的音视频标志
+        self._file.seek(4)
+        self._file.write(bytes((self.flags,)))
+        self._file.close()
+
+
+class RTMPCaptureSession:
+    """
+    抓包中的一个RTMP会话（一条TCP连接）
+
+    两个方向分别经过TCP重组和块流解复用，含音视频的方向写成FLV文件。
+    重组出现缺口后块流状态已经不可信，该方向停止解析。
+    """
+
+    def __init__(self, session_id: int, client: Tuple[str, int], server: Tuple[str, int],
+                 started: float, output_prefix: Optional[Path], max_pending: int):
+        self.session_id = session_id
+        self.client = client
+        self.server = server
+        self.started = started
+        self.last_seen = started
+        self.closed = False
+        self.is_rtmp = False                      # 至少一个方向解析出了RTMP消息
+        self.commands: List[Tuple[int, str]] = []
+        self.issues: List[Dict[str, str]] = []
+        self.output_paths: Dict[str, Path] = {}   # 方向 -> 还原出的FLV文件
+        self._output_prefix = output_prefix
+        self._reassemblers = {DIRECTION_UPSTREAM: TCPReassembler(max_pending),
+                              DIRECTION_DOWNSTREAM: TCPReassembler(max_pending)}
+        self._demuxers = {DIRECTION_UPSTREAM: RTMPChunkDemuxer(keep_payload=True),
+                          DIRECTION_DOWNSTREAM: RTMPChunkDemuxer(keep_payload=True)}
+        self._spools: Dict[str, _FLVSpool] = {}
+        self._fin = set()
+
+    @property
+    def is_dead(self) -> bool:
+        """两个方向都已停止解析（不是RTMP或解析失败）"""
+        return all(demuxer is None for demuxer in self._demuxers.values())
+
+    def reassembler(self, direction: str) -> TCPReassembler:
+        return self._reassemblers[direction]
+
+    def add_segment(self, direction: str, timestamp: float, seq: int, flags: int, payload):
+        self.last_seen = timestamp
+        reassembler = self._reassemblers[direction]
+        if flags & TCP_SYN:
+            reassembler.syn(seq)
+        if payload and self._demuxers[direction] is not None:
+            self._feed(direction, reassembler.add(seq, payload))
+        if flags & TCP_FIN:
+            self._fin.add(direction)
+        if flags & TCP_RST or len(self._fin) == 2:
+            self.close()
+
+    def _feed(self, direction: str, chunks: List[Optional[bytes]]):
+        for data in chunks:
+            demuxer = self._demuxers[direction]
+            if demuxer is None:
+                return
+            if data is None:
+                self._stop(direction, LEVEL_ERROR,
+                           f"{direction} 在字节 {demuxer.bytes_consumed} 附近有数据没有抓到，之后停止解析")
+                return
+            try:
+                tags = demuxer.feed(data)
+            except (RTMPError, FLVStreamError) as e:
+                level = LEVEL_ERROR if demuxer.messages_parsed else None
+                self._stop(direction, level, f"{direction} 解析失败: {e}")
+                return
+            if demuxer.messages_parsed:
+                self.is_rtmp = True
+            if demuxer.commands:
+                self.commands.extend(demuxer.commands)
+                demuxer.commands.clear()
+            tags = [tag for tag in tags if tag[0][1] in (TAG_TYPE_AUDIO, TAG_TYPE_VIDEO, TAG_TYPE_SCRIPT)]
+            if tags and self._output_prefix is not None:
+                spool = self._spools.get(direction)
+                if spool is None:
+                    suffix = 'c2s' if direction == DIRECTION_UPSTREAM else 's2c'
+                    path = Path(f"{self._output_prefix}_s{self.session_id}_{suffix}.flv")
+                    spool = self._spools[direction] = _FLVSpool(path)
+                    self.output_paths[direction] = path
+                spool.write(tags)
+
+    def _stop(self, direction: str, level: Optional[str], message: str):
+        """停止一个方向的解析；level为None表示不是RTMP数据，不记为问题"""
+        self._demuxers[direction] = None
+        if level is not None:
+            self.issues.append({'级别': level, '检查项': 'RTMP会话还原', '描述': message})
+        else:
+            logger.debug(f"会话 #{self.session_id} {message}")
+
+    def close(self):
+        """连接结束：交付剩余缓存的数据并关闭输出文件"""
+        if self.closed:
+            return
+        self.closed = True
+        for direction, reassembler in self._reassemblers.items():
+            if self._demuxers[direction] is not None and reassembler.pending_bytes:
+                self._feed(direction, reassembler.flush())
+            if reassembler.retransmitted_bytes:
+                self.issues.append({'级别': LEVEL_WARNING, '检查项': 'TCP重组',
+                                    '描述': f"{direction} 重传 {reassembler.retransmitted_bytes} 字节"})
+            if reassembler.gaps:
+                self.issues.append({'级别': LEVEL_ERROR, '检查项': 'TCP重组',
+                                    '描述': f"{direction} 缺失 {reassembler.gaps} 段，"
+                                            f"共 {reassembler.gap_bytes} 字节"})
+        for spool in self._spools.values():
+            spool.close()
+        self._spools.clear()
+        # 释放解析状态，只保留结果
+        self._demuxers = dict.fromkeys(self._demuxers)
+
+    def summary(self) -> Dict[str, Any]:
+        """会话概要"""
+        upstream = self._reassemblers[DIRECTION_UPSTREAM]
+        downstream = self._reassemblers[DIRECTION_DOWNSTREAM]
+        return {
+            '会话': self.session_id,
+            '客户端': f"{self.client[0]}:{self.client[1]}",
+            '服务器': f"{self.server[0]}:{self.server[1]}",
+            '开始时间': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+            '会话时长_秒': round(self.last_seen - self.started, 3),
+            '上行字节数': upstream.position,
+            '下行字节数': downstream.position,
+            '乱序段数': upstream.out_of_order_segments + downstream.out_of_order_segments,
+            '命令': [name for _, name in self.commands],
+        }
+
+
+def extract_rtmp_sessions(capture_path, output_dir=None, ports: Optional[List[int]] = None,
+                          max_pending: int = DEFAULT_MAX_PENDING,
+                          progress: Optional[Callable[[int], None]] = None) -> List[RTMPCaptureSession]:
+    """
+    从抓包文件中还原所有RTMP会话
+
+    按顺序流式读取数据包，每条TCP连接的两个方向分别重组和解复用，
+    音视频直接写入 output_dir 下的FLV文件，内存中只保留每个方向有限的
+    乱序缓存和正在重组的消息。
+
+    Args:
+        capture_path: pcap / pcapng 文件
+        output_dir: 还原出的FLV文件目录，None表示不输出文件
+        ports: 只处理这些端口的连接，None表示按握手自动识别
+        max_pending: 每个方向缓存的乱序数据上限
+        progress: 进度回调，参数为已处理的数据包数
+
+    Returns:
+        list: 识别为RTMP的会话（按出现顺序，均已结束）
+    """
+    prefix = None
+    if output_dir is not None:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        prefix = Path(output_dir) / Path(capture_path).stem
+    port_filter = set(ports) if ports else None
+
+    # (客户端, 服务器) -> 会话；已确定不是RTMP的连接只记下键
+    active: Dict[tuple, RTMPCaptureSession] = {}
+    ignored = set()
+    sessions: List[RTMPCaptureSession] = []
+    next_id = 1
+    packets = 0
+
+    for timestamp, linktype, frame in iter_capture_packets(capture_path):
+        packets += 1
+        if progress is not None and packets % 10000 == 0:
+            progress(packets)
+        segment = decode_tcp_segment(linktype, frame)
+        if segment is None:
+            continue
+        src, sport, dst, dport, seq, flags, payload = segment
+        if port_filter is not None and sport not in port_filter and dport not in port_filter:
+            continue
+
+        key = ((src, sport), (dst, dport))
+        session = active.get(key)
+        direction = DIRECTION_UPSTREAM
+        if session is None:
+            session = active.get(key[::-1])
+            direction = DIRECTION_DOWNSTREAM
+        if session is None:
+            if key in ignored or key[::-1] in ignored:
+                continue
+            # 先发SYN或先发数据的一方是客户端
+            if not (flags & TCP_SYN and not flags & TCP_ACK) and not payload:
+                continue
+            session = RTMPCaptureSession(next_id, key[0], key[1], timestamp, prefix, max_pending)
+            active[key] = session
+            direction = DIRECTION_UPSTREAM
+            next_id += 1
+
+        session.add_segment(direction, timestamp, seq, flags, payload)
+        if session.closed or session.is_dead:
+            # 两个方向都无法解析的连接之后的数据包直接忽略；正常结束的连接
+            # 允许相同的地址端口再次建立新会话
+            conn_key = (session.client, session.server)
+            if not session.closed:
+                ignored.add(conn_key)
+                session.close()
+            del active[conn_key]
+            if session.is_rtmp:
+                sessions.append(session)
+
+    for session in active.values():
+        session.close()
+        if session.is_rtmp:
+            sessions.append(session)
+    sessions.sort(key=lambda s: s.session_id)
+    logger.info(f"抓包 {capture_path}: {packets} 个数据包，{len(sessions)} 个RTMP会话")
+    return sessions
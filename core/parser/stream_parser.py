@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+FLV 增量解析器
+推送式解析任意分块到达的FLV数据（网络流、增长中的文件），
+分块之间保留解析状态，只缓存尚未解析完的不完整标签
+"""
+
+import time
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from core import get_logger
+from .flv_header import FLVHeader, FLV_HEADER_SIZE, PREV_TAG_SIZE_LENGTH
+from .tag_parser import (TagRecord, TAG_HEADER_SIZE, TAG_TYPE_NAMES, EX_VIDEO_HEADER_SIZE,
+                         decode_av_header, _TAG_HEADER_STRUCT, _UINT32_STRUCT)
+
+logger = get_logger(__name__)
+
+# decode_av_header 需要的负载首部字节数：Enhanced FLV的avc1/hvc1编码帧
+# 为扩展头(1字节包类型 + 4字节FourCC)之后再加3字节CTS，传统AVC/HEVC标签只需前5字节
+AV_HEADER_BYTES = EX_VIDEO_HEADER_SIZE + 3
+
+DEFAULT_READ_SIZE = 1024 * 1024
+
+# (标签记录, 负载数据)；不保留负载时负载为None
+StreamTag = Tuple[TagRecord, Optional[bytes]]
+
+
+class FLVStreamError(ValueError):
+    """流数据无法继续解析"""
+
+
+class FLVStreamParser:
+    """
+    推送式FLV解析器
+
+    每次 feed() 返回本次新解析出的完整标签。输入追加到同一个 bytearray，
+    解析完成后一次性删除已消费的前缀，不做重复拼接。记录中的偏移是
+    从流起点开始计算的绝对偏移，与文件扫描器的结果一致。
+    """
+
+    def __init__(self, keep_payload: bool = True, has_header: bool = True):
+        """
+        Args:
+            keep_payload: 是否拷贝标签负载；为False时负载数据直接跳过，
+                不会等待整个标签到达，也不校验PreviousTagSize
+            has_header: 数据是否以FLV文件头开始；为False时直接从标签开始
+                （如从RTMP消息还原的标签流）
+        """
+        self.keep_payload = keep_payload
+        self.header: Optional[FLVHeader] = None
+        self.tags_parsed = 0
+        self.prev_tag_size_errors = 0
+        self._buffer = bytearray()
+        self._consumed = 0                   # 已从缓冲区删除的字节数
+        self._skip = 0                       # 待跳过的字节数
+        self._need_header = has_header
+
+    @property
+    def bytes_consumed(self) -> int:
+        """已解析（或跳过）的字节数"""
+        return self._consumed
+
+    @property
+    def pending_bytes(self) -> int:
+        """缓冲区中尚未组成完整标签的字节数"""
+        return len(self._buffer)
+
+    def feed(self, data) -> List[StreamTag]:
+        """
+        输入一块数据
+
+        Args:
+            data: bytes、bytearray或memoryview，长度任意
+
+        Returns:
+            list: 本次解析出的 (标签记录, 负载) 列表
+
+        Raises:
+            FLVHeaderError: 文件头无效
+            FLVStreamError: 遇到无效的标签类型（数据已失去同步）
+        """
+        buf = self._buffer
+        buf += data
+        size = len(buf)
+        pos = 0
+        events = []
+        keep_payload = self.keep_payload
+        unpack_header = _TAG_HEADER_STRUCT.unpack_from
+        unpack_uint32 = _UINT32_STRUCT.unpack_from
+
+        try:
+            while True:
+                if self._skip:
+                    step = min(self._skip, size - pos)
+                    pos += step
+                    self._skip -= step
+                    if self._skip:
+                        break
+
+                if self._need_header:
+                    if size - pos < FLV_HEADER_SIZE:
+                        break
+                    self.header = FLVHeader.parse(buf, pos)
+                    self._need_header = False
+                    pos += FLV_HEADER_SIZE
+                    # 跳过扩展头部和PreviousTagSize0
+                    self._skip = self.header.data_offset - FLV_HEADER_SIZE + PREV_TAG_SIZE_LENGTH
+                    continue
+
+                if size - pos < TAG_HEADER_SIZE:
+                    break
+                type_size, ts_field = unpack_header(buf, pos)
+                tag_type = (type_size >> 24) & 0x1F
+                data_size = type_size & 0x00FFFFFF
+                if tag_type not in TAG_TYPE_NAMES:
+                    raise FLVStreamError(f"偏移 {self._consumed + pos} 处的标签类型无效: {tag_type}")
+
+                data_pos = pos + TAG_HEADER_SIZE
+                if keep_payload:
+                    end = data_pos + data_size
+                    if end + PREV_TAG_SIZE_LENGTH > size:
+                        break
+                elif data_pos + min(data_size, AV_HEADER_BYTES) > size:
+                    break
+
+                timestamp = (ts_field >> 8) | ((ts_field & 0xFF) << 24)
+                codec_id, frame_type, packet_type, cts = decode_av_header(
+                    buf, tag_type, data_pos, data_size)
+                record = (self._consumed + pos, tag_type, timestamp, data_size,
+                          codec_id, frame_type, packet_type, cts)
+
+                if keep_payload:
+                    events.append((record, bytes(buf[data_pos:end])))
+                    if unpack_uint32(buf, end)[0] != data_size + TAG_HEADER_SIZE:
+                        self.prev_tag_size_errors += 1
+                    pos = end + PREV_TAG_SIZE_LENGTH
+                else:
+                    events.append((record, None))
+                    pos = data_pos
+                    self._skip = data_size + PREV_TAG_SIZE_LENGTH
+        finally:
+            # 只删除一次已消费的前缀（bytearray删除前缀不移动剩余数据）
+            del buf[:pos]
+            self._consumed += pos
+            self.tags_parsed += len(events)
+
+        return events
+
+    def finish(self) -> bool:
+        """
+        输入结束
+
+        Returns:
+            bool: 有未解析完的不完整数据（流被截断）时返回True
+        """
+        truncated = bool(self._buffer) or self._skip > 0 or self._need_header
+        if truncated:
+            logger.warning(f"流在偏移 {self._consumed} 处截断，剩余 {len(self._buffer)} 字节未解析")
+        return truncated
+
+    def reset(self, has_header: bool = True):
+        """清空状态，重新开始解析新的流"""
+        self.__init__(self.keep_payload, has_header)
+
+
+def follow_file(file_path, parser: Optional[FLVStreamParser] = None,
+                read_size: int = DEFAULT_READ_SIZE, poll_interval: float = 0.5,
+                stopped: Optional[Callable[[], bool]] = None) -> Iterator[StreamTag]:
+    """
+    跟踪增长中的FLV文件（如正在录制的文件），逐个返回新写入的标签
+
+    读到文件末尾后按 poll_interval 轮询，直到 stopped() 返回True。
+
+    Args:
+        file_path: 文件路径
+        parser: 使用的解析器，默认新建（保留负载）
+        read_size: 每次读取的字节数
+        poll_interval: 没有新数据时的等待间隔（秒）
+        stopped: 返回True时停止跟踪；为None时读到文件末尾即停止
+    """
+    parser = parser or FLVStreamParser()
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(read_size)
+            if chunk:
+                yield from parser.feed(chunk)
+                continue
+            if stopped is None or stopped():
+                return
+            time.sleep(poll_interval)
@@ -0,0 +1,456 @@
+# -*- coding: utf-8 -*-
+"""
+FLV 标签解析器
+基于mmap的零拷贝标签扫描，以及AMF0脚本数据解码
+"""
+
+import mmap
+import struct
+from pathlib import Path
+from typing import Any, Iterator, Optional, Tuple
+
+from core import get_logger
+from .flv_header import FLVHeader, FLVHeaderError, PREV_TAG_SIZE_LENGTH
+
+logger = get_logger(__name__)
+
+# 标签类型
+TAG_TYPE_AUDIO = 8
+TAG_TYPE_VIDEO = 9
+TAG_TYPE_SCRIPT = 18
+
+TAG_TYPE_NAMES = {
+    TAG_TYPE_AUDIO: 'AudioTag',
+    TAG_TYPE_VIDEO: 'VideoTag',
+    TAG_TYPE_SCRIPT: 'ScriptTag',
+}
+
+TAG_HEADER_SIZE = 11
+
+# 视频编码ID
+VIDEO_CODEC_AVC = 7
+VIDEO_CODEC_HEVC = 12
+
+# Enhanced FLV（ExVideoTagHeader）：首字节最高位为1，低4位是扩展包类型，
+# 其后4字节FourCC标识编码。索引中的编码ID置最高位，与4位的传统编码ID区分
+VIDEO_EX_HEADER_FLAG = 0x80
+VIDEO_CODEC_ENHANCED = 0x80
+VIDEO_CODEC_EX_AVC = VIDEO_CODEC_ENHANCED | VIDEO_CODEC_AVC
+VIDEO_CODEC_EX_HEVC = VIDEO_CODEC_ENHANCED | VIDEO_CODEC_HEVC
+VIDEO_CODEC_EX_AV1 = VIDEO_CODEC_ENHANCED | 13
+VIDEO_CODEC_EX_VP9 = VIDEO_CODEC_ENHANCED | 14
+
+# FourCC（大端整数） -> 编码ID，未知FourCC记为 VIDEO_CODEC_ENHANCED
+VIDEO_FOURCC_CODECS = {
+    int.from_bytes(b'avc1', 'big'): VIDEO_CODEC_EX_AVC,
+    int.from_bytes(b'hvc1', 'big'): VIDEO_CODEC_EX_HEVC,
+    int.from_bytes(b'av01', 'big'): VIDEO_CODEC_EX_AV1,
+    int.from_bytes(b'vp09', 'big'): VIDEO_CODEC_EX_VP9,
+}
+
+VIDEO_CODEC_NAMES = {
+    2: 'Sorenson H.263',
+    3: 'Screen Video',
+    4: 'VP6',
+    5: 'VP6 Alpha',
+    6: 'Screen Video 2',
+    VIDEO_CODEC_AVC: 'H.264',
+    VIDEO_CODEC_HEVC: 'H.265',
+    VIDEO_CODEC_ENHANCED: 'Enhanced FLV (未知FourCC)',
+    VIDEO_CODEC_EX_AVC: 'H.264',
+    VIDEO_CODEC_EX_HEVC: 'H.265',
+    VIDEO_CODEC_EX_AV1: 'AV1',
+    VIDEO_CODEC_EX_VP9: 'VP9',
+}
+
+# Enhanced FLV扩展包类型。0~2与AVC包类型（序列头/编码帧/序列结束）含义相同，
+# 直接存入索引的包类型列
+EX_PACKET_SEQUENCE_START = 0
+EX_PACKET_CODED_FRAMES = 1
+EX_PACKET_SEQUENCE_END = 2
+EX_PACKET_CODED_FRAMES_X = 3        # CTS为0，省略CTS字段
+EX_PACKET_METADATA = 4
+EX_PACKET_MPEG2TS_SEQUENCE_START = 5
+EX_PACKET_MULTITRACK = 6
+EX_PACKET_MODEX = 7
+
+# 编码帧包中带3字节CTS的FourCC编码
+EX_CTS_CODECS = frozenset((VIDEO_CODEC_EX_AVC, VIDEO_CODEC_EX_HEVC))
+
+# 首字节(1) + FourCC(4)
+EX_VIDEO_HEADER_SIZE = 5
+
+# 视频帧类型
+FRAME_TYPE_KEY = 1
+FRAME_TYPE_INTER = 2
+FRAME_TYPE_DISPOSABLE = 3
+
+# 音频编码格式
+SOUND_FORMAT_AAC = 10
+
+SOUND_FORMAT_NAMES = {
+    0: 'PCM',
+    1: 'ADPCM',
+    2: 'MP3',
+    3: 'PCM LE',
+    4: 'Nellymoser 16kHz',
+    5: 'Nellymoser 8kHz',
+    6: 'Nellymoser',
+    7: 'G.711 A-law',
+    8: 'G.711 mu-law',
+    SOUND_FORMAT_AAC: 'AAC',
+    11: 'Speex',
+    14: 'MP3 8kHz',
+}
+
+# 无AVC/AAC包类型时的占位值
+PACKET_TYPE_NONE = 0xFF
+
+AUDIO_SAMPLE_RATES = (5500, 11025, 22050, 44100)
+
+# 类型+数据大小(4) + 时间戳+扩展时间戳(4)，StreamID忽略
+_TAG_HEADER_STRUCT = struct.Struct('>II')
+_UINT32_STRUCT = struct.Struct('>I')
+_CTS_STRUCT = struct.Struct('>i')
+
+# (偏移, 标签类型, 时间戳, 数据大小, 编码ID, 帧类型, 包类型, CTS)
+TagRecord = Tuple[int, int, int, int, int, int, int, int]
+
+
+def audio_sample_rate(audio_flags: int) -> int:
+    """根据音频标签参数位获取采样率"""
+    return AUDIO_SAMPLE_RATES[(audio_flags >> 2) & 0x03]
+
+
+def audio_channels(audio_flags: int) -> int:
+    """根据音频标签参数位获取声道数"""
+    return 2 if audio_flags & 0x01 else 1
+
+
+def audio_sample_bits(audio_flags: int) -> int:
+    """根据音频标签参数位获取样本位深"""
+    return 16 if audio_flags & 0x02 else 8
+
+
+def video_header_size(codec_id: int, packet_type: int) -> int:
+    """视频标签负载中编码数据（序列头记录或帧数据）之前的头部长度"""
+    if codec_id & VIDEO_CODEC_ENHANCED:
+        if packet_type == EX_PACKET_CODED_FRAMES and codec_id in EX_CTS_CODECS:
+            return EX_VIDEO_HEADER_SIZE + 3
+        return EX_VIDEO_HEADER_SIZE
+    if codec_id in (VIDEO_CODEC_AVC, VIDEO_CODEC_HEVC):
+        # 帧类型/编码ID(1) + 包类型(1) + CTS(3)
+        return 5
+    return 1
+
+
+def decode_av_header(buffer, tag_type: int, data_pos: int, data_size: int) -> Tuple[int, int, int, int]:
+    """
+    解析音视频标签负载的首部字节
+
+    Args:
+        buffer: 标签数据所在缓冲区
+        tag_type: 标签类型
+        data_pos: 负载起始偏移
+        data_size: 负载长度
+
+    Returns:
+        tuple: (编码ID, 帧类型, 包类型, CTS)。音频标签的"帧类型"
+            存放首字节低4位（采样率、位宽、声道参数）；Enhanced FLV视频标签的
+            编码ID由FourCC映射，包类型为扩展包类型
+    """
+    if data_size < 1 or tag_type == TAG_TYPE_SCRIPT:
+        return 0, 0, PACKET_TYPE_NONE, 0
+
+    flags = buffer[data_pos]
+    if tag_type == TAG_TYPE_VIDEO:
+        frame_type = (flags >> 4) & 0x07
+        if flags & VIDEO_EX_HEADER_FLAG:
+            packet_type = flags & 0x0F
+            if data_size < EX_VIDEO_HEADER_SIZE:
+                return VIDEO_CODEC_ENHANCED, frame_type, packet_type, 0
+            codec_id = VIDEO_FOURCC_CODECS.get(_UINT32_STRUCT.unpack_from(buffer, data_pos + 1)[0],
+                                               VIDEO_CODEC_ENHANCED)
+            if (packet_type == EX_PACKET_CODED_FRAMES and codec_id in EX_CTS_CODECS
+                    and data_size >= EX_VIDEO_HEADER_SIZE + 3):
+                # FourCC的最后一字节与3字节CTS一起读出，取低24位还原符号
+                cts = _CTS_STRUCT.unpack_from(buffer, data_pos + 4)[0] & 0x00FFFFFF
+                if cts & 0x800000:
+                    cts -= 0x1000000
+                return codec_id, frame_type, packet_type, cts
+            return codec_id, frame_type, packet_type, 0
+        codec_id = flags & 0x0F
+        if codec_id in (VIDEO_CODEC_AVC, VIDEO_CODEC_HEVC) and data_size >= 5:
+            # 3字节有符号CTS：与前一字节一起读出后右移还原符号
+            packet_type = buffer[data_pos + 1]
+            cts = _CTS_STRUCT.unpack_from(buffer, data_pos + 1)[0] & 0x00FFFFFF
+            if cts & 0x800000:
+                cts -= 0x1000000
+            return codec_id, frame_type, packet_type, cts
+        return codec_id, frame_type, PACKET_TYPE_NONE, 0
+
+    if tag_type == TAG_TYPE_AUDIO:
+        codec_id = flags >> 4
+        if codec_id == SOUND_FORMAT_AAC and data_size >= 2:
+            return codec_id, flags & 0x0F, buffer[data_pos + 1], 0
+        return codec_id, flags & 0x0F, PACKET_TYPE_NONE, 0
+
+    return 0, 0, PACKET_TYPE_NONE, 0
+
+
+class FLVTagScanner:
+    """
+    FLV标签扫描器
+
+    通过mmap遍历标签头和PreviousTagSize，只解析每个标签的首部字节，
+    负载数据以memoryview形式按需访问，不做任何拷贝。
+    """
+
+    def __init__(self, file_path):
+        self.file_path = Path(file_path)
+        self.header: Optional[FLVHeader] = None
+        self.file_size = 0
+        self.truncated = False
+        self.prev_tag_size_errors = 0
+        self._file = None
+        self._mm = None
+        self._view = None
+
+    def open(self) -> 'FLVTagScanner':
+        """打开文件并解析文件头"""
+        self._file = open(self.file_path, 'rb')
+        try:
+            self.file_size = Path(self.file_path).stat().st_size
+            if self.file_size == 0:
+                raise FLVHeaderError("文件为空")
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mm)
+            self.header = FLVHeader.parse(self._mm)
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    @property
+    def buffer(self):
+        """底层只读缓冲区（mmap）"""
+        return self._mm
+
+    def iter_tags(self, start: Optional[int] = None) -> Iterator[TagRecord]:
+        """
+        遍历所有标签
+
+        Args:
+            start: 起始标签头偏移，默认从第一个标签开始
+
+        Yields:
+            TagRecord: (偏移, 标签类型, 时间戳, 数据大小, 编码ID, 帧类型, 包类型, CTS)
+        """
+        if self._mm is None:
+            raise RuntimeError("扫描器未打开")
+
+        mm = self._mm
+        size = self.file_size
+        unpack_header = _TAG_HEADER_STRUCT.unpack_from
+        unpack_uint32 = _UINT32_STRUCT.unpack_from
+
+        self.truncated = False
+        self.prev_tag_size_errors = 0
+
+        # 跳过PreviousTagSize0
+        pos = self.header.data_offset + PREV_TAG_SIZE_LENGTH if start is None else start
+        while pos < size:
+            if pos + TAG_HEADER_SIZE > size:
+                # 末尾剩余字节不足一个标签头
+                self.truncated = True
+                logger.warning(f"标签在偏移 {pos} 处被截断")
+                break
+            type_size, ts_field = unpack_header(mm, pos)
+            tag_type = (type_size >> 24) & 0x1F
+            data_size = type_size & 0x00FFFFFF
+            timestamp = (ts_field >> 8) | ((ts_field & 0xFF) << 24)
+
+            data_pos = pos + TAG_HEADER_SIZE
+            end = data_pos + data_size
+            if end + PREV_TAG_SIZE_LENGTH > size:
+                self.truncated = True
+                logger.warning(f"标签在偏移 {pos} 处被截断")
+                break
+
+            if unpack_uint32(mm, end)[0] != data_size + TAG_HEADER_SIZE:
+                self.prev_tag_size_errors += 1
+
+            codec_id, frame_type, packet_type, cts = decode_av_header(mm, tag_type, data_pos, data_size)
+            yield (pos, tag_type, timestamp, data_size, codec_id, frame_type, packet_type, cts)
+
+            pos = end + PREV_TAG_SIZE_LENGTH
+
+    def read_tag(self, offset: int) -> Optional[TagRecord]:
+        """
+        读取指定偏移处的单个标签头
+
+        Returns:
+            TagRecord: 偏移处不是完整标签时返回None
+        """
+        if offset < 0 or offset + TAG_HEADER_SIZE > self.file_size:
+            return None
+        type_size, ts_field = _TAG_HEADER_STRUCT.unpack_from(self._mm, offset)
+        tag_type = (type_size >> 24) & 0x1F
+        data_size = type_size & 0x00FFFFFF
+        if tag_type not in TAG_TYPE_NAMES or offset + TAG_HEADER_SIZE + data_size > self.file_size:
+            return None
+        timestamp = (ts_field >> 8) | ((ts_field & 0xFF) << 24)
+        codec_id, frame_type, packet_type, cts = decode_av_header(
+            self._mm, tag_type, offset + TAG_HEADER_SIZE, data_size)
+        return (offset, tag_type, timestamp, data_size, codec_id, frame_type, packet_type, cts)
+
+    def payload(self, offset: int, data_size: int) -> memoryview:
+        """
+        获取标签负载的零拷贝视图
+
+        Args:
+            offset: 标签头偏移
+            data_size: 负载长度
+
+        Returns:
+            memoryview: 负载视图，使用完毕后应及时释放
+        """
+        start = offset + TAG_HEADER_SIZE
+        return self._view[start:start + data_size]
+
+    def close(self):
+        """释放mmap与文件句柄"""
+        if self._view is not None:
+            try:
+                self._view.release()
+            except Exception:
+                pass
+            self._view = None
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                # 仍有外部memoryview引用，交由垃圾回收处理
+                logger.debug("mmap仍被引用，延迟释放")
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# ---------------------------------------------------------------------------
+# AMF0 脚本数据解码
+# ---------------------------------------------------------------------------
+
+_DOUBLE_STRUCT = struct.Struct('>d')
+_UINT16_STRUCT = struct.Struct('>H')
+
+
+class AMF0Error(ValueError):
+    """AMF0数据无效"""
+
+
+class AMF0Decoder:
+    """AMF0解码器，仅支持FLV脚本标签中出现的类型"""
+
+    def __init__(self, buffer, offset: int = 0, end: Optional[int] = None):
+        self.buffer = buffer
+        self.pos = offset
+        self.end = len(buffer) if end is None else end
+
+    def _require(self, count: int):
+        if self.pos + count > self.end:
+            raise AMF0Error("AMF0数据不完整")
+
+    def _read_string(self, long: bool = False) -> str:
+        if long:
+            self._require(4)
+            length = _UINT32_STRUCT.unpack_from(self.buffer, self.pos)[0]
+            self.pos += 4
+        else:
+            self._require(2)
+            length = _UINT16_STRUCT.unpack_from(self.buffer, self.pos)[0]
+            self.pos += 2
+        self._require(length)
+        value = bytes(self.buffer[self.pos:self.pos + length]).decode('utf-8', errors='replace')
+        self.pos += length
+        return value
+
+    def _read_properties(self) -> dict:
+        result = {}
+        while self.pos < self.end:
+            key = self._read_string()
+            if not key and self.pos < self.end and self.buffer[self.pos] == 0x09:
+                self.pos += 1
+                break
+            result[key] = self.read_value()
+        return result
+
+    def read_value(self) -> Any:
+        """读取一个AMF0值"""
+        self._require(1)
+        marker = self.buffer[self.pos]
+        self.pos += 1
+
+        if marker == 0x00:  # Number
+            self._require(8)
+            value = _DOUBLE_STRUCT.unpack_from(self.buffer, self.pos)[0]
+            self.pos += 8
+            return value
+        if marker == 0x01:  # Boolean
+            self._require(1)
+            value = self.buffer[self.pos] != 0
+            self.pos += 1
+            return value
+        if marker == 0x02:  # String
+            return self._read_string()
+        if marker == 0x03:  # Object
+            return self._read_properties()
+        if marker in (0x05, 0x06):  # Null / Undefined
+            return None
+        if marker == 0x07:  # Reference
+            self._require(2)
+            self.pos += 2
+            return None
+        if marker == 0x08:  # ECMA Array
+            self._require(4)
+            self.pos += 4  # 近似元素个数，以对象结束符为准
+            return self._read_properties()
+        if marker == 0x0A:  # Strict Array
+            self._require(4)
+            count = _UINT32_STRUCT.unpack_from(self.buffer, self.pos)[0]
+            self.pos += 4
+            return [self.read_value() for _ in range(count)]
+        if marker == 0x0B:  # Date
+            self._require(10)
+            value = _DOUBLE_STRUCT.unpack_from(self.buffer, self.pos)[0]
+            self.pos += 10
+            return value
+        if marker == 0x0C:  # Long String
+            return self._read_string(long=True)
+
+        raise AMF0Error(f"不支持的AMF0类型: 0x{marker:02X}")
+
+
+def parse_script_data(buffer, offset: int, data_size: int) -> Tuple[Optional[str], Any]:
+    """
+    解析脚本标签负载
+
+    Args:
+        buffer: 标签数据所在缓冲区
+        offset: 负载起始偏移
+        data_size: 负载长度
+
+    Returns:
+        tuple: (事件名称, 值)，例如 ('onMetaData', {...})
+    """
+    decoder = AMF0Decoder(buffer, offset, offset + data_size)
+    name = decoder.read_value()
+    value = decoder.read_value() if decoder.pos < decoder.end else None
+    return (name if isinstance(name, str) else None), value
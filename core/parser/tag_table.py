@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+FLV 标签索引表
+以并行数组(列)存储标签扫描结果，替代每个标签一个dict的存储方式
+"""
+
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
+from itertools import compress
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .tag_parser import (TagRecord, TAG_TYPE_AUDIO, TAG_TYPE_VIDEO, TAG_TYPE_NAMES,
+                         FRAME_TYPE_KEY, EX_PACKET_METADATA, EX_PACKET_MPEG2TS_SEQUENCE_START,
+                         EX_PACKET_MULTITRACK, EX_PACKET_MODEX, audio_sample_rate, audio_channels)
+
+# AVC/HEVC序列头、序列结束的包类型
+PACKET_TYPE_SEQUENCE_HEADER = 0
+PACKET_TYPE_END_OF_SEQUENCE = 2
+
+# 不是编码帧的包类型：序列头、序列结束，以及Enhanced FLV的元数据、MPEG-2 TS序列头，
+# 和暂不支持的多轨/ModEx包。传统AVC/AAC标签不会出现3以上的包类型
+NON_FRAME_PACKET_TYPES = (PACKET_TYPE_SEQUENCE_HEADER, PACKET_TYPE_END_OF_SEQUENCE,
+                          EX_PACKET_METADATA, EX_PACKET_MPEG2TS_SEQUENCE_START,
+                          EX_PACKET_MULTITRACK, EX_PACKET_MODEX)
+
+# 可选依赖 - NumPy，用于零拷贝列视图和布尔掩码过滤
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+if HAS_NUMPY:
+    # 包类型 -> 是否为编码帧，按包类型列查表得到掩码
+    _FRAME_PACKET_TABLE = np.ones(256, dtype=bool)
+    _FRAME_PACKET_TABLE[list(NON_FRAME_PACKET_TYPES)] = False
+
+# 列名 -> array类型码，顺序与TagRecord一致
+COLUMNS = (
+    ('offset', 'Q'),
+    ('tag_type', 'B'),
+    ('timestamp', 'I'),
+    ('data_size', 'I'),
+    ('codec_id', 'B'),
+    ('frame_type', 'B'),
+    ('packet_type', 'B'),
+    ('cts', 'i'),
+)
+
+COLUMN_NAMES = tuple(name for name, _ in COLUMNS)
+
+
+class TagTable:
+    """
+    列式标签索引
+
+    每列是一个 array.array，行号即标签序号。构建完成后可通过
+    column() 获取零拷贝的NumPy视图；注意视图存在期间不能再追加行。
+    """
+
+    __slots__ = COLUMN_NAMES
+
+    def __init__(self):
+        for name, typecode in COLUMNS:
+            setattr(self, name, array(typecode))
+
+    @classmethod
+    def from_records(cls, records: Iterable[TagRecord]) -> 'TagTable':
+        """从TagRecord序列构建索引表"""
+        table = cls()
+        table.extend(records)
+        return table
+
+    def append(self, record: TagRecord):
+        """追加一行"""
+        (offset, tag_type, timestamp, data_size,
+         codec_id, frame_type, packet_type, cts) = record
+        self.offset.append(offset)
+        self.tag_type.append(tag_type)
+        self.timestamp.append(timestamp)
+        self.data_size.append(data_size)
+        self.codec_id.append(codec_id)
+        self.frame_type.append(frame_type)
+        self.packet_type.append(packet_type)
+        self.cts.append(cts)
+
+    def extend(self, records: Iterable[TagRecord]):
+        """批量追加行"""
+        # 局部绑定append方法，避免热循环中的属性查找
+        appenders = [getattr(self, name).append for name in COLUMN_NAMES]
+        (add_offset, add_type, add_ts, add_size,
+         add_codec, add_frame, add_packet, add_cts) = appenders
+        for offset, tag_type, timestamp, data_size, codec_id, frame_type, packet_type, cts in records:
+            add_offset(offset)
+            add_type(tag_type)
+            add_ts(timestamp)
+            add_size(data_size)
+            add_codec(codec_id)
+            add_frame(frame_type)
+            add_packet(packet_type)
+            add_cts(cts)
+
+    def __len__(self) -> int:
+        return len(self.offset)
+
+    def __getitem__(self, index: int) -> TagRecord:
+        """O(1)按行访问"""
+        return (self.offset[index], self.tag_type[index], self.timestamp[index],
+                self.data_size[index], self.codec_id[index], self.frame_type[index],
+                self.packet_type[index], self.cts[index])
+
+    def __iter__(self) -> Iterator[TagRecord]:
+        return zip(*(getattr(self, name) for name in COLUMN_NAMES))
+
+    def column(self, name: str):
+        """
+        获取列的零拷贝视图
+
+        Args:
+            name: 列名，见 COLUMN_NAMES
+
+        Returns:
+            numpy.ndarray 或 memoryview（未安装NumPy时）
+        """
+        if name not in COLUMN_NAMES:
+            raise KeyError(f"未知列: {name}")
+        data = getattr(self, name)
+        if HAS_NUMPY:
+            return np.frombuffer(data, dtype=data.typecode) if len(data) else np.empty(0, dtype=data.typecode)
+        return memoryview(data)
+
+    def filter(self, mask) -> 'TagTable':
+        """
+        按布尔掩码过滤行
+
+        Args:
+            mask: 与行数等长的布尔序列或NumPy布尔数组
+
+        Returns:
+            TagTable: 新的索引表
+        """
+        if len(mask) != len(self):
+            raise ValueError("掩码长度与行数不一致")
+        result = TagTable()
+        if HAS_NUMPY:
+            mask = np.asarray(mask, dtype=bool)
+            for name in COLUMN_NAMES:
+                selected = self.column(name)[mask]
+                setattr(result, name, array(getattr(self, name).typecode, selected.tobytes()))
+        else:
+            for name in COLUMN_NAMES:
+                data = getattr(self, name)
+                setattr(result, name, array(data.typecode, compress(data, mask)))
+        return result
+
+    def mask_type(self, tag_type: int):
+        """生成指定标签类型的布尔掩码"""
+        if HAS_NUMPY:
+            return self.column('tag_type') == tag_type
+        return [t == tag_type for t in self.tag_type]
+
+    def indices(self, tag_type: int) -> List[int]:
+        """指定类型标签的行号列表"""
+        if HAS_NUMPY:
+            return np.flatnonzero(self.column('tag_type') == tag_type).tolist()
+        return [i for i, t in enumerate(self.tag_type) if t == tag_type]
+
+    def frame_mask(self, tag_type: int):
+        """指定类型编码帧标签的布尔掩码（不含序列头、序列结束等非帧包）"""
+        if HAS_NUMPY:
+            return (self.column('tag_type') == tag_type) & _FRAME_PACKET_TABLE[self.column('packet_type')]
+        return [t == tag_type and p not in NON_FRAME_PACKET_TYPES
+                for t, p in zip(self.tag_type, self.packet_type)]
+
+    def keyframe_rows(self) -> array:
+        """关键帧视频标签的行号（不含序列头和序列结束标记）"""
+        if HAS_NUMPY:
+            mask = self.frame_mask(TAG_TYPE_VIDEO) & (self.column('frame_type') == FRAME_TYPE_KEY)
+            return array('I', np.flatnonzero(mask).astype(np.uint32).tobytes())
+        return array('I', (i for i, (t, f, p) in enumerate(zip(self.tag_type, self.frame_type, self.packet_type))
+                           if t == TAG_TYPE_VIDEO and f == FRAME_TYPE_KEY and p not in NON_FRAME_PACKET_TYPES))
+
+    def frame_count(self, tag_type: int) -> int:
+        """指定类型的编码帧数（不含序列头和序列结束标记）"""
+        if HAS_NUMPY:
+            return int(np.count_nonzero(self.frame_mask(tag_type)))
+        return sum(self.frame_mask(tag_type))
+
+    def row_after(self, offset: int) -> int:
+        """第一个起始偏移大于 offset 的行号（行按文件偏移递增）"""
+        return bisect_right(self.offset, offset)
+
+    def find_row(self, start_row: int = 0, tag_type: Optional[int] = None,
+                 min_timestamp: Optional[int] = None, keyframe: bool = False) -> int:
+        """
+        从 start_row 开始查找第一个满足条件的行
+
+        Args:
+            start_row: 起始行号
+            tag_type: 标签类型，None表示不限
+            min_timestamp: 时间戳下限（毫秒），None表示不限
+            keyframe: 只匹配关键帧视频标签（与 keyframe_rows 的定义一致）
+
+        Returns:
+            int: 行号，未找到返回-1
+        """
+        start_row = max(start_row, 0)
+        if start_row >= len(self):
+            return -1
+        if keyframe:
+            tag_type = TAG_TYPE_VIDEO
+
+        if HAS_NUMPY:
+            mask = np.ones(len(self) - start_row, dtype=bool)
+            if tag_type is not None:
+                mask &= self.column('tag_type')[start_row:] == tag_type
+            if min_timestamp is not None:
+                mask &= self.column('timestamp')[start_row:] >= min_timestamp
+            if keyframe:
+                mask &= ((self.column('frame_type')[start_row:] == FRAME_TYPE_KEY)
+                         & _FRAME_PACKET_TABLE[self.column('packet_type')[start_row:]])
+            first = int(mask.argmax())
+            return start_row + first if mask[first] else -1
+
+        for row in range(start_row, len(self)):
+            if tag_type is not None and self.tag_type[row] != tag_type:
+                continue
+            if min_timestamp is not None and self.timestamp[row] < min_timestamp:
+                continue
+            if keyframe and (self.frame_type[row] != FRAME_TYPE_KEY
+                             or self.packet_type[row] in NON_FRAME_PACKET_TYPES):
+                continue
+            return row
+        return -1
+
+    def count(self, tag_type: int) -> int:
+        """统计指定类型的标签数量"""
+        if HAS_NUMPY:
+            return int(np.count_nonzero(self.column('tag_type') == tag_type))
+        return self.tag_type.count(tag_type)
+
+    def max_timestamp(self) -> int:
+        """最大时间戳（毫秒）"""
+        return max(self.timestamp) if len(self) else 0
+
+    def nbytes(self) -> int:
+        """索引占用的字节数"""
+        return sum(getattr(self, name).itemsize * len(self) for name in COLUMN_NAMES)
+
+    def as_dicts(self) -> 'TagDictView':
+        """兼容旧接口的dict视图"""
+        return TagDictView(self)
+
+
+def tag_row_to_dict(record: TagRecord) -> Dict[str, Any]:
+    """将一行转换为旧版标签dict"""
+    _, tag_type, timestamp, data_size, codec_id, frame_type, _, _ = record
+    tag_info = {
+        '类型': TAG_TYPE_NAMES.get(tag_type, 'UnknownTag'),
+        '时间戳': timestamp,
+        '数据大小': data_size,
+    }
+    if tag_type == TAG_TYPE_VIDEO:
+        tag_info.update({
+            '编解码器': codec_id,
+            '帧类型': frame_type,
+        })
+    elif tag_type == TAG_TYPE_AUDIO:
+        tag_info.update({
+            '编解码器': codec_id,
+            '采样率': audio_sample_rate(frame_type),
+            '声道': audio_channels(frame_type),
+        })
+    return tag_info
+
+
+class TagDictView(Sequence):
+    """
+    TagTable的只读dict视图
+
+    按需把行转换为旧版dict（'类型'、'时间戳'、'数据大小'等键），
+    不预先生成任何dict，供仍按列表-字典方式访问的调用方使用。
+    """
+
+    __slots__ = ('_table',)
+
+    def __init__(self, table: TagTable):
+        self._table = table
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [tag_row_to_dict(self._table[i]) for i in range(*index.indices(len(self)))]
+        return tag_row_to_dict(self._table[index])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return map(tag_row_to_dict, self._table)
+
+    def copy(self) -> List[Dict[str, Any]]:
+        """生成完整的dict列表（与旧版list.copy()行为一致）"""
+        return list(self)
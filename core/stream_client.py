@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP-FLV 拉流客户端
+在独立线程的asyncio事件循环中拉取直播流，边接收边解析标签，
+通过线程安全队列把事件交给界面线程；断线后按指数退避重连
+"""
+
+import asyncio
+import queue
+import random
+import ssl
+import threading
+import time
+from typing import Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from core import get_logger, log_exception
+from core.parser.flv_header import FLVHeaderError
+from core.parser.stream_parser import FLVStreamParser, FLVStreamError
+
+logger = get_logger(__name__)
+
+READ_SIZE = 64 * 1024
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 15.0          # 超过该时间没有数据视为断线
+MAX_REDIRECTS = 5
+BACKOFF_INITIAL = 0.5
+BACKOFF_MAX = 30.0
+
+# 队列事件类型
+EVENT_STATUS = 'status'      # (EVENT_STATUS, 接收时间, 状态文本)
+EVENT_TAGS = 'tags'          # (EVENT_TAGS, 接收时间, [TagRecord, ...])
+EVENT_STOPPED = 'stopped'    # (EVENT_STOPPED, 接收时间, None)
+
+
+class StreamClientError(Exception):
+    """拉流请求失败"""
+
+
+def parse_http_url(url: str) -> Tuple[str, str, int, str]:
+    """
+    解析HTTP(S)地址
+
+    Returns:
+        tuple: (协议, 主机, 端口, 请求路径)
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https') or not parts.hostname:
+        raise StreamClientError(f"不支持的地址: {url}")
+    port = parts.port or (443 if scheme == 'https' else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    return scheme, parts.hostname, port, path
+
+
+class HTTPFLVClient:
+    """
+    HTTP-FLV拉流客户端（运行在asyncio事件循环中）
+
+    每次连接使用新的增量解析器，解析出的标签按网络读取批次放入队列。
+    """
+
+    def __init__(self, url: str, events: queue.SimpleQueue, max_retries: Optional[int] = None):
+        """
+        Args:
+            url: HTTP-FLV地址
+            events: 接收事件的线程安全队列
+            max_retries: 连续重连次数上限，None表示一直重连
+        """
+        self.url = url
+        self.events = events
+        self.max_retries = max_retries
+        self.bytes_received = 0
+        self._stopping = False
+
+    def _emit(self, kind: str, payload):
+        self.events.put((kind, time.time(), payload))
+
+    def stop(self):
+        """请求停止（在事件循环线程中调用）"""
+        self._stopping = True
+
+    async def run(self):
+        """拉流主循环：连接、接收，断线后退避重连"""
+        failures = 0
+        backoff = BACKOFF_INITIAL
+        try:
+            while not self._stopping:
+                received_before = self.bytes_received
+                try:
+                    await self._pull_once()
+                    reason = "服务器关闭了连接"
+                except asyncio.CancelledError:
+                    raise
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError,
+                        StreamClientError, FLVHeaderError, FLVStreamError) as e:
+                    reason = str(e) or type(e).__name__
+                except Exception as e:
+                    # 解析器或协议处理中的意外错误同样按断线处理，避免拉流线程静默退出
+                    log_exception(logger, e, "拉流出现意外错误")
+                    reason = f"{type(e).__name__}: {e}"
+                if self._stopping:
+                    break
+
+                # 收到过数据说明连接曾经正常，重新开始退避
+                if self.bytes_received > received_before:
+                    failures = 0
+                    backoff = BACKOFF_INITIAL
+                failures += 1
+                if self.max_retries is not None and failures > self.max_retries:
+                    self._emit(EVENT_STATUS, f"连接失败: {reason}")
+                    break
+
+                delay = backoff * (0.5 + random.random() / 2)
+                logger.warning(f"拉流中断 ({reason})，{delay:.1f}秒后第{failures}次重连")
+                self._emit(EVENT_STATUS, f"重连中({failures}): {reason}")
+                await asyncio.sleep(delay)
+                backoff = min(backoff * 2, BACKOFF_MAX)
+        finally:
+            self._emit(EVENT_STOPPED, None)
+
+    async def _open(self, url: str):
+        """建立连接并完成请求，跟随重定向，返回 (reader, writer, 响应头)"""
+        for _ in range(MAX_REDIRECTS + 1):
+            scheme, host, port, path = parse_http_url(url)
+            self._emit(EVENT_STATUS, f"连接中: {host}:{port}")
+            ssl_context = ssl.create_default_context() if scheme == 'https' else None
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=ssl_context), CONNECT_TIMEOUT)
+            request = (f"GET {path} HTTP/1.1\r\n"
+                       f"Host: {host}:{port}\r\n"
+                       f"User-Agent: lookFlv\r\n"
+                       f"Accept: */*\r\n"
+                       f"Connection: close\r\n\r\n")
+            writer.write(request.encode('latin-1'))
+            await writer.drain()
+
+            status_line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+            fields = status_line.decode('latin-1').split(None, 2)
+            if len(fields) < 2 or not fields[1].isdigit():
+                writer.close()
+                raise StreamClientError(f"无效的HTTP响应: {status_line[:80]!r}")
+            status = int(fields[1])
+
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            if status in (301, 302, 303, 307, 308) and 'location' in headers:
+                writer.close()
+                url = urljoin(url, headers['location'])
+                continue
+            if status != 200:
+                writer.close()
+                raise StreamClientError(f"HTTP {status}")
+            return reader, writer, headers
+        raise StreamClientError("重定向次数过多")
+
+    async def _pull_once(self):
+        """拉取一次直到连接结束"""
+        reader, writer, headers = await self._open(self.url)
+        self._emit(EVENT_STATUS, "已连接")
+        parser = FLVStreamParser(keep_payload=False)
+        try:
+            if 'chunked' in headers.get('transfer-encoding', '').lower():
+                body = self._read_chunked(reader)
+            else:
+                length = headers.get('content-length')
+                body = self._read_plain(reader, int(length) if length and length.isdigit() else None)
+            async for data in body:
+                self.bytes_received += len(data)
+                tags = parser.feed(data)
+                if tags:
+                    self._emit(EVENT_TAGS, [record for record, _ in tags])
+                if self._stopping:
+                    return
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_plain(reader: asyncio.StreamReader, length: Optional[int]):
+        """读取普通响应体（有长度时读到长度为止，否则读到连接关闭）"""
+        remaining = length
+        while remaining is None or remaining > 0:
+            size = READ_SIZE if remaining is None else min(READ_SIZE, remaining)
+            data = await asyncio.wait_for(reader.read(size), READ_TIMEOUT)
+            if not data:
+                return
+            if remaining is not None:
+                remaining -= len(data)
+            yield data
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader):
+        """解码分块传输编码，大块按 READ_SIZE 分段交出，不等整块到齐"""
+        while True:
+            line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+            if not line:
+                raise asyncio.IncompleteReadError(b'', None)
+            try:
+                size = int(line.split(b';', 1)[0].strip(), 16)
+            except ValueError:
+                raise StreamClientError(f"无效的分块长度: {line[:40]!r}")
+            if size == 0:
+                return
+            while size > 0:
+                data = await asyncio.wait_for(reader.read(min(size, READ_SIZE)), READ_TIMEOUT)
+                if not data:
+                    raise asyncio.IncompleteReadError(b'', size)
+                size -= len(data)
+                yield data
+            await asyncio.wait_for(reader.readexactly(2), READ_TIMEOUT)
+
+
+class StreamClientThread(threading.Thread):
+    """
+    在后台线程中运行拉流客户端的事件循环
+
+    界面线程通过 events 队列读取事件，调用 stop() 结束拉流。
+    """
+
+    def __init__(self, url: str, events: Optional[queue.SimpleQueue] = None,
+                 max_retries: Optional[int] = None):
+        super().__init__(name='HTTPFLVClient', daemon=True)
+        self.events = events if events is not None else queue.SimpleQueue()
+        self.client = HTTPFLVClient(url, self.events, max_retries)
+        self._loop = None
+        self._task = None
+        self._ready = threading.Event()
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        asyncio.set_event_loop(loop)
+        try:
+            self._task = loop.create_task(self.client.run())
+            self._ready.set()
+            loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"拉流线程异常: {e}")
+        finally:
+            self._ready.set()
+            try:
+                loop.run_until_complete(loop.shutdown_asyncgens())
+            finally:
+                loop.close()
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止拉流并等待线程退出"""
+        self._ready.wait(timeout)
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._cancel)
+            except RuntimeError:
+                # 事件循环已经结束
+                pass
+        self.join(timeout)
+
+    def _cancel(self):
+        self.client.stop()
+        self._task.cancel()
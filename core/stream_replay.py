@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP-FLV 回放服务器
+把本地FLV文件按标签时间戳节奏以HTTP-FLV形式推送，
+用于在没有直播源时调试拉流客户端和流监控
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+from core import get_logger
+from core.parser.flv_header import PREV_TAG_SIZE_LENGTH
+from core.parser.tag_parser import FLVTagScanner, TAG_HEADER_SIZE
+
+logger = get_logger(__name__)
+
+
+class FLVReplayServer:
+    """
+    HTTP-FLV回放服务器
+
+    每个连接从文件头开始发送整个文件；speed 为回放倍速，
+    0 表示不等待、尽快发送。
+    """
+
+    def __init__(self, file_path, host: str = '127.0.0.1', port: int = 0,
+                 speed: float = 1.0, chunked: bool = True):
+        self.file_path = file_path
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.chunked = chunked
+        self._server = None
+
+    async def start(self) -> int:
+        """开始监听，返回实际端口"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"回放服务器已启动: http://{self.host}:{self.port}/ ({self.file_path})")
+        return self.port
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info('peername')
+        try:
+            # 忽略请求内容，读到请求头结束即可
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+            headers = "HTTP/1.1 200 OK\r\nContent-Type: video/x-flv\r\nConnection: close\r\n"
+            if self.chunked:
+                headers += "Transfer-Encoding: chunked\r\n"
+            writer.write((headers + "\r\n").encode('latin-1'))
+            await self._send_file(writer)
+            if self.chunked:
+                writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            logger.debug(f"客户端断开: {peer}")
+        finally:
+            writer.close()
+
+    def _write(self, writer: asyncio.StreamWriter, data):
+        if self.chunked:
+            writer.write(f"{len(data):X}\r\n".encode('latin-1'))
+            writer.write(data)
+            writer.write(b"\r\n")
+        else:
+            writer.write(data)
+
+    async def _send_file(self, writer: asyncio.StreamWriter):
+        """按时间戳节奏逐个发送标签"""
+        with FLVTagScanner(self.file_path) as scanner:
+            buffer = scanner.buffer
+            first_tag = scanner.header.data_offset + PREV_TAG_SIZE_LENGTH
+            self._write(writer, buffer[:first_tag])
+
+            started = time.monotonic()
+            first_timestamp: Optional[int] = None
+            for offset, _, timestamp, data_size, *_ in scanner.iter_tags():
+                if self.speed > 0:
+                    if first_timestamp is None:
+                        first_timestamp = timestamp
+                    delay = (timestamp - first_timestamp) / 1000 / self.speed - (time.monotonic() - started)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                if writer.is_closing():
+                    return
+                end = offset + TAG_HEADER_SIZE + data_size + PREV_TAG_SIZE_LENGTH
+                self._write(writer, buffer[offset:end])
+                await writer.drain()
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+直播流实时统计
+按标签到达时间统计滑动窗口内的帧率、码率、关键帧间隔和到达抖动；
+计数按时间分桶，每个标签的开销是常数，不保存逐标签的列表
+"""
+
+import time
+from array import array
+from typing import Any, Dict, Optional, Sequence
+
+from core.parser.tag_parser import TAG_TYPE_AUDIO, TAG_TYPE_VIDEO, FRAME_TYPE_KEY, TagRecord
+
+DEFAULT_WINDOWS = (1.0, 5.0, 60.0)   # 统计窗口（秒）
+BUCKETS_PER_WINDOW = 20              # 每个窗口的分桶数，决定窗口边界的精度
+MIN_SPAN = 0.05                      # 计算速率的最短时长（秒），避免第一个样本得到极大的速率
+
+# SlidingWindow 中的计数字段
+FIELD_VIDEO_FRAMES = 0
+FIELD_VIDEO_BYTES = 1
+FIELD_AUDIO_BYTES = 2
+FIELD_KEYFRAMES = 3
+FIELD_KEYFRAME_INTERVAL = 4    # 关键帧间隔之和（毫秒）
+FIELD_JITTER = 5               # |到达间隔 - 时间戳间隔| 之和（毫秒）
+FIELD_JITTER_SAMPLES = 6
+FIELD_COUNT = 7
+
+
+class SlidingWindow:
+    """
+    分桶滑动窗口计数器
+
+    窗口被分成 buckets 个等长的桶，每个桶保存 fields 个计数，同时维护
+    整个窗口的合计。时间前进时把过期的桶从合计中减去并清零，每个桶
+    只会被清理一次，所以每次 add 的均摊开销为常数。
+    """
+
+    __slots__ = ('length', 'fields', '_count', '_width', '_buckets', '_totals', '_epoch', '_start')
+
+    def __init__(self, length: float, fields: int = 1, buckets: int = BUCKETS_PER_WINDOW):
+        self.length = length
+        self.fields = fields
+        self._count = buckets
+        self._width = length / buckets
+        self._buckets = array('d', bytes(8 * buckets * fields))
+        self._totals = array('d', bytes(8 * fields))
+        self._epoch: Optional[int] = None    # 当前桶的序号（时间 / 桶宽）
+        self._start: Optional[float] = None  # 第一个样本的时间
+
+    def advance(self, now: float) -> int:
+        """把窗口移动到 now，返回当前桶在数组中的起始位置"""
+        epoch = int(now / self._width)
+        last = self._epoch
+        if last is None:
+            self._epoch = epoch
+            self._start = now
+        elif epoch > last:
+            buckets = self._buckets
+            totals = self._totals
+            fields = self.fields
+            for step in range(last + 1, last + 1 + min(epoch - last, self._count)):
+                base = (step % self._count) * fields
+                for field in range(fields):
+                    totals[field] -= buckets[base + field]
+                    buckets[base + field] = 0.0
+            self._epoch = epoch
+        # 时间倒退（调用方传入的时间不单调）时计入当前桶
+        return (self._epoch % self._count) * self.fields
+
+    def add(self, now: float, value: float = 1.0, field: int = 0):
+        base = self.advance(now)
+        self._buckets[base + field] += value
+        self._totals[field] += value
+
+    def total(self, now: Optional[float] = None, field: int = 0) -> float:
+        """窗口内的合计；传入 now 时先移动窗口"""
+        if now is not None:
+            self.advance(now)
+        # 浮点累加误差可能使清空后的合计为极小的负数
+        return max(self._totals[field], 0.0)
+
+    def span(self, now: float) -> float:
+        """
+        窗口实际覆盖的时长：完整的旧桶加上当前桶已经过去的部分
+
+        刚开始统计、窗口还没有填满时只计算第一个样本之后经过的时间
+        （至少 MIN_SPAN）。
+        """
+        if self._epoch is None:
+            return self.length
+        elapsed = min(max(now - self._epoch * self._width, 0.0), self._width)
+        full_span = (self._count - 1) * self._width + elapsed
+        return min(full_span, max(now - self._start, MIN_SPAN))
+
+    def clear(self):
+        self._buckets = array('d', bytes(8 * self._count * self.fields))
+        self._totals = array('d', bytes(8 * self.fields))
+        self._epoch = None
+        self._start = None
+
+
+class StreamRateMeter:
+    """
+    单路直播流的实时统计
+
+    每个标签到达时调用 add_tag()，随时调用 snapshot() 读取某个窗口的
+    统计结果。抖动按每类标签计算：相邻两个标签的到达间隔与时间戳间隔
+    之差的绝对值，在窗口内取平均。
+    """
+
+    def __init__(self, windows: Sequence[float] = DEFAULT_WINDOWS):
+        self.windows = tuple(windows)
+        self._windows = [SlidingWindow(length, FIELD_COUNT) for length in self.windows]
+        self._last_arrival: Dict[int, tuple] = {}    # 标签类型 -> (到达时间, 时间戳)
+        self._last_keyframe: Optional[int] = None
+        self.last_keyframe_interval: Optional[int] = None   # 最近一个关键帧间隔（毫秒）
+        self.tags = 0
+        self.bytes = 0
+
+    def add_tag(self, record: TagRecord, arrival: Optional[float] = None):
+        """
+        记录一个到达的标签
+
+        Args:
+            record: 标签记录（FLVStreamParser / RTMPChunkDemuxer 的输出）
+            arrival: 到达时间（秒），默认为 time.monotonic()
+        """
+        if arrival is None:
+            arrival = time.monotonic()
+        _, tag_type, timestamp, data_size, _, frame_type = record[:6]
+        self.tags += 1
+        self.bytes += data_size
+
+        keyframe_interval = None
+        if tag_type == TAG_TYPE_VIDEO and frame_type == FRAME_TYPE_KEY:
+            if self._last_keyframe is not None and timestamp > self._last_keyframe:
+                keyframe_interval = timestamp - self._last_keyframe
+                self.last_keyframe_interval = keyframe_interval
+            self._last_keyframe = timestamp
+
+        jitter = None
+        if tag_type in (TAG_TYPE_VIDEO, TAG_TYPE_AUDIO):
+            last = self._last_arrival.get(tag_type)
+            if last is not None:
+                jitter = abs((arrival - last[0]) * 1000 - (timestamp - last[1]))
+            self._last_arrival[tag_type] = (arrival, timestamp)
+
+        for window in self._windows:
+            base = window.advance(arrival)
+            buckets = window._buckets
+            totals = window._totals
+            if tag_type == TAG_TYPE_VIDEO:
+                buckets[base + FIELD_VIDEO_FRAMES] += 1
+                totals[FIELD_VIDEO_FRAMES] += 1
+                buckets[base + FIELD_VIDEO_BYTES] += data_size
+                totals[FIELD_VIDEO_BYTES] += data_size
+            elif tag_type == TAG_TYPE_AUDIO:
+                buckets[base + FIELD_AUDIO_BYTES] += data_size
+                totals[FIELD_AUDIO_BYTES] += data_size
+            if keyframe_interval is not None:
+                buckets[base + FIELD_KEYFRAMES] += 1
+                totals[FIELD_KEYFRAMES] += 1
+                buckets[base + FIELD_KEYFRAME_INTERVAL] += keyframe_interval
+                totals[FIELD_KEYFRAME_INTERVAL] += keyframe_interval
+            if jitter is not None:
+                buckets[base + FIELD_JITTER] += jitter
+                totals[FIELD_JITTER] += jitter
+                buckets[base + FIELD_JITTER_SAMPLES] += 1
+                totals[FIELD_JITTER_SAMPLES] += 1
+
+    def snapshot(self, window: Optional[float] = None, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        读取一个窗口的统计
+
+        Args:
+            window: 窗口长度（秒），必须是构造时给出的窗口之一，默认最短的窗口
+            now: 当前时间，需与 add_tag 的到达时间使用同一时钟，默认 time.monotonic()
+
+        Returns:
+            dict: 帧率、视频/音频/总码率(kbps)、平均关键帧间隔和平均抖动（毫秒）；
+                窗口内没有样本的项为None
+        """
+        if now is None:
+            now = time.monotonic()
+        sliding = self._windows[self.windows.index(window) if window is not None else 0]
+        sliding.advance(now)
+        length = sliding.span(now)
+
+        def total(field):
+            return sliding.total(field=field)
+
+        video_bits = total(FIELD_VIDEO_BYTES) * 8
+        audio_bits = total(FIELD_AUDIO_BYTES) * 8
+        keyframes = total(FIELD_KEYFRAMES)
+        jitter_samples = total(FIELD_JITTER_SAMPLES)
+        return {
+            '窗口_秒': sliding.length,
+            '帧率': total(FIELD_VIDEO_FRAMES) / length,
+            '视频码率_kbps': video_bits / length / 1000,
+            '音频码率_kbps': audio_bits / length / 1000,
+            '总码率_kbps': (video_bits + audio_bits) / length / 1000,
+            '关键帧间隔_毫秒': total(FIELD_KEYFRAME_INTERVAL) / keyframes if keyframes else None,
+            '抖动_毫秒': total(FIELD_JITTER) / jitter_samples if jitter_samples else None,
+        }
+
+    def reset(self):
+        self.__init__(self.windows)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+二进制位流工具
+按位读取与Exp-Golomb解码，用于解析H.264/HEVC参数集和片头
+"""
+
+EMULATION_PREVENTION = b'\x00\x00\x03'
+
+
+class BitReaderError(ValueError):
+    """位流数据不足"""
+
+
+def remove_emulation_prevention(data) -> bytes:
+    """
+    去掉NAL单元中的防竞争字节（00 00 03 -> 00 00），得到RBSP
+
+    bytes.replace 不重叠地从左向右匹配，与逐字节去除的结果一致。
+    """
+    data = bytes(data)
+    if EMULATION_PREVENTION not in data:
+        return data
+    return data.replace(EMULATION_PREVENTION, b'\x00\x00')
+
+
+class BitReader:
+    """
+    大端位读取器
+
+    数据一次性转换为整数，读取通过移位和掩码完成。适合参数集、片头这类
+    几十字节的短数据；长数据应只截取需要解析的前缀。
+    """
+
+    __slots__ = ('_value', '_size', 'pos')
+
+    def __init__(self, data):
+        data = bytes(data)
+        self._value = int.from_bytes(data, 'big')
+        self._size = len(data) * 8
+        self.pos = 0
+
+    @property
+    def bits_left(self) -> int:
+        return self._size - self.pos
+
+    def read_bits(self, count: int) -> int:
+        """读取 count 位无符号整数"""
+        end = self.pos + count
+        if end > self._size:
+            raise BitReaderError(f"需要 {count} 位，剩余 {self._size - self.pos} 位")
+        self.pos = end
+        return (self._value >> (self._size - end)) & ((1 << count) - 1)
+
+    def read_bit(self) -> int:
+        return self.read_bits(1)
+
+    def read_flag(self) -> bool:
+        return bool(self.read_bits(1))
+
+    def skip_bits(self, count: int):
+        if self.pos + count > self._size:
+            raise BitReaderError(f"需要跳过 {count} 位，剩余 {self._size - self.pos} 位")
+        self.pos += count
+
+    def read_ue(self) -> int:
+        """无符号Exp-Golomb码 ue(v)"""
+        remaining = self._size - self.pos
+        rest = self._value & ((1 << remaining) - 1)
+        if not rest:
+            raise BitReaderError("Exp-Golomb码缺少终止位")
+        zeros = remaining - rest.bit_length()
+        if zeros > 31:
+            raise BitReaderError(f"Exp-Golomb码前导零过多: {zeros}")
+        self.pos += zeros
+        return self.read_bits(zeros + 1) - 1
+
+    def read_se(self) -> int:
+        """有符号Exp-Golomb码 se(v)"""
+        code = self.read_ue()
+        return (code + 1) >> 1 if code & 1 else -(code >> 1)
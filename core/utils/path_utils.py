@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+文件路径工具
+枚举目录中的FLV文件，供界面批量加载和命令行批处理共用
+"""
+
+import os
+
+from .logging_system import get_logger
+
+logger = get_logger(__name__)
+
+
+def iter_flv_files(folder, recursive=True):
+    """
+    使用 os.scandir 惰性枚举目录中的FLV文件
+    
+    Args:
+        folder: 目录路径
+        recursive: 是否递归子目录
+        
+    Yields:
+        str: FLV文件路径，按目录遍历顺序产出，不预先收集
+    """
+    stack = [str(folder)]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                stack.append(entry.path)
+                        elif entry.name.lower().endswith('.flv') and entry.is_file():
+                            yield entry.path
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning(f"无法读取目录 {current}: {e}")
@@ -1,5 +1,7 @@
 import sys
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QSplitter, QTableWidget, QTableWidgetItem, QTreeWidget, 
                              QTreeWidgetItem, QLabel, QFrame, QMenuBar, QMenu, 
@@ -14,17 +16,149 @@ from .widgets.hex_viewer import HexViewer
 from .widgets.stream_monitor import StreamMonitor
 from .widgets.gop_diagram import GOPDiagram
 from .widgets.video_player import VideoPlayer
-from core.flv_handler import FLVFileHandler
+from core.flv_handler import FLVFileHandler, read_file_summary
+from core.analysis.gop_visualizer import extract_gops
 from core import get_logger
+from core.utils.path_utils import iter_flv_files
 
 logger = get_logger(__name__)
 
 
+class FileLoadWorker(QThread):
+    """
+    后台加载FLV文件
+
+    先读取文件头和onMetaData并发出headerLoaded，然后扫描标签索引，
+    扫描过程中发出进度和新增标签的时间戳/大小，供界面逐步填充。
+    """
+    
+    headerLoaded = pyqtSignal(dict)            # 文件头阶段的文件信息
+    progressChanged = pyqtSignal(int, int)     # 已扫描千分比、已发现标签数
+    chunkLoaded = pyqtSignal(object, object, object)   # 新增标签的时间戳(ms)、数据大小(B)、类型
+    loadFinished = pyqtSignal(dict)            # 完整的文件信息
+    loadFailed = pyqtSignal(str)               # 错误信息
+    loadCancelled = pyqtSignal()
+    
+    def __init__(self, file_path):
+        super().__init__()
+        self.file_path = file_path
+        self.handler = None
+        self.gop_structure = None
+        self._reported_rows = 0
+        self._file_size = 1
+        
+    def run(self):
+        handler = FLVFileHandler()
+        try:
+            if not handler.load_file(self.file_path):
+                self.loadFailed.emit('无法加载FLV文件，请检查文件格式')
+                return
+            self._file_size = max(handler.file_info.get('文件大小_字节', 1), 1)
+            self.headerLoaded.emit(handler.get_file_info(with_tags=False))
+            
+            if not handler.load_tag_index(self._on_progress, self.isInterruptionRequested):
+                handler.close()
+                self.loadCancelled.emit()
+                return
+                
+            # GOP提取（片头读取加数组运算）在后台线程顺带完成
+            self.gop_structure = extract_gops(handler.tags_data, handler.get_slice_index())
+            self.handler = handler
+            self.loadFinished.emit(handler.get_file_info())
+            
+        except Exception as e:
+            logger.error(f"后台加载失败: {e}")
+            handler.close()
+            self.loadFailed.emit(str(e))
+            
+    def _on_progress(self, bytes_scanned, table):
+        start = self._reported_rows
+        self._reported_rows = len(table)
+        # 拷贝新增部分，扫描线程会继续向索引追加数据
+        self.chunkLoaded.emit(table.timestamp[start:], table.data_size[start:], table.tag_type[start:])
+        self.progressChanged.emit(min(bytes_scanned * 1000 // self._file_size, 1000), len(table))
+
+
+class FolderScanWorker(QThread):
+    """
+    后台扫描文件夹
+
+    边遍历目录边把文件提交到线程池读取概要信息（文件头、onMetaData和
+    已缓存的索引统计），结果按批发出，界面一次插入一批行。
+    """
+    
+    rowsReady = pyqtSignal(list)          # 一批文件信息
+    progressChanged = pyqtSignal(int)     # 已读取的文件数
+    scanFinished = pyqtSignal(int)        # 读取的文件总数
+    
+    BATCH_ROWS = 200          # 每批最多行数
+    BATCH_INTERVAL = 0.1      # 未满一批时最长等待时间（秒）
+    
+    def __init__(self, folder_path, max_workers=None):
+        super().__init__()
+        self.folder_path = folder_path
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        
+    def run(self):
+        files = iter_flv_files(self.folder_path)
+        pending = {}
+        batch = []
+        done = 0
+        exhausted = False
+        last_emit = time.monotonic()
+        # 限制提交数量，目录很大时不会一次把所有路径放进队列
+        max_pending = self.max_workers * 4
+        
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while not self.isInterruptionRequested():
+                while not exhausted and len(pending) < max_pending:
+                    file_path = next(files, None)
+                    if file_path is None:
+                        exhausted = True
+                        break
+                    pending[pool.submit(read_file_summary, file_path)] = file_path
+                if not pending:
+                    break
+                    
+                finished, _ = wait(pending, timeout=self.BATCH_INTERVAL,
+                                   return_when=FIRST_COMPLETED)
+                for future in finished:
+                    file_path = pending.pop(future)
+                    try:
+                        batch.append(future.result())
+                    except Exception as e:
+                        logger.error(f"读取文件信息失败 {file_path}: {e}")
+                        batch.append({'文件路径': file_path,
+                                      '文件名': os.path.basename(file_path),
+                                      '错误': str(e)})
+                    done += 1
+                    
+                now = time.monotonic()
+                if batch and (len(batch) >= self.BATCH_ROWS or now - last_emit >= self.BATCH_INTERVAL):
+                    self.rowsReady.emit(batch)
+                    self.progressChanged.emit(done)
+                    batch = []
+                    last_emit = now
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            
+        if self.isInterruptionRequested():
+            return
+        if batch:
+            self.rowsReady.emit(batch)
+        self.scanFinished.emit(done)
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.current_files = []
         self.flv_handler = FLVFileHandler()  # FLV文件处理器
+        self.load_worker = None      # 当前的后台加载线程
+        self._retired_workers = []   # 已取消、尚未退出的加载线程
+        self.folder_worker = None    # 当前的文件夹扫描线程
+        self._listed_files = set()   # 已在文件列表中的文件路径
         
         # 设置中文字体
         self.setup_chinese_font()
@@ -150,6 +284,8 @@ class MainWindow(QMainWindow):
         self.file_table.setAlternatingRowColors(True)
         self.file_table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.file_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.file_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.file_table.setSortingEnabled(True)
         
         # 自适应列宽
         header = self.file_table.horizontalHeader()
@@ -158,6 +294,7 @@ class MainWindow(QMainWindow):
         
         # 连接选择信号
         self.file_table.itemSelectionChanged.connect(self.on_file_selected)
+        self.file_table.itemDoubleClicked.connect(self.on_file_activated)
         
     def create_video_preview_panel(self, parent):
         # 创建中间面板
@@ -341,6 +478,12 @@ class MainWindow(QMainWindow):
         open_folder_action.triggered.connect(self.open_folder)
         toolbar.addAction(open_folder_action)
         
+        # 取消加载
+        self.cancel_load_action = QAction('取消加载', self)
+        self.cancel_load_action.setEnabled(False)
+        self.cancel_load_action.triggered.connect(self.cancel_all_loading)
+        toolbar.addAction(self.cancel_load_action)
+        
         toolbar.addSeparator()
         
         # 刷新
@@ -468,42 +611,190 @@ class MainWindow(QMainWindow):
             self.load_flv_folder(folder_path)
             
     def load_flv_file(self, file_path):
-        """加载FLV文件"""
+        """在后台线程加载FLV文件，正在进行的加载会被取消"""
         try:
+            self.cancel_loading()
+            
             self.statusBar().showMessage(f'正在加载: {os.path.basename(file_path)}')
             logger.info(f"开始加载FLV文件: {file_path}")
             
-            # 使用FLV处理器加载文件
-            if self.flv_handler.load_file(file_path):
-                # 获取文件信息
-                file_info = self.flv_handler.get_file_info()
-                
-                # 更新文件列表
-                self._add_file_to_table(file_info)
-                
-                # 加载视频到播放器
-                if self.video_player.load_video(self.flv_handler):
-                    self.statusBar().showMessage(f'已加载: {os.path.basename(file_path)}')
-                    # 更新属性面板
-                    self._update_properties_panel(file_info)
-                    # 切换到视频预览标签页
-                    self.center_tabs.setCurrentIndex(0)
-                else:
-                    self.statusBar().showMessage('视频加载失败')
-                    QMessageBox.warning(self, '警告', '无法播放此FLV文件，但可以查看文件信息')
-            else:
-                self.statusBar().showMessage('文件加载失败')
-                QMessageBox.critical(self, '错误', '无法加载FLV文件，请检查文件格式')
+            self.timeline_chart.clear_chart()
+            self.gop_diagram.clear()
+            
+            worker = FileLoadWorker(file_path)
+            worker.headerLoaded.connect(self._on_header_loaded)
+            worker.progressChanged.connect(self._on_load_progress)
+            worker.chunkLoaded.connect(self._on_chunk_loaded)
+            worker.loadFinished.connect(self._on_load_finished)
+            worker.loadFailed.connect(self._on_load_failed)
+            worker.loadCancelled.connect(self._on_load_cancelled)
+            worker.finished.connect(self._on_worker_exited)
+            self.load_worker = worker
+            
+            self.status_progress.setRange(0, 1000)
+            self.status_progress.setValue(0)
+            self.status_progress.setVisible(True)
+            self.cancel_load_action.setEnabled(True)
+            worker.start()
                 
         except Exception as e:
             logger.error(f"加载FLV文件失败: {e}")
             self.statusBar().showMessage('加载失败')
             QMessageBox.critical(self, '错误', f'加载文件时发生错误：{str(e)}')
+            
+    def cancel_loading(self):
+        """取消正在进行的文件加载，不等待线程退出"""
+        worker = self.load_worker
+        if worker is None:
+            return
+        worker.requestInterruption()
+        self._retired_workers.append(worker)
+        self.load_worker = None
+        self._finish_loading_ui()
+        self.statusBar().showMessage('已取消加载')
+        
+    def cancel_folder_scan(self):
+        """取消正在进行的文件夹扫描，不等待线程退出"""
+        worker = self.folder_worker
+        if worker is None:
+            return
+        worker.requestInterruption()
+        self._retired_workers.append(worker)
+        self.folder_worker = None
+        self._update_cancel_action()
+        
+    def cancel_all_loading(self):
+        """取消文件加载和文件夹扫描"""
+        self.cancel_folder_scan()
+        self.cancel_loading()
+        
+    def _update_cancel_action(self):
+        self.cancel_load_action.setEnabled(self.load_worker is not None or
+                                           self.folder_worker is not None)
+        
+    def _finish_loading_ui(self):
+        self.status_progress.setVisible(False)
+        self._update_cancel_action()
+        
+    def _is_current_worker(self) -> bool:
+        """信号是否来自当前的加载线程（忽略已取消线程的迟到信号）"""
+        return self.sender() is not None and self.sender() is self.load_worker
+        
+    def _on_worker_exited(self):
+        worker = self.sender()
+        if worker in self._retired_workers:
+            self._retired_workers.remove(worker)
+            # 取消前已完成加载的处理器不会再被使用
+            if getattr(worker, 'handler', None) is not None:
+                worker.handler.close()
+            
+    def _on_header_loaded(self, file_info):
+        """文件头阶段完成：先显示基本信息"""
+        if not self._is_current_worker():
+            return
+        self._add_file_to_table(file_info)
+        self._update_properties_panel(file_info)
+        self.hex_viewer.open_file(self.load_worker.file_path)
+        
+    def _on_load_progress(self, permille, tags_found):
+        if not self._is_current_worker():
+            return
+        self.status_progress.setValue(permille)
+        name = os.path.basename(self.load_worker.file_path)
+        self.statusBar().showMessage(f'正在扫描: {name}  {permille / 10:.1f}%  已发现 {tags_found} 个标签')
+        
+    def _on_chunk_loaded(self, timestamps, sizes, tag_types):
+        """新增一批标签：追加到时间轴图表"""
+        if not self._is_current_worker():
+            return
+        self.timeline_chart.append_data(timestamps, sizes, tag_types)
+        
+    def _on_load_finished(self, file_info):
+        """标签索引扫描完成"""
+        if not self._is_current_worker():
+            return
+        worker = self.load_worker
+        self.load_worker = None
+        self._finish_loading_ui()
+        
+        # 替换处理器，旧处理器在播放器停止使用后关闭
+        self.video_player.stop_decode_worker()
+        old_handler = self.flv_handler
+        self.flv_handler = worker.handler
+        if old_handler is not self.flv_handler:
+            old_handler.close()
+            
+        file_path = worker.file_path
+        self._add_file_to_table(file_info)
+        self._update_properties_panel(file_info)
+        self.hex_viewer.set_tag_table(self.flv_handler.get_tag_table())
+        self.gop_diagram.set_structure(worker.gop_structure)
+        
+        # 加载视频到播放器
+        if self.video_player.load_video(self.flv_handler):
+            self.statusBar().showMessage(f'已加载: {os.path.basename(file_path)}')
+            # 切换到视频预览标签页
+            self.center_tabs.setCurrentIndex(0)
+        else:
+            self.statusBar().showMessage('视频加载失败')
+            QMessageBox.warning(self, '警告', '无法播放此FLV文件，但可以查看文件信息')
+            
+    def _on_load_failed(self, message):
+        if not self._is_current_worker():
+            return
+        self.load_worker = None
+        self._finish_loading_ui()
+        self.statusBar().showMessage('文件加载失败')
+        QMessageBox.critical(self, '错误', message)
+        
+    def _on_load_cancelled(self):
+        if not self._is_current_worker():
+            return
+        self.load_worker = None
+        self._finish_loading_ui()
         
     def load_flv_folder(self, folder_path):
-        # TODO: 实现文件夹加载逻辑
+        """在后台扫描文件夹，文件信息分批加入文件列表"""
+        self.cancel_folder_scan()
         self.statusBar().showMessage(f'正在扫描文件夹: {folder_path}')
-        
+        logger.info(f"开始扫描文件夹: {folder_path}")
+        
+        worker = FolderScanWorker(folder_path)
+        worker.rowsReady.connect(self._on_folder_rows)
+        worker.progressChanged.connect(self._on_folder_progress)
+        worker.scanFinished.connect(self._on_folder_finished)
+        worker.finished.connect(self._on_worker_exited)
+        self.folder_worker = worker
+        self._update_cancel_action()
+        worker.start()
+        
+    def _on_folder_rows(self, file_infos):
+        if self.sender() is None or self.sender() is not self.folder_worker:
+            return
+        self._insert_file_rows(file_infos)
+        
+    def _on_folder_progress(self, files_read):
+        if self.sender() is None or self.sender() is not self.folder_worker:
+            return
+        if self.load_worker is None:
+            self.statusBar().showMessage(f'正在扫描文件夹: 已读取 {files_read} 个文件')
+            
+    def _on_folder_finished(self, files_read):
+        if self.sender() is None or self.sender() is not self.folder_worker:
+            return
+        folder_path = self.folder_worker.folder_path
+        self.folder_worker = None
+        self._update_cancel_action()
+        logger.info(f"文件夹扫描完成: {folder_path}，共 {files_read} 个FLV文件")
+        if self.load_worker is None:
+            self.statusBar().showMessage(f'文件夹扫描完成: 共 {files_read} 个FLV文件')
+        
+    def on_file_activated(self, item):
+        """双击文件列表中的文件：加载该文件"""
+        file_path = self.file_table.item(item.row(), 0).data(Qt.UserRole)
+        if file_path:
+            self.load_flv_file(file_path)
+            
     def on_file_selected(self):
         # TODO: 实现文件选择处理逻辑
         current_row = self.file_table.currentRow()
@@ -517,32 +808,84 @@ class MainWindow(QMainWindow):
                          '版本: 1.0.0\n'
                          '用于分析和查看FLV视频文件的详细信息。')
                          
+    def _find_file_row(self, file_path) -> int:
+        """查找文件所在的行号，不在列表中返回-1"""
+        if file_path not in self._listed_files:
+            return -1
+        for row in range(self.file_table.rowCount()):
+            item = self.file_table.item(row, 0)
+            if item is not None and item.data(Qt.UserRole) == file_path:
+                return row
+        return -1
+        
     def _add_file_to_table(self, file_info):
-        """添加文件信息到表格"""
+        """添加文件信息到表格，文件已在列表中时更新该行"""
+        row = self._find_file_row(file_info.get('文件路径'))
+        if row < 0:
+            self._insert_file_rows([file_info])
+            return
+        sorting = self.file_table.isSortingEnabled()
+        self.file_table.setSortingEnabled(False)
         try:
-            row = self.file_table.rowCount()
-            self.file_table.insertRow(row)
+            self._update_file_row(row, file_info)
+        finally:
+            self.file_table.setSortingEnabled(sorting)
+        
+    def _insert_file_rows(self, file_infos):
+        """
+        批量插入文件行（跳过已在列表中的文件）
+        
+        插入期间关闭排序和重绘，避免每写一个单元格都重新排序。
+        """
+        file_infos = [info for info in file_infos
+                      if info.get('文件路径') not in self._listed_files]
+        if not file_infos:
+            return
             
+        table = self.file_table
+        sorting = table.isSortingEnabled()
+        table.setSortingEnabled(False)
+        table.setUpdatesEnabled(False)
+        try:
+            start = table.rowCount()
+            table.setRowCount(start + len(file_infos))
+            for i, file_info in enumerate(file_infos):
+                self._update_file_row(start + i, file_info)
+                file_path = file_info.get('文件路径')
+                self._listed_files.add(file_path)
+                self.current_files.append(file_path)
+        finally:
+            table.setUpdatesEnabled(True)
+            table.setSortingEnabled(sorting)
+        
+    def _update_file_row(self, row, file_info):
+        """更新表格中一行的文件信息（调用方需关闭排序）"""
+        try:
             # 文件信息列
             items = [
                 file_info.get('文件名', ''),
                 file_info.get('文件大小', ''),
                 file_info.get('持续时间', ''),
-                file_info.get('视频编码', 'H.264'),  # 默认值
-                file_info.get('音频编码', 'AAC'),    # 默认值
+                file_info.get('视频编码', ''),
+                file_info.get('音频编码', ''),
                 file_info.get('分辨率', file_info.get('视频分辨率', '')),
                 file_info.get('帧率', file_info.get('视频帧率', '')),
                 file_info.get('视频比特率', ''),
                 str(file_info.get('创建时间', ''))
             ]
             
+            error = file_info.get('错误')
             for col, item_text in enumerate(items):
                 item = QTableWidgetItem(str(item_text))
                 item.setFont(self.label_font)
+                if error:
+                    item.setToolTip(error)
+                    item.setForeground(QColor('#c0392b'))
                 self.file_table.setItem(row, col, item)
+            self.file_table.item(row, 0).setData(Qt.UserRole, file_info.get('文件路径'))
                 
         except Exception as e:
-            logger.error(f"添加文件到表格失败: {e}")
+            logger.error(f"更新文件表格失败: {e}")
             
     def _update_properties_panel(self, file_info):
         """更新属性面板"""
@@ -561,7 +904,7 @@ class MainWindow(QMainWindow):
             video_mapping = {
                 "编解码器": "视频编码",
                 "分辨率": "分辨率",
-                "帧率": "视频帧率", 
+                "帧率": "帧率",
                 "比特率": "视频比特率",
                 "总帧数": "总帧数",
                 "关键帧数": "关键帧数",
@@ -598,10 +941,22 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         """窗口关闭事件"""
         try:
+            # 停止后台加载
+            self.cancel_all_loading()
+            for worker in self._retired_workers:
+                worker.wait()
+                
+            # 停止拉流监控
+            if hasattr(self, 'stream_monitor'):
+                self.stream_monitor.stop_monitoring()
+                
             # 关闭视频播放器
             if hasattr(self, 'video_player'):
                 self.video_player.close_video()
                 
+            if hasattr(self, 'hex_viewer'):
+                self.hex_viewer.close_file()
+                
             # 关闭FLV处理器
             if hasattr(self, 'flv_handler'):
                 self.flv_handler.close()
@@ -1,9 +1,40 @@
 # -*- coding: utf-8 -*-
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
-                             QPushButton, QScrollArea, QFrame)
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPainter, QColor, QPen, QBrush, QFont
-import pyqtgraph as pg
+"""
+GOP 结构图
+每个GOP一行，视图只绘制与可见区域相交的行，每行的帧图案缓存为位图；
+帧宽小于一个像素时改为绘制每个GOP的汇总条（长度、大小、帧类型比例）
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
+                             QPushButton, QAbstractScrollArea)
+from PyQt5.QtCore import Qt, QRect
+from PyQt5.QtGui import QPainter, QColor, QPen, QFont, QPixmap
+
+from core import format_file_size
+from core.analysis.gop_visualizer import (FRAME_I, FRAME_P, FRAME_B, FRAME_UNKNOWN, FRAME_TYPE_CHARS,
+                                         gop_type_counts)
+
+# 按帧类型编码排列的颜色
+FRAME_COLORS = (
+    QColor(255, 0, 0),      # 红色 - I帧
+    QColor(0, 255, 0),      # 绿色 - P帧
+    QColor(0, 0, 255),      # 蓝色 - B帧
+    QColor(128, 128, 128),  # 灰色 - 未知
+)
+
+LABEL_WIDTH = 90            # 左侧GOP编号列宽
+FRAME_GAP = 2               # 帧宽足够时帧之间的间隔
+DETAIL_ROW_HEIGHT = 30
+SUMMARY_ROW_HEIGHT = 16
+MIN_FRAME_WIDTH = 0.02      # 每帧最少占的像素数（最大缩小倍数）
+MAX_FRAME_WIDTH = 40.0
+DEFAULT_FRAME_WIDTH = 15.0
+ZOOM_STEP = 1.5
+MAX_CACHED_ROWS = 512       # 缓存的GOP位图数
+MAX_PIXMAP_WIDTH = 8192     # 超过该宽度的GOP不缓存，直接绘制可见的帧
 
 
 class GOPDiagram(QWidget):
@@ -11,23 +42,23 @@ class GOPDiagram(QWidget):
         super().__init__()
         self.gop_data = []
         self.init_ui()
-        
+
     def init_ui(self):
         layout = QVBoxLayout(self)
         layout.setContentsMargins(5, 5, 5, 5)
-        
+
         # 设置微软雅黑字体
         font = QFont("Microsoft YaHei", 10)
-        
+
         # 标题
         title = QLabel("GOP 结构分析")
         title.setFont(font)
         title.setStyleSheet("font-weight: bold; font-size: 12px; font-family: 'Microsoft YaHei';")
         layout.addWidget(title)
-        
+
         # 统计信息
         stats_layout = QHBoxLayout()
-        
+
         self.i_frame_label = QLabel("I帧: 0")
         self.i_frame_label.setFont(font)
         self.p_frame_label = QLabel("P帧: 0")
@@ -36,139 +67,293 @@ class GOPDiagram(QWidget):
         self.b_frame_label.setFont(font)
         self.gop_count_label = QLabel("GOP数: 0")
         self.gop_count_label.setFont(font)
-        
+
         stats_layout.addWidget(self.i_frame_label)
         stats_layout.addWidget(self.p_frame_label)
         stats_layout.addWidget(self.b_frame_label)
         stats_layout.addWidget(self.gop_count_label)
         stats_layout.addStretch()
-        
+
+        # 图例
+        legend = QLabel("  ".join(
+            f"<span style='color:{FRAME_COLORS[code].name()}'>■</span> {text}"
+            for code, text in ((FRAME_I, 'I帧 (关键帧)'), (FRAME_P, 'P帧 (预测帧)'),
+                               (FRAME_B, 'B帧 (双向帧)'))))
+        legend.setFont(font)
+        stats_layout.addWidget(legend)
+
         layout.addLayout(stats_layout)
-        
+
         # GOP 可视化区域
-        self.scroll_area = QScrollArea()
         self.gop_canvas = GOPCanvas()
-        self.scroll_area.setWidget(self.gop_canvas)
-        self.scroll_area.setWidgetResizable(True)
-        layout.addWidget(self.scroll_area)
-        
+        layout.addWidget(self.gop_canvas)
+
         # 控制按钮
         control_layout = QHBoxLayout()
-        
+
         self.refresh_btn = QPushButton("刷新")
         self.refresh_btn.setFont(font)
         self.export_btn = QPushButton("导出结构")
         self.export_btn.setFont(font)
-        
+        self.zoom_in_btn = QPushButton("放大")
+        self.zoom_in_btn.setFont(font)
+        self.zoom_out_btn = QPushButton("缩小")
+        self.zoom_out_btn.setFont(font)
+        self.zoom_in_btn.clicked.connect(lambda: self.gop_canvas.zoom(ZOOM_STEP))
+        self.zoom_out_btn.clicked.connect(lambda: self.gop_canvas.zoom(1 / ZOOM_STEP))
+
         control_layout.addWidget(self.refresh_btn)
         control_layout.addWidget(self.export_btn)
+        control_layout.addWidget(self.zoom_in_btn)
+        control_layout.addWidget(self.zoom_out_btn)
         control_layout.addStretch()
-        
+
         layout.addLayout(control_layout)
-        
+
     def update_gop_data(self, gop_data):
-        """更新GOP数据"""
+        """
+        更新GOP数据（兼容旧格式：每个GOP是帧字典的列表，字典含'type'和可选的'size'）
+        """
         self.gop_data = gop_data
-        
-        # 统计帧类型
-        i_count = sum(1 for gop in gop_data for frame in gop if frame['type'] == 'I')
-        p_count = sum(1 for gop in gop_data for frame in gop if frame['type'] == 'P')
-        b_count = sum(1 for gop in gop_data for frame in gop if frame['type'] == 'B')
-        
-        self.i_frame_label.setText(f"I帧: {i_count}")
-        self.p_frame_label.setText(f"P帧: {p_count}")
-        self.b_frame_label.setText(f"B帧: {b_count}")
-        self.gop_count_label.setText(f"GOP数: {len(gop_data)}")
-        
+        type_codes = {char: code for code, char in enumerate(FRAME_TYPE_CHARS)}
+        lengths = np.fromiter((len(gop) for gop in gop_data), dtype=np.int64, count=len(gop_data))
+        frames = [frame for gop in gop_data for frame in gop]
+        frame_types = np.fromiter((type_codes.get(frame.get('type'), FRAME_UNKNOWN) for frame in frames),
+                                  dtype=np.uint8, count=len(frames))
+        frame_sizes = np.fromiter((frame.get('size', 0) for frame in frames),
+                                  dtype=np.int64, count=len(frames))
+        gop_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(lengths) else lengths
+        # 空GOP无法表示为起始位置，去掉
+        gop_starts = gop_starts[lengths > 0]
+        self.set_frames(frame_types, gop_starts, frame_sizes)
+
+    def set_frames(self, frame_types, gop_starts, frame_sizes=None):
+        """
+        设置按解码顺序排列的帧
+
+        Args:
+            frame_types: 每帧的类型编码（FRAME_I/P/B/UNKNOWN）
+            gop_starts: 每个GOP第一帧的下标（递增）
+            frame_sizes: 每帧的字节数，可选
+        """
+        frame_types = np.asarray(frame_types, dtype=np.uint8)
+        totals = np.bincount(np.minimum(frame_types, FRAME_UNKNOWN), minlength=len(FRAME_TYPE_CHARS))
+        self.i_frame_label.setText(f"I帧: {totals[FRAME_I]}")
+        self.p_frame_label.setText(f"P帧: {totals[FRAME_P]}")
+        self.b_frame_label.setText(f"B帧: {totals[FRAME_B]}")
+        self.gop_count_label.setText(f"GOP数: {len(gop_starts)}")
+
         # 更新画布
-        self.gop_canvas.set_gop_data(gop_data)
-        
+        self.gop_canvas.set_frames(frame_types, gop_starts, frame_sizes)
+
+    def set_structure(self, structure):
+        """显示 extract_gops() 提取的GOP结构"""
+        self.set_frames(structure.frame_types, structure.gop_starts, structure.frame_sizes)
+        open_count = int(np.count_nonzero(structure.open_gops))
+        if open_count:
+            self.gop_count_label.setText(f"GOP数: {len(structure)} (开放GOP {open_count})")
+
+    def clear(self):
+        """清空GOP结构图"""
+        self.gop_data = []
+        self.set_frames(np.zeros(0, dtype=np.uint8), np.zeros(0, dtype=np.int64))
+
+
+class GOPCanvas(QAbstractScrollArea):
+    """
+    虚拟化的GOP画布
+
+    纵向滚动条以行（GOP）为单位，GOP数量不受控件像素高度的限制；
+    横向按像素滚动。
+    """
 
-class GOPCanvas(QFrame):
     def __init__(self):
         super().__init__()
-        self.gop_data = []
+        self.frame_types = np.zeros(0, dtype=np.uint8)
+        self.gop_starts = np.zeros(0, dtype=np.int64)
+        self.gop_lengths = np.zeros(0, dtype=np.int64)
+        self.gop_sizes = np.zeros(0, dtype=np.int64)
+        self.gop_counts = gop_type_counts(self.frame_types, self.gop_starts)
+        self.frame_width = DEFAULT_FRAME_WIDTH
+        self._pixmaps: 'OrderedDict[int, QPixmap]' = OrderedDict()
+        self._font = QFont("Microsoft YaHei", 8)
         self.setMinimumHeight(200)
-        self.setStyleSheet("border: 1px solid #ccc; background-color: white;")
-        
-    def set_gop_data(self, gop_data):
-        """设置GOP数据并重绘"""
-        self.gop_data = gop_data
-        self.update()
-        
+        self.setStyleSheet("QAbstractScrollArea { border: 1px solid #ccc; }")
+        self.viewport().setStyleSheet("background-color: white;")
+
+    @property
+    def gop_count(self) -> int:
+        return len(self.gop_starts)
+
+    @property
+    def summary_mode(self) -> bool:
+        """帧宽小于一个像素时只绘制GOP汇总"""
+        return self.frame_width < 1
+
+    @property
+    def row_height(self) -> int:
+        return SUMMARY_ROW_HEIGHT if self.summary_mode else DETAIL_ROW_HEIGHT
+
+    def set_frames(self, frame_types, gop_starts, frame_sizes=None):
+        """设置帧类型数组和GOP起始位置，并一次性计算每个GOP的汇总"""
+        self.frame_types = np.asarray(frame_types, dtype=np.uint8)
+        self.gop_starts = np.asarray(gop_starts, dtype=np.int64)
+        total = len(self.frame_types)
+        self.gop_lengths = np.diff(np.append(self.gop_starts, total))
+        self.gop_counts = gop_type_counts(self.frame_types, self.gop_starts)
+        if frame_sizes is not None and len(self.gop_starts):
+            self.gop_sizes = np.add.reduceat(np.asarray(frame_sizes, dtype=np.int64), self.gop_starts)
+        else:
+            self.gop_sizes = np.zeros(len(self.gop_starts), dtype=np.int64)
+        self._pixmaps.clear()
+        self.verticalScrollBar().setValue(0)
+        self.horizontalScrollBar().setValue(0)
+        self._update_scrollbars()
+        self.viewport().update()
+
+    def zoom(self, factor: float):
+        """按比例改变帧宽，保持视图左侧对应的帧位置不变"""
+        old = self.frame_width
+        new = min(max(old * factor, MIN_FRAME_WIDTH), MAX_FRAME_WIDTH)
+        if new == old:
+            return
+        hbar = self.horizontalScrollBar()
+        first_frame = hbar.value() / self._frame_step(old)
+        top_gop = self.verticalScrollBar().value()
+        self.frame_width = new
+        self._pixmaps.clear()
+        self._update_scrollbars()
+        hbar.setValue(int(first_frame * self._frame_step(new)))
+        self.verticalScrollBar().setValue(top_gop)
+        self.viewport().update()
+
+    @staticmethod
+    def _frame_step(frame_width: float) -> float:
+        """相邻两帧起点之间的距离"""
+        return frame_width + FRAME_GAP if frame_width >= 4 else frame_width
+
+    def _update_scrollbars(self):
+        visible = max(self.viewport().height() // self.row_height, 1)
+        vbar = self.verticalScrollBar()
+        vbar.setRange(0, max(self.gop_count - visible, 0))
+        vbar.setPageStep(visible)
+        longest = int(self.gop_lengths.max()) if self.gop_count else 0
+        content_width = int(longest * self._frame_step(self.frame_width)) + LABEL_WIDTH + 10
+        hbar = self.horizontalScrollBar()
+        hbar.setRange(0, max(content_width - self.viewport().width(), 0))
+        hbar.setPageStep(self.viewport().width())
+        hbar.setSingleStep(max(int(self._frame_step(self.frame_width)), 1))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_scrollbars()
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+
+    def wheelEvent(self, event):
+        if event.modifiers() & Qt.ControlModifier:
+            self.zoom(ZOOM_STEP if event.angleDelta().y() > 0 else 1 / ZOOM_STEP)
+            event.accept()
+            return
+        super().wheelEvent(event)
+
     def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        
-        if not self.gop_data:
-            painter.drawText(self.rect(), Qt.AlignCenter, "暂无GOP数据")
+        painter = QPainter(self.viewport())
+        painter.setFont(self._font)
+
+        if not self.gop_count:
+            painter.drawText(self.viewport().rect(), Qt.AlignCenter, "暂无GOP数据")
             return
-            
-        # 设置绘图参数
-        margin = 20
-        gop_height = 30
-        frame_width = 15
-        frame_height = 20
-        gop_spacing = 10
-        
-        y_start = margin
-        
-        # 颜色映射
-        colors = {
-            'I': QColor(255, 0, 0),    # 红色 - I帧
-            'P': QColor(0, 255, 0),    # 绿色 - P帧
-            'B': QColor(0, 0, 255)     # 蓝色 - B帧
-        }
-        
-        font = QFont("Microsoft YaHei", 8)
-        painter.setFont(font)
-        
-        for gop_idx, gop in enumerate(self.gop_data):
-            y_pos = y_start + gop_idx * (gop_height + gop_spacing)
-            
-            # 绘制GOP标签
+
+        row_height = self.row_height
+        first = self.verticalScrollBar().value()
+        last = min(first + self.viewport().height() // row_height + 1, self.gop_count)
+        dx = self.horizontalScrollBar().value()
+        width = self.viewport().width()
+
+        for gop in range(first, last):
+            y = (gop - first) * row_height
+            if self.summary_mode:
+                self._paint_summary(painter, gop, y, dx, width)
+            else:
+                self._paint_frames(painter, gop, y, dx, width)
+
+            # GOP编号列固定在左侧，不随横向滚动
+            painter.fillRect(0, y, LABEL_WIDTH, row_height, Qt.white)
             painter.setPen(QPen(Qt.black))
-            painter.drawText(5, y_pos + 15, f"GOP {gop_idx + 1}")
-            
-            # 绘制帧
-            x_pos = margin + 80
-            for frame_idx, frame in enumerate(gop):
-                frame_type = frame.get('type', 'P')
-                color = colors.get(frame_type, QColor(128, 128, 128))
-                
-                # 绘制帧矩形
-                painter.setPen(QPen(Qt.black))
-                painter.setBrush(QBrush(color))
-                
-                frame_rect = painter.drawRect(
-                    x_pos + frame_idx * (frame_width + 2),
-                    y_pos,
-                    frame_width,
-                    frame_height
-                )
-                
-                # 绘制帧类型文字
-                painter.setPen(QPen(Qt.white))
-                painter.drawText(
-                    x_pos + frame_idx * (frame_width + 2) + 3,
-                    y_pos + 14,
-                    frame_type
-                )
-                
-        # 绘制图例
-        legend_y = self.height() - 60
+            painter.drawText(QRect(5, y, LABEL_WIDTH - 5, row_height),
+                             Qt.AlignVCenter | Qt.AlignLeft, f"GOP {gop + 1}")
+
+    def _paint_frames(self, painter: QPainter, gop: int, y: int, dx: int, width: int):
+        """逐帧模式：使用缓存的GOP位图，过宽的GOP只绘制可见的帧"""
+        frame_y = y + (DETAIL_ROW_HEIGHT - 20) // 2
+        step = self._frame_step(self.frame_width)
+        length = int(self.gop_lengths[gop])
+        start = int(self.gop_starts[gop])
+        row_width = int(length * step) + 1
+
+        if row_width <= MAX_PIXMAP_WIDTH:
+            pixmap = self._pixmaps.get(gop)
+            if pixmap is None:
+                pixmap = self._render_frames(start, 0, length, row_width)
+                self._pixmaps[gop] = pixmap
+                if len(self._pixmaps) > MAX_CACHED_ROWS:
+                    self._pixmaps.popitem(last=False)
+            else:
+                self._pixmaps.move_to_end(gop)
+            painter.drawPixmap(LABEL_WIDTH - dx, frame_y, pixmap)
+            return
+
+        first = max(int(dx / step), 0)
+        last = min(int((dx + width) / step) + 1, length)
+        if first >= last:
+            return
+        pixmap = self._render_frames(start, first, last, int((last - first) * step) + 1)
+        painter.drawPixmap(LABEL_WIDTH - dx + int(first * step), frame_y, pixmap)
+
+    def _render_frames(self, start: int, first: int, last: int, pixmap_width: int) -> QPixmap:
+        """把GOP中第 first~last 帧画到一张位图上"""
+        frame_width = self.frame_width
+        step = self._frame_step(frame_width)
+        pixmap = QPixmap(max(pixmap_width, 1), 20)
+        pixmap.fill(Qt.white)
+        painter = QPainter(pixmap)
+        painter.setFont(self._font)
+        outline = frame_width >= 4
+        painter.setPen(QPen(Qt.black) if outline else Qt.NoPen)
+        types = self.frame_types[start + first:start + last]
+        for i, frame_type in enumerate(types.tolist()):
+            x = (i * step)
+            painter.setBrush(FRAME_COLORS[min(frame_type, FRAME_UNKNOWN)])
+            painter.drawRect(int(x), 0, max(int(frame_width) - (1 if outline else 0), 1), 19)
+        if frame_width >= 10:
+            painter.setPen(QPen(Qt.white))
+            for i, frame_type in enumerate(types.tolist()):
+                painter.drawText(QRect(int(i * step), 0, int(frame_width), 20), Qt.AlignCenter,
+                                 FRAME_TYPE_CHARS[min(frame_type, FRAME_UNKNOWN)])
+        painter.end()
+        return pixmap
+
+    def _paint_summary(self, painter: QPainter, gop: int, y: int, dx: int, width: int):
+        """汇总模式：条长表示GOP长度，按I/P/B比例分段着色，右侧标注帧数和大小"""
+        length = int(self.gop_lengths[gop])
+        bar_width = max(int(length * self.frame_width), 1)
+        x = LABEL_WIDTH - dx
+        bar_height = SUMMARY_ROW_HEIGHT - 4
+        counts = self.gop_counts[gop]
+        for code in range(len(FRAME_TYPE_CHARS)):
+            count = int(counts[code])
+            if not count:
+                continue
+            segment = max(int(round(bar_width * count / length)), 1)
+            painter.fillRect(x, y + 2, segment, bar_height, FRAME_COLORS[code])
+            x += segment
+
+        text = f"{length} 帧"
+        size = int(self.gop_sizes[gop])
+        if size:
+            text += f"  {format_file_size(size)}"
         painter.setPen(QPen(Qt.black))
-        painter.drawText(margin, legend_y, "图例:")
-        
-        legend_items = [
-            ('I帧 (关键帧)', colors['I']),
-            ('P帧 (预测帧)', colors['P']),
-            ('B帧 (双向帧)', colors['B'])
-        ]
-        
-        for i, (text, color) in enumerate(legend_items):
-            x = margin + i * 120
-            painter.setBrush(QBrush(color))
-            painter.drawRect(x, legend_y + 15, 15, 15)
-            painter.setPen(QPen(Qt.black))
-            painter.drawText(x + 20, legend_y + 27, text)
\ No newline at end of file
+        painter.drawText(QRect(max(x, LABEL_WIDTH) + 6, y, width, SUMMARY_ROW_HEIGHT),
+                         Qt.AlignVCenter | Qt.AlignLeft, text)
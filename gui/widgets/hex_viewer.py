@@ -1,92 +1,679 @@
 # -*- coding: utf-8 -*-
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTextEdit, QLineEdit, QPushButton
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QFont
+"""
+十六进制查看器
+文件通过mmap映射，视图只绘制可见行；数据按页批量格式化，
+打开4GB文件和打开4KB文件的开销相同
+"""
+
+import mmap
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
+                             QPushButton, QAbstractScrollArea, QSpinBox, QComboBox)
+from PyQt5.QtCore import Qt, pyqtSignal, QThread
+from PyQt5.QtGui import QFont, QFontMetrics, QFontInfo, QFontDatabase, QColor, QPainter
+
+from core import get_logger
+from core.byte_search import iter_pattern_hits, find_next, parse_search_pattern
+from core.parser.tag_parser import TAG_HEADER_SIZE, TAG_TYPE_NAMES
+from core.parser.flv_header import PREV_TAG_SIZE_LENGTH
+
+logger = get_logger(__name__)
+
+BYTES_PER_ROW = 16
+PAGE_ROWS = 256          # 每次格式化的行数
+MAX_CACHED_PAGES = 16
+
+# 搜索方式
+SEARCH_HEX = 0
+SEARCH_ASCII = 1
+SEARCH_KEYFRAME = 2
+SEARCH_TIMESTAMP = 3
+SEARCH_MODES = ["十六进制", "ASCII", "下一个关键帧", "时间戳≥(ms)"]
+
+MAX_SEARCH_HITS = 100000      # 全部查找时保留的最大结果数
+SEARCH_BATCH_INTERVAL = 0.1   # 搜索结果的发送间隔（秒）
+
+# 可打印ASCII保持原样，其余字节显示为'.'
+ASCII_TABLE = bytes(b if 32 <= b <= 126 else ord('.') for b in range(256))
+
+
+def format_hex_rows(data, row_count: int):
+    """
+    把一段数据格式化为十六进制行和ASCII行
+
+    整段数据只调用一次 bytes.hex / bytes.translate，每行只做切片。
+
+    Returns:
+        tuple: (十六进制文本列表, ASCII文本列表)
+    """
+    hex_text = data.hex(' ').upper()
+    ascii_text = data.translate(ASCII_TABLE).decode('ascii')
+    row_width = BYTES_PER_ROW * 3
+    half = BYTES_PER_ROW // 2 * 3
+    hex_rows = []
+    ascii_rows = []
+    for row in range(row_count):
+        start = row * row_width
+        line = hex_text[start:start + row_width - 1]
+        # 前后8字节之间多空一格
+        hex_rows.append(line[:half] + ' ' + line[half:])
+        ascii_rows.append(ascii_text[row * BYTES_PER_ROW:(row + 1) * BYTES_PER_ROW])
+    return hex_rows, ascii_rows
+
+
+def hex_column_of(byte_in_row: int) -> int:
+    """行内第 n 个字节在十六进制文本中的字符位置"""
+    return byte_in_row * 3 + (1 if byte_in_row >= BYTES_PER_ROW // 2 else 0)
+
+
+class PatternSearchWorker(QThread):
+    """
+    后台字节模式搜索
+
+    查找全部时按偏移顺序分批发出结果；查找下一个时只发出一个结果，
+    到文件末尾后从头继续。
+    """
+
+    hitsFound = pyqtSignal(list)       # 一批匹配偏移
+    searchFinished = pyqtSignal(int)   # 匹配总数
+
+    def __init__(self, buffer, pattern: bytes, start: int = 0, find_all: bool = True):
+        super().__init__()
+        self.buffer = buffer
+        self.pattern = pattern
+        self.start_offset = start
+        self.find_all = find_all
+
+    def run(self):
+        try:
+            if not self.find_all:
+                offset = find_next(self.buffer, self.pattern, self.start_offset,
+                                   cancelled=self.isInterruptionRequested)
+                if offset >= 0:
+                    self.hitsFound.emit([offset])
+                self.searchFinished.emit(1 if offset >= 0 else 0)
+                return
+
+            batch = []
+            total = 0
+            last_emit = time.monotonic()
+            for offset in iter_pattern_hits(self.buffer, self.pattern, self.start_offset,
+                                            max_hits=MAX_SEARCH_HITS,
+                                            cancelled=self.isInterruptionRequested):
+                batch.append(offset)
+                total += 1
+                now = time.monotonic()
+                if now - last_emit >= SEARCH_BATCH_INTERVAL:
+                    self.hitsFound.emit(batch)
+                    batch = []
+                    last_emit = now
+            if batch:
+                self.hitsFound.emit(batch)
+            self.searchFinished.emit(total)
+        except Exception as e:
+            logger.error(f"搜索失败: {e}")
+            self.searchFinished.emit(-1)
+
+
+class HexDataModel:
+    """
+    十六进制数据模型
+
+    数据源可以是 bytes 或 mmap，只在视图请求时按页读取和格式化。
+    """
+
+    def __init__(self):
+        self._data = b''
+        self._size = 0
+        self._pages = OrderedDict()
+
+    def set_source(self, data):
+        """设置数据源（bytes、bytearray或mmap）"""
+        self._data = data
+        self._size = len(data)
+        self._pages.clear()
+
+    @property
+    def source(self):
+        """当前数据源"""
+        return self._data
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def row_count(self) -> int:
+        return (self._size + BYTES_PER_ROW - 1) // BYTES_PER_ROW
+
+    @property
+    def address_width(self) -> int:
+        """地址的十六进制位数"""
+        return 8 if self._size <= 0xFFFFFFFF else 10
+
+    def _page(self, page: int):
+        """获取一页的格式化结果，最近使用的页保留在缓存中"""
+        cached = self._pages.get(page)
+        if cached is not None:
+            self._pages.move_to_end(page)
+            return cached
+
+        start = page * PAGE_ROWS * BYTES_PER_ROW
+        chunk = bytes(self._data[start:start + PAGE_ROWS * BYTES_PER_ROW])
+        row_count = (len(chunk) + BYTES_PER_ROW - 1) // BYTES_PER_ROW
+        cached = format_hex_rows(chunk, row_count)
+        self._pages[page] = cached
+        if len(self._pages) > MAX_CACHED_PAGES:
+            self._pages.popitem(last=False)
+        return cached
+
+    def row_text(self, row: int):
+        """
+        获取一行的显示文本
+
+        Returns:
+            tuple: (地址, 十六进制, ASCII)
+        """
+        hex_rows, ascii_rows = self._page(row // PAGE_ROWS)
+        i = row % PAGE_ROWS
+        return f"{row * BYTES_PER_ROW:0{self.address_width}X}", hex_rows[i], ascii_rows[i]
+
+
+class HexView(QAbstractScrollArea):
+    """
+    十六进制视图
+
+    垂直滚动条以行为单位，文件多大都不会超出整数范围；
+    每次重绘只格式化和绘制视口内的行。
+    """
+
+    offsetClicked = pyqtSignal(int)   # 点击的字节偏移
+
+    BACKGROUND = QColor('#2b2b2b')
+    TEXT_COLOR = QColor('#ffffff')
+    ADDRESS_COLOR = QColor('#8a8a8a')
+    HIGHLIGHT_COLOR = QColor('#3d5a80')
+    CURSOR_COLOR = QColor('#c0392b')
+
+    def __init__(self, model: HexDataModel, parent=None):
+        super().__init__(parent)
+        self.model = model
+        self.highlight = (0, 0)      # 高亮的 [起始, 结束) 字节范围
+        self.cursor_offset = -1      # 当前选中的字节
+        self.setStyleSheet("QAbstractScrollArea { border: 1px solid #555; }")
+        font = QFont("Consolas", 10)
+        if not QFontInfo(font).fixedPitch():
+            # 列位置按等宽字符计算
+            font = QFontDatabase.systemFont(QFontDatabase.FixedFont)
+        self.setFont(font)
+        self._update_metrics()
+
+    def _update_metrics(self):
+        metrics = QFontMetrics(self.font())
+        self._char_width = metrics.horizontalAdvance('0')
+        self._row_height = metrics.height() + 2
+        self._ascent = metrics.ascent() + 1
+
+    def _columns_x(self):
+        """地址、十六进制、ASCII三列的起始横坐标"""
+        cw = self._char_width
+        address_x = cw
+        hex_x = address_x + (self.model.address_width + 2) * cw
+        ascii_x = hex_x + (BYTES_PER_ROW * 3 + 2) * cw
+        return address_x, hex_x, ascii_x
+
+    def visible_rows(self) -> int:
+        return max(self.viewport().height() // self._row_height, 1)
+
+    def reset(self):
+        """数据源变化后重置滚动位置"""
+        self.highlight = (0, 0)
+        self.cursor_offset = -1
+        self.verticalScrollBar().setValue(0)
+        self._update_scrollbars()
+        self.viewport().update()
+
+    def _update_scrollbars(self):
+        visible = self.visible_rows()
+        vbar = self.verticalScrollBar()
+        vbar.setRange(0, max(self.model.row_count - visible, 0))
+        vbar.setPageStep(visible)
+        vbar.setSingleStep(1)
+
+        _, _, ascii_x = self._columns_x()
+        content_width = ascii_x + (BYTES_PER_ROW + 1) * self._char_width
+        hbar = self.horizontalScrollBar()
+        hbar.setRange(0, max(content_width - self.viewport().width(), 0))
+        hbar.setPageStep(self.viewport().width())
+        hbar.setSingleStep(self._char_width)
+
+    def set_highlight(self, start: int, end: int):
+        """高亮 [start, end) 字节范围"""
+        self.highlight = (start, end)
+        self.viewport().update()
+
+    def scroll_to_offset(self, offset: int):
+        """滚动使偏移所在行可见（不可见时置于顶部）"""
+        row = offset // BYTES_PER_ROW
+        vbar = self.verticalScrollBar()
+        top = vbar.value()
+        if not top <= row < top + self.visible_rows():
+            vbar.setValue(row)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_scrollbars()
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+
+    def _byte_rect_x(self, hex_x, ascii_x, first, last):
+        """行内 [first, last) 字节在十六进制列和ASCII列中的横向范围"""
+        cw = self._char_width
+        hex_left = hex_x + hex_column_of(first) * cw
+        hex_right = hex_x + (hex_column_of(last - 1) + 2) * cw
+        return ((hex_left, hex_right - hex_left),
+                (ascii_x + first * cw, (last - first) * cw))
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.fillRect(self.viewport().rect(), self.BACKGROUND)
+        painter.setFont(self.font())
+
+        model = self.model
+        row_count = model.row_count
+        if row_count == 0:
+            return
+
+        dx = -self.horizontalScrollBar().value()
+        address_x, hex_x, ascii_x = (x + dx for x in self._columns_x())
+        top = self.verticalScrollBar().value()
+        height = self._row_height
+        start, end = self.highlight
+
+        for i in range(min(self.visible_rows() + 1, row_count - top)):
+            row = top + i
+            y = i * height
+            row_start = row * BYTES_PER_ROW
+
+            # 高亮范围与本行的交集
+            first = max(start, row_start) - row_start
+            last = min(end, row_start + BYTES_PER_ROW) - row_start
+            if first < last:
+                for x, width in self._byte_rect_x(hex_x, ascii_x, first, last):
+                    painter.fillRect(x, y, width, height, self.HIGHLIGHT_COLOR)
+            if row_start <= self.cursor_offset < row_start + BYTES_PER_ROW:
+                column = self.cursor_offset - row_start
+                for x, width in self._byte_rect_x(hex_x, ascii_x, column, column + 1):
+                    painter.fillRect(x, y, width, height, self.CURSOR_COLOR)
+
+            address, hex_text, ascii_text = model.row_text(row)
+            baseline = y + self._ascent
+            painter.setPen(self.ADDRESS_COLOR)
+            painter.drawText(address_x, baseline, address)
+            painter.setPen(self.TEXT_COLOR)
+            painter.drawText(hex_x, baseline, hex_text)
+            painter.drawText(ascii_x, baseline, ascii_text)
+
+    def offset_at(self, pos) -> int:
+        """视口坐标处的字节偏移，不在数据上返回-1"""
+        row = self.verticalScrollBar().value() + pos.y() // self._row_height
+        x = pos.x() + self.horizontalScrollBar().value()
+        _, hex_x, ascii_x = self._columns_x()
+        cw = self._char_width
+        if ascii_x <= x < ascii_x + BYTES_PER_ROW * cw:
+            column = (x - ascii_x) // cw
+        elif hex_x <= x < ascii_x:
+            char = (x - hex_x) // cw
+            if char >= hex_column_of(BYTES_PER_ROW // 2):
+                char -= 1
+            column = min(char // 3, BYTES_PER_ROW - 1)
+        else:
+            return -1
+        offset = row * BYTES_PER_ROW + column
+        return offset if offset < self.model.size else -1
+
+    def mousePressEvent(self, event):
+        offset = self.offset_at(event.pos())
+        if offset >= 0:
+            self.cursor_offset = offset
+            self.viewport().update()
+            self.offsetClicked.emit(offset)
+
+    def keyPressEvent(self, event):
+        vbar = self.verticalScrollBar()
+        steps = {
+            Qt.Key_Up: -1,
+            Qt.Key_Down: 1,
+            Qt.Key_PageUp: -vbar.pageStep(),
+            Qt.Key_PageDown: vbar.pageStep(),
+        }
+        key = event.key()
+        if key in steps:
+            vbar.setValue(vbar.value() + steps[key])
+        elif key == Qt.Key_Home:
+            vbar.setValue(0)
+        elif key == Qt.Key_End:
+            vbar.setValue(vbar.maximum())
+        else:
+            super().keyPressEvent(event)
 
 
 class HexViewer(QWidget):
     def __init__(self):
         super().__init__()
+        self._mmap = None
+        self._file = None
+        self._tag_table = None
+        self._search_worker = None
+        self._search_hits = []          # 全部查找的结果（按偏移递增）
+        self._search_pattern = None     # 结果对应的模式
+        self._search_complete = False   # 结果是否已完整
         self.init_ui()
-        
+
     def init_ui(self):
         layout = QVBoxLayout(self)
         layout.setContentsMargins(5, 5, 5, 5)
-        
+
         # 设置微软雅黑字体
         font = QFont("Microsoft YaHei", 10)
-        
+
         # 标题和搜索
         header_layout = QHBoxLayout()
-        
+
         title = QLabel("十六进制查看器")
         title.setFont(font)
         title.setStyleSheet("font-weight: bold; font-size: 12px; font-family: 'Microsoft YaHei';")
         header_layout.addWidget(title)
-        
+
         header_layout.addStretch()
-        
+
+        # 跳转到偏移
+        offset_label = QLabel("偏移:")
+        offset_label.setFont(font)
+        self.offset_input = QLineEdit()
+        self.offset_input.setFont(font)
+        self.offset_input.setMaximumWidth(110)
+        self.offset_input.setPlaceholderText("0x0 或 十进制")
+        self.offset_input.returnPressed.connect(self._on_offset_entered)
+
+        # 跳转到标签
+        tag_label = QLabel("标签:")
+        tag_label.setFont(font)
+        self.tag_input = QSpinBox()
+        self.tag_input.setFont(font)
+        self.tag_input.setRange(0, 0)
+        self.tag_input.setEnabled(False)
+        self.tag_jump_btn = QPushButton("跳转")
+        self.tag_jump_btn.setFont(font)
+        self.tag_jump_btn.setEnabled(False)
+        self.tag_jump_btn.clicked.connect(lambda: self.jump_to_tag(self.tag_input.value()))
+
         search_label = QLabel("搜索:")
         search_label.setFont(font)
+        self.search_mode = QComboBox()
+        self.search_mode.setFont(font)
+        self.search_mode.addItems(SEARCH_MODES)
         self.search_input = QLineEdit()
         self.search_input.setFont(font)
         self.search_input.setMaximumWidth(150)
+        self.search_input.returnPressed.connect(self.find_next)
         search_btn = QPushButton("查找")
         search_btn.setFont(font)
-        
+        search_btn.clicked.connect(self.find_next)
+        self.find_all_btn = QPushButton("全部")
+        self.find_all_btn.setFont(font)
+        self.find_all_btn.clicked.connect(self.find_all)
+
+        header_layout.addWidget(offset_label)
+        header_layout.addWidget(self.offset_input)
+        header_layout.addWidget(tag_label)
+        header_layout.addWidget(self.tag_input)
+        header_layout.addWidget(self.tag_jump_btn)
         header_layout.addWidget(search_label)
+        header_layout.addWidget(self.search_mode)
         header_layout.addWidget(self.search_input)
         header_layout.addWidget(search_btn)
-        
+        header_layout.addWidget(self.find_all_btn)
+
         layout.addLayout(header_layout)
-        
-        # 十六进制显示区域
-        self.hex_display = QTextEdit()
-        self.hex_display.setFont(QFont("Consolas", 10))
-        self.hex_display.setReadOnly(True)
-        self.hex_display.setStyleSheet("""
-            QTextEdit {
-                background-color: #2b2b2b;
-                color: #ffffff;
-                border: 1px solid #555;
-            }
-        """)
+
+        # 十六进制显示区域：只绘制可见行
+        self.model = HexDataModel()
+        self.hex_display = HexView(self.model)
+        self.hex_display.offsetClicked.connect(lambda offset: self._update_status(offset, 1))
         layout.addWidget(self.hex_display)
-        
+
         # 状态信息
         self.status_label = QLabel("位置: 0x0000 | 选中: 0 字节")
         self.status_label.setFont(font)
         self.status_label.setStyleSheet("color: #666; font-size: 10px; font-family: 'Microsoft YaHei';")
         layout.addWidget(self.status_label)
-        
+
+    def _set_source(self, data):
+        # 搜索线程可能正在读取旧的映射
+        self._stop_search()
+        self._search_hits = []
+        self._search_pattern = None
+        self._search_complete = False
+        self.model.set_source(data)
+        self.hex_display.reset()
+        self._update_status(0, 0)
+
+    def open_file(self, file_path) -> bool:
+        """
+        以内存映射方式打开文件
+
+        Returns:
+            bool: 打开成功返回True
+        """
+        self.close_file()
+        try:
+            self._file = open(file_path, 'rb')
+            if self._file.seek(0, 2) > 0:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._set_source(self._mmap)
+            return True
+        except (OSError, ValueError) as e:
+            logger.error(f"打开文件失败 {file_path}: {e}")
+            self.close_file()
+            return False
+
     def load_data(self, data):
         """加载二进制数据并显示为十六进制"""
-        hex_text = ""
-        for i in range(0, len(data), 16):
-            # 地址
-            addr = f"{i:08X}: "
-            
-            # 十六进制数据
-            hex_bytes = []
-            ascii_chars = []
-            
-            for j in range(16):
-                if i + j < len(data):
-                    byte_val = data[i + j]
-                    hex_bytes.append(f"{byte_val:02X}")
-                    # ASCII 字符显示
-                    if 32 <= byte_val <= 126:
-                        ascii_chars.append(chr(byte_val))
-                    else:
-                        ascii_chars.append(".")
-                else:
-                    hex_bytes.append("  ")
-                    ascii_chars.append(" ")
-            
-            # 格式化行
-            hex_part = " ".join(hex_bytes[:8]) + "  " + " ".join(hex_bytes[8:])
-            ascii_part = "".join(ascii_chars)
-            
-            hex_text += f"{addr}{hex_part}  |{ascii_part}|\n"
-            
-        self.hex_display.setPlainText(hex_text)
\ No newline at end of file
+        self.close_file()
+        self._set_source(bytes(data))
+
+    def set_tag_table(self, tag_table):
+        """设置标签索引，用于按标签序号跳转"""
+        self._tag_table = tag_table
+        count = len(tag_table) if tag_table is not None else 0
+        self.tag_input.setRange(0, max(count - 1, 0))
+        self.tag_input.setEnabled(count > 0)
+        self.tag_jump_btn.setEnabled(count > 0)
+
+    def close_file(self):
+        """释放映射的文件"""
+        self._set_source(b'')
+        self.set_tag_table(None)
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def jump_to_offset(self, offset: int, length: int = 0) -> bool:
+        """
+        跳转到指定偏移，并高亮 length 字节
+
+        Returns:
+            bool: 偏移在数据范围内返回True
+        """
+        size = self.model.size
+        if not 0 <= offset < size:
+            return False
+        view = self.hex_display
+        view.cursor_offset = offset
+        view.set_highlight(offset, min(offset + length, size))
+        view.scroll_to_offset(offset)
+        self._update_status(offset, length)
+        return True
+
+    def jump_to_tag(self, tag_index: int) -> bool:
+        """跳转到标签索引中的第 tag_index 个标签，高亮标签头、数据和PreviousTagSize"""
+        table = self._tag_table
+        if table is None or not 0 <= tag_index < len(table):
+            return False
+        offset = table.offset[tag_index]
+        length = TAG_HEADER_SIZE + table.data_size[tag_index] + PREV_TAG_SIZE_LENGTH
+        if not self.jump_to_offset(offset, length):
+            return False
+        tag_name = TAG_TYPE_NAMES.get(table.tag_type[tag_index], '未知')
+        self.status_label.setText(
+            f"位置: 0x{offset:X} | 选中: {length} 字节 | 标签 #{tag_index} ({tag_name}, "
+            f"时间戳 {table.timestamp[tag_index]} ms)")
+        return True
+
+    def _on_offset_entered(self):
+        text = self.offset_input.text().strip()
+        try:
+            offset = int(text, 0)
+        except ValueError:
+            self.status_label.setText(f"无效的偏移: {text}")
+            return
+        if not self.jump_to_offset(offset):
+            self.status_label.setText(f"偏移超出文件范围: 0x{offset:X}")
+
+    def _update_status(self, offset: int, length: int):
+        self.status_label.setText(f"位置: 0x{offset:04X} | 选中: {length} 字节")
+
+    def _search_start_offset(self) -> int:
+        """从当前选中字节之后开始查找"""
+        return self.hex_display.cursor_offset + 1
+
+    def find_next(self):
+        """按当前搜索方式查找下一个匹配"""
+        mode = self.search_mode.currentIndex()
+        text = self.search_input.text()
+        if mode in (SEARCH_KEYFRAME, SEARCH_TIMESTAMP):
+            self._find_next_tag(mode, text)
+            return
+
+        try:
+            pattern = parse_search_pattern(text, mode == SEARCH_HEX)
+        except ValueError as e:
+            self.status_label.setText(f"无效的搜索内容: {e}")
+            return
+
+        start = self._search_start_offset()
+        if pattern == self._search_pattern and self._search_complete:
+            # 已有完整结果，直接在结果中定位
+            hits = self._search_hits
+            if not hits:
+                self.status_label.setText("未找到匹配")
+                return
+            i = bisect_right(hits, start - 1)
+            offset = hits[i] if i < len(hits) else hits[0]
+            self.jump_to_offset(offset, len(pattern))
+            self._show_search_position(offset)
+            return
+
+        self._start_search(pattern, start, find_all=False)
+
+    def find_all(self):
+        """查找全部匹配，结果逐批到达"""
+        mode = self.search_mode.currentIndex()
+        if mode not in (SEARCH_HEX, SEARCH_ASCII):
+            self.find_next()
+            return
+        try:
+            pattern = parse_search_pattern(self.search_input.text(), mode == SEARCH_HEX)
+        except ValueError as e:
+            self.status_label.setText(f"无效的搜索内容: {e}")
+            return
+        self._search_hits = []
+        self._search_pattern = pattern
+        self._search_complete = False
+        self._start_search(pattern, 0, find_all=True)
+
+    def _find_next_tag(self, mode: int, text: str):
+        """在标签索引中查找下一个关键帧或时间戳不小于T的标签"""
+        table = self._tag_table
+        if table is None or not len(table):
+            self.status_label.setText("标签索引尚未加载")
+            return
+        start_row = table.row_after(self.hex_display.cursor_offset)
+        if mode == SEARCH_KEYFRAME:
+            row = table.find_row(start_row, keyframe=True)
+        else:
+            try:
+                min_timestamp = int(text.strip())
+            except ValueError:
+                self.status_label.setText(f"无效的时间戳: {text}")
+                return
+            row = table.find_row(start_row, min_timestamp=min_timestamp)
+        if row < 0:
+            self.status_label.setText("当前位置之后没有匹配的标签")
+            return
+        self.tag_input.setValue(row)
+        self.jump_to_tag(row)
+
+    def _start_search(self, pattern: bytes, start: int, find_all: bool):
+        if self.model.size == 0:
+            return
+        self._stop_search()
+        worker = PatternSearchWorker(self.model.source, pattern, start, find_all)
+        worker.hitsFound.connect(self._on_search_hits)
+        worker.searchFinished.connect(self._on_search_finished)
+        self._search_worker = worker
+        self.status_label.setText("正在搜索...")
+        worker.start()
+
+    def _stop_search(self):
+        worker = self._search_worker
+        if worker is not None:
+            self._search_worker = None
+            worker.requestInterruption()
+            # 最多等待一个块搜索完成
+            worker.wait()
+
+    def _on_search_hits(self, offsets):
+        worker = self.sender()
+        if worker is None or worker is not self._search_worker:
+            return
+        if not worker.find_all:
+            self.jump_to_offset(offsets[0], len(worker.pattern))
+            return
+        first_batch = not self._search_hits
+        self._search_hits.extend(offsets)
+        if first_batch:
+            self.jump_to_offset(offsets[0], len(worker.pattern))
+        self.status_label.setText(f"正在搜索... 已找到 {len(self._search_hits)} 处")
+
+    def _on_search_finished(self, total):
+        worker = self.sender()
+        if worker is None or worker is not self._search_worker:
+            return
+        self._search_worker = None
+        if total < 0:
+            self.status_label.setText("搜索失败")
+        elif total == 0:
+            self.status_label.setText("未找到匹配")
+        elif worker.find_all:
+            self._search_complete = total < MAX_SEARCH_HITS
+            suffix = "" if self._search_complete else f"（结果过多，仅保留前 {MAX_SEARCH_HITS} 处）"
+            self.status_label.setText(f"共找到 {total} 处{suffix}")
+        else:
+            self._show_search_position(self.hex_display.cursor_offset)
+
+    def _show_search_position(self, offset: int):
+        hits = self._search_hits
+        if self._search_complete and hits:
+            i = bisect_right(hits, offset)
+            self.status_label.setText(f"位置: 0x{offset:X} | 第 {i}/{len(hits)} 处")
+        else:
+            self.status_label.setText(f"位置: 0x{offset:X} | 找到匹配")
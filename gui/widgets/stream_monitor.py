@@ -1,13 +1,143 @@
 # -*- coding: utf-8 -*-
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
-                             QTableWidget, QTableWidgetItem, QPushButton, QProgressBar)
-from PyQt5.QtCore import Qt, QTimer
+import queue
+import time
+from array import array
+from typing import Tuple
+
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
+                             QTableView, QHeaderView, QPushButton, QProgressBar, QComboBox)
+from PyQt5.QtCore import Qt, QTimer, QAbstractTableModel, QModelIndex
 from PyQt5.QtGui import QColor, QFont
 
+from core import get_logger
+from core.parser.tag_parser import TAG_TYPE_AUDIO, TAG_TYPE_VIDEO, TAG_TYPE_SCRIPT
+from core.stream_client import StreamClientThread, EVENT_STATUS, EVENT_TAGS, EVENT_STOPPED
+from core.stream_stats import StreamRateMeter, DEFAULT_WINDOWS
+
+logger = get_logger(__name__)
+
+UI_TICK_MS = 100               # 界面刷新间隔，每次刷新处理一批队列事件
+MAX_EVENTS_PER_TICK = 200      # 每次刷新最多处理的队列事件数
+MAX_ROWS = 50000               # 表格保留的最大行数（环形缓冲区容量）
+TIMESTAMP_GAP_WARNING = 1000   # 同类标签时间戳跳变超过该值（毫秒）视为警告
+
+TAG_TYPE_LABELS = {
+    TAG_TYPE_AUDIO: '音频',
+    TAG_TYPE_VIDEO: '视频',
+    TAG_TYPE_SCRIPT: '脚本',
+}
+
+# 行状态
+STATUS_OK = 0
+STATUS_WARNING = 1
+STATUS_ERROR = 2
+STATUS_LABELS = ("正常", "警告", "错误")
+STATUS_COLORS = (QColor(0, 255, 0, 50), QColor(255, 255, 0, 50), QColor(255, 0, 0, 50))
+
+# 单行数据: (接收时间, 标签类型, 大小, 时间戳, 状态)
+StreamRow = Tuple[float, int, int, int, int]
+
+
+class StreamTagModel(QAbstractTableModel):
+    """
+    固定容量的环形缓冲区表格模型
+
+    每列是预分配的 array，写满后新行覆盖最早的行，内存占用与运行时长
+    无关。append_rows() 每次调用最多发出一次 rowsInserted（未满时）
+    和一次 dataChanged（覆盖旧行时），单元格文本在显示时才生成。
+    """
+
+    HEADERS = ("时间", "类型", "大小(B)", "时间戳", "状态")
+
+    def __init__(self, capacity: int = MAX_ROWS, parent=None):
+        super().__init__(parent)
+        self.capacity = capacity
+        self._received = array('d', bytes(8 * capacity))
+        self._tag_type = array('B', bytes(capacity))
+        self._size = array('I', bytes(4 * capacity))
+        self._timestamp = array('I', bytes(4 * capacity))
+        self._status = array('B', bytes(capacity))
+        self._start = 0      # 最早一行在数组中的位置
+        self._count = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._count:
+            return None
+        i = (self._start + index.row()) % self.capacity
+        if role == Qt.DisplayRole:
+            column = index.column()
+            if column == 0:
+                return time.strftime('%H:%M:%S', time.localtime(self._received[i]))
+            if column == 1:
+                tag_type = self._tag_type[i]
+                return TAG_TYPE_LABELS.get(tag_type, str(tag_type))
+            if column == 2:
+                return str(self._size[i])
+            if column == 3:
+                return str(self._timestamp[i])
+            return STATUS_LABELS[self._status[i]]
+        if role == Qt.BackgroundRole:
+            return STATUS_COLORS[self._status[i]]
+        return None
+
+    def append_rows(self, rows):
+        """追加一批行（StreamRow序列），超过容量时只保留最新的部分"""
+        if not rows:
+            return
+        capacity = self.capacity
+        if len(rows) > capacity:
+            rows = rows[-capacity:]
+        count = self._count
+        inserted = min(len(rows), capacity - count)
+        overwritten = len(rows) - inserted
+
+        if inserted:
+            self.beginInsertRows(QModelIndex(), count, count + inserted - 1)
+        pos = (self._start + count) % capacity
+        for received, tag_type, size, timestamp, status in rows:
+            self._received[pos] = received
+            self._tag_type[pos] = tag_type
+            self._size[pos] = size
+            self._timestamp[pos] = timestamp & 0xFFFFFFFF
+            self._status[pos] = status
+            pos += 1
+            if pos == capacity:
+                pos = 0
+        self._count = count + inserted
+        self._start = (self._start + overwritten) % capacity
+        if inserted:
+            self.endInsertRows()
+        if overwritten:
+            # 覆盖最早的行后，所有行整体前移一行；视图只重绘可见部分
+            self.dataChanged.emit(self.index(0, 0),
+                                  self.index(self._count - 1, len(self.HEADERS) - 1),
+                                  [Qt.DisplayRole, Qt.BackgroundRole])
+
+    def clear(self):
+        self.beginResetModel()
+        self._start = 0
+        self._count = 0
+        self.endResetModel()
+
 
 class StreamMonitor(QWidget):
     def __init__(self):
         super().__init__()
+        self.client_thread = None
+        self._events = queue.SimpleQueue()
+        self._last_timestamps = {}     # 标签类型 -> 上一个时间戳
+        self.rate_meter = StreamRateMeter(DEFAULT_WINDOWS)
         self.init_ui()
         self.update_timer = QTimer()
         self.update_timer.timeout.connect(self.update_data)
@@ -25,6 +155,17 @@ class StreamMonitor(QWidget):
         title.setStyleSheet("font-weight: bold; font-size: 12px; font-family: 'Microsoft YaHei';")
         layout.addWidget(title)
         
+        # 拉流地址
+        url_layout = QHBoxLayout()
+        url_label = QLabel("地址:")
+        url_label.setFont(font)
+        self.url_input = QLineEdit()
+        self.url_input.setFont(font)
+        self.url_input.setPlaceholderText("http://host/live/stream.flv")
+        url_layout.addWidget(url_label)
+        url_layout.addWidget(self.url_input)
+        layout.addLayout(url_layout)
+        
         # 实时状态
         status_layout = QHBoxLayout()
         
@@ -34,16 +175,31 @@ class StreamMonitor(QWidget):
         self.fps_label.setFont(font)
         self.bitrate_label = QLabel("比特率: 0 kbps")
         self.bitrate_label.setFont(font)
+        self.gop_label = QLabel("关键帧间隔: -")
+        self.gop_label.setFont(font)
+        self.jitter_label = QLabel("抖动: -")
+        self.jitter_label.setFont(font)
+        self.window_combo = QComboBox()
+        self.window_combo.setFont(font)
+        for length in DEFAULT_WINDOWS:
+            self.window_combo.addItem(f"{length:g} 秒", length)
+        self.window_combo.setToolTip("统计窗口")
+        self.window_combo.currentIndexChanged.connect(lambda _: self._update_rates(time.time()))
         
         status_layout.addWidget(self.status_label)
         status_layout.addStretch()
         status_layout.addWidget(self.fps_label)
         status_layout.addWidget(self.bitrate_label)
+        status_layout.addWidget(self.gop_label)
+        status_layout.addWidget(self.jitter_label)
+        status_layout.addWidget(self.window_combo)
         
         layout.addLayout(status_layout)
         
         # 数据表格
-        self.data_table = QTableWidget()
+        self.data_model = StreamTagModel(MAX_ROWS, self)
+        self.data_table = QTableView()
+        self.data_table.setModel(self.data_model)
         self.setup_table()
         layout.addWidget(self.data_table)
         
@@ -69,9 +225,12 @@ class StreamMonitor(QWidget):
         layout.addLayout(control_layout)
         
     def setup_table(self):
-        headers = ["时间", "类型", "大小(B)", "时间戳", "状态"]
-        self.data_table.setColumnCount(len(headers))
-        self.data_table.setHorizontalHeaderLabels(headers)
+        # 固定行高，行数很多时视图不需要逐行计算高度
+        header = self.data_table.verticalHeader()
+        header.setSectionResizeMode(QHeaderView.Fixed)
+        header.setDefaultSectionSize(self.data_table.fontMetrics().height() + 6)
+        header.hide()
+        self.data_table.setSelectionBehavior(QTableView.SelectRows)
         
         # 设置列宽
         self.data_table.setColumnWidth(0, 80)
@@ -80,47 +239,99 @@ class StreamMonitor(QWidget):
         self.data_table.setColumnWidth(3, 80)
         self.data_table.setColumnWidth(4, 60)
         
-    def start_monitoring(self):
-        """开始监控"""
+    def start_monitoring(self, url=None):
+        """开始拉流监控"""
+        url = (url or self.url_input.text()).strip()
+        if not url:
+            self.status_label.setText("状态: 请输入拉流地址")
+            self.status_label.setStyleSheet("color: red;")
+            return
+        self.url_input.setText(url)
+        self._stop_client()
+        
+        self._events = queue.SimpleQueue()
+        self._last_timestamps.clear()
+        self.rate_meter.reset()
+        self.client_thread = StreamClientThread(url, self._events)
+        self.client_thread.start()
+        logger.info(f"开始拉流监控: {url}")
+        
         self.status_label.setText("状态: 监控中")
         self.status_label.setStyleSheet("color: green;")
-        self.update_timer.start(1000)  # 每秒更新
+        self.update_timer.start(UI_TICK_MS)
         
     def stop_monitoring(self):
         """停止监控"""
+        self._stop_client()
+        self.update_data()
         self.status_label.setText("状态: 已停止")
         self.status_label.setStyleSheet("color: red;")
         self.update_timer.stop()
         
+    def _stop_client(self):
+        if self.client_thread is not None:
+            self.client_thread.stop(timeout=5)
+            self.client_thread = None
+        
     def clear_data(self):
         """清空数据"""
-        self.data_table.setRowCount(0)
+        self.data_model.clear()
+        self.rate_meter.reset()
+        self._update_rates(time.time())
         
     def update_data(self):
-        """更新监控数据"""
-        # TODO: 实现实际的数据更新逻辑
-        pass
-        
-    def add_data_row(self, time_str, data_type, size, timestamp, status):
-        """添加数据行"""
-        row = self.data_table.rowCount()
-        self.data_table.insertRow(row)
-        
-        self.data_table.setItem(row, 0, QTableWidgetItem(time_str))
-        self.data_table.setItem(row, 1, QTableWidgetItem(data_type))
-        self.data_table.setItem(row, 2, QTableWidgetItem(str(size)))
-        self.data_table.setItem(row, 3, QTableWidgetItem(str(timestamp)))
-        self.data_table.setItem(row, 4, QTableWidgetItem(status))
-        
-        # 根据状态设置颜色
-        if status == "正常":
-            color = QColor(0, 255, 0, 50)
-        elif status == "警告":
-            color = QColor(255, 255, 0, 50)
-        else:
-            color = QColor(255, 0, 0, 50)
-            
-        for col in range(5):
-            item = self.data_table.item(row, col)
-            if item:
-                item.setBackground(color)
\ No newline at end of file
+        """处理一批队列中的拉流事件（界面定时器调用）"""
+        rows = []
+        now = time.time()
+        for _ in range(MAX_EVENTS_PER_TICK):
+            try:
+                kind, received, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == EVENT_TAGS:
+                for record in payload:
+                    rows.append(self._tag_row(received, record))
+            elif kind == EVENT_STATUS:
+                self.status_label.setText(f"状态: {payload}")
+            elif kind == EVENT_STOPPED and self.client_thread is not None:
+                self.client_thread = None
+                self.update_timer.stop()
+                self.status_label.setText(f"{self.status_label.text()}（已停止）")
+                self.status_label.setStyleSheet("color: red;")
+                
+        if rows:
+            self._append_rows(rows)
+        self._update_rates(now)
+        
+    def _tag_row(self, received, record) -> StreamRow:
+        """把标签记录转换为表格行，同时计入统计窗口"""
+        _, tag_type, timestamp, data_size = record[:4]
+        self.rate_meter.add_tag(record, received)
+        
+        status = STATUS_OK
+        last = self._last_timestamps.get(tag_type)
+        if last is not None and (timestamp < last or timestamp - last > TIMESTAMP_GAP_WARNING):
+            status = STATUS_WARNING
+        self._last_timestamps[tag_type] = timestamp
+        return received, tag_type, data_size, timestamp, status
+        
+    def _update_rates(self, now):
+        """按所选统计窗口更新帧率、码率、关键帧间隔和抖动"""
+        stats = self.rate_meter.snapshot(self.window_combo.currentData(), now)
+        self.fps_label.setText(f"FPS: {stats['帧率']:.0f}")
+        self.bitrate_label.setText(f"比特率: {stats['总码率_kbps']:.0f} kbps")
+        self.bitrate_label.setToolTip(f"视频 {stats['视频码率_kbps']:.0f} kbps / "
+                                      f"音频 {stats['音频码率_kbps']:.0f} kbps")
+        interval = stats['关键帧间隔_毫秒']
+        self.gop_label.setText(f"关键帧间隔: {interval / 1000:.2f} s" if interval is not None
+                               else "关键帧间隔: -")
+        jitter = stats['抖动_毫秒']
+        self.jitter_label.setText(f"抖动: {jitter:.0f} ms" if jitter is not None else "抖动: -")
+        
+    def _append_rows(self, rows):
+        """一次性追加本次刷新的所有行；原本停在底部时继续跟随最新数据"""
+        scroll_bar = self.data_table.verticalScrollBar()
+        follow = scroll_bar.value() >= scroll_bar.maximum()
+        self.data_model.append_rows(rows)
+        if follow:
+            self.data_table.scrollToBottom()
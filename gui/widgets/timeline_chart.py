@@ -1,50 +1,359 @@
 # -*- coding: utf-8 -*-
+"""
+时间轴图表
+标签大小曲线使用 min/max 金字塔按视图范围选择细节层级，只绘制与屏幕
+像素数相当的点；下方按秒汇总音频/视频码率
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QFont
 import pyqtgraph as pg
 
+from core.parser.tag_parser import TAG_TYPE_AUDIO, TAG_TYPE_VIDEO
+
+LOD_FACTOR = 4            # 相邻层级的合并倍数
+LOD_MIN_BINS = 512        # 最粗层级的分箱数下限
+POINTS_PER_PIXEL = 2      # 每个像素最多绘制的分箱数
+REBUILD_DELAY_MS = 200    # 加载过程中合并多次数据追加后再更新金字塔
+
+
+class _GrowableArray:
+    """按倍数扩容的一维数组，追加的均摊开销为常数；view 为有效部分"""
+
+    __slots__ = ('data', 'size')
+
+    def __init__(self, dtype):
+        self.data = np.empty(1024, dtype=dtype)
+        self.size = 0
+
+    def resize(self, size: int):
+        if size > len(self.data):
+            data = np.empty(max(size, len(self.data) * 2), dtype=self.data.dtype)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+        self.size = size
+
+    @property
+    def view(self) -> np.ndarray:
+        return self.data[:self.size]
+
+
+class MinMaxPyramid:
+    """
+    多分辨率 min/max 金字塔
+
+    第0层是原始点，第k层每个分箱覆盖 LOD_FACTOR**k 个原始点，保存箱内的
+    最小值、最大值和第一个点的横坐标。每层由上一层按 LOD_FACTOR 合并，
+    总内存约为原始数据的 1/(LOD_FACTOR-1)。
+
+    数据可以分批追加（extend）：每层只重新计算受新数据影响的分箱（原来
+    末尾不完整的分箱和之后的新分箱），加载过程中反复追加的总开销与数据量成正比。
+    """
+
+    def __init__(self, x=(), y=()):
+        """
+        Args:
+            x: 横坐标（按数据顺序，大致递增）
+            y: 纵坐标
+        """
+        self._x = _GrowableArray(np.float64)
+        self._y = _GrowableArray(np.float32)
+        # 时间戳可能有少量回退，用累计最大值作为查找键保证单调
+        self._keys = _GrowableArray(np.float64)
+        self._levels: List[Tuple[_GrowableArray, _GrowableArray, _GrowableArray]] = []
+        self.extend(x, y)
+
+    @property
+    def x(self) -> np.ndarray:
+        return self._x.view
+
+    @property
+    def y(self) -> np.ndarray:
+        return self._y.view
+
+    @property
+    def levels(self) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """各层的 (x, min, max)"""
+        return [(xs.view, low.view, high.view) for xs, low, high in self._levels]
+
+    def extend(self, x, y):
+        """追加一批点并更新各层"""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float32)
+        if not len(x):
+            return
+        old = len(self)
+        size = old + len(x)
+        keys = np.maximum.accumulate(x)
+        if old:
+            np.maximum(keys, self._keys.data[old - 1], out=keys)
+        for array, values in ((self._x, x), (self._y, y), (self._keys, keys)):
+            array.resize(size)
+            array.data[old:size] = values
+
+        # dirty 为上一层中第一个发生变化的分箱，本层从包含它的分箱开始重新计算
+        dirty = old
+        xs, low, high = self.x, self.y, self.y
+        level = 0
+        while len(low) > LOD_MIN_BINS:
+            first = dirty // LOD_FACTOR
+            if level == len(self._levels):
+                self._levels.append((_GrowableArray(np.float64), _GrowableArray(np.float32),
+                                     _GrowableArray(np.float32)))
+                first = 0
+            tail_low, tail_high = low[first * LOD_FACTOR:], high[first * LOD_FACTOR:]
+            pad = -len(tail_low) % LOD_FACTOR
+            if pad:
+                # 末尾不完整的分箱用最后一个值填充，不影响最小/最大值
+                tail_low = np.concatenate((tail_low, np.repeat(tail_low[-1:], pad)))
+                tail_high = np.concatenate((tail_high, np.repeat(tail_high[-1:], pad)))
+            values = (xs[first * LOD_FACTOR::LOD_FACTOR],
+                      tail_low.reshape(-1, LOD_FACTOR).min(axis=1),
+                      tail_high.reshape(-1, LOD_FACTOR).max(axis=1))
+            count = first + len(values[0])
+            for array, part in zip(self._levels[level], values):
+                array.resize(count)
+                array.data[first:count] = part
+            xs, low, high = (array.view for array in self._levels[level])
+            dirty = first
+            level += 1
+
+    def __len__(self) -> int:
+        return self._x.size
+
+    def index_range(self, x0: float, x1: float) -> Tuple[int, int]:
+        """横坐标范围 [x0, x1] 对应的原始点下标范围（两端各多取一个点）"""
+        keys = self._keys.view
+        start = max(int(np.searchsorted(keys, x0, 'left')) - 1, 0)
+        stop = min(int(np.searchsorted(keys, x1, 'right')) + 1, len(keys))
+        return start, stop
+
+    def render(self, start: int, stop: int, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        取下标范围 [start, stop) 内不超过 max_points 个分箱的绘图数据
+
+        分箱以 (x, min), (x, max) 两个点的折线绘制，峰值不会因抽样丢失。
+        """
+        count = stop - start
+        if count <= max_points or not self._levels:
+            return self.x[start:stop], self.y[start:stop]
+
+        level = 0
+        scale = 1
+        while level < len(self._levels) and count // scale > max_points:
+            level += 1
+            scale *= LOD_FACTOR
+        xs, low, high = (array.view for array in self._levels[level - 1])
+        first = start // scale
+        last = -(-stop // scale)
+        xs = xs[first:last]
+        points_x = np.repeat(xs, 2)
+        points_y = np.empty(len(xs) * 2, dtype=np.float32)
+        points_y[0::2] = low[first:last]
+        points_y[1::2] = high[first:last]
+        return points_x, points_y
+
+
+def per_second_bitrate(timestamps, sizes, tag_types=None):
+    """
+    按秒汇总码率
+
+    Args:
+        timestamps: 时间戳（毫秒）
+        sizes: 数据大小（字节）
+        tag_types: 标签类型；为None时只计算总码率
+
+    Returns:
+        dict: 'video'/'audio'/'total' -> 每秒码率数组(kbps)，下标为秒
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=np.float64)
+    if not len(timestamps):
+        return {'total': np.zeros(0)}
+    seconds = np.maximum(timestamps, 0) // 1000
+    length = int(seconds.max()) + 1
+    result = {'total': np.bincount(seconds, weights=sizes, minlength=length) * 8 / 1000}
+    if tag_types is not None:
+        tag_types = np.asarray(tag_types)
+        for name, tag_type in (('video', TAG_TYPE_VIDEO), ('audio', TAG_TYPE_AUDIO)):
+            mask = tag_types == tag_type
+            result[name] = np.bincount(seconds[mask], weights=sizes[mask], minlength=length) * 8 / 1000
+    return result
+
 
 class TimelineChart(QWidget):
     def __init__(self):
         super().__init__()
+        # 尚未加入金字塔和码率统计的数据块
+        self._chunks: List[Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]] = []
+        self._reset_data()
+        self._rebuild_timer = QTimer(self)
+        self._rebuild_timer.setSingleShot(True)
+        self._rebuild_timer.timeout.connect(self._rebuild)
         self.init_ui()
-        
+
     def init_ui(self):
         layout = QVBoxLayout(self)
         layout.setContentsMargins(5, 5, 5, 5)
-        
+
         # 设置微软雅黑字体
         font = QFont("Microsoft YaHei", 10)
-        
+
         # 标题
         title = QLabel("时间轴分析")
         title.setFont(font)
         title.setStyleSheet("font-weight: bold; font-size: 12px; font-family: 'Microsoft YaHei';")
         layout.addWidget(title)
-        
+
         # 图表区域
         self.plot_widget = pg.PlotWidget()
         self.plot_widget.setLabel('left', '数据大小 (KB)')
         self.plot_widget.setLabel('bottom', '时间 (秒)')
         self.plot_widget.setTitle('FLV 数据流分析')
-        layout.addWidget(self.plot_widget)
-        
+        self.size_curve = self.plot_widget.plot(pen='b', name='数据流')
+        self.plot_widget.getPlotItem().sigXRangeChanged.connect(self._update_visible)
+        layout.addWidget(self.plot_widget, 3)
+
+        # 每秒码率
+        self.bitrate_widget = pg.PlotWidget()
+        self.bitrate_widget.setLabel('left', '码率 (kbps)')
+        self.bitrate_widget.setLabel('bottom', '时间 (秒)')
+        self.bitrate_widget.addLegend()
+        self.bitrate_widget.setXLink(self.plot_widget)
+        self.video_rate_curve = self.bitrate_widget.plot(pen='b', name='视频')
+        self.audio_rate_curve = self.bitrate_widget.plot(pen='g', name='音频')
+        # 码率曲线每秒一个点，长录像也只有几万点，用pyqtgraph自带的裁剪和峰值抽样即可
+        for curve in (self.video_rate_curve, self.audio_rate_curve):
+            curve.setClipToView(True)
+            curve.setDownsampling(auto=True, method='peak')
+        layout.addWidget(self.bitrate_widget, 2)
+
         # 控制按钮
         control_layout = QHBoxLayout()
-        
+
         self.refresh_btn = QPushButton("刷新")
         self.refresh_btn.setFont(font)
+        self.refresh_btn.clicked.connect(self.reset_view)
         self.export_btn = QPushButton("导出")
         self.export_btn.setFont(font)
-        
+
         control_layout.addWidget(self.refresh_btn)
         control_layout.addWidget(self.export_btn)
         control_layout.addStretch()
-        
+
         layout.addLayout(control_layout)
-        
+
     def update_chart(self, time_data, size_data):
-        """更新时间轴图表数据"""
-        self.plot_widget.clear()
-        self.plot_widget.plot(time_data, size_data, pen='b', name='数据流')
\ No newline at end of file
+        """更新时间轴图表数据（时间为秒、大小为KB，不区分音视频）"""
+        timestamps = np.asarray(time_data, dtype=np.float64) * 1000
+        sizes = np.asarray(size_data, dtype=np.float64) * 1024
+        self.set_data(timestamps.astype(np.int64), sizes)
+
+    def set_data(self, timestamps, sizes, tag_types=None):
+        """
+        替换图表数据
+
+        Args:
+            timestamps: 标签时间戳（毫秒）
+            sizes: 标签数据大小（字节）
+            tag_types: 标签类型，用于分别统计音视频码率
+        """
+        self._chunks = []
+        self._reset_data()
+        self.append_data(timestamps, sizes, tag_types)
+        self._rebuild()
+
+    def append_data(self, timestamps, sizes, tag_types=None):
+        """追加一批标签，短时间内的多次追加合并后只处理新增部分"""
+        if not len(timestamps):
+            return
+        self._chunks.append((np.asarray(timestamps, dtype=np.int64),
+                             np.asarray(sizes, dtype=np.float64),
+                             None if tag_types is None else np.asarray(tag_types, dtype=np.uint8)))
+        if not self._rebuild_timer.isActive():
+            self._rebuild_timer.start(REBUILD_DELAY_MS)
+
+    def clear_chart(self):
+        """清空图表"""
+        self._rebuild_timer.stop()
+        self._chunks = []
+        self._reset_data()
+        self.size_curve.setData([], [])
+        self.video_rate_curve.setData([], [])
+        self.audio_rate_curve.setData([], [])
+        self.reset_view()
+
+    def reset_view(self):
+        """恢复自动缩放，显示全部数据"""
+        self.plot_widget.enableAutoRange()
+        self.bitrate_widget.enableAutoRange()
+        self._update_visible()
+
+    def _reset_data(self):
+        self._pyramid = MinMaxPyramid()
+        # 每秒码率(kbps)，下标为秒；任何一批数据没有标签类型时只显示总码率
+        self._rates = {name: _GrowableArray(np.float64) for name in ('video', 'audio', 'total')}
+        self._typed = True
+
+    def _take_chunks(self):
+        """取出并合并尚未处理的数据块"""
+        chunks, self._chunks = self._chunks, []
+        if len(chunks) == 1:
+            return chunks[0]
+        timestamps = np.concatenate([chunk[0] for chunk in chunks])
+        sizes = np.concatenate([chunk[1] for chunk in chunks])
+        if any(chunk[2] is None for chunk in chunks):
+            tag_types = None
+        else:
+            tag_types = np.concatenate([chunk[2] for chunk in chunks])
+        return timestamps, sizes, tag_types
+
+    def _rebuild(self):
+        """把新追加的数据加入 min/max 金字塔和每秒码率，已处理的部分不再重新计算"""
+        self._rebuild_timer.stop()
+        if self._chunks:
+            timestamps, sizes, tag_types = self._take_chunks()
+            self._pyramid.extend(timestamps / 1000, sizes / 1024)
+
+            if tag_types is None:
+                self._typed = False
+            rates = per_second_bitrate(timestamps, sizes, tag_types)
+            length = len(rates['total'])
+            for name, array in self._rates.items():
+                if length > array.size:
+                    old = array.size
+                    array.resize(length)
+                    array.data[old:length] = 0
+                if name in rates:
+                    array.data[:length] += rates[name]
+
+        total = self._rates['total'].view
+        # 每秒的码率画在该秒的中点
+        centers = np.arange(len(total)) + 0.5
+        if not self._typed:
+            self.video_rate_curve.setData(centers, total)
+            self.audio_rate_curve.setData([], [])
+        else:
+            self.video_rate_curve.setData(centers, self._rates['video'].view)
+            self.audio_rate_curve.setData(centers, self._rates['audio'].view)
+        self._update_visible()
+
+    def _update_visible(self, *_):
+        """按当前视图范围和宽度选择层级，只设置可见部分的点"""
+        pyramid = self._pyramid
+        if not len(pyramid):
+            return
+        view_box = self.plot_widget.getPlotItem().getViewBox()
+        if view_box.autoRangeEnabled()[0]:
+            # 自动缩放时显示全部数据，让视图范围随数据扩展
+            start, stop = 0, len(pyramid)
+        else:
+            x0, x1 = view_box.viewRange()[0]
+            start, stop = pyramid.index_range(x0, x1)
+        max_points = max(int(view_box.width()), 200) * POINTS_PER_PIXEL
+        xs, ys = pyramid.render(start, stop, max_points)
+        self.size_curve.setData(xs, ys)
@@ -4,16 +4,110 @@
 用于在GUI中播放和显示视频
 """
 
+import queue
 import numpy as np
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                              QPushButton, QSlider, QSizePolicy)
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
 from PyQt5.QtGui import QPixmap, QImage, QFont
 
 from core import get_logger
+from core.frame_cache import FrameCache, DEFAULT_CACHE_MB
 
 logger = get_logger(__name__)
 
+# 预读帧数
+DEFAULT_PREFETCH_FRAMES = 25
+
+# 元数据中没有帧率时使用的帧间隔（毫秒）
+DEFAULT_FRAME_INTERVAL_MS = 40
+
+
+def frame_to_qimage(frame) -> QImage:
+    """将RGB帧数据转换为独立持有内存的QImage"""
+    height, width, _ = frame.shape
+    if frame.dtype != np.uint8:
+        frame = frame.astype(np.uint8)
+    frame = np.ascontiguousarray(frame)
+    return QImage(frame.data, width, height, 3 * width, QImage.Format_RGB888).copy()
+
+
+class FrameDecodeWorker(QThread):
+    """
+    后台解码线程
+
+    只处理最新的定位请求，解码目标帧后继续预读后续帧，
+    结果写入共享的帧缓存并通过frameReady信号通知界面线程。
+    """
+
+    frameReady = pyqtSignal(int)  # 帧槽位编号
+
+    def __init__(self, flv_handler, frame_cache: FrameCache, frame_interval_ms: float,
+                 duration: float, prefetch_frames: int = DEFAULT_PREFETCH_FRAMES):
+        super().__init__()
+        self.flv_handler = flv_handler
+        self.frame_cache = frame_cache
+        self.frame_interval_ms = frame_interval_ms
+        self.duration = duration
+        self.prefetch_frames = prefetch_frames
+        self._requests = queue.Queue()
+        self._stopped = False
+
+    def frame_key(self, position: float) -> int:
+        """时间（秒）对应的帧槽位编号"""
+        return int(position * 1000 // self.frame_interval_ms)
+
+    def request(self, position: float):
+        """请求解码指定时间的帧（只保留最新请求）"""
+        self._requests.put(position)
+
+    def stop(self):
+        """停止线程并等待退出"""
+        self._stopped = True
+        self._requests.put(None)
+        self.wait()
+
+    def _latest_request(self, timeout: float):
+        position = self._requests.get(timeout=timeout)
+        while True:
+            try:
+                position = self._requests.get_nowait()
+            except queue.Empty:
+                return position
+
+    def _decode(self, key: int):
+        if key in self.frame_cache:
+            return
+        # 取槽位中点，避免浮点误差落到前一帧
+        time_seconds = (key + 0.5) * self.frame_interval_ms / 1000
+        frame = self.flv_handler.get_frame_at_time(time_seconds)
+        if frame is None:
+            return
+        image = frame_to_qimage(frame)
+        self.frame_cache.put(key, image, image.byteCount())
+        self.frameReady.emit(key)
+
+    def run(self):
+        last_key = int(self.duration * 1000 // self.frame_interval_ms)
+        while not self._stopped:
+            try:
+                position = self._latest_request(timeout=0.2)
+            except queue.Empty:
+                continue
+            if position is None or self._stopped:
+                break
+
+            key = self.frame_key(position)
+            try:
+                self._decode(key)
+                # 没有新请求时预读后续帧
+                for next_key in range(key + 1, min(key + 1 + self.prefetch_frames, last_key + 1)):
+                    if self._stopped or not self._requests.empty():
+                        break
+                    self._decode(next_key)
+            except Exception as e:
+                logger.error(f"后台解码失败: {e}")
+
 
 class VideoPlayer(QWidget):
     """视频播放器组件"""
@@ -23,12 +117,22 @@ class VideoPlayer(QWidget):
     durationChanged = pyqtSignal(float)  # 总时长改变
     stateChanged = pyqtSignal(str)       # 播放状态改变
     
-    def __init__(self):
+    def __init__(self, cache_mb: int = DEFAULT_CACHE_MB,
+                 prefetch_frames: int = DEFAULT_PREFETCH_FRAMES):
+        """
+        Args:
+            cache_mb: 解码帧缓存的内存预算（MB）
+            prefetch_frames: 当前位置之后预读的帧数
+        """
         super().__init__()
         self.flv_handler = None
         self.duration = 0.0
         self.current_position = 0.0
         self.is_playing = False
+        self.frame_cache = FrameCache(cache_mb * 1024 * 1024)
+        self.prefetch_frames = prefetch_frames
+        self.decode_worker = None
+        self._wanted_key = -1
         self.playback_timer = QTimer()
         self.playback_timer.timeout.connect(self._update_playback)
         
@@ -125,16 +229,19 @@ class VideoPlayer(QWidget):
         try:
             self.flv_handler = flv_handler
             
-            if not flv_handler or not flv_handler.video_clip:
+            if not flv_handler or not flv_handler.is_video_available():
                 self.video_label.setText("无法加载视频\n请检查文件格式")
                 self.status_label.setText("错误: 无法加载视频")
                 self._set_controls_enabled(False)
                 return False
                 
             # 获取视频信息
-            self.duration = flv_handler.video_clip.duration
+            self.duration = flv_handler.get_duration()
             self.current_position = 0.0
             
+            # 启动后台解码线程
+            self._start_decode_worker()
+            
             # 更新界面
             self._update_duration_display()
             self._set_controls_enabled(True)
@@ -165,7 +272,7 @@ class VideoPlayer(QWidget):
             
     def play(self):
         """开始播放"""
-        if not self.flv_handler or not self.flv_handler.video_clip:
+        if not self.is_video_loaded():
             return
             
         self.is_playing = True
@@ -200,7 +307,7 @@ class VideoPlayer(QWidget):
         Args:
             position: 位置（0.0-1.0）
         """
-        if not self.flv_handler or not self.flv_handler.video_clip:
+        if not self.is_video_loaded():
             return
             
         self.current_position = position * self.duration
@@ -225,31 +332,63 @@ class VideoPlayer(QWidget):
         self._display_frame_at_position(self.current_position)
         self.positionChanged.emit(self.current_position)
         
+    def _start_decode_worker(self):
+        """为当前文件启动后台解码线程"""
+        self.stop_decode_worker()
+        
+        framerate = self.flv_handler.metadata.get('framerate') if self.flv_handler.metadata else None
+        if isinstance(framerate, (int, float)) and framerate > 0:
+            frame_interval_ms = 1000.0 / framerate
+        else:
+            frame_interval_ms = DEFAULT_FRAME_INTERVAL_MS
+            
+        self.decode_worker = FrameDecodeWorker(self.flv_handler, self.frame_cache, frame_interval_ms,
+                                               self.duration, self.prefetch_frames)
+        self.decode_worker.frameReady.connect(self._on_frame_ready)
+        self.decode_worker.start()
+        
+    def stop_decode_worker(self):
+        """停止后台解码线程并清空帧缓存"""
+        if self.decode_worker is not None:
+            self.decode_worker.stop()
+            self.decode_worker = None
+        self.frame_cache.clear()
+        self._wanted_key = -1
+        
+    def set_cache_budget(self, cache_mb: int):
+        """设置解码帧缓存的内存预算（MB）"""
+        self.frame_cache.set_max_bytes(cache_mb * 1024 * 1024)
+        
     def _display_frame_at_position(self, position: float):
-        """在指定位置显示视频帧"""
-        if not self.flv_handler:
+        """
+        在指定位置显示视频帧
+        
+        只从帧缓存取图像，未命中时向解码线程发出请求，
+        帧就绪后由 _on_frame_ready 显示，界面线程不做解码。
+        """
+        if not self.flv_handler or self.decode_worker is None:
             return
             
-        try:
-            # 获取视频帧
-            frame = self.flv_handler.get_frame_at_time(position)
-            if frame is None:
-                return
-                
-            # 转换为QImage
-            height, width, channel = frame.shape
-            bytes_per_line = 3 * width
-            
-            # 确保数据类型正确
-            if frame.dtype != np.uint8:
-                frame = frame.astype(np.uint8)
-                
-            q_image = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888)
-            
-            # 转换为QPixmap并显示
-            pixmap = QPixmap.fromImage(q_image)
-            self.video_label.setPixmap(pixmap)
+        key = self.decode_worker.frame_key(position)
+        self._wanted_key = key
+        image = self.frame_cache.get(key)
+        if image is not None:
+            self._show_image(image)
+        # 命中时也发出请求，让解码线程继续预读后续帧
+        self.decode_worker.request(position)
+        
+    def _on_frame_ready(self, key: int):
+        """解码线程完成一帧"""
+        if key != self._wanted_key:
+            return
+        image = self.frame_cache.get(key)
+        if image is not None:
+            self._show_image(image)
             
+    def _show_image(self, image: QImage):
+        """显示已解码的图像"""
+        try:
+            self.video_label.setPixmap(QPixmap.fromImage(image))
         except Exception as e:
             logger.error(f"显示视频帧失败: {e}")
             
@@ -296,17 +435,19 @@ class VideoPlayer(QWidget):
             self.play()
             
     def _slider_value_changed(self, value):
-        """滑块值改变时更新显示"""
-        if not hasattr(self, '_was_playing'):  # 只在拖拽时更新
+        """拖动滑块时更新显示，关键帧定位使拖动过程中也能实时出帧"""
+        if not self.position_slider.isSliderDown():  # 只在拖拽时更新
             return
             
         position_percent = value / 1000.0
         self.current_position = position_percent * self.duration
         self._update_duration_display()
+        self._display_frame_at_position(self.current_position)
         
     def close_video(self):
         """关闭视频"""
         self.stop()
+        self.stop_decode_worker()
         if self.flv_handler:
             self.flv_handler.close()
         self.flv_handler = None
@@ -325,4 +466,4 @@ class VideoPlayer(QWidget):
         
     def is_video_loaded(self) -> bool:
         """检查是否已加载视频"""
-        return self.flv_handler is not None and self.flv_handler.video_clip is not None
\ No newline at end of file
+        return self.flv_handler is not None and self.flv_handler.is_video_available()
\ No newline at end of file
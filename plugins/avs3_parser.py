@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+AVS3解析插件
+按起始码扫描AVS3码流，解析序列头、序列显示扩展和图像头，
+得到逐图像的类型(I/P/B)以及序列级参数
+"""
+
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from core.utils.binary_utils import BitReader, BitReaderError
+from core.parser.es_processor import (ESParseError, VideoFormat, iter_start_code_units,
+                                      SLICE_B, SLICE_P, SLICE_I, SLICE_UNKNOWN, SLICE_TYPE_CHARS)
+from plugins.plugin_manager import AnalysisPlugin
+
+# 起始码值（00 00 01 之后的字节）；0x00~0x8F为片起始码
+AVS3_LAST_SLICE_START_CODE = 0x8F
+AVS3_SEQUENCE_HEADER = 0xB0
+AVS3_SEQUENCE_END = 0xB1
+AVS3_USER_DATA = 0xB2
+AVS3_INTRA_PICTURE = 0xB3
+AVS3_EXTENSION = 0xB5
+AVS3_INTER_PICTURE = 0xB6
+AVS3_VIDEO_EDIT = 0xB7
+
+AVS3_PROFILE_NAMES = {
+    0x20: 'Main',
+    0x22: 'Main 10',
+    0x30: 'High',
+    0x32: 'High 10',
+}
+
+# 序列头中带encoding_precision字段的10位档次
+AVS3_10BIT_PROFILES = (0x22, 0x32)
+
+# frame_rate_code -> 帧率，0和14以上为保留值
+AVS3_FRAME_RATES = (None, 24000 / 1001, 24.0, 25.0, 30000 / 1001, 30.0, 50.0, 60000 / 1001,
+                    60.0, 100.0, 120.0, 200.0, 240.0, 300.0)
+
+# 码率以400bit/s为单位
+AVS3_BIT_RATE_UNIT = 400
+
+# 扩展起始码后的extension_id：序列显示扩展
+AVS3_SEQUENCE_DISPLAY_EXTENSION = 0x2
+
+# picture_coding_type -> H.264片类型编码
+AVS3_PICTURE_TYPES = {1: SLICE_P, 2: SLICE_B}
+
+# 图像头只读取到picture_coding_type，截取的前缀长度
+AVS3_PICTURE_HEADER_BYTES = 8
+
+
+class AVS3SequenceHeader(VideoFormat):
+    """
+    AVS3序列头
+
+    序列头各字段之间有标记位，不会出现需要去除的起始码竞争位，按位直接读取。
+    颜色描述来自随后的序列显示扩展（apply_display_extension）。
+    """
+
+    __slots__ = ('profile_id', 'level_id', 'progressive', 'field_coded', 'library_stream',
+                 'library_picture_enable', 'aspect_ratio', 'frame_rate_code', 'bit_rate',
+                 'low_delay', 'temporal_id_enable', 'bbv_buffer_size', 'max_dpb_size')
+
+    # libuavs3d不输出yuvj像素格式
+    JPEG_RANGE_CHROMA = ()
+
+    @property
+    def profile_name(self) -> str:
+        return AVS3_PROFILE_NAMES.get(self.profile_id, f'Profile 0x{self.profile_id:02X}')
+
+    @property
+    def level(self) -> str:
+        """级别（level_id 原值，如 '0x22'）"""
+        return f"0x{self.level_id:02X}"
+
+    @staticmethod
+    def _marker(reader: BitReader):
+        if not reader.read_bit():
+            raise ESParseError("序列头标记位不为1")
+
+    @classmethod
+    def parse(cls, unit) -> 'AVS3SequenceHeader':
+        """
+        解析序列头（起始码值0xB0之后的数据）
+
+        Raises:
+            ESParseError: 数据不足、标记位错误或字段超出范围
+        """
+        header = cls()
+        header._reset_format()
+        try:
+            reader = BitReader(unit[:32])
+            header.profile_id = reader.read_bits(8)
+            header.level_id = reader.read_bits(8)
+            header.progressive = reader.read_flag()
+            header.field_coded = reader.read_flag()
+            header.library_stream = reader.read_flag()
+            header.library_picture_enable = False
+            if not header.library_stream:
+                header.library_picture_enable = reader.read_flag()
+                if header.library_picture_enable:
+                    reader.skip_bits(1)    # duplicate_sequence_header_flag
+            cls._marker(reader)
+            header.width = reader.read_bits(14)
+            cls._marker(reader)
+            header.height = reader.read_bits(14)
+            header.chroma_format_idc = reader.read_bits(2)
+            precision = reader.read_bits(3)    # sample_precision
+            if header.profile_id in AVS3_10BIT_PROFILES:
+                precision = reader.read_bits(3)    # encoding_precision
+            cls._marker(reader)
+            header.aspect_ratio = reader.read_bits(4)
+            header.frame_rate_code = reader.read_bits(4)
+            cls._marker(reader)
+            bit_rate_lower = reader.read_bits(18)
+            cls._marker(reader)
+            header.bit_rate = ((reader.read_bits(12) << 18) | bit_rate_lower) * AVS3_BIT_RATE_UNIT
+            header.low_delay = reader.read_flag()
+            header.temporal_id_enable = reader.read_flag()
+            cls._marker(reader)
+            header.bbv_buffer_size = reader.read_bits(18)
+            cls._marker(reader)
+            header.max_dpb_size = reader.read_bits(4) + 1
+        except BitReaderError as e:
+            raise ESParseError(f"序列头数据不完整: {e}") from e
+        if precision not in (1, 2) or not header.width or not header.height:
+            raise ESParseError("序列头字段超出范围")
+        header.bit_depth_luma = 6 + 2 * precision
+        if header.frame_rate_code < len(AVS3_FRAME_RATES):
+            header.frame_rate = AVS3_FRAME_RATES[header.frame_rate_code]
+        return header
+
+    def apply_display_extension(self, unit) -> bool:
+        """
+        读取序列显示扩展（起始码值0xB5之后的数据）中的取值范围和颜色描述
+
+        Returns:
+            bool: 是否为序列显示扩展
+        """
+        try:
+            reader = BitReader(unit[:5])
+            if reader.read_bits(4) != AVS3_SEQUENCE_DISPLAY_EXTENSION:
+                return False
+            reader.skip_bits(3)    # video_format
+            self.full_range = reader.read_flag()    # sample_range
+            if reader.read_flag():    # colour_description
+                self.colour_primaries = reader.read_bits(8)
+                self.transfer_characteristics = reader.read_bits(8)
+                self.matrix_coefficients = reader.read_bits(8)
+        except BitReaderError:
+            return False
+        return True
+
+
+class AVS3PictureHeader:
+    """
+    AVS3图像头
+
+    slice_type 为H.264的片类型编码：帧内图像头为I，帧间图像头按picture_coding_type
+    区分P/B，无法识别时为 SLICE_UNKNOWN。
+    """
+
+    __slots__ = ('start_code', 'slice_type', 'random_access_decodable')
+
+    def __init__(self, start_code: int, slice_type: int, random_access_decodable: bool = True):
+        self.start_code = start_code
+        self.slice_type = slice_type
+        self.random_access_decodable = random_access_decodable
+
+    @property
+    def intra(self) -> bool:
+        return self.start_code == AVS3_INTRA_PICTURE
+
+    @property
+    def frame_type(self) -> str:
+        """I/P/B，未知为 '?'"""
+        return SLICE_TYPE_CHARS[self.slice_type] if self.slice_type < len(SLICE_TYPE_CHARS) else '?'
+
+    @classmethod
+    def parse(cls, start_code: int, unit) -> 'AVS3PictureHeader':
+        """
+        解析图像头开头的字段（起始码值之后的数据）
+
+        Raises:
+            ESParseError: 帧间图像头数据不足
+        """
+        if start_code == AVS3_INTRA_PICTURE:
+            return cls(start_code, SLICE_I)
+        try:
+            reader = BitReader(unit[:AVS3_PICTURE_HEADER_BYTES])
+            random_access_decodable = reader.read_flag()
+            reader.skip_bits(32)    # bbv_delay
+            coding_type = reader.read_bits(2)
+        except BitReaderError as e:
+            raise ESParseError(f"图像头数据不完整: {e}") from e
+        return cls(start_code, AVS3_PICTURE_TYPES.get(coding_type, SLICE_UNKNOWN), random_access_decodable)
+
+    def __repr__(self):
+        return f"AVS3PictureHeader(type={self.frame_type}, random_access={self.random_access_decodable})"
+
+
+class AVS3Parser:
+    """
+    AVS3起始码/图像头解析器
+
+    AVS3码流只有起始码格式；序列头按解码顺序保存，同一个解析器应依次处理同一条流。
+    """
+
+    def __init__(self):
+        self.sequence: Optional[AVS3SequenceHeader] = None
+
+    def reset(self):
+        """AVS3图像头不依赖前一图像的状态，保留序列头即可"""
+
+    def parse_unit(self, unit) -> Optional[AVS3PictureHeader]:
+        """
+        解析一个起始码单元（以起始码值开头）：序列头和显示扩展被保存，图像头返回解析结果
+
+        Raises:
+            ESParseError: 序列头或图像头损坏
+        """
+        start_code = unit[0]
+        if start_code in (AVS3_INTRA_PICTURE, AVS3_INTER_PICTURE):
+            return AVS3PictureHeader.parse(start_code, unit[1:])
+        if start_code == AVS3_SEQUENCE_HEADER:
+            self.sequence = AVS3SequenceHeader.parse(unit[1:])
+        elif start_code == AVS3_EXTENSION and self.sequence is not None:
+            self.sequence.apply_display_extension(unit[1:])
+        return None
+
+    def scan(self, buffer, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, AVS3PictureHeader]]:
+        """
+        扫描AVS3码流，按解码顺序返回每个图像的 (起始码值偏移, 图像头)
+
+        起始码用缓冲区的 find 查找，片数据不做任何处理，适合直接扫描内存映射的大文件；
+        损坏的图像头被跳过。
+        """
+        for unit_start, unit_end in iter_start_code_units(buffer, start, end):
+            start_code = buffer[unit_start]
+            if start_code <= AVS3_LAST_SLICE_START_CODE:
+                continue
+            try:
+                if start_code in (AVS3_INTRA_PICTURE, AVS3_INTER_PICTURE):
+                    header_end = min(unit_end, unit_start + 1 + AVS3_PICTURE_HEADER_BYTES)
+                    yield unit_start, AVS3PictureHeader.parse(start_code, buffer[unit_start + 1:header_end])
+                else:
+                    self.parse_unit(buffer[unit_start:min(unit_end, unit_start + 64)])
+            except ESParseError:
+                continue
+
+    def deep_parse(self, data) -> Dict[str, Any]:
+        """
+        解析一段AVS3 ES数据（起始码格式）
+
+        Returns:
+            dict: 起始码值列表和图像类型列表；包含图像头时还有第一个图像的帧类型；
+                已知序列头时附带序列参数
+
+        Raises:
+            ESParseError: 数据中没有起始码，或序列头/图像头损坏
+        """
+        data = bytes(data)
+        start_codes = []
+        pictures = []
+        for unit_start, unit_end in iter_start_code_units(data):
+            start_codes.append(data[unit_start])
+            picture = self.parse_unit(data[unit_start:unit_end])
+            if picture is not None:
+                pictures.append(picture)
+        if not start_codes:
+            raise ESParseError("未找到AVS3起始码")
+
+        result = {"codec": "avs3", "start_codes": start_codes,
+                  "picture_types": ''.join(picture.frame_type for picture in pictures), "parsed": True}
+        if pictures:
+            result.update({
+                "frame_type": pictures[0].frame_type,
+                "slice_type": pictures[0].slice_type,
+                "intra": pictures[0].intra,
+                "random_access_decodable": pictures[0].random_access_decodable,
+            })
+        sequence = self.sequence
+        if sequence is not None:
+            result.update({
+                "profile": sequence.profile_name,
+                "level": sequence.level,
+                "size": (sequence.width, sequence.height),
+                "pixel_format": sequence.pixel_format,
+                "color_space": sequence.color_space,
+                "frame_rate": sequence.frame_rate,
+                "bit_rate": sequence.bit_rate,
+                "progressive": sequence.progressive,
+                "low_delay": sequence.low_delay,
+            })
+        return result
+
+
+class AVS3ParserPlugin(AnalysisPlugin):
+    """注册AVS3解析器，供 ESProcessor.parse_es(data, 'avs3') 使用"""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "AVS3解析插件"
+
+    def register_hooks(self, hook_manager):
+        hook_manager.register_codec_parser('avs3', AVS3Parser)
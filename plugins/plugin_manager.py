@@ -1,15 +1,144 @@
-# plugins/plugin_manager.py
+# -*- coding: utf-8 -*-
+"""
+插件管理
+加载 plugins/ 目录中的分析插件；插件通过钩子管理器注册钩子函数，
+以及ESProcessor使用的编码解析器
+"""
+
+import importlib
+import os
+import pkgutil
+from typing import Any, Callable, Dict, List, Optional
+
+from core import get_logger
+
+logger = get_logger(__name__)
+
+HOOK_PRE_TAG_PARSE = 'pre_tag_parse'
+HOOK_POST_ES_EXTRACT = 'post_es_extract'
+HOOK_REPORT_GENERATE = 'report_generate'
+HOOK_NAMES = (HOOK_PRE_TAG_PARSE, HOOK_POST_ES_EXTRACT, HOOK_REPORT_GENERATE)
+
+PLUGIN_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
 class AnalysisPlugin:
     PLUGIN_API_VERSION = 1.0
-    
+
     def __init__(self):
         self.name = "Unnamed Plugin"
-        
+
     def register_hooks(self, hook_manager):
         """
         注册钩子函数到以下位置：
         - pre_tag_parse: Tag解析前
         - post_es_extract: ES提取后
         - report_generate: 报告生成时
+
+        也可以通过 hook_manager.register_codec_parser 注册编码解析器
         """
-        pass
\ No newline at end of file
+        pass
+
+
+class HookManager:
+    """
+    钩子与编码解析器注册表
+
+    编码解析器按工厂注册：解析器保存参数集等逐流状态，
+    每个ESProcessor通过 create_codec_parsers 得到自己的实例。
+    """
+
+    def __init__(self):
+        self.hooks: Dict[str, List[Callable]] = {name: [] for name in HOOK_NAMES}
+        self.codec_parser_factories: Dict[str, Callable[[], Any]] = {}
+        self.plugins: List[AnalysisPlugin] = []
+
+    def register(self, hook: str, callback: Callable):
+        """
+        注册钩子函数
+
+        Raises:
+            ValueError: 未知的钩子名称
+        """
+        if hook not in self.hooks:
+            raise ValueError(f"未知的钩子: {hook}")
+        self.hooks[hook].append(callback)
+
+    def register_codec_parser(self, codec_type: str, factory: Callable[[], Any]):
+        """
+        注册编码解析器
+
+        Args:
+            codec_type: 编码类型，与 ESProcessor.parse_es 的 codec_type 相同（如 avs3、vvc）
+            factory: 无参数的解析器工厂（通常是解析器类），解析器需提供 deep_parse(data)
+        """
+        self.codec_parser_factories[codec_type] = factory
+
+    def create_codec_parsers(self) -> Dict[str, Any]:
+        """为已注册的编码各创建一个解析器实例"""
+        return {codec_type: factory() for codec_type, factory in self.codec_parser_factories.items()}
+
+    def call(self, hook: str, *args, **kwargs) -> List[Any]:
+        """
+        依次调用钩子函数，单个钩子出错只记录日志
+
+        Returns:
+            list: 各钩子函数的返回值（出错的除外）
+        """
+        results = []
+        for callback in self.hooks.get(hook, ()):
+            try:
+                results.append(callback(*args, **kwargs))
+            except Exception as e:
+                logger.warning(f"钩子 {hook} 执行失败 ({getattr(callback, '__qualname__', callback)}): {e}")
+        return results
+
+    def load_plugin(self, plugin: AnalysisPlugin):
+        """注册一个插件实例的钩子"""
+        plugin.register_hooks(self)
+        self.plugins.append(plugin)
+        logger.info(f"已加载插件: {plugin.name}")
+
+
+def discover_plugins() -> List[AnalysisPlugin]:
+    """
+    导入 plugins/ 目录中的模块，实例化其中定义的 AnalysisPlugin 子类
+
+    Returns:
+        list: 插件实例；导入或实例化失败的插件被跳过
+    """
+    plugins = []
+    for module_info in pkgutil.iter_modules([PLUGIN_DIR]):
+        name = module_info.name
+        if name == 'plugin_manager' or name.startswith('_'):
+            continue
+        try:
+            module = importlib.import_module(f"{__package__ or 'plugins'}.{name}")
+        except Exception as e:
+            logger.warning(f"插件 {name} 导入失败: {e}")
+            continue
+        for value in vars(module).values():
+            if (isinstance(value, type) and issubclass(value, AnalysisPlugin)
+                    and value is not AnalysisPlugin and value.__module__ == module.__name__):
+                try:
+                    plugins.append(value())
+                except Exception as e:
+                    logger.warning(f"插件 {value.__name__} 初始化失败: {e}")
+    return plugins
+
+
+_hook_manager: Optional[HookManager] = None
+
+
+def get_hook_manager() -> HookManager:
+    """进程内共享的钩子管理器，首次调用时加载全部插件"""
+    global _hook_manager
+    if _hook_manager is None:
+        manager = HookManager()
+        for plugin in discover_plugins():
+            try:
+                manager.load_plugin(plugin)
+            except Exception as e:
+                logger.warning(f"插件 {plugin.name} 注册失败: {e}")
+        _hook_manager = manager
+    return _hook_manager
@@ -0,0 +1,454 @@
+# -*- coding: utf-8 -*-
+"""
+VVC(H.266)解析插件
+按起始码扫描VVC码流，解析NAL头、SPS/PPS、图像头和片头，
+得到逐图像的类型(I/P/B)和POC，以及序列级参数
+"""
+
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from core.utils.binary_utils import BitReader, BitReaderError, remove_emulation_prevention
+from core.parser.es_processor import (ESParseError, NALStreamParser, VideoFormat, iter_start_code_units,
+                                      SLICE_B, SLICE_P, SLICE_I, SLICE_UNKNOWN, SLICE_TYPE_CHARS,
+                                      SLICE_HEADER_BYTES)
+from plugins.plugin_manager import AnalysisPlugin
+
+# VVC NAL单元类型
+VVC_NAL_TRAIL = 0
+VVC_NAL_STSA = 1
+VVC_NAL_RADL = 2
+VVC_NAL_RASL = 3
+VVC_NAL_IDR_W_RADL = 7
+VVC_NAL_IDR_N_LP = 8
+VVC_NAL_CRA = 9
+VVC_NAL_GDR = 10
+VVC_NAL_OPI = 12
+VVC_NAL_DCI = 13
+VVC_NAL_VPS = 14
+VVC_NAL_SPS = 15
+VVC_NAL_PPS = 16
+VVC_NAL_PREFIX_APS = 17
+VVC_NAL_SUFFIX_APS = 18
+VVC_NAL_PH = 19
+VVC_NAL_AUD = 20
+VVC_NAL_EOS = 21
+VVC_NAL_EOB = 22
+VVC_NAL_PREFIX_SEI = 23
+VVC_NAL_SUFFIX_SEI = 24
+VVC_NAL_FD = 25
+
+VVC_NAL_NAMES = {
+    VVC_NAL_TRAIL: 'TRAIL', VVC_NAL_STSA: 'STSA', VVC_NAL_RADL: 'RADL', VVC_NAL_RASL: 'RASL',
+    VVC_NAL_IDR_W_RADL: 'IDR_W_RADL', VVC_NAL_IDR_N_LP: 'IDR_N_LP', VVC_NAL_CRA: 'CRA',
+    VVC_NAL_GDR: 'GDR', VVC_NAL_OPI: 'OPI', VVC_NAL_DCI: 'DCI', VVC_NAL_VPS: 'VPS',
+    VVC_NAL_SPS: 'SPS', VVC_NAL_PPS: 'PPS', VVC_NAL_PREFIX_APS: 'PREFIX_APS',
+    VVC_NAL_SUFFIX_APS: 'SUFFIX_APS', VVC_NAL_PH: 'PH', VVC_NAL_AUD: 'AUD', VVC_NAL_EOS: 'EOS',
+    VVC_NAL_EOB: 'EOB', VVC_NAL_PREFIX_SEI: 'PREFIX_SEI', VVC_NAL_SUFFIX_SEI: 'SUFFIX_SEI',
+    VVC_NAL_FD: 'FD',
+}
+
+# 编码片NAL：0~3为普通图像，7~10为IRAP/GDR（4~6为保留的VCL类型）
+VVC_SLICE_NALS = frozenset((VVC_NAL_TRAIL, VVC_NAL_STSA, VVC_NAL_RADL, VVC_NAL_RASL,
+                            VVC_NAL_IDR_W_RADL, VVC_NAL_IDR_N_LP, VVC_NAL_CRA, VVC_NAL_GDR))
+
+# sh_slice_type 0/1/2 -> H.264片类型编码
+VVC_SLICE_TYPES = (SLICE_B, SLICE_P, SLICE_I)
+
+VVC_PROFILE_NAMES = {
+    1: 'Main 10',
+    17: 'Multilayer Main 10',
+    33: 'Main 10 4:4:4',
+    49: 'Multilayer Main 10 4:4:4',
+    65: 'Main 10 Still Picture',
+    97: 'Main 10 4:4:4 Still Picture',
+}
+
+# general_constraints_info() 中 gci_num_additional_bits 之前的约束标志位数（第1版）
+VVC_GCI_FLAG_BITS = 71
+
+
+def _byte_align(reader: BitReader):
+    """跳到下一个字节边界（读取器从NAL头之后开始，与RBSP的字节对齐一致）"""
+    reader.skip_bits(-reader.pos % 8)
+
+
+def _parse_vvc_profile_tier_level(reader: BitReader, max_sublayers_minus1: int):
+    """
+    解析 profile_tier_level(1, MaxNumSubLayersMinus1)
+
+    Returns:
+        tuple: (general_profile_idc, general_tier_flag, general_level_idc)
+    """
+    profile_idc = reader.read_bits(7)
+    tier = reader.read_bit()
+    level_idc = reader.read_bits(8)
+    reader.skip_bits(2)    # ptl_frame_only_constraint_flag、ptl_multilayer_enabled_flag
+    if reader.read_flag():    # gci_present_flag
+        reader.skip_bits(VVC_GCI_FLAG_BITS)
+        reader.skip_bits(reader.read_bits(8))    # gci_num_additional_bits
+    _byte_align(reader)
+    sublayer_level_present = sum(reader.read_bit() for _ in range(max_sublayers_minus1))
+    _byte_align(reader)
+    reader.skip_bits(8 * sublayer_level_present)
+    reader.skip_bits(32 * reader.read_bits(8))    # ptl_num_sub_profiles、general_sub_profile_idc
+    return profile_idc, tier, level_idc
+
+
+class VVCSPS(VideoFormat):
+    """
+    H.266序列参数集
+
+    只解析到片头需要的额外位数为止；VUI位于SPS末尾，之前有大量编码工具
+    字段，不解析，颜色描述和帧率保持默认值。
+    """
+
+    __slots__ = ('sps_id', 'vps_id', 'max_sublayers', 'profile_idc', 'tier', 'level_idc',
+                 'log2_ctu_size', 'gdr_enabled', 'subpic_info_present', 'subpic_id_len',
+                 'log2_max_poc_lsb', 'num_extra_ph_bits', 'num_extra_sh_bits')
+
+    # 没有解析VUI，full_range始终为False
+    JPEG_RANGE_CHROMA = ()
+
+    @property
+    def profile_name(self) -> str:
+        return VVC_PROFILE_NAMES.get(self.profile_idc, f'Profile {self.profile_idc}')
+
+    @property
+    def level(self) -> str:
+        """级别，如 '4.1'（general_level_idc 为主级别×16 + 子级别×3）"""
+        return f"{self.level_idc // 16}.{self.level_idc % 16 // 3}"
+
+    def _skip_subpic_info(self, reader: BitReader, width: int, height: int):
+        """跳过子图像布局，记录片头中sh_subpic_id的位数"""
+        num_subpics = reader.read_ue() + 1
+        if num_subpics > 600:
+            raise BitReaderError("子图像数量超出范围")
+        independent = same_size = True
+        if num_subpics > 1:
+            independent = reader.read_flag()
+            same_size = reader.read_flag()
+        ctu_size = 1 << self.log2_ctu_size
+        x_bits = ((width + ctu_size - 1) // ctu_size - 1).bit_length()
+        y_bits = ((height + ctu_size - 1) // ctu_size - 1).bit_length()
+        for i in range(num_subpics if num_subpics > 1 else 0):
+            if not same_size or i == 0:
+                last = i == num_subpics - 1
+                reader.skip_bits((x_bits + y_bits if i > 0 else 0) + (0 if last else x_bits + y_bits))
+            if not independent:
+                reader.skip_bits(2)    # treated_as_pic、loop_filter_across_subpic
+        self.subpic_id_len = reader.read_ue() + 1
+        if reader.read_flag() and reader.read_flag():    # id_mapping_explicitly_signalled/present
+            reader.skip_bits(num_subpics * self.subpic_id_len)
+
+    @classmethod
+    def parse(cls, nal) -> 'VVCSPS':
+        """
+        解析SPS NAL单元（含2字节NAL头）
+
+        Raises:
+            ESParseError: 数据不足或字段超出范围
+        """
+        sps = cls()
+        sps._reset_format()
+        sps.profile_idc = sps.tier = sps.level_idc = 0
+        sps.subpic_id_len = 0
+        try:
+            reader = BitReader(remove_emulation_prevention(nal[2:]))
+            sps.sps_id = reader.read_bits(4)
+            sps.vps_id = reader.read_bits(4)
+            max_sublayers_minus1 = reader.read_bits(3)
+            sps.max_sublayers = max_sublayers_minus1 + 1
+            sps.chroma_format_idc = reader.read_bits(2)
+            sps.log2_ctu_size = reader.read_bits(2) + 5
+            if reader.read_flag():    # sps_ptl_dpb_hrd_params_present_flag
+                sps.profile_idc, sps.tier, sps.level_idc = _parse_vvc_profile_tier_level(
+                    reader, max_sublayers_minus1)
+            sps.gdr_enabled = reader.read_flag()
+            if reader.read_flag():    # sps_ref_pic_resampling_enabled_flag
+                reader.skip_bits(1)    # sps_res_change_in_clvs_allowed_flag
+            width = reader.read_ue()
+            height = reader.read_ue()
+            sps.width, sps.height = width, height
+            if reader.read_flag():    # sps_conformance_window_flag
+                left, right, top, bottom = (reader.read_ue() for _ in range(4))
+                chroma = sps.chroma_format_idc
+                sps.width -= (left + right) * (2 if chroma in (1, 2) else 1)
+                sps.height -= (top + bottom) * (2 if chroma == 1 else 1)
+            sps.subpic_info_present = reader.read_flag()
+            if sps.subpic_info_present:
+                sps._skip_subpic_info(reader, width, height)
+            sps.bit_depth_luma = reader.read_ue() + 8
+            reader.skip_bits(2)    # entropy_coding_sync_enabled、entry_point_offsets_present
+            sps.log2_max_poc_lsb = reader.read_bits(4) + 4
+            if reader.read_flag():    # sps_poc_msb_cycle_flag
+                reader.read_ue()
+            sps.num_extra_ph_bits = sum(reader.read_bit() for _ in range(reader.read_bits(2) * 8))
+            sps.num_extra_sh_bits = sum(reader.read_bit() for _ in range(reader.read_bits(2) * 8))
+        except BitReaderError as e:
+            raise ESParseError(f"SPS数据不完整: {e}") from e
+        if sps.log2_max_poc_lsb > 16 or not width or not height:
+            raise ESParseError("SPS字段超出范围")
+        return sps
+
+
+class VVCPPS:
+    """H.266图像参数集（只保留片头解析需要的字段）"""
+
+    __slots__ = ('pps_id', 'sps_id', 'width', 'height', 'no_pic_partition')
+
+    @classmethod
+    def parse(cls, nal) -> 'VVCPPS':
+        pps = cls()
+        try:
+            reader = BitReader(remove_emulation_prevention(nal[2:SLICE_HEADER_BYTES]))
+            pps.pps_id = reader.read_bits(6)
+            pps.sps_id = reader.read_bits(4)
+            reader.skip_bits(1)    # pps_mixed_nalu_types_in_pic_flag
+            pps.width = reader.read_ue()
+            pps.height = reader.read_ue()
+            if reader.read_flag():    # pps_conformance_window_flag
+                for _ in range(4):
+                    reader.read_ue()
+            if reader.read_flag():    # pps_scaling_window_explicit_signalling_flag
+                for _ in range(4):
+                    reader.read_se()
+            reader.skip_bits(1)    # pps_output_flag_present_flag
+            pps.no_pic_partition = reader.read_flag()
+        except BitReaderError as e:
+            raise ESParseError(f"PPS数据不完整: {e}") from e
+        return pps
+
+
+class VVCPictureHeader:
+    """picture_header_structure() 开头到POC为止的字段"""
+
+    __slots__ = ('non_ref', 'inter_allowed', 'intra_allowed', 'pps_id', 'poc_lsb')
+
+
+class VVCSliceHeader:
+    """
+    H.266图像的片头信息
+
+    slice_type 为H.264的片类型编码：图像头不允许帧间片时为I；片头中的
+    sh_slice_type 无法定位（图像被划分为多个片/砖）时为 SLICE_UNKNOWN。
+    """
+
+    __slots__ = ('nal_type', 'temporal_id', 'layer_id', 'slice_type', 'poc')
+
+    frame_num = -1
+
+    def __init__(self, nal_type: int, temporal_id: int, layer_id: int,
+                 slice_type: int = SLICE_UNKNOWN, poc: int = -1):
+        self.nal_type = nal_type
+        self.temporal_id = temporal_id
+        self.layer_id = layer_id
+        self.slice_type = slice_type
+        self.poc = poc
+
+    @property
+    def idr(self) -> bool:
+        return self.nal_type in (VVC_NAL_IDR_W_RADL, VVC_NAL_IDR_N_LP)
+
+    @property
+    def frame_type(self) -> str:
+        """I/P/B，未知为 '?'"""
+        return SLICE_TYPE_CHARS[self.slice_type] if self.slice_type < len(SLICE_TYPE_CHARS) else '?'
+
+    def __repr__(self):
+        return (f"VVCSliceHeader(type={self.frame_type}, nal_type={VVC_NAL_NAMES.get(self.nal_type)}, "
+                f"poc={self.poc})")
+
+
+class VVCParser(NALStreamParser):
+    """
+    H.266 NAL/图像头/片头解析器
+
+    参数集和最近的图像头按解码顺序保存，同一个解析器应依次处理同一条流。
+    接口与内置的 H264Parser/HEVCParser 相同。
+    """
+
+    def __init__(self):
+        self.sps: Dict[int, VVCSPS] = {}
+        self.pps: Dict[int, VVCPPS] = {}
+        self.length_size = 4
+        self.reset()
+
+    def reset(self):
+        """清空POC推导状态和缓存的图像头（跳转后重新解析时调用）"""
+        self._picture_header: Optional[VVCPictureHeader] = None
+        self._prev_poc_msb = 0
+        self._prev_poc_lsb = 0
+        self._first_picture = True
+
+    def _parse_picture_header(self, reader: BitReader) -> Optional[VVCPictureHeader]:
+        """解析图像头开头的字段；引用的PPS/SPS未知时返回None"""
+        header = VVCPictureHeader()
+        gdr_or_irap = reader.read_flag()
+        header.non_ref = reader.read_flag()
+        if gdr_or_irap:
+            reader.skip_bits(1)    # ph_gdr_pic_flag
+        header.inter_allowed = reader.read_flag()
+        header.intra_allowed = reader.read_flag() if header.inter_allowed else True
+        header.pps_id = reader.read_ue()
+        pps = self.pps.get(header.pps_id)
+        sps = self.sps.get(pps.sps_id) if pps is not None else None
+        if sps is None:
+            return None
+        header.poc_lsb = reader.read_bits(sps.log2_max_poc_lsb)
+        return header
+
+    def parse_nal(self, nal) -> Optional[VVCSliceHeader]:
+        """
+        解析一个NAL单元（含2字节NAL头）：参数集和图像头被保存，片返回片头，其余忽略
+        """
+        if len(nal) < 2:
+            return None
+        nal_type = (nal[1] >> 3) & 0x1F
+        if nal_type in VVC_SLICE_NALS:
+            return self.parse_slice(nal)
+        try:
+            if nal_type == VVC_NAL_SPS:
+                sps = VVCSPS.parse(nal)
+                self.sps[sps.sps_id] = sps
+            elif nal_type == VVC_NAL_PPS:
+                pps = VVCPPS.parse(nal)
+                self.pps[pps.pps_id] = pps
+            elif nal_type == VVC_NAL_PH:
+                reader = BitReader(remove_emulation_prevention(nal[2:SLICE_HEADER_BYTES]))
+                self._picture_header = self._parse_picture_header(reader)
+            elif nal_type in (VVC_NAL_EOS, VVC_NAL_EOB):
+                # 序列结束后的第一个IRAP/GDR图像重新开始POC
+                self._first_picture = True
+        except (ESParseError, BitReaderError):
+            pass
+        return None
+
+    def parse_slice(self, nal) -> Optional[VVCSliceHeader]:
+        """解析片头到sh_slice_type为止；缺少参数集或图像头时返回None"""
+        nal_type = (nal[1] >> 3) & 0x1F
+        header = VVCSliceHeader(nal_type, (nal[1] & 0x07) - 1, nal[0] & 0x3F)
+        reader = BitReader(remove_emulation_prevention(nal[2:SLICE_HEADER_BYTES]))
+        try:
+            if reader.read_flag():    # sh_picture_header_in_slice_header_flag
+                picture = self._parse_picture_header(reader)
+                # 片头内的图像头之后还有大量字段，无法继续定位sh_slice_type
+                known_layout = False
+            else:
+                picture = self._picture_header
+                known_layout = True
+            if picture is None:
+                return None
+            pps = self.pps[picture.pps_id]
+            sps = self.sps[pps.sps_id]
+            if not picture.inter_allowed:
+                header.slice_type = SLICE_I
+            elif known_layout and pps.no_pic_partition:
+                # 单片图像没有sh_slice_address和sh_num_tiles_in_slice_minus1
+                if sps.subpic_info_present:
+                    reader.skip_bits(sps.subpic_id_len)
+                reader.skip_bits(sps.num_extra_sh_bits)
+                slice_type = reader.read_ue()
+                if slice_type < len(VVC_SLICE_TYPES):
+                    header.slice_type = VVC_SLICE_TYPES[slice_type]
+        except BitReaderError:
+            return None
+        header.poc = self._derive_poc(sps, header, picture)
+        return header
+
+    def _derive_poc(self, sps: VVCSPS, header: VVCSliceHeader, picture: VVCPictureHeader) -> int:
+        """按 8.3.1 推导POC（不处理ph_poc_msb_cycle_val）"""
+        nal_type = header.nal_type
+        poc_lsb = picture.poc_lsb
+        # IDR，以及流中（或序列结束后）第一个CRA/GDR图像的POC高位清零
+        if (nal_type in (VVC_NAL_IDR_W_RADL, VVC_NAL_IDR_N_LP)
+                or (nal_type in (VVC_NAL_CRA, VVC_NAL_GDR) and self._first_picture)):
+            msb = 0
+        else:
+            max_lsb = 1 << sps.log2_max_poc_lsb
+            prev_msb, prev_lsb = self._prev_poc_msb, self._prev_poc_lsb
+            if poc_lsb < prev_lsb and prev_lsb - poc_lsb >= max_lsb // 2:
+                msb = prev_msb + max_lsb
+            elif poc_lsb > prev_lsb and poc_lsb - prev_lsb > max_lsb // 2:
+                msb = prev_msb - max_lsb
+            else:
+                msb = prev_msb
+        self._first_picture = False
+        # prevTid0Pic：时间层0且不是RADL/RASL/非参考图像
+        if (header.temporal_id == 0 and not picture.non_ref
+                and nal_type not in (VVC_NAL_RADL, VVC_NAL_RASL)):
+            self._prev_poc_msb, self._prev_poc_lsb = msb, poc_lsb
+        return msb + poc_lsb
+
+    def scan(self, buffer, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, VVCSliceHeader]]:
+        """
+        扫描Annex-B码流，按解码顺序返回每个图像第一个片的 (起始码后偏移, 片头)
+
+        起始码用缓冲区的 find 查找，片只截取片头前缀，适合直接扫描内存映射的大文件。
+        """
+        # 图像头在片头中时图像只有一个片；否则PH NAL之后的第一个片是图像的第一个片
+        picture_pending = False
+        for unit_start, unit_end in iter_start_code_units(buffer, start, end):
+            if unit_end - unit_start < 3:
+                continue
+            nal_type = (buffer[unit_start + 1] >> 3) & 0x1F
+            if nal_type in VVC_SLICE_NALS:
+                nal = buffer[unit_start:min(unit_end, unit_start + SLICE_HEADER_BYTES)]
+                first_slice = picture_pending or nal[2] & 0x80
+                picture_pending = False
+                header = self.parse_slice(nal)
+                if header is not None and first_slice:
+                    yield unit_start, header
+            elif nal_type in (VVC_NAL_SPS, VVC_NAL_PPS, VVC_NAL_PH, VVC_NAL_EOS, VVC_NAL_EOB):
+                self.parse_nal(buffer[unit_start:unit_end])
+                picture_pending = picture_pending or nal_type == VVC_NAL_PH
+
+    def deep_parse(self, data) -> Dict[str, Any]:
+        """
+        解析一段H.266 ES数据（Annex-B或长度前缀格式）
+
+        Returns:
+            dict: NAL类型列表和参数集数量；包含片时还有帧类型、IDR标志、时间层和POC；
+                已知SPS时附带序列参数
+        """
+        data = bytes(data)
+        nal_types = []
+        header = None
+        for nal in self.iter_nals(data):
+            if len(nal) < 2:
+                continue
+            nal_types.append((nal[1] >> 3) & 0x1F)
+            result = self.parse_nal(nal)
+            if header is None:
+                header = result
+        result = {"codec": "vvc", "nal_types": nal_types, "sps_count": len(self.sps),
+                  "pps_count": len(self.pps), "parsed": True}
+        if header is not None:
+            result.update({
+                "frame_type": header.frame_type,
+                "slice_type": header.slice_type,
+                "idr": header.idr,
+                "temporal_id": header.temporal_id,
+                "poc": header.poc,
+            })
+        if self.sps:
+            sps = next(iter(self.sps.values()))
+            result.update({
+                "profile": sps.profile_name,
+                "tier": 'High' if sps.tier else 'Main',
+                "level": sps.level,
+                "size": (sps.width, sps.height),
+                "pixel_format": sps.pixel_format,
+                "ctu_size": 1 << sps.log2_ctu_size,
+            })
+        return result
+
+
+class VVCParserPlugin(AnalysisPlugin):
+    """注册VVC解析器，供 ESProcessor.parse_es(data, 'vvc') 使用"""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "VVC解析插件"
+
+    def register_hooks(self, hook_manager):
+        hook_manager.register_codec_parser('vvc', VVCParser)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+集成测试共用的测试文件：用PyAV/libx264生成的小尺寸H.264 FLV
+"""
+
+import pytest
+
+FRAME_RATE = 25
+
+
+@pytest.fixture(scope='session')
+def make_h264_flv(tmp_path_factory):
+    """
+    返回生成H.264 FLV的函数 make(name, frame_count, x264_options, flv_options)
+
+    画面为逐帧变化的纯色，码率很低；x264_options 覆盖默认编码参数。
+    """
+    av = pytest.importorskip('av')
+    np = pytest.importorskip('numpy')
+    directory = tmp_path_factory.mktemp('h264')
+
+    def make(name, frame_count, x264_options=None, flv_options=None):
+        path = str(directory / name)
+        with av.open(path, 'w', format='flv', options=flv_options or {}) as container:
+            stream = container.add_stream('libx264', rate=FRAME_RATE)
+            stream.width, stream.height, stream.pix_fmt = 64, 48, 'yuv420p'
+            stream.options = dict({'g': '12', 'sc_threshold': '0', 'preset': 'ultrafast'}, **(x264_options or {}))
+            for i in range(frame_count):
+                image = np.full((48, 64, 3), (i * 37) % 256, dtype=np.uint8)
+                container.mux(stream.encode(av.VideoFrame.from_ndarray(image, format='rgb24')))
+            container.mux(stream.encode(None))
+        return path
+
+    return make
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+帧定位回归测试：含B帧的H.264文件中，按时间取帧应得到PTS不晚于目标时间的最后一帧
+"""
+
+import bisect
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+av = pytest.importorskip('av')
+
+from core.flv_handler import FLVFileHandler
+
+FRAME_COUNT = 90
+
+
+@pytest.fixture(scope='module')
+def bframe_flv(make_h264_flv):
+    """带B帧、关键帧间隔较短并在onMetaData中写入关键帧表的FLV"""
+    return make_h264_flv('bframes.flv', FRAME_COUNT, {'bf': '3', 'x264-params': 'b-pyramid=none'},
+                         {'flvflags': 'add_keyframe_index'})
+
+
+def _reference_pts(path):
+    with av.open(path) as container:
+        return sorted(frame.pts for frame in container.decode(video=0))
+
+
+def _seek_targets(pts_list):
+    targets = []
+    for pts in pts_list:
+        targets += [pts - 1, pts, pts + 1]
+    # 乱序访问，覆盖向前、向后和跨GOP的定位
+    return targets[1::2] + targets[::-2]
+
+
+@pytest.mark.parametrize('load_tags', [True, False], ids=['tag_index', 'metadata_index'])
+def test_seek_returns_frame_by_pts(bframe_flv, load_tags):
+    reference = _reference_pts(bframe_flv)
+    assert len(reference) == FRAME_COUNT
+
+    handler = FLVFileHandler(use_cache=False)
+    handler.load_file(bframe_flv)
+    if load_tags:
+        handler.tags_data
+    seeker = handler._get_seeker()
+    if seeker is None:
+        pytest.skip('当前PyAV无法构建帧定位器')
+
+    for target in _seek_targets(reference):
+        assert seeker.get_frame(target) is not None
+        expected = reference[max(bisect.bisect_right(reference, target) - 1, 0)]
+        assert seeker._last_frame.pts == expected, f'target={target}'
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+片头解析测试：libx264生成的FLV中，逐帧片类型与PyAV解码出的图像类型一致，
+frame_num按参考帧递增，同一IDR周期内POC顺序与显示顺序一致
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+av = pytest.importorskip('av')
+
+from core.parser.tag_parser import FLVTagScanner, TAG_TYPE_VIDEO, FRAME_TYPE_KEY, video_header_size
+from core.parser.tag_table import TagTable, PACKET_TYPE_SEQUENCE_HEADER
+from core.parser.es_processor import H264Parser, scan_slices, SLICE_TYPE_CHARS
+
+FRAME_COUNT = 60
+
+# 名称 -> (x264参数, 期望的pic_order_cnt_type)
+CASES = {
+    'b_pyramid': ({'bf': '3', 'x264-params': 'b-pyramid=normal'}, 0),
+    'b_flat': ({'bf': '2', 'x264-params': 'b-pyramid=none'}, 0),
+    'no_b_frames': ({'bf': '0'}, 2),
+}
+
+
+@pytest.fixture(scope='module', params=list(CASES))
+def slice_case(request, make_h264_flv):
+    options, poc_type = CASES[request.param]
+    path = make_h264_flv(f'{request.param}.flv', FRAME_COUNT, options)
+    with FLVTagScanner(path) as scanner:
+        table = TagTable.from_records(scanner.iter_tags())
+        index = scan_slices(scanner, table)
+        parser = H264Parser()
+        row = table.find_row(tag_type=TAG_TYPE_VIDEO)
+        assert table.packet_type[row] == PACKET_TYPE_SEQUENCE_HEADER
+        payload = bytes(scanner.payload(table.offset[row], table.data_size[row]))
+        parser.configure(payload[video_header_size(table.codec_id[row], PACKET_TYPE_SEQUENCE_HEADER):])
+    sps = next(iter(parser.sps.values()))
+    assert sps.poc_type == poc_type
+
+    with av.open(path) as container:
+        reference = {frame.pts: (av.video.frame.PictureType(frame.pict_type).name, frame.key_frame)
+                     for frame in container.decode(video=0)}
+    return table, index, sps, reference, options['bf'] != '0'
+
+
+def _frames(table, index):
+    """按解码顺序返回 (PTS, 是否关键帧标签, 片类型字符, idr, nal_ref_idc, frame_num, poc)"""
+    frames = []
+    for i, row in enumerate(index.row):
+        pts = table.timestamp[row] + table.cts[row]
+        frames.append((pts, table.frame_type[row] == FRAME_TYPE_KEY, SLICE_TYPE_CHARS[index.slice_type[i]],
+                       bool(index.idr[i]), index.nal_ref_idc[i], index.frame_num[i], index.poc[i]))
+    return frames
+
+
+def test_slice_types_match_decoder(slice_case):
+    table, index, _, reference, has_b_frames = slice_case
+    frames = _frames(table, index)
+    assert len(frames) == len(reference) == FRAME_COUNT
+    for pts, keyframe, slice_type, idr, *_ in frames:
+        picture_type, key_frame = reference[pts]
+        assert slice_type == picture_type, f'pts={pts}'
+        assert idr == keyframe == key_frame, f'pts={pts}'
+    assert {frame[2] for frame in frames} == ({'I', 'P', 'B'} if has_b_frames else {'I', 'P'})
+
+
+def test_frame_num_follows_reference_pictures(slice_case):
+    table, index, sps, _, _ = slice_case
+    max_frame_num = 1 << sps.log2_max_frame_num
+    prev_ref_frame_num = 0
+    for pts, _, _, idr, nal_ref_idc, frame_num, _ in _frames(table, index):
+        if idr:
+            assert frame_num == 0
+        else:
+            assert frame_num == (prev_ref_frame_num + 1) % max_frame_num, f'pts={pts}'
+        if nal_ref_idc:
+            prev_ref_frame_num = frame_num
+
+
+def test_poc_order_matches_presentation_order(slice_case):
+    table, index, _, _, _ = slice_case
+    periods = []
+    for frame in _frames(table, index):
+        if frame[3]:
+            periods.append([])
+        periods[-1].append(frame)
+    assert len(periods) == FRAME_COUNT // 12
+    for period in periods:
+        assert period[0][6] == 0
+        by_poc = sorted(period, key=lambda frame: frame[6])
+        assert len({frame[6] for frame in period}) == len(period)
+        assert [frame[0] for frame in by_poc] == sorted(frame[0] for frame in period)
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+字节模式搜索测试：分块搜索与整体查找结果一致，跨块边界的匹配不丢失也不重复
+"""
+
+import mmap
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.byte_search import iter_pattern_hits, find_next, parse_hex_pattern, parse_search_pattern
+
+PATTERN = b'FLV\x01'
+
+
+def _reference_hits(data, pattern, start=0, end=None):
+    end = len(data) if end is None else min(end, len(data))
+    hits = []
+    pos = data.find(pattern, start, end)
+    while pos != -1:
+        hits.append(pos)
+        pos = data.find(pattern, pos + 1, end)
+    return hits
+
+
+def _sample_data(seed=0, size=5000):
+    rng = random.Random(seed)
+    data = bytearray(rng.choice(b'FLV\x01\x00') for _ in range(size))
+    # 模式恰好横跨第1、2块边界（块大小64）
+    data[62:66] = PATTERN
+    return bytes(data)
+
+
+class CountingBuffer:
+    """记录 find 调用次数的缓冲区"""
+
+    def __init__(self, data):
+        self.data = data
+        self.calls = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def find(self, sub, start, end):
+        self.calls += 1
+        return self.data.find(sub, start, end)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 4, 63, 64, 65, 1000, 1 << 20])
+def test_hits_match_reference(chunk_size):
+    data = _sample_data()
+    assert 62 in _reference_hits(data, PATTERN)
+    for start, end in ((0, None), (62, 66), (63, None), (7, 4000), (0, 65), (4990, 10000)):
+        hits = list(iter_pattern_hits(data, PATTERN, start, end, chunk_size=chunk_size))
+        assert hits == _reference_hits(data, PATTERN, start, end), (start, end)
+
+
+@pytest.mark.parametrize('pattern', [b'F', b'\x01\x00', b'LV\x01F', b'FLV\x01\x00F'])
+def test_overlapping_matches(pattern):
+    data = _sample_data(seed=1)
+    for chunk_size in (1, 5, 64):
+        assert list(iter_pattern_hits(data, pattern, chunk_size=chunk_size)) == _reference_hits(data, pattern)
+    # 自重叠的模式逐个位置返回
+    assert list(iter_pattern_hits(b'aaaaa', b'aa', chunk_size=2)) == [0, 1, 2, 3]
+
+
+def test_mmap_buffer(tmp_path):
+    data = _sample_data(size=20000)
+    path = tmp_path / 'data.bin'
+    path.write_bytes(data)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        assert list(iter_pattern_hits(mm, PATTERN, chunk_size=64)) == _reference_hits(data, PATTERN)
+        assert find_next(mm, PATTERN, 63, chunk_size=64) == data.find(PATTERN, 63)
+
+
+def test_max_hits():
+    data = _sample_data()
+    reference = _reference_hits(data, PATTERN)
+    for max_hits in (0, 1, 2, 7, len(reference) + 5):
+        hits = list(iter_pattern_hits(data, PATTERN, max_hits=max_hits, chunk_size=64))
+        assert hits == reference[:max_hits]
+
+
+def test_find_next_wraps_around():
+    data = bytes(100) + PATTERN + bytes(100) + PATTERN + bytes(100)
+    first, second = 100, 204
+    assert find_next(data, PATTERN, 0, chunk_size=16) == first
+    assert find_next(data, PATTERN, first, chunk_size=16) == first
+    assert find_next(data, PATTERN, first + 1, chunk_size=16) == second
+    # 最后一个匹配之后回到开头
+    assert find_next(data, PATTERN, second + 1, chunk_size=16) == first
+    assert find_next(data, PATTERN, len(data), chunk_size=16) == first
+    assert find_next(data, PATTERN, second + 1, wrap=False, chunk_size=16) == -1
+    assert find_next(data, b'missing', 50) == -1
+
+
+def test_find_next_wrap_includes_match_across_start():
+    # 唯一的匹配从 start 之前开始，回绕后仍能找到
+    data = bytes(50) + PATTERN + bytes(50)
+    for start in (51, 52, 53):
+        assert find_next(data, PATTERN, start, chunk_size=8) == 50
+    assert find_next(data, PATTERN, 51, wrap=False) == -1
+
+
+def test_cancelled_before_first_chunk():
+    buffer = CountingBuffer(_sample_data())
+    assert list(iter_pattern_hits(buffer, PATTERN, chunk_size=64, cancelled=lambda: True)) == []
+    assert buffer.calls == 0
+
+
+def test_cancelled_between_chunks():
+    data = _sample_data()
+    chunk_size = 500
+    polls = []
+
+    def cancelled():
+        polls.append(None)
+        return len(polls) > 3
+
+    buffer = CountingBuffer(data)
+    hits = list(iter_pattern_hits(buffer, PATTERN, chunk_size=chunk_size, cancelled=cancelled))
+    # 只搜索了前3块
+    assert len(polls) == 4
+    assert hits == [pos for pos in _reference_hits(data, PATTERN) if pos < 3 * chunk_size]
+    assert buffer.calls == len(hits) + 3
+
+
+def test_stopping_iteration_stops_search():
+    buffer = CountingBuffer(_sample_data())
+    hits = iter_pattern_hits(buffer, PATTERN, chunk_size=64)
+    next(hits)
+    calls = buffer.calls
+    hits.close()
+    assert buffer.calls == calls
+    assert find_next(buffer, PATTERN, 0, chunk_size=64) == _reference_hits(buffer.data, PATTERN)[0]
+
+
+def test_parse_patterns():
+    for text in ('46 4C 56', '464c56', '0x464C56', ' 46,4c,56 '):
+        assert parse_hex_pattern(text) == b'FLV'
+    assert parse_search_pattern('FLV', False) == b'FLV'
+    assert parse_search_pattern('46 4C', True) == b'FL'
+    assert parse_search_pattern('时间', False) == '时间'.encode('utf-8')
+    for text, hex_mode in (('', True), ('0x', True), ('465', True), ('zz', True), ('', False)):
+        with pytest.raises(ValueError):
+            parse_search_pattern(text, hex_mode)
+    with pytest.raises(ValueError):
+        list(iter_pattern_hits(b'data', b''))
@@ -0,0 +1,452 @@
+# -*- coding: utf-8 -*-
+"""
+FLV解析测试：用合成的FLV文件检查增量解析器在任意分块下与文件扫描器的结果一致
+"""
+
+import os
+import random
+import struct
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.parser.flv_header import FLV_HEADER_SIZE, PREV_TAG_SIZE_LENGTH
+from core.parser.tag_parser import (FLVTagScanner, TAG_TYPE_AUDIO, TAG_TYPE_VIDEO, TAG_TYPE_SCRIPT,
+                                    TAG_HEADER_SIZE, PACKET_TYPE_NONE, VIDEO_CODEC_AVC,
+                                    VIDEO_CODEC_EX_AVC, VIDEO_CODEC_EX_HEVC, VIDEO_CODEC_EX_AV1,
+                                    VIDEO_CODEC_ENHANCED, SOUND_FORMAT_AAC, FRAME_TYPE_KEY,
+                                    FRAME_TYPE_INTER, EX_PACKET_SEQUENCE_START,
+                                    EX_PACKET_CODED_FRAMES, EX_PACKET_CODED_FRAMES_X)
+from core.parser.stream_parser import FLVStreamParser, AV_HEADER_BYTES
+
+MP3 = 2
+
+
+# ---------------------------------------------------------------------------
+# 合成FLV
+# ---------------------------------------------------------------------------
+
+def amf0_metadata(values):
+    """onMetaData脚本标签负载（ECMA数组，数值属性）"""
+    data = b'\x02' + struct.pack('>H', 10) + b'onMetaData' + b'\x08' + struct.pack('>I', len(values))
+    for key, value in values.items():
+        name = key.encode('utf-8')
+        data += struct.pack('>H', len(name)) + name + b'\x00' + struct.pack('>d', value)
+    return data + b'\x00\x00\x09'
+
+
+def avc_payload(frame_type, packet_type, cts, data):
+    """传统AVC视频标签负载"""
+    return bytes([(frame_type << 4) | VIDEO_CODEC_AVC, packet_type]) + (cts & 0xFFFFFF).to_bytes(3, 'big') + data
+
+
+def ex_video_payload(frame_type, packet_type, fourcc, data, cts=None):
+    """Enhanced FLV视频标签负载；cts不为None时写入3字节CTS"""
+    payload = bytes([0x80 | (frame_type << 4) | packet_type]) + fourcc
+    if cts is not None:
+        payload += (cts & 0xFFFFFF).to_bytes(3, 'big')
+    return payload + data
+
+
+def audio_payload(sound_format, flags, data, packet_type=None):
+    """音频标签负载；flags为首字节低4位"""
+    payload = bytes([(sound_format << 4) | flags])
+    if packet_type is not None:
+        payload += bytes([packet_type])
+    return payload + data
+
+
+class FLVBuilder:
+    """按顺序拼接标签，同时记录每个标签应得到的TagRecord"""
+
+    def __init__(self, flags=0x05):
+        self.data = bytearray(b'FLV\x01' + bytes([flags]) + struct.pack('>I', FLV_HEADER_SIZE))
+        self.data += bytes(PREV_TAG_SIZE_LENGTH)
+        self.records = []
+
+    def add(self, tag_type, timestamp, payload, record_fields, prev_tag_size=None):
+        """
+        Args:
+            record_fields: (编码ID, 帧类型, 包类型, CTS)
+            prev_tag_size: 写入的PreviousTagSize，默认为正确值
+        """
+        offset = len(self.data)
+        self.data += (bytes([tag_type]) + len(payload).to_bytes(3, 'big')
+                      + (timestamp & 0xFFFFFF).to_bytes(3, 'big') + bytes([(timestamp >> 24) & 0xFF])
+                      + bytes(3) + payload)
+        if prev_tag_size is None:
+            prev_tag_size = len(payload) + TAG_HEADER_SIZE
+        self.data += struct.pack('>I', prev_tag_size)
+        self.records.append((offset, tag_type, timestamp, len(payload)) + tuple(record_fields))
+        return self
+
+
+def build_sample_flv(seed=0):
+    """
+    含脚本、传统AVC/AAC/MP3、Enhanced FLV（avc1/hvc1/av01、CodedFramesX、负CTS）
+    以及扩展时间戳的合成FLV
+
+    Returns:
+        FLVBuilder
+    """
+    rng = random.Random(seed)
+
+    def blob(size):
+        return bytes(rng.getrandbits(8) for _ in range(size))
+
+    builder = FLVBuilder()
+    builder.add(TAG_TYPE_SCRIPT, 0, amf0_metadata({'duration': 4.0, 'width': 64.0, 'height': 48.0}),
+                (0, 0, PACKET_TYPE_NONE, 0))
+    builder.add(TAG_TYPE_VIDEO, 0, avc_payload(FRAME_TYPE_KEY, 0, 0, blob(30)),
+                (VIDEO_CODEC_AVC, FRAME_TYPE_KEY, 0, 0))
+    builder.add(TAG_TYPE_AUDIO, 0, audio_payload(SOUND_FORMAT_AAC, 0x0F, blob(2), 0),
+                (SOUND_FORMAT_AAC, 0x0F, 0, 0))
+    timestamp = 0
+    for i in range(12):
+        frame_type = FRAME_TYPE_KEY if i % 6 == 0 else FRAME_TYPE_INTER
+        cts = (80, -40, 40, 0)[i % 4]
+        builder.add(TAG_TYPE_VIDEO, timestamp, avc_payload(frame_type, 1, cts, blob(rng.choice((3, 700, 30000)))),
+                    (VIDEO_CODEC_AVC, frame_type, 1, cts))
+        builder.add(TAG_TYPE_AUDIO, timestamp, audio_payload(SOUND_FORMAT_AAC, 0x0F, blob(200), 1),
+                    (SOUND_FORMAT_AAC, 0x0F, 1, 0))
+        timestamp += 40
+    builder.add(TAG_TYPE_AUDIO, timestamp, audio_payload(MP3, 0x0E, blob(100)), (MP3, 0x0E, PACKET_TYPE_NONE, 0))
+
+    # Enhanced FLV：编码ID为最高位置1的值，avc1/hvc1的编码帧带CTS
+    builder.add(TAG_TYPE_VIDEO, timestamp, ex_video_payload(FRAME_TYPE_KEY, EX_PACKET_SEQUENCE_START, b'hvc1', blob(40)),
+                (VIDEO_CODEC_EX_HEVC, FRAME_TYPE_KEY, EX_PACKET_SEQUENCE_START, 0))
+    for i, cts in enumerate((120, -80, 0x7FFFFF, -0x800000)):
+        frame_type = FRAME_TYPE_KEY if i == 0 else FRAME_TYPE_INTER
+        builder.add(TAG_TYPE_VIDEO, timestamp,
+                    ex_video_payload(frame_type, EX_PACKET_CODED_FRAMES, b'hvc1', blob(rng.choice((0, 1, 5000))), cts),
+                    (VIDEO_CODEC_EX_HEVC, frame_type, EX_PACKET_CODED_FRAMES, cts))
+        timestamp += 40
+    builder.add(TAG_TYPE_VIDEO, timestamp,
+                ex_video_payload(FRAME_TYPE_INTER, EX_PACKET_CODED_FRAMES_X, b'hvc1', blob(300)),
+                (VIDEO_CODEC_EX_HEVC, FRAME_TYPE_INTER, EX_PACKET_CODED_FRAMES_X, 0))
+    builder.add(TAG_TYPE_VIDEO, timestamp,
+                ex_video_payload(FRAME_TYPE_KEY, EX_PACKET_CODED_FRAMES, b'avc1', blob(64), -40),
+                (VIDEO_CODEC_EX_AVC, FRAME_TYPE_KEY, EX_PACKET_CODED_FRAMES, -40))
+    builder.add(TAG_TYPE_VIDEO, timestamp,
+                ex_video_payload(FRAME_TYPE_KEY, EX_PACKET_CODED_FRAMES, b'av01', blob(64)),
+                (VIDEO_CODEC_EX_AV1, FRAME_TYPE_KEY, EX_PACKET_CODED_FRAMES, 0))
+    builder.add(TAG_TYPE_VIDEO, timestamp,
+                ex_video_payload(FRAME_TYPE_INTER, EX_PACKET_CODED_FRAMES, b'xxxx', blob(16)),
+                (VIDEO_CODEC_ENHANCED, FRAME_TYPE_INTER, EX_PACKET_CODED_FRAMES, 0))
+    # 负载不足以容纳扩展头时只有包类型
+    builder.add(TAG_TYPE_VIDEO, timestamp, bytes([0x80 | (FRAME_TYPE_INTER << 4) | EX_PACKET_CODED_FRAMES]) + b'hv',
+                (VIDEO_CODEC_ENHANCED, FRAME_TYPE_INTER, EX_PACKET_CODED_FRAMES, 0))
+
+    # 超过24位的时间戳写入扩展时间戳字节
+    long_timestamp = 0x01234567
+    builder.add(TAG_TYPE_VIDEO, long_timestamp, avc_payload(FRAME_TYPE_INTER, 1, 40, blob(10)),
+                (VIDEO_CODEC_AVC, FRAME_TYPE_INTER, 1, 40))
+    builder.add(TAG_TYPE_AUDIO, long_timestamp, b'', (0, 0, PACKET_TYPE_NONE, 0))
+    return builder
+
+
+@pytest.fixture(scope='module')
+def sample_flv(tmp_path_factory):
+    builder = build_sample_flv()
+    path = tmp_path_factory.mktemp('flv') / 'sample.flv'
+    path.write_bytes(builder.data)
+    return str(path), builder
+
+
+def _scan(path):
+    with FLVTagScanner(path) as scanner:
+        records = list(scanner.iter_tags())
+        payloads = [bytes(scanner.payload(record[0], record[3])) for record in records]
+    return records, payloads
+
+
+# ---------------------------------------------------------------------------
+# 增量解析器
+# ---------------------------------------------------------------------------
+
+def _feed_chunks(parser, data, boundaries):
+    events = []
+    last = 0
+    for boundary in list(boundaries) + [len(data)]:
+        events.extend(parser.feed(data[last:boundary]))
+        last = boundary
+    return events
+
+
+def _check_stream(events, parser, records, payloads, keep_payload):
+    assert [record for record, _ in events] == records
+    if keep_payload:
+        assert [payload for _, payload in events] == payloads
+    else:
+        assert all(payload is None for _, payload in events)
+    assert not parser.finish()
+    assert parser.tags_parsed == len(records)
+    assert parser.prev_tag_size_errors == 0
+
+
+@pytest.mark.parametrize('keep_payload', [True, False], ids=['keep_payload', 'skip_payload'])
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7, 11, 13, 64, 1000, 4096, 70000])
+def test_stream_parser_fixed_chunks(sample_flv, chunk_size, keep_payload):
+    path, builder = sample_flv
+    records, payloads = _scan(path)
+    data = bytes(builder.data)
+    parser = FLVStreamParser(keep_payload=keep_payload)
+    events = _feed_chunks(parser, data, range(chunk_size, len(data), chunk_size))
+    _check_stream(events, parser, records, payloads, keep_payload)
+    assert parser.header.has_video and parser.header.has_audio
+
+
+@pytest.mark.parametrize('keep_payload', [True, False], ids=['keep_payload', 'skip_payload'])
+def test_stream_parser_splits_inside_headers(sample_flv, keep_payload):
+    """在每个标签的11字节标签头和音视频首部字节内部切分"""
+    path, builder = sample_flv
+    records, payloads = _scan(path)
+    data = bytes(builder.data)
+    for offset, *_ in records:
+        for delta in range(1, TAG_HEADER_SIZE + AV_HEADER_BYTES + 1):
+            parser = FLVStreamParser(keep_payload=keep_payload)
+            events = _feed_chunks(parser, data, [offset + delta])
+            _check_stream(events, parser, records, payloads, keep_payload)
+
+
+@pytest.mark.parametrize('keep_payload', [True, False], ids=['keep_payload', 'skip_payload'])
+def test_stream_parser_random_chunks(sample_flv, keep_payload):
+    path, builder = sample_flv
+    records, payloads = _scan(path)
+    data = bytes(builder.data)
+    rng = random.Random(1)
+    for _ in range(20):
+        boundaries = sorted(rng.sample(range(1, len(data)), 200))
+        parser = FLVStreamParser(keep_payload=keep_payload)
+        events = _feed_chunks(parser, data, boundaries)
+        _check_stream(events, parser, records, payloads, keep_payload)
+
+
+def test_stream_parser_without_file_header(sample_flv):
+    """从RTMP还原的标签流不带FLV文件头"""
+    path, builder = sample_flv
+    records, payloads = _scan(path)
+    start = FLV_HEADER_SIZE + PREV_TAG_SIZE_LENGTH
+    parser = FLVStreamParser(has_header=False)
+    events = parser.feed(bytes(builder.data[start:]))
+    assert [(record[0] + start,) + record[1:] for record, _ in events] == records
+    assert [payload for _, payload in events] == payloads
+
+
+def test_stream_parser_reports_truncation(sample_flv):
+    _, builder = sample_flv
+    parser = FLVStreamParser()
+    events = parser.feed(bytes(builder.data[:-7]))
+    assert len(events) == len(builder.records) - 1
+    assert parser.finish()
+
+
+# ---------------------------------------------------------------------------
+# mmap标签扫描器
+# ---------------------------------------------------------------------------
+
+def _write(tmp_path, data, name='test.flv'):
+    path = tmp_path / name
+    path.write_bytes(bytes(data))
+    return str(path)
+
+
+def test_scanner_records(sample_flv):
+    path, builder = sample_flv
+    with FLVTagScanner(path) as scanner:
+        assert scanner.header.version == 1
+        assert scanner.header.has_audio and scanner.header.has_video
+        records = list(scanner.iter_tags())
+        assert not scanner.truncated
+        assert scanner.prev_tag_size_errors == 0
+        # 从中间某个标签开始遍历
+        middle = builder.records[10][0]
+        assert list(scanner.iter_tags(middle)) == builder.records[10:]
+    assert records == builder.records
+    # Enhanced FLV的编码ID为置最高位的值
+    codec_ids = {record[4] for record in records if record[1] == TAG_TYPE_VIDEO}
+    assert {VIDEO_CODEC_EX_AVC, VIDEO_CODEC_EX_HEVC, VIDEO_CODEC_EX_AV1, VIDEO_CODEC_ENHANCED} <= codec_ids
+    assert {record[7] for record in records} >= {-40, -80, 0x7FFFFF, -0x800000}
+
+
+@pytest.mark.parametrize('cut', [1, 4, 12, 14])
+def test_scanner_truncated_final_tag(tmp_path, cut):
+    builder = build_sample_flv()
+    # 最后一个标签为空负载的音频标签：11字节标签头 + 4字节PreviousTagSize
+    assert len(builder.data) - builder.records[-1][0] == TAG_HEADER_SIZE + PREV_TAG_SIZE_LENGTH
+    path = _write(tmp_path, builder.data[:-cut])
+    with FLVTagScanner(path) as scanner:
+        assert list(scanner.iter_tags()) == builder.records[:-1]
+        assert scanner.truncated
+
+
+def test_scanner_ends_on_tag_boundary(tmp_path):
+    builder = build_sample_flv()
+    path = _write(tmp_path, builder.data[:builder.records[-1][0]])
+    with FLVTagScanner(path) as scanner:
+        assert list(scanner.iter_tags()) == builder.records[:-1]
+        assert not scanner.truncated
+
+
+def test_scanner_counts_prev_tag_size_errors(tmp_path):
+    builder = FLVBuilder()
+    builder.add(TAG_TYPE_VIDEO, 0, avc_payload(FRAME_TYPE_KEY, 1, 0, b'abc'), (VIDEO_CODEC_AVC, FRAME_TYPE_KEY, 1, 0),
+                prev_tag_size=0)
+    builder.add(TAG_TYPE_VIDEO, 40, avc_payload(FRAME_TYPE_INTER, 1, 0, b'de'), (VIDEO_CODEC_AVC, FRAME_TYPE_INTER, 1, 0),
+                prev_tag_size=12345)
+    builder.add(TAG_TYPE_AUDIO, 40, audio_payload(MP3, 0x0E, b'f'), (MP3, 0x0E, PACKET_TYPE_NONE, 0))
+    path = _write(tmp_path, builder.data)
+    with FLVTagScanner(path) as scanner:
+        # 标签按数据大小前进，PreviousTagSize错误只计数
+        assert list(scanner.iter_tags()) == builder.records
+        assert scanner.prev_tag_size_errors == 2
+
+    parser = FLVStreamParser()
+    assert [record for record, _ in parser.feed(bytes(builder.data))] == builder.records
+    assert parser.prev_tag_size_errors == 2
+
+
+def test_scanner_read_tag(sample_flv):
+    path, builder = sample_flv
+    size = len(builder.data)
+    with FLVTagScanner(path) as scanner:
+        for record in builder.records:
+            assert scanner.read_tag(record[0]) == record
+        assert scanner.read_tag(-1) is None
+        assert scanner.read_tag(size) is None
+        assert scanner.read_tag(size - TAG_HEADER_SIZE + 1) is None
+        # 文件头的'F'(0x46)不是有效的标签类型
+        assert scanner.read_tag(0) is None
+        offset, _, _, data_size = builder.records[5][:4]
+        assert bytes(scanner.payload(offset, data_size)) == bytes(
+            builder.data[offset + TAG_HEADER_SIZE:offset + TAG_HEADER_SIZE + data_size])
+
+
+def test_scanner_rejects_invalid_header(tmp_path):
+    from core.parser.flv_header import FLVHeaderError
+    for name, data in (('empty.flv', b''), ('bad.flv', b'FLX\x01\x05\x00\x00\x00\x09' + bytes(4)),
+                       ('short.flv', b'FLV\x01')):
+        with pytest.raises(FLVHeaderError):
+            FLVTagScanner(_write(tmp_path, data, name)).open()
+
+
+# ---------------------------------------------------------------------------
+# 列式标签索引
+# ---------------------------------------------------------------------------
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'pure_python'])
+def table_module(request, monkeypatch):
+    """分别在NumPy和纯Python路径下测试 TagTable"""
+    from core.parser import tag_table
+    if request.param:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(tag_table, 'HAS_NUMPY', False)
+    return tag_table
+
+
+def _is_frame(record):
+    return record[6] not in (0, 2, 4, 5, 6, 7)
+
+
+def _expected_find_row(records, start_row, tag_type=None, min_timestamp=None, keyframe=False):
+    for row in range(max(start_row, 0), len(records)):
+        record = records[row]
+        if keyframe and not (record[1] == TAG_TYPE_VIDEO and record[5] == FRAME_TYPE_KEY and _is_frame(record)):
+            continue
+        if tag_type is not None and record[1] != tag_type:
+            continue
+        if min_timestamp is not None and record[2] < min_timestamp:
+            continue
+        return row
+    return -1
+
+
+def test_tag_table_columns(table_module):
+    records = build_sample_flv().records
+    table = table_module.TagTable.from_records(records)
+    assert len(table) == len(records)
+    assert list(table) == records
+    assert [table[row] for row in range(len(table))] == records
+    for position, name in enumerate(table_module.COLUMN_NAMES):
+        assert list(getattr(table, name)) == [record[position] for record in records]
+        assert list(table.column(name)) == [record[position] for record in records]
+    with pytest.raises(KeyError):
+        table.column('missing')
+    assert table.nbytes() == len(records) * sum(getattr(table, name).itemsize for name in table_module.COLUMN_NAMES)
+    assert table.max_timestamp() == 0x01234567
+
+
+def test_tag_table_queries(table_module):
+    records = build_sample_flv().records
+    table = table_module.TagTable.from_records(records)
+    for tag_type in (TAG_TYPE_AUDIO, TAG_TYPE_VIDEO, TAG_TYPE_SCRIPT):
+        rows = [row for row, record in enumerate(records) if record[1] == tag_type]
+        assert table.indices(tag_type) == rows
+        assert table.count(tag_type) == len(rows)
+        assert list(table.filter(table.mask_type(tag_type))) == [records[row] for row in rows]
+        assert table.frame_count(tag_type) == sum(1 for row in rows if _is_frame(records[row]))
+    # 序列头不是关键帧
+    keyframes = [row for row, record in enumerate(records)
+                 if record[1] == TAG_TYPE_VIDEO and record[5] == FRAME_TYPE_KEY and _is_frame(record)]
+    assert list(table.keyframe_rows()) == keyframes
+    assert records[1][5] == FRAME_TYPE_KEY and 1 not in keyframes
+    with pytest.raises(ValueError):
+        table.filter([True])
+
+    assert table.row_after(-1) == 0
+    assert table.row_after(records[3][0]) == 4
+    assert table.row_after(records[3][0] + 1) == 4
+    assert table.row_after(records[-1][0]) == len(records)
+
+
+@pytest.mark.parametrize('query', [
+    {}, {'tag_type': TAG_TYPE_VIDEO}, {'tag_type': TAG_TYPE_AUDIO}, {'tag_type': TAG_TYPE_SCRIPT},
+    {'min_timestamp': 200}, {'min_timestamp': 0x01000000}, {'min_timestamp': 0x7FFFFFFF},
+    {'keyframe': True}, {'keyframe': True, 'min_timestamp': 100},
+    {'tag_type': TAG_TYPE_AUDIO, 'min_timestamp': 440},
+])
+def test_tag_table_find_row(table_module, query):
+    records = build_sample_flv().records
+    table = table_module.TagTable.from_records(records)
+    for start_row in range(-1, len(records) + 2):
+        assert table.find_row(start_row, **query) == _expected_find_row(records, start_row, **query)
+
+
+def test_tag_table_dict_view():
+    from core.parser.tag_table import TagTable
+    records = build_sample_flv().records
+    view = TagTable.from_records(records).as_dicts()
+    assert len(view) == len(records)
+    assert view[0] == {'类型': 'ScriptTag', '时间戳': 0, '数据大小': records[0][3]}
+    assert view[1]['编解码器'] == VIDEO_CODEC_AVC and view[1]['帧类型'] == FRAME_TYPE_KEY
+    assert view[2]['采样率'] == 44100 and view[2]['声道'] == 2
+    assert view[1:3] == view.copy()[1:3]
+
+
+# ---------------------------------------------------------------------------
+# 文件处理器中的结构错误
+# ---------------------------------------------------------------------------
+
+def test_handler_reports_structure_errors(tmp_path):
+    from core.flv_handler import FLVFileHandler
+    from core.analysis.error_detector import detect_errors, LEVEL_ERROR, LEVEL_WARNING
+
+    builder = build_sample_flv()
+    data = bytearray(builder.data[:-3])
+    # 第3个标签的PreviousTagSize写错
+    offset, _, _, data_size = builder.records[2][:4]
+    prev_pos = offset + TAG_HEADER_SIZE + data_size
+    data[prev_pos:prev_pos + 4] = struct.pack('>I', 1)
+    path = _write(tmp_path, data)
+
+    handler = FLVFileHandler(use_cache=False)
+    assert handler.load_file(path)
+    assert list(handler.tags_data) == builder.records[:-1]
+    assert handler.file_info['文件截断']
+    assert handler.file_info['PreviousTagSize错误数'] == 1
+    issues = detect_errors(handler)
+    assert {'级别': LEVEL_ERROR, '检查项': '标签结构检查', '描述': '文件末尾的标签被截断'} in issues
+    assert {'级别': LEVEL_WARNING, '检查项': '标签结构检查', '描述': 'PreviousTagSize不匹配 1 处'} in issues
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+RTMP块流解复用测试：用测试用的块写入器生成各种块头组合，
+检查还原出的标签记录（时间戳、偏移、负载）
+"""
+
+import os
+import random
+import struct
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.parser.rtmp_sniffer import (RTMPChunkDemuxer, RTMPError, HANDSHAKE_SIZE, RTMP_VERSION,
+                                      DEFAULT_CHUNK_SIZE, EXTENDED_TIMESTAMP, MSG_SET_CHUNK_SIZE,
+                                      MSG_ABORT, MSG_AUDIO, MSG_VIDEO, MSG_DATA_AMF0,
+                                      MSG_COMMAND_AMF0, MSG_AGGREGATE)
+from core.parser.tag_parser import (TAG_TYPE_AUDIO, TAG_TYPE_VIDEO, TAG_TYPE_SCRIPT, TAG_HEADER_SIZE,
+                                    VIDEO_CODEC_AVC, SOUND_FORMAT_AAC, FRAME_TYPE_KEY,
+                                    FRAME_TYPE_INTER, PACKET_TYPE_NONE)
+
+CONTROL_CSID = 2
+
+
+class ChunkWriter:
+    """
+    测试用RTMP块写入器
+
+    每条消息的第一个块使用指定的fmt，后续块为fmt 3；时间戳字段
+    （fmt 0为绝对值，其余为增量）不小于0xFFFFFF时写入扩展时间戳，
+    该消息的fmt 3块同样带扩展时间戳。
+    """
+
+    def __init__(self, handshake=True):
+        self.data = bytearray()
+        if handshake:
+            self.data += bytes([RTMP_VERSION]) + bytes(HANDSHAKE_SIZE * 2)
+        self.chunk_size = DEFAULT_CHUNK_SIZE
+        self._extended = {}
+
+    @staticmethod
+    def basic_header(fmt, csid):
+        if csid < 64:
+            return bytes([(fmt << 6) | csid])
+        if csid < 320:
+            return bytes([fmt << 6, csid - 64])
+        return bytes([(fmt << 6) | 1]) + struct.pack('<H', csid - 64)
+
+    def chunks(self, csid, fmt, ts_field, type_id, payload, stream_id=1):
+        """把一条消息切分为块，返回块列表"""
+        if fmt < 3:
+            self._extended[csid] = ts_field >= EXTENDED_TIMESTAMP
+        extended = self._extended.get(csid, False)
+        header = self.basic_header(fmt, csid)
+        if fmt < 3:
+            header += min(ts_field, EXTENDED_TIMESTAMP).to_bytes(3, 'big')
+        if fmt < 2:
+            header += len(payload).to_bytes(3, 'big') + bytes([type_id])
+        if fmt == 0:
+            header += struct.pack('<I', stream_id)
+        ext = struct.pack('>I', ts_field) if extended else b''
+        continuation = self.basic_header(3, csid) + ext
+        parts = [payload[i:i + self.chunk_size] for i in range(0, len(payload), self.chunk_size)] or [b'']
+        return [header + ext + parts[0]] + [continuation + part for part in parts[1:]]
+
+    def write(self, *chunks):
+        """追加块，返回第一个块的偏移"""
+        offset = len(self.data)
+        for chunk in chunks:
+            self.data += chunk
+        return offset
+
+    def message(self, csid, fmt, ts_field, type_id, payload, stream_id=1):
+        return self.write(*self.chunks(csid, fmt, ts_field, type_id, payload, stream_id))
+
+    def set_chunk_size(self, size):
+        self.message(CONTROL_CSID, 0, 0, MSG_SET_CHUNK_SIZE, struct.pack('>I', size), 0)
+        self.chunk_size = size
+
+    def abort(self, csid):
+        self.message(CONTROL_CSID, 0, 0, MSG_ABORT, struct.pack('>I', csid), 0)
+
+
+def video(frame_type, size, cts=0, seed=0):
+    rng = random.Random(seed)
+    return (bytes([(frame_type << 4) | VIDEO_CODEC_AVC, 1]) + (cts & 0xFFFFFF).to_bytes(3, 'big')
+            + bytes(rng.getrandbits(8) for _ in range(size)))
+
+
+def audio(size):
+    return bytes([(SOUND_FORMAT_AAC << 4) | 0x0F, 1]) + bytes(range(256)) * (size // 256) + bytes(size % 256)
+
+
+def video_record(offset, timestamp, payload, frame_type, cts=0):
+    return (offset, TAG_TYPE_VIDEO, timestamp, len(payload), VIDEO_CODEC_AVC, frame_type, 1, cts)
+
+
+def audio_record(offset, timestamp, payload):
+    return (offset, TAG_TYPE_AUDIO, timestamp, len(payload), SOUND_FORMAT_AAC, 0x0F, 1, 0)
+
+
+def flv_tag(tag_type, timestamp, payload):
+    return (bytes([tag_type]) + len(payload).to_bytes(3, 'big') + (timestamp & 0xFFFFFF).to_bytes(3, 'big')
+            + bytes([(timestamp >> 24) & 0xFF]) + bytes(3) + payload
+            + struct.pack('>I', len(payload) + TAG_HEADER_SIZE))
+
+
+def demux(data, keep_payload=True, boundaries=(), has_handshake=True):
+    demuxer = RTMPChunkDemuxer(keep_payload=keep_payload, has_handshake=has_handshake)
+    events = []
+    last = 0
+    for boundary in list(boundaries) + [len(data)]:
+        events.extend(demuxer.feed(bytes(data[last:boundary])))
+        last = boundary
+    assert demuxer.bytes_consumed == len(data)
+    return demuxer, events
+
+
+def check(writer, expected, payloads):
+    """整块输入、逐字节输入和随机分块输入，保留与不保留负载，结果都应相同"""
+    data = bytes(writer.data)
+    rng = random.Random(len(data))
+    splits = [(), range(1, len(data)), sorted(rng.sample(range(1, len(data)), min(50, len(data) - 1)))]
+    for boundaries in splits:
+        for keep_payload in (True, False):
+            demuxer, events = demux(data, keep_payload, boundaries)
+            assert [record for record, _ in events] == expected
+            if keep_payload:
+                assert [bytes(payload) for _, payload in events] == payloads
+            else:
+                assert all(payload is None for _, payload in events)
+    return demuxer
+
+
+# ---------------------------------------------------------------------------
+# 块头类型
+# ---------------------------------------------------------------------------
+
+def test_chunk_header_formats():
+    writer = ChunkWriter()
+    frames = [video(FRAME_TYPE_KEY, 300, 80, 1), video(FRAME_TYPE_INTER, 40, -40, 2),
+              video(FRAME_TYPE_INTER, 200, 40, 3), video(FRAME_TYPE_INTER, 200, 0, 4)]
+    offsets = [
+        writer.message(6, 0, 1000, MSG_VIDEO, frames[0]),      # fmt 0: 绝对时间戳
+        writer.message(6, 1, 40, MSG_VIDEO, frames[1]),        # fmt 1: 增量 + 长度 + 类型
+        writer.message(6, 1, 40, MSG_VIDEO, frames[2]),
+        writer.message(6, 2, 33, MSG_VIDEO, frames[3]),        # fmt 2: 只有增量，长度沿用
+        writer.message(6, 3, 0, MSG_VIDEO, frames[3]),         # fmt 3: 沿用增量和长度
+    ]
+    expected = [
+        video_record(offsets[0], 1000, frames[0], FRAME_TYPE_KEY, 80),
+        video_record(offsets[1], 1040, frames[1], FRAME_TYPE_INTER, -40),
+        video_record(offsets[2], 1080, frames[2], FRAME_TYPE_INTER, 40),
+        video_record(offsets[3], 1113, frames[3], FRAME_TYPE_INTER, 0),
+        video_record(offsets[4], 1146, frames[3], FRAME_TYPE_INTER, 0),
+    ]
+    demuxer = check(writer, expected, [frames[0], frames[1], frames[2], frames[3], frames[3]])
+    assert demuxer.messages_parsed == 5
+
+
+@pytest.mark.parametrize('csid', [3, 63, 64, 319, 320, 65599])
+def test_basic_header_sizes(csid):
+    writer = ChunkWriter()
+    payload = video(FRAME_TYPE_KEY, 500)
+    offset = writer.message(csid, 0, 5, MSG_VIDEO, payload)
+    check(writer, [video_record(offset, 5, payload, FRAME_TYPE_KEY)], [payload])
+
+
+def test_interleaved_chunk_streams():
+    writer = ChunkWriter()
+    frame = video(FRAME_TYPE_KEY, 400)
+    sound = audio(300)
+    video_chunks = writer.chunks(6, 0, 0, MSG_VIDEO, frame)
+    audio_chunks = writer.chunks(4, 0, 20, MSG_AUDIO, sound)
+    video_offset = writer.write(video_chunks[0])
+    audio_offset = writer.write(audio_chunks[0])
+    writer.write(video_chunks[1], audio_chunks[1], audio_chunks[2], video_chunks[2], video_chunks[3])
+    # 音频消息先完成
+    check(writer, [audio_record(audio_offset, 20, sound), video_record(video_offset, 0, frame, FRAME_TYPE_KEY)],
+          [sound, frame])
+
+
+# ---------------------------------------------------------------------------
+# 扩展时间戳与回绕
+# ---------------------------------------------------------------------------
+
+def test_extended_timestamp_with_fmt3_chunks():
+    writer = ChunkWriter()
+    frames = [video(FRAME_TYPE_KEY, 500, 0, 1), video(FRAME_TYPE_INTER, 400, 0, 2),
+              video(FRAME_TYPE_INTER, 400, 0, 3), video(FRAME_TYPE_INTER, 100, 0, 4)]
+    base = 0x01000000
+    delta = 0x01000001
+    offsets = [
+        writer.message(6, 0, base, MSG_VIDEO, frames[0]),      # 后续fmt 3块都带扩展时间戳
+        writer.message(6, 1, delta, MSG_VIDEO, frames[1]),     # 增量本身需要扩展时间戳
+        writer.message(6, 3, 0, MSG_VIDEO, frames[2]),         # fmt 3新消息沿用扩展增量
+        writer.message(6, 1, 40, MSG_VIDEO, frames[3]),        # 回到普通时间戳
+    ]
+    assert writer.data.count(struct.pack('>I', base)) >= 4
+    expected = [
+        video_record(offsets[0], base, frames[0], FRAME_TYPE_KEY),
+        video_record(offsets[1], base + delta, frames[1], FRAME_TYPE_INTER),
+        video_record(offsets[2], base + 2 * delta, frames[2], FRAME_TYPE_INTER),
+        video_record(offsets[3], base + 2 * delta + 40, frames[3], FRAME_TYPE_INTER),
+    ]
+    check(writer, expected, frames)
+
+
+def test_extended_timestamp_exactly_at_marker():
+    writer = ChunkWriter()
+    payload = video(FRAME_TYPE_KEY, 300)
+    offset = writer.message(6, 0, EXTENDED_TIMESTAMP, MSG_VIDEO, payload)
+    check(writer, [video_record(offset, EXTENDED_TIMESTAMP, payload, FRAME_TYPE_KEY)], [payload])
+
+
+def test_timestamp_wraparound():
+    writer = ChunkWriter()
+    frames = [video(FRAME_TYPE_KEY, 200, 0, 1), video(FRAME_TYPE_INTER, 200, 0, 2), video(FRAME_TYPE_INTER, 200, 0, 3)]
+    offsets = [
+        writer.message(6, 0, 0xFFFFFF00, MSG_VIDEO, frames[0]),
+        writer.message(6, 1, 0x200, MSG_VIDEO, frames[1]),     # 越过2^32回绕
+        writer.message(6, 2, 0x40, MSG_VIDEO, frames[2]),      # fmt 2沿用长度
+    ]
+    expected = [
+        video_record(offsets[0], 0xFFFFFF00, frames[0], FRAME_TYPE_KEY),
+        video_record(offsets[1], 0x100, frames[1], FRAME_TYPE_INTER),
+        video_record(offsets[2], 0x140, frames[2], FRAME_TYPE_INTER),
+    ]
+    check(writer, expected, frames)
+
+
+# ---------------------------------------------------------------------------
+# 协议控制消息
+# ---------------------------------------------------------------------------
+
+def test_set_chunk_size():
+    writer = ChunkWriter()
+    frames = [video(FRAME_TYPE_KEY, 1000, 0, 1), video(FRAME_TYPE_INTER, 10000, 0, 2), video(FRAME_TYPE_INTER, 3, 0, 3)]
+    offsets = [writer.message(6, 0, 0, MSG_VIDEO, frames[0])]
+    writer.set_chunk_size(4096)
+    offsets.append(writer.message(6, 1, 40, MSG_VIDEO, frames[1]))
+    writer.set_chunk_size(1)
+    offsets.append(writer.message(6, 1, 40, MSG_VIDEO, frames[2]))
+    expected = [
+        video_record(offsets[0], 0, frames[0], FRAME_TYPE_KEY),
+        video_record(offsets[1], 40, frames[1], FRAME_TYPE_INTER),
+        video_record(offsets[2], 80, frames[2], FRAME_TYPE_INTER),
+    ]
+    demuxer = check(writer, expected, frames)
+    assert demuxer.chunk_size == 1
+
+
+def test_invalid_chunk_size():
+    writer = ChunkWriter()
+    writer.message(CONTROL_CSID, 0, 0, MSG_SET_CHUNK_SIZE, struct.pack('>I', 0), 0)
+    with pytest.raises(RTMPError):
+        demux(writer.data)
+
+
+def test_abort_discards_partial_message():
+    writer = ChunkWriter()
+    aborted = video(FRAME_TYPE_KEY, 1000, 0, 1)
+    frame = video(FRAME_TYPE_KEY, 300, 0, 2)
+    writer.write(*writer.chunks(6, 0, 0, MSG_VIDEO, aborted)[:3])
+    writer.abort(6)
+    offset = writer.message(6, 0, 80, MSG_VIDEO, frame)
+    check(writer, [video_record(offset, 80, frame, FRAME_TYPE_KEY)], [frame])
+
+
+# ---------------------------------------------------------------------------
+# 聚合消息、数据消息和命令消息
+# ---------------------------------------------------------------------------
+
+def test_aggregate_message_split():
+    writer = ChunkWriter()
+    frame = video(FRAME_TYPE_KEY, 500)
+    sound = audio(100)
+    later = video(FRAME_TYPE_INTER, 20, 40)
+    # 子标签时间戳从5000开始，整体平移到聚合消息的时间戳
+    body = flv_tag(TAG_TYPE_VIDEO, 5000, frame) + flv_tag(TAG_TYPE_AUDIO, 5010, sound) + flv_tag(TAG_TYPE_VIDEO, 5040, later)
+    offset = writer.message(6, 0, 200, MSG_AGGREGATE, body)
+    expected = [
+        video_record(offset, 200, frame, FRAME_TYPE_KEY),
+        audio_record(offset, 210, sound),
+        video_record(offset, 240, later, FRAME_TYPE_INTER, 40),
+    ]
+    check(writer, expected, [frame, sound, later])
+
+
+def test_aggregate_message_wraps_timestamp():
+    writer = ChunkWriter()
+    frame = video(FRAME_TYPE_KEY, 50)
+    body = flv_tag(TAG_TYPE_VIDEO, 100, frame) + flv_tag(TAG_TYPE_VIDEO, 300, frame)
+    offset = writer.message(6, 0, 0xFFFFFFF0, MSG_AGGREGATE, body)
+    expected = [video_record(offset, 0xFFFFFFF0, frame, FRAME_TYPE_KEY),
+                video_record(offset, 0xB8, frame, FRAME_TYPE_KEY)]
+    check(writer, expected, [frame, frame])
+
+
+def test_data_and_command_messages():
+    writer = ChunkWriter()
+    connect = b'\x02\x00\x07connect' + b'\x00' + struct.pack('>d', 1.0)
+    writer.message(3, 0, 0, MSG_COMMAND_AMF0, connect, 0)
+    metadata = b'\x02\x00\x0aonMetaData\x08\x00\x00\x00\x00\x00\x00\x09'
+    offset = writer.message(4, 0, 0, MSG_DATA_AMF0, b'\x02\x00\x0d@setDataFrame' + metadata)
+    expected = [(offset, TAG_TYPE_SCRIPT, 0, len(metadata), 0, 0, PACKET_TYPE_NONE, 0)]
+    demuxer = check(writer, expected, [metadata])
+    assert demuxer.commands == [(0, 'connect')]
+
+
+def test_handshake_version_check():
+    with pytest.raises(RTMPError):
+        demux(b'\x06' + bytes(HANDSHAKE_SIZE * 2))
+    writer = ChunkWriter(handshake=False)
+    payload = video(FRAME_TYPE_KEY, 10)
+    writer.message(6, 0, 0, MSG_VIDEO, payload)
+    _, events = demux(writer.data, has_handshake=False)
+    assert [record for record, _ in events] == [video_record(0, 0, payload, FRAME_TYPE_KEY)]
+
+
+def test_first_chunk_must_be_fmt0():
+    writer = ChunkWriter()
+    writer.message(6, 1, 40, MSG_VIDEO, video(FRAME_TYPE_KEY, 10))
+    with pytest.raises(RTMPError):
+        demux(writer.data)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+直播流滑动窗口统计测试：预热期、窗口填满后以及空闲后桶过期
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.parser.tag_parser import TAG_TYPE_VIDEO, FRAME_TYPE_KEY, FRAME_TYPE_INTER
+from core.stream_stats import StreamRateMeter, SlidingWindow, MIN_SPAN
+
+START = 1000.0
+FPS = 25
+FRAME_BYTES = 1000    # 25帧/秒 × 1000字节 = 200kbps
+
+
+def _feed(meter, seconds, start=START, first_timestamp=0):
+    """按25帧/秒送入视频标签，每秒一个关键帧，返回最后一帧之后的时间"""
+    frames = int(seconds * FPS)
+    for i in range(frames):
+        frame_type = FRAME_TYPE_KEY if i % FPS == 0 else FRAME_TYPE_INTER
+        timestamp = first_timestamp + i * 1000 // FPS
+        meter.add_tag((0, TAG_TYPE_VIDEO, timestamp, FRAME_BYTES, 7, frame_type, 1, 0),
+                      start + i / FPS)
+    return start + frames / FPS
+
+
+@pytest.mark.parametrize('window', [1.0, 5.0, 60.0])
+def test_warm_up_uses_elapsed_time(window):
+    meter = StreamRateMeter()
+    now = _feed(meter, 10)
+    stats = meter.snapshot(window, now)
+    assert stats['帧率'] == pytest.approx(FPS, rel=0.05)
+    assert stats['视频码率_kbps'] == pytest.approx(200, rel=0.05)
+    if window > 1:
+        assert stats['关键帧间隔_毫秒'] == pytest.approx(1000)
+
+
+def test_filled_window_uses_window_length():
+    meter = StreamRateMeter()
+    now = _feed(meter, 90)
+    for window in meter.windows:
+        stats = meter.snapshot(window, now)
+        assert stats['帧率'] == pytest.approx(FPS, rel=0.05)
+        assert stats['总码率_kbps'] == pytest.approx(200, rel=0.05)
+    assert meter.tags == 90 * FPS
+
+
+def test_buckets_expire_after_idle_gap():
+    meter = StreamRateMeter()
+    now = _feed(meter, 10)
+    idle = now + 6
+    assert meter.snapshot(5.0, idle)['帧率'] == 0
+    assert meter.snapshot(5.0, idle)['关键帧间隔_毫秒'] is None
+    # 60秒窗口中10秒的数据还在，按第一个样本之后经过的16秒计算
+    assert meter.snapshot(60.0, idle)['帧率'] == pytest.approx(10 * FPS / 16, rel=0.05)
+
+    # 恢复推流后短窗口只统计新的数据
+    now = _feed(meter, 5, start=idle, first_timestamp=16000)
+    assert meter.snapshot(5.0, now)['帧率'] == pytest.approx(FPS, rel=0.05)
+    assert meter.snapshot(60.0, now + 100)['帧率'] == 0
+
+
+def test_reset_restarts_warm_up():
+    meter = StreamRateMeter()
+    now = _feed(meter, 30)
+    meter.reset()
+    now = _feed(meter, 2, start=now + 100)
+    assert meter.snapshot(60.0, now)['帧率'] == pytest.approx(FPS, rel=0.05)
+
+
+def test_sliding_window_span():
+    window = SlidingWindow(10.0, buckets=10)
+    assert window.span(START) == 10.0
+    window.add(START)
+    assert window.span(START) == pytest.approx(MIN_SPAN)
+    assert window.span(START + 3.5) == pytest.approx(3.5)
+    assert window.span(START + 30) == pytest.approx(10.0)
+    window.clear()
+    window.add(START + 50)
+    assert window.span(START + 52) == pytest.approx(2.0)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+时间轴 min/max 金字塔测试：分批追加与一次构建的结果相同
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('PyQt5.QtWidgets')
+pytest.importorskip('pyqtgraph')
+
+from gui.widgets.timeline_chart import MinMaxPyramid, LOD_FACTOR, per_second_bitrate
+
+
+def _data(count, seed=0):
+    rng = np.random.default_rng(seed)
+    # 时间戳有少量回退
+    x = np.cumsum(rng.integers(-2, 40, count)).astype(np.float64)
+    y = rng.random(count) * 100
+    return x, y
+
+
+@pytest.mark.parametrize('count', [0, 1, 513, 2049, 100001])
+def test_extend_matches_single_build(count):
+    x, y = _data(count)
+    whole = MinMaxPyramid(x, y)
+    pieces = MinMaxPyramid()
+    rng = np.random.default_rng(1)
+    pos = 0
+    while pos < count:
+        step = int(rng.integers(1, 5000))
+        pieces.extend(x[pos:pos + step], y[pos:pos + step])
+        pos += step
+
+    assert len(pieces) == count
+    assert len(pieces.levels) == len(whole.levels)
+    for level_whole, level_pieces in zip(whole.levels, pieces.levels):
+        for a, b in zip(level_whole, level_pieces):
+            np.testing.assert_array_equal(a, b)
+    for start, stop in ((0, count), (count // 4, count // 2)):
+        for a, b in zip(whole.render(start, stop, 300), pieces.render(start, stop, 300)):
+            np.testing.assert_array_equal(a, b)
+
+
+def test_levels_keep_min_max():
+    x, y = _data(4 ** 6)
+    pyramid = MinMaxPyramid(x, y)
+    for level, (xs, low, high) in enumerate(pyramid.levels, 1):
+        scale = LOD_FACTOR ** level
+        np.testing.assert_array_equal(xs, x[::scale])
+        np.testing.assert_allclose(low, y.astype(np.float32).reshape(-1, scale).min(axis=1))
+        np.testing.assert_allclose(high, y.astype(np.float32).reshape(-1, scale).max(axis=1))
+    start, stop = pyramid.index_range(1000, 5000)
+    assert x[start] <= 1000 and x[stop - 1] >= 5000
+
+
+def test_per_second_bitrate():
+    rates = per_second_bitrate([0, 500, 1500, 2999], [1000, 1000, 500, 250], [9, 8, 9, 9])
+    np.testing.assert_allclose(rates['total'], [16, 4, 2])
+    np.testing.assert_allclose(rates['video'], [8, 4, 2])
+    np.testing.assert_allclose(rates['audio'], [8, 0, 0])